@@ -1,10 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from typing import List, Dict, Any
-from datetime import datetime, timedelta
-from ..database import get_db
-from ..models import Survey, PerformanceReview, Employee, Department
-from ..auth import get_current_user
+from datetime import datetime
+from database import get_db
+from models import Survey, PerformanceReview
+from auth import get_current_user
+from services import performance_analytics
 
 router = APIRouter()
 
@@ -20,8 +22,7 @@ async def get_analytics_data(
         survey_response_rate = (completed_surveys / total_surveys * 100) if total_surveys > 0 else 0
 
         # Calculate average performance rating
-        reviews = db.query(PerformanceReview).all()
-        average_rating = sum(review.rating for review in reviews) / len(reviews) if reviews else 0
+        average_rating = performance_analytics.review_summary(db)["average_rating"] or 0
 
         # Calculate employee satisfaction (example metric)
         employee_satisfaction = 85  # This would be calculated based on survey responses
@@ -32,42 +33,26 @@ async def get_analytics_data(
         ).count()
 
         # Get department performance data
-        departments = db.query(Department).all()
-        department_performance = [
-            {
-                "name": dept.name,
-                "value": sum(review.rating for review in dept.employees[0].reviews) / len(dept.employees[0].reviews)
-                if dept.employees and dept.employees[0].reviews else 0
-            }
-            for dept in departments
-        ]
+        department_performance = performance_analytics.department_ratings(db)
 
         # Get survey distribution data
-        survey_types = db.query(Survey.type).distinct().all()
         survey_distribution = [
-            {
-                "name": survey_type[0],
-                "value": db.query(Survey).filter(Survey.type == survey_type[0]).count()
-            }
-            for survey_type in survey_types
+            {"name": survey_type, "value": count}
+            for survey_type, count in db.query(Survey.type, func.count(Survey.id)).group_by(Survey.type).all()
         ]
 
         # Get performance trends (last 6 months)
-        six_months_ago = datetime.now() - timedelta(days=180)
-        monthly_reviews = db.query(PerformanceReview).filter(
-            PerformanceReview.created_at >= six_months_ago
-        ).all()
-
-        performance_trends = []
-        for i in range(6):
-            month = datetime.now() - timedelta(days=30 * i)
-            month_reviews = [r for r in monthly_reviews if r.created_at.month == month.month]
-            avg_rating = sum(r.rating for r in month_reviews) / len(month_reviews) if month_reviews else 0
-            performance_trends.append({
-                "name": month.strftime("%b %Y"),
-                "value": avg_rating
-            })
-        performance_trends.reverse()
+        # Six whole calendar months, including the current one
+        now = datetime.now()
+        first_month = now.year * 12 + now.month - 6
+        trend_start = datetime(first_month // 12, first_month % 12 + 1, 1)
+        performance_trends = [
+            {
+                "name": datetime.strptime(month["month"], "%Y-%m").strftime("%b %Y"),
+                "value": month["average_rating"] or 0
+            }
+            for month in performance_analytics.review_trend(db, trend_start)
+        ]
 
         # Get employee engagement data
         engagement_metrics = [
@@ -8,6 +8,7 @@ from sqlalchemy.orm import Session
 from database import get_db
 import models
 from config import settings
+from auth.permissions import Principal, roles_mask
 
 # Security configuration
 SECRET_KEY = settings.SECRET_KEY
@@ -65,39 +66,48 @@ def authenticate_user(db: Session, email: str, password: str):
         return False
     return user
 
-def require_roles(allowed_roles: list):
+def is_super_admin(user: models.User) -> bool:
+    """Check if user is a super admin"""
+    return bool(user.profile_settings and 
+                user.profile_settings.get("is_super_admin", False))
+
+async def get_current_principal(current_user: models.User = Depends(get_current_user)) -> Principal:
+    """
+    Compiled permissions for the request's user. FastAPI caches this per
+    request, so the profile_settings lookup happens once however many
+    checks a route stacks.
+    """
+    return Principal(current_user, is_super_admin(current_user))
+
+def require_roles(allowed_roles: list, active_only: bool = False,
+                  detail: str = "Access denied. Insufficient permissions."):
     """
     Dependency factory that creates a dependency to check user roles.
     Usage: current_user = Depends(require_roles(["admin", "hr_admin"]))
     """
-    async def role_checker(current_user: models.User = Depends(get_current_user)):
+    required = roles_mask(allowed_roles)
+    
+    async def role_checker(principal: Principal = Depends(get_current_principal)):
+        if active_only and not principal.user.is_active:
+            raise HTTPException(status_code=400, detail="Inactive user")
         # Super admins can access everything
-        if (current_user.profile_settings and 
-            current_user.profile_settings.get("is_super_admin", False)):
-            return current_user
-            
-        if current_user.role not in allowed_roles:
+        if not principal.has_roles(required):
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
-                detail="Access denied. Insufficient permissions."
+                detail=detail
             )
-        return current_user
+        return principal.user
     
     return role_checker
 
-def is_super_admin(user: models.User) -> bool:
-    """Check if user is a super admin"""
-    return (user.profile_settings and 
-            user.profile_settings.get("is_super_admin", False))
-
 def require_super_admin():
     """Dependency that requires super admin access"""
-    async def super_admin_checker(current_user: models.User = Depends(get_current_user)):
-        if not is_super_admin(current_user):
+    async def super_admin_checker(principal: Principal = Depends(get_current_principal)):
+        if not principal.is_super_admin:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Super admin access required."
             )
-        return current_user
+        return principal.user
     
-    return super_admin_checker 
\ No newline at end of file
+    return super_admin_checker 
@@ -0,0 +1,98 @@
+"""
+Compiled role model.
+
+Every role in the permission matrix below gets one bit in ``ROLE_BITS``, so
+``require_roles([...])`` compiles its role list to a mask once, when the
+route is declared, and each request's check is a single AND against the
+``Principal``'s role bit.
+
+The matrix itself describes each role's capabilities for
+``/users/me/permissions`` and ``/users/permissions/*``; access is enforced
+by the role checks on each route.
+"""
+
+from typing import Dict, Iterable, List, Optional
+
+# User Permissions Matrix
+USER_PERMISSIONS: Dict[str, Dict[str, List[str]]] = {
+    "admin": {
+        "users": ["create", "read", "update", "delete"],
+        "employees": ["create", "read", "update", "delete"],
+        "departments": ["create", "read", "update", "delete"],
+        "kpis": ["create", "read", "update", "delete"],
+        "surveys": ["create", "read", "update", "delete"],
+        "action_plans": ["create", "read", "update", "delete"],
+        "focus_groups": ["create", "read", "update", "delete"],
+        "analytics": ["read", "export"],
+        "system": ["configure", "backup"]
+    },
+    "hr_admin": {
+        "users": ["create", "read", "update"],
+        "employees": ["create", "read", "update", "delete"],
+        "departments": ["create", "read", "update"],
+        "kpis": ["create", "read", "update"],
+        "surveys": ["create", "read", "update", "delete"],
+        "action_plans": ["create", "read", "update", "delete"],
+        "focus_groups": ["create", "read", "update", "delete"],
+        "analytics": ["read", "export"]
+    },
+    "manager": {
+        "employees": ["read", "update"],  # Only in their department
+        "kpis": ["read"],
+        "surveys": ["read", "update"],  # Only their department surveys
+        "action_plans": ["create", "read", "update"],  # Only their department
+        "focus_groups": ["create", "read", "update"],  # Only their department
+        "analytics": ["read"]  # Only their department data
+    },
+    "employee": {
+        "surveys": ["read", "respond"],
+        "action_plans": ["read"],  # Only assigned to them
+        "focus_groups": ["read"],  # Only groups they're in
+        "profile": ["read", "update"]  # Their own profile
+    }
+}
+
+# Granted only through the is_super_admin profile flag, never through a role
+SUPER_ADMIN_PERMISSIONS: Dict[str, List[str]] = {
+    **USER_PERMISSIONS["admin"],
+    "system": [*USER_PERMISSIONS["admin"]["system"], "super_admin"],
+}
+
+ROLE_BITS: Dict[str, int] = {role: 1 << bit for bit, role in enumerate(USER_PERMISSIONS)}
+
+
+def role_bit(role: Optional[str]) -> int:
+    """Bit for a role; roles outside the matrix have none and match no require_roles mask"""
+    return ROLE_BITS.get(role, 0)
+
+
+def roles_mask(roles: Iterable[str]) -> int:
+    """Compile a require_roles list; unknown names are rejected when the route is declared"""
+    unknown = [role for role in roles if role not in ROLE_BITS]
+    if unknown:
+        raise ValueError(f"Unknown roles: {', '.join(unknown)}")
+    mask = 0
+    for role in roles:
+        mask |= ROLE_BITS[role]
+    return mask
+
+
+class Principal:
+    """The authenticated user plus their compiled role bit"""
+
+    __slots__ = ("user", "role_bit", "is_super_admin")
+
+    def __init__(self, user, is_super_admin: bool):
+        self.user = user
+        self.is_super_admin = is_super_admin
+        self.role_bit = role_bit(user.role)
+
+    def has_roles(self, required_roles: int) -> bool:
+        # Super admins pass every role check
+        return self.is_super_admin or bool(self.role_bit & required_roles)
+
+    def permissions(self) -> Dict[str, List[str]]:
+        """The matrix entry for /users/me/permissions; informational, routes check roles"""
+        if self.is_super_admin:
+            return SUPER_ADMIN_PERMISSIONS
+        return USER_PERMISSIONS.get(self.user.role, {})
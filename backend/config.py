@@ -17,6 +17,7 @@ hasn't been refactored to import `settings` directly.
 from __future__ import annotations
 
 import os
+import tempfile
 from pathlib import Path
 from typing import Any
 
@@ -68,6 +69,100 @@ class Settings(BaseSettings):
         description="API key for Cerebras inference or similar service"
     )
 
+    # Audit pipeline ----------------------------------------------------------
+    AUDIT_QUEUE_MAX_SIZE: int = Field(10000, description="Max audit events buffered before writes fall back to synchronous inserts")
+    AUDIT_BATCH_SIZE: int = Field(500, description="Max audit events written per batch insert")
+    AUDIT_FLUSH_INTERVAL_SECONDS: float = Field(1.0, description="Max time an audit event waits in the buffer before being flushed")
+
+    # Background writers --------------------------------------------------------
+    WRITER_RETRY_ATTEMPTS: int = Field(3, description="Attempts for a failed audit/ingestion batch before it is written row by row")
+    WRITER_RETRY_BASE_SECONDS: float = Field(0.5, description="Base delay for exponential backoff between batch write attempts")
+    DEAD_LETTER_DIR: str = Field(
+        str(BACKEND_DIR / "dead_letters"),
+        description="Directory for JSON-lines files of acknowledged rows that could not be written"
+    )
+
+    # Exports ---------------------------------------------------------------
+    EXPORT_DIR: str = Field(
+        str(Path(tempfile.gettempdir()) / "hr_dashboard_exports"),
+        description="Local directory where background export jobs write their files"
+    )
+    EXPORT_RETENTION_HOURS: int = Field(24, description="How long generated export files are kept for download")
+
+    # Data retention ----------------------------------------------------------
+    RETENTION_BATCH_SIZE: int = Field(1000, description="Rows deleted/anonymized per retention transaction")
+    RETENTION_MAX_DUTY_CYCLE: float = Field(0.25, description="Max fraction of wall time the retention executor spends inside transactions")
+    RETENTION_LOCK_TIMEOUT_MS: int = Field(2000, description="Per-batch lock timeout so retention never queues behind OLTP locks")
+    RETENTION_INTERVAL_HOURS: float = Field(24, description="How often auto-delete policies are executed in the background (0 disables)")
+    RETENTION_STALE_AFTER_SECONDS: float = Field(600.0, description="Running retention runs without a heartbeat for this long may be resumed by another worker")
+
+    # Background jobs ---------------------------------------------------------
+    JOB_WORKER_CONCURRENCY: int = Field(4, description="Number of concurrent background job workers")
+    JOB_RESULT_TTL_HOURS: int = Field(24, description="How long finished job results are retained")
+    JOB_HEARTBEAT_SECONDS: float = Field(15.0, description="How often workers refresh the heartbeat of their running jobs")
+    JOB_STALE_AFTER_SECONDS: float = Field(120.0, description="Running jobs without a heartbeat for this long are re-queued")
+
+    # Notifications -----------------------------------------------------------
+    NOTIFICATION_SENDER_MODE: str = Field("stub", description="'live' delivers through Slack/Teams/SMTP, 'stub' only logs deliveries locally")
+    NOTIFICATION_BATCH_SIZE: int = Field(1000, description="Due notifications claimed per dispatcher batch")
+    NOTIFICATION_POLL_INTERVAL_SECONDS: float = Field(5.0, description="How often the dispatcher polls when the queue is idle")
+    NOTIFICATION_MAX_ATTEMPTS: int = Field(5, description="Delivery attempts before a notification is marked failed")
+    NOTIFICATION_RETRY_BASE_SECONDS: float = Field(30.0, description="Base delay for exponential retry backoff")
+    NOTIFICATION_CLAIM_TIMEOUT_SECONDS: int = Field(600, description="Claimed notifications not finished within this time are released for retry")
+    NOTIFICATION_PLATFORM_CONCURRENCY: int = Field(50, description="Max in-flight deliveries per platform")
+    SLACK_RATE_LIMIT_PER_SECOND: float = Field(50, description="Max Slack messages per second (0 = unlimited)")
+    TEAMS_RATE_LIMIT_PER_SECOND: float = Field(20, description="Max Teams messages per second (0 = unlimited)")
+    EMAIL_RATE_LIMIT_PER_SECOND: float = Field(100, description="Max emails per second (0 = unlimited)")
+    SLACK_BOT_TOKEN: str | None = Field(None, description="Slack bot token used for chat.postMessage")
+    TEAMS_WEBHOOK_URL: str | None = Field(None, description="Default Teams incoming webhook URL")
+    TEAMS_CHANNEL_WEBHOOKS: dict[str, str] = Field({}, description="Teams channel ID -> incoming webhook URL, for surveys that target channels")
+    SMTP_HOST: str | None = Field(None, description="SMTP server for email notifications")
+    SMTP_PORT: int = Field(587, description="SMTP server port")
+    SMTP_USERNAME: str | None = None
+    SMTP_PASSWORD: str | None = None
+    SMTP_SENDER: str = Field("hr-team@example.com", description="From address for email notifications")
+
+    # Survey scheduler --------------------------------------------------------
+    SURVEY_SCHEDULER_RESYNC_SECONDS: float = Field(300, description="How often each worker reloads scheduled deployments from the database")
+
+    # Live survey counters ----------------------------------------------------
+    LIVE_COUNTER_RESYNC_SECONDS: float = Field(30, description="How often watched survey counters are reconciled with the database (picks up other workers' responses)")
+
+    # Survey response ingestion -----------------------------------------------
+    INGEST_BATCH_SIZE: int = Field(500, description="Max survey responses inserted per group commit")
+    INGEST_FLUSH_INTERVAL_MS: int = Field(50, description="Max time an accepted response waits before its batch is committed")
+    INGEST_QUEUE_MAX_SIZE: int = Field(20000, description="Accepted responses buffered before submitters wait for the writer")
+    SURVEY_DEFINITION_CACHE_SECONDS: float = Field(60, description="How long validated survey definitions are cached per worker")
+
+    # Response quality ----------------------------------------------------------
+    QUALITY_SPEEDER_Z: float = Field(3.5, description="Modified z-score (median/MAD of log completion time) beyond which a response is a speeder or unusually slow")
+    QUALITY_NEAR_DUPLICATE_SIMILARITY: float = Field(0.8, description="Shingle Jaccard similarity at which free-text answers count as near-duplicates")
+    QUALITY_MIN_TEXT_LENGTH: int = Field(20, description="Shorter normalized text answers are not checked for duplicates")
+    QUALITY_REBUILD_SECONDS: float = Field(600, description="Age after which a survey's cached quality state is rebuilt from scratch")
+
+    # Org hierarchy -------------------------------------------------------------
+    ORG_HIERARCHY_REFRESH_SECONDS: float = Field(30, description="How often each worker checks whether its cached reporting tree is stale")
+
+    # Bulk operations -----------------------------------------------------------
+    BULK_BATCH_SIZE: int = Field(1000, description="Rows per IN lookup / UPDATE ... FROM (VALUES ...) statement in bulk endpoints")
+
+    # Department metrics --------------------------------------------------------
+    DEPARTMENT_METRICS_TTL_SECONDS: float = Field(60, description="Upper bound on how stale cached department metrics can be on workers that did not see the write")
+
+    # KPI alerts ----------------------------------------------------------------
+    KPI_ALERT_DEVIATION_WARNING: float = Field(10.0, description="Deviation from target (%) at which a KPI raises a warning alert")
+    KPI_ALERT_DEVIATION_CRITICAL: float = Field(20.0, description="Deviation from target (%) at which a KPI alert becomes critical")
+    KPI_ALERT_CHANGE_WARNING: float = Field(15.0, description="Change from the previous measurement (%) that raises a rate-of-change warning")
+    KPI_ALERT_CHANGE_CRITICAL: float = Field(30.0, description="Change from the previous measurement (%) that makes a rate-of-change alert critical")
+    KPI_ALERT_TREND_WARNING: float = Field(10.0, description="Fitted adverse change (%) over the trend window that raises a trend warning")
+    KPI_ALERT_TREND_CRITICAL: float = Field(25.0, description="Fitted adverse change (%) over the trend window that makes a trend alert critical")
+    KPI_ALERT_TREND_WINDOW: int = Field(6, description="Latest measurements fitted by the trend rule")
+    KPI_ALERT_TREND_CONFIDENCE: float = Field(0.9, description="Slope confidence required before the trend rule fires")
+    KPI_ALERT_HYSTERESIS: float = Field(0.25, description="An active alert clears only once its metric falls this fraction below the warning level")
+    KPI_ALERT_THRESHOLD_MARGIN: float = Field(2.5, description="An active threshold alert clears only once the value is this many percent of the threshold back inside the band")
+    KPI_ALERT_PLATFORMS: list[str] = Field(["in_app"], description="Platforms KPI alert notifications are queued for")
+    KPI_ALERT_RECIPIENT_ROLES: list[str] = Field(["admin", "hr_admin"], description="Roles notified of KPI alerts, in addition to the KPI's creator")
+
     class Config:
         env_file: str | Path = ".env"  # secondary fallback (project root)
         case_sensitive = False
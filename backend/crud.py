@@ -4,6 +4,7 @@ import models
 import schemas
 from typing import List, Optional, Dict, Any
 from datetime import datetime
+from services.pagination import keyset_paginate, build_page
 
 # User CRUD operations
 def create_user(db: Session, user: schemas.UserCreate):
@@ -52,6 +53,14 @@ def get_employee(db: Session, employee_id: int):
 def get_employees(db: Session, skip: int = 0, limit: int = 100):
     return db.query(models.Employee).offset(skip).limit(limit).all()
 
+def get_employees_page(db: Session, limit: int = 100, cursor: Optional[str] = None, skip: int = 0):
+    """Keyset-paginated employees ordered by (created_at, id); returns (items, next_cursor)"""
+    query = keyset_paginate(
+        db.query(models.Employee), models.Employee.created_at, models.Employee.id,
+        limit, cursor=cursor, skip=skip
+    )
+    return build_page(query.all(), limit, "created_at")
+
 # Department CRUD operations
 def create_department(db: Session, department: schemas.DepartmentCreate):
     db_department = models.Department(**department.dict())
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+SURVEY RESPONSE INGESTION LOAD TEST
+Pushes concurrent submissions through the validation + group-commit pipeline
+used by POST /surveys/{id}/responses and reports sustained submissions/sec.
+
+Against the configured database (creates a throwaway survey, removed afterwards):
+    python load_test_survey_ingestion.py --duration 30 --clients 200
+
+Without a database (simulated batch insert latency):
+    python load_test_survey_ingestion.py --simulate-db-ms 20
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from services import response_ingestion
+from services.response_ingestion import (
+    ResponseIngestor, SurveyDefinition, build_response_row, validate_response
+)
+
+QUESTION_IDS = [str(uuid.uuid4()) for _ in range(10)]
+
+
+def _answers():
+    return {question_id: random.randint(1, 5) for question_id in QUESTION_IDS}
+
+
+def _simulated_definition():
+    return SurveyDefinition(
+        survey_id=str(uuid.uuid4()), status="active", start_date=None, end_date=None, is_anonymous=False,
+        questions={question_id: {"type": "scale", "options": ["1", "5"]} for question_id in QUESTION_IDS},
+        question_order=QUESTION_IDS, branching={},
+    )
+
+
+def _simulated_writer(latency_ms: float):
+    seen = set()
+
+    def write(batch):
+        # One round trip per batch, regardless of its size
+        time.sleep(latency_ms / 1000)
+        inserted = []
+        for row in batch:
+            key = (row["survey_id"], row["employee_id"])
+            if key not in seen:
+                seen.add(key)
+                inserted.append(row)
+        return inserted
+
+    return write
+
+
+def _create_test_survey(employee_count: int):
+    from database import SessionLocal
+    import models
+
+    db = SessionLocal()
+    try:
+        employee_ids = [row[0] for row in db.query(models.Employee.id).limit(employee_count).all()]
+        survey = models.Survey(
+            title=f"Ingestion load test {datetime.now(timezone.utc):%Y-%m-%d %H:%M:%S}",
+            type="pulse", status="active",
+            start_date=datetime.now(timezone.utc) - timedelta(minutes=1),
+            end_date=datetime.now(timezone.utc) + timedelta(days=1),
+        )
+        db.add(survey)
+        db.flush()
+        for index, question_id in enumerate(QUESTION_IDS):
+            db.add(models.SurveyQuestion(
+                id=uuid.UUID(question_id), survey_id=survey.id, text=f"Load test question {index + 1}",
+                type="scale", options=["1", "5"], position=index,
+            ))
+        db.commit()
+        return survey.id, employee_ids
+    finally:
+        db.close()
+
+
+def _delete_test_survey(survey_id):
+    from database import SessionLocal
+    import models
+
+    db = SessionLocal()
+    try:
+        db.query(models.SurveyResponse).filter(models.SurveyResponse.survey_id == survey_id).delete()
+        db.query(models.SurveyQuestion).filter(models.SurveyQuestion.survey_id == survey_id).delete()
+        db.query(models.Survey).filter(models.Survey.id == survey_id).delete()
+        db.commit()
+    finally:
+        db.close()
+
+
+async def run_load_test(args):
+    if args.simulate_db_ms is not None:
+        print(f"🔄 Simulating {args.simulate_db_ms}ms per batch insert (no database)")
+        response_ingestion.write_response_batch = _simulated_writer(args.simulate_db_ms)
+        definition = _simulated_definition()
+        survey_id = definition.survey_id
+        employee_ids = [uuid.uuid4() for _ in range(args.employees)]
+    else:
+        print("🔄 Creating load test survey...")
+        survey_id, employee_ids = _create_test_survey(args.employees)
+        if not employee_ids:
+            print("❌ No employees found; seed data first or use --simulate-db-ms")
+            _delete_test_survey(survey_id)
+            return False
+        definition = await response_ingestion.survey_definitions.get(survey_id)
+
+    ingestor = ResponseIngestor(
+        max_queue_size=args.queue_size, batch_size=args.batch_size, flush_interval=args.flush_ms / 1000
+    )
+    await ingestor.start()
+
+    latencies = []
+    per_second = {}
+    next_employee = 0
+    started = time.perf_counter()
+    deadline = started + args.duration
+
+    async def client():
+        nonlocal next_employee
+        while time.perf_counter() < deadline:
+            # ~10% resubmissions exercise the ON CONFLICT path
+            if next_employee and random.random() < args.duplicate_rate:
+                employee_id = employee_ids[random.randrange(min(next_employee, len(employee_ids)))]
+            else:
+                employee_id = employee_ids[next_employee % len(employee_ids)]
+                next_employee += 1
+            answers = _answers()
+
+            t0 = time.perf_counter()
+            validate_response(definition, answers)
+            await ingestor.submit(build_response_row(survey_id, employee_id, answers, completion_time_seconds=120))
+            t1 = time.perf_counter()
+            latencies.append(t1 - t0)
+            second = int(t1 - started)
+            per_second[second] = per_second.get(second, 0) + 1
+
+    print(f"🚀 {args.clients} clients submitting for {args.duration}s "
+          f"(batch {args.batch_size}, flush {args.flush_ms}ms)...")
+    await asyncio.gather(*(client() for _ in range(args.clients)))
+    accepted_elapsed = time.perf_counter() - started
+    await ingestor.stop()
+    committed_elapsed = time.perf_counter() - started
+
+    stats = ingestor.stats
+    committed = stats["inserted"] + stats["duplicates"]
+    steady = [count for second, count in sorted(per_second.items()) if second < int(args.duration)]
+    latencies.sort()
+
+    print("✅ LOAD TEST COMPLETE")
+    print(f"Accepted:             {stats['accepted']} in {accepted_elapsed:.1f}s "
+          f"({stats['accepted'] / accepted_elapsed:,.0f}/s)")
+    print(f"Committed:            {committed} in {committed_elapsed:.1f}s "
+          f"({committed / committed_elapsed:,.0f}/s, {stats['batches']} batches)")
+    print(f"Inserted/duplicates:  {stats['inserted']} / {stats['duplicates']} (failed {stats['failed']})")
+    if steady:
+        print(f"Sustained per second: min {min(steady):,}  median {statistics.median(steady):,.0f}  max {max(steady):,}")
+    if latencies:
+        print(f"Accept latency:       p50 {latencies[len(latencies) // 2] * 1000:.2f}ms  "
+              f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.2f}ms")
+
+    if args.simulate_db_ms is None:
+        _delete_test_survey(survey_id)
+        print("🧹 Load test survey removed")
+    return stats["failed"] == 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=10, help="Seconds to keep submitting")
+    parser.add_argument("--clients", type=int, default=100, help="Concurrent submitters")
+    parser.add_argument("--employees", type=int, default=50000, help="Distinct respondents to cycle through")
+    parser.add_argument("--duplicate-rate", type=float, default=0.1, help="Fraction of resubmissions")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--flush-ms", type=int, default=50)
+    parser.add_argument("--queue-size", type=int, default=20000)
+    parser.add_argument("--simulate-db-ms", type=float, default=None,
+                        help="Replace the batch insert with a sleep of this many ms (no database needed)")
+    asyncio.run(run_load_test(parser.parse_args()))
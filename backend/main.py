@@ -35,6 +35,8 @@ from routers.employees import router as employees_router
 from routers.action_plans import router as action_plans_router
 from routers.focus_groups import router as focus_groups_router
 from routers.security import router as security_router
+from routers.jobs import router as jobs_router
+from routers.exports import router as exports_router
 from routers import surveys, kpis, employees, departments, analytics, performance, parameters
 
 # Configure logging
@@ -170,6 +172,8 @@ app.include_router(employees_router, prefix="/api/v1")
 app.include_router(action_plans_router, prefix="/api/v1")
 app.include_router(focus_groups_router, prefix="/api/v1")
 app.include_router(security_router, prefix="/api/v1")
+app.include_router(jobs_router, prefix="/api/v1")
+app.include_router(exports_router, prefix="/api/v1")
 
 # Add AI router
 from routers.ai import router as ai_router
@@ -222,6 +226,55 @@ async def startup_event():
         if engine.dialect.name != "sqlite":
             raise RuntimeError("Failed to create database tables")
     
+    # Start background audit writer
+    try:
+        from services.audit import start_audit_writer
+        await start_audit_writer()
+    except Exception as e:
+        logger.error(f"❌ Audit writer failed to start, audit events will be written inline: {e}")
+    
+    # Start background job workers (re-queues jobs interrupted by a restart)
+    try:
+        from services.jobs import start_job_runner
+        await start_job_runner()
+    except Exception as e:
+        logger.error(f"❌ Job runner failed to start: {e}")
+    
+    # Start data retention scheduler (also resumes interrupted runs)
+    try:
+        from services.retention import start_retention_scheduler
+        await start_retention_scheduler()
+    except Exception as e:
+        logger.error(f"❌ Retention scheduler failed to start: {e}")
+    
+    # Start notification dispatcher (survey invitations, reminders)
+    try:
+        from services.notifications import start_notification_dispatcher
+        await start_notification_dispatcher()
+    except Exception as e:
+        logger.error(f"❌ Notification dispatcher failed to start: {e}")
+    
+    # Start recurring survey scheduler
+    try:
+        from services.survey_scheduler import start_survey_scheduler
+        await start_survey_scheduler()
+    except Exception as e:
+        logger.error(f"❌ Survey scheduler failed to start: {e}")
+    
+    # Start live survey counters (real-time dashboards)
+    try:
+        from services.live_counters import start_live_counters
+        await start_live_counters()
+    except Exception as e:
+        logger.error(f"❌ Live survey counters failed to start: {e}")
+    
+    # Start survey response ingestor (group-commits submitted responses)
+    try:
+        from services.response_ingestion import start_response_ingestor
+        await start_response_ingestor()
+    except Exception as e:
+        logger.error(f"❌ Response ingestor failed to start, responses will be written inline: {e}")
+    
     # Initialize sample data for development
     if settings.ENVIRONMENT == "development":
         await init_sample_data()
@@ -233,6 +286,55 @@ async def shutdown_event():
     """Cleanup on shutdown"""
     logger.info("🛑 Shutting down HR Dashboard API...")
     
+    # Stop job workers; interrupted jobs are re-queued on next startup
+    try:
+        from services.jobs import stop_job_runner
+        await stop_job_runner()
+    except Exception as e:
+        logger.error(f"❌ Error stopping job runner: {e}")
+    
+    # Stop retention runs after their current batch; they resume on next startup
+    try:
+        from services.retention import stop_retention_scheduler
+        await stop_retention_scheduler()
+    except Exception as e:
+        logger.error(f"❌ Error stopping retention scheduler: {e}")
+    
+    # Close live dashboard streams
+    try:
+        from services.live_counters import stop_live_counters
+        await stop_live_counters()
+    except Exception as e:
+        logger.error(f"❌ Error stopping live survey counters: {e}")
+    
+    # Stop survey scheduler; due deployments are picked up on next startup
+    try:
+        from services.survey_scheduler import stop_survey_scheduler
+        await stop_survey_scheduler()
+    except Exception as e:
+        logger.error(f"❌ Error stopping survey scheduler: {e}")
+    
+    # Finish the in-flight notification batch; unsent rows stay queued
+    try:
+        from services.notifications import stop_notification_dispatcher
+        await stop_notification_dispatcher()
+    except Exception as e:
+        logger.error(f"❌ Error stopping notification dispatcher: {e}")
+    
+    # Commit accepted survey responses still in the ingest buffer
+    try:
+        from services.response_ingestion import stop_response_ingestor
+        await stop_response_ingestor()
+    except Exception as e:
+        logger.error(f"❌ Error draining response ingestor: {e}")
+    
+    # Drain queued audit events before the pools go away
+    try:
+        from services.audit import stop_audit_writer
+        await stop_audit_writer()
+    except Exception as e:
+        logger.error(f"❌ Error draining audit writer: {e}")
+    
     # Close async database connection pool
     try:
         from services.database import close_database
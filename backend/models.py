@@ -1,7 +1,7 @@
-from sqlalchemy import Boolean, Column, ForeignKey, String, DateTime, Float, JSON, Text, Integer, Numeric, Date
+from sqlalchemy import Boolean, Column, ForeignKey, String, DateTime, Float, JSON, Text, Integer, Numeric, Date, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 from database import Base
 import uuid
 
@@ -26,6 +26,10 @@ class User(Base):
     # Relationships
     employee = relationship("Employee", back_populates="user")
 
+    __table_args__ = (
+        Index("idx_users_created_at_id", "created_at", "id"),
+    )
+
 class Department(Base):
     __tablename__ = "departments"
 
@@ -70,6 +74,22 @@ class Employee(Base):
     feedback_given = relationship("Feedback", back_populates="giver", foreign_keys="Feedback.giver_id")
     feedback_received = relationship("Feedback", back_populates="recipient", foreign_keys="Feedback.recipient_id")
 
+    __table_args__ = (
+        Index("idx_employees_created_at_id", "created_at", "id"),
+    )
+
+class EmployeeHierarchy(Base):
+    """Closure table over Employee.manager_id, maintained by a database trigger"""
+    __tablename__ = "employee_hierarchy"
+
+    ancestor_id = Column(UUID(as_uuid=True), ForeignKey("employees.id", ondelete="CASCADE"), primary_key=True)
+    descendant_id = Column(UUID(as_uuid=True), ForeignKey("employees.id", ondelete="CASCADE"), primary_key=True)
+    depth = Column(Integer, nullable=False)  # 0 = self, 1 = direct report, ...
+
+    __table_args__ = (
+        Index("idx_employee_hierarchy_descendant", "descendant_id", "depth"),
+    )
+
 # =====================================================
 # KPI MANAGEMENT MODELS
 # =====================================================
@@ -101,6 +121,7 @@ class KPI(Base):
     calculation_method = Column(String)  # manual, automatic, survey_based
     is_custom = Column(Boolean, default=False)
     is_active = Column(Boolean, default=True)
+    priority = Column(String, default='medium')  # high, medium, low
     target_departments = Column(JSON, default=[])
     target_employee_groups = Column(JSON, default=[])
     alert_threshold_low = Column(Numeric)
@@ -112,6 +133,8 @@ class KPI(Base):
     # Relationships
     category = relationship("KPICategory", back_populates="kpis")
     values = relationship("KPIValue", back_populates="kpi")
+    measurements = relationship("KPIMeasurement", back_populates="kpi", passive_deletes=True)
+    alerts = relationship("KPIAlert", back_populates="kpi", passive_deletes=True)
     creator = relationship("User")
 
 class KPIValue(Base):
@@ -130,6 +153,54 @@ class KPIValue(Base):
     kpi = relationship("KPI", back_populates="values")
     department = relationship("Department")
 
+class KPIMeasurement(Base):
+    __tablename__ = "kpi_measurements"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
+    kpi_id = Column(UUID(as_uuid=True), ForeignKey("kpis.id", ondelete="CASCADE"), nullable=False)
+    value = Column(Numeric, nullable=False)
+    measurement_date = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    notes = Column(Text)
+    recorded_by = Column(UUID(as_uuid=True), ForeignKey("users.id"))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    # Relationships
+    kpi = relationship("KPI", back_populates="measurements")
+    recorder = relationship("User")
+
+    __table_args__ = (
+        Index("idx_kpi_measurements_kpi_date", "kpi_id", "measurement_date"),
+    )
+
+class KPIAlert(Base):
+    """Alert state per KPI and rule; at most one active alert per (kpi_id, rule)"""
+    __tablename__ = "kpi_alerts"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
+    kpi_id = Column(UUID(as_uuid=True), ForeignKey("kpis.id", ondelete="CASCADE"), nullable=False)
+    rule = Column(String, nullable=False)  # deviation, threshold, trend, rate_of_change
+    severity = Column(String, nullable=False)  # warning, critical
+    status = Column(String, default='active', nullable=False)  # active, resolved
+    value = Column(Numeric)  # Measurement that last confirmed the alert
+    metric = Column(Float)  # Rule metric, e.g. deviation percentage
+    message = Column(Text)
+    details = Column(JSON, default={})
+    occurrences = Column(Integer, default=1, nullable=False)
+    measured_at = Column(DateTime(timezone=True))
+    triggered_at = Column(DateTime(timezone=True), server_default=func.now())
+    last_evaluated_at = Column(DateTime(timezone=True), server_default=func.now())
+    notified_at = Column(DateTime(timezone=True))
+    resolved_at = Column(DateTime(timezone=True))
+
+    # Relationships
+    kpi = relationship("KPI", back_populates="alerts")
+
+    __table_args__ = (
+        Index("uq_kpi_alerts_active_rule", "kpi_id", "rule", unique=True, postgresql_where=text("status = 'active'")),
+        Index("idx_kpi_alerts_status_severity", "status", "severity", "triggered_at"),
+    )
+
 # =====================================================
 # SURVEY SYSTEM MODELS
 # =====================================================
@@ -162,10 +233,13 @@ class Survey(Base):
     start_date = Column(DateTime(timezone=True), server_default=func.now())
     end_date = Column(DateTime(timezone=True), nullable=False)
     is_anonymous = Column(Boolean, default=False)
-    target_departments = Column(JSON, default=[])
-    target_employees = Column(JSON, default=[])
+    audience_size = Column(Integer)  # Employees in survey_audience, set when the audience is resolved at deployment
+    audience_resolved_at = Column(DateTime(timezone=True))
     frequency = Column(String, default='one-time')
     platform_integrations = Column(JSON, default={})
+    parent_survey_id = Column(UUID(as_uuid=True), ForeignKey("surveys.id"))  # Recurring schedule this instance came from
+    occurrence_at = Column(DateTime(timezone=True))  # Scheduled deployment time of this instance
+    next_run_at = Column(DateTime(timezone=True))  # Next scheduler deployment, NULL when nothing is scheduled
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now())
 
@@ -173,6 +247,76 @@ class Survey(Base):
     questions = relationship("SurveyQuestion", back_populates="survey")
     responses = relationship("SurveyResponse", back_populates="survey")
     kpi_mappings = relationship("SurveyKPIMapping", back_populates="survey")
+    target_department_links = relationship("SurveyTargetDepartment", lazy="selectin", cascade="all, delete-orphan", passive_deletes=True)
+    target_employee_links = relationship("SurveyTargetEmployee", lazy="selectin", cascade="all, delete-orphan", passive_deletes=True)
+
+    @property
+    def target_departments(self):
+        """Targeted department IDs, from survey_target_departments"""
+        return [link.department_id for link in self.target_department_links]
+
+    @target_departments.setter
+    def target_departments(self, department_ids):
+        existing = {link.department_id: link for link in self.target_department_links}
+        self.target_department_links = [
+            existing.get(department_id) or SurveyTargetDepartment(department_id=department_id)
+            for department_id in dict.fromkeys(_as_uuid(value) for value in department_ids or [])
+        ]
+
+    @property
+    def target_employees(self):
+        """Individually targeted employee IDs, from survey_target_employees"""
+        return [link.employee_id for link in self.target_employee_links]
+
+    @target_employees.setter
+    def target_employees(self, employee_ids):
+        existing = {link.employee_id: link for link in self.target_employee_links}
+        self.target_employee_links = [
+            existing.get(employee_id) or SurveyTargetEmployee(employee_id=employee_id)
+            for employee_id in dict.fromkeys(_as_uuid(value) for value in employee_ids or [])
+        ]
+
+    __table_args__ = (
+        Index("idx_surveys_created_at_id", "created_at", "id"),
+        Index("idx_surveys_next_run_at", "next_run_at"),
+        Index("idx_surveys_parent_occurrence", "parent_survey_id", "occurrence_at", unique=True),
+    )
+
+def _as_uuid(value):
+    return value if isinstance(value, uuid.UUID) else uuid.UUID(str(value))
+
+class SurveyTargetDepartment(Base):
+    __tablename__ = "survey_target_departments"
+
+    survey_id = Column(UUID(as_uuid=True), ForeignKey("surveys.id", ondelete="CASCADE"), primary_key=True)
+    department_id = Column(UUID(as_uuid=True), ForeignKey("departments.id", ondelete="CASCADE"), primary_key=True)
+
+    __table_args__ = (
+        Index("idx_survey_target_departments_department", "department_id", "survey_id"),
+    )
+
+class SurveyTargetEmployee(Base):
+    __tablename__ = "survey_target_employees"
+
+    survey_id = Column(UUID(as_uuid=True), ForeignKey("surveys.id", ondelete="CASCADE"), primary_key=True)
+    employee_id = Column(UUID(as_uuid=True), ForeignKey("employees.id", ondelete="CASCADE"), primary_key=True)
+
+    __table_args__ = (
+        Index("idx_survey_target_employees_employee", "employee_id", "survey_id"),
+    )
+
+class SurveyAudience(Base):
+    """Resolved audience of a deployed survey: target departments expanded into employees once"""
+    __tablename__ = "survey_audience"
+
+    survey_id = Column(UUID(as_uuid=True), ForeignKey("surveys.id", ondelete="CASCADE"), primary_key=True)
+    employee_id = Column(UUID(as_uuid=True), ForeignKey("employees.id", ondelete="CASCADE"), primary_key=True)
+    department_id = Column(UUID(as_uuid=True), ForeignKey("departments.id", ondelete="SET NULL"))  # At resolution time
+
+    __table_args__ = (
+        Index("idx_survey_audience_employee", "employee_id", "survey_id"),
+        Index("idx_survey_audience_department", "survey_id", "department_id"),
+    )
 
 class SurveyQuestion(Base):
     __tablename__ = "survey_questions"
@@ -182,6 +326,7 @@ class SurveyQuestion(Base):
     text = Column(Text, nullable=False)
     type = Column(String, nullable=False)
     options = Column(JSON)
+    position = Column(Integer, nullable=False, default=0)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     # Relationships
@@ -197,12 +342,37 @@ class SurveyResponse(Base):
     completion_time_seconds = Column(Integer)
     is_anonymous = Column(Boolean, default=False)
     submitted_at = Column(DateTime(timezone=True), server_default=func.now())
-    extra_metadata = Column(JSON, default={})
+    extra_metadata = Column("metadata", JSON, default={})
 
     # Relationships
     survey = relationship("Survey", back_populates="responses")
     employee = relationship("Employee", back_populates="survey_responses")
 
+    __table_args__ = (
+        Index("idx_survey_responses_survey_submitted_id", "survey_id", "submitted_at", "id"),
+        Index("uq_survey_responses_survey_employee", "survey_id", "employee_id", unique=True),
+    )
+
+class SurveyAnswer(Base):
+    """Columnar projection of closed-ended answers, maintained by the response ingestor"""
+    __tablename__ = "survey_answers"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
+    response_id = Column(UUID(as_uuid=True), ForeignKey("survey_responses.id", ondelete="CASCADE"), nullable=False)
+    survey_id = Column(UUID(as_uuid=True), ForeignKey("surveys.id", ondelete="CASCADE"), nullable=False)
+    question_id = Column(UUID(as_uuid=True), ForeignKey("survey_questions.id", ondelete="CASCADE"), nullable=False)
+    department_id = Column(UUID(as_uuid=True), ForeignKey("departments.id", ondelete="SET NULL"))
+    numeric_value = Column(Float)  # Scale value, 1/0 for booleans, numeric choice labels
+    choice_code = Column(Integer)  # Index into the question's options
+
+    __table_args__ = (
+        Index(
+            "idx_survey_answers_survey_question_dept", "survey_id", "question_id", "department_id",
+            postgresql_include=["numeric_value", "choice_code", "response_id"]
+        ),
+        Index("idx_survey_answers_response", "response_id"),
+    )
+
 class SurveyKPIMapping(Base):
     __tablename__ = "survey_kpi_mappings"
 
@@ -229,7 +399,6 @@ class FocusGroup(Base):
     description = Column(Text)
     type = Column(String, nullable=False)  # department, role, performance, survey_based, custom
     criteria = Column(JSON, nullable=False)
-    members = Column(JSON, nullable=False)  # array of employee IDs
     status = Column(String, default='active')  # active, archived, dissolved
     created_by = Column(UUID(as_uuid=True), ForeignKey("users.id"))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -238,6 +407,33 @@ class FocusGroup(Base):
     # Relationships
     creator = relationship("User")
     action_plans = relationship("ActionPlan", back_populates="target_focus_group")
+    memberships = relationship("FocusGroupMember", back_populates="focus_group", passive_deletes=True)
+
+    @property
+    def members(self):
+        """Member employee IDs, from focus_group_members"""
+        return [membership.employee_id for membership in self.memberships]
+
+class FocusGroupMember(Base):
+    __tablename__ = "focus_group_members"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
+    focus_group_id = Column(UUID(as_uuid=True), ForeignKey("focus_groups.id", ondelete="CASCADE"), nullable=False)
+    employee_id = Column(UUID(as_uuid=True), ForeignKey("employees.id", ondelete="CASCADE"), nullable=False)
+    role = Column(String, default='member', nullable=False)  # member, coordinator, leader
+    notes = Column(Text)
+    added_by = Column(UUID(as_uuid=True), ForeignKey("users.id"))
+    joined_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # Relationships
+    focus_group = relationship("FocusGroup", back_populates="memberships")
+    employee = relationship("Employee")
+
+    __table_args__ = (
+        Index("uq_focus_group_members_group_employee", "focus_group_id", "employee_id", unique=True),
+        # Reverse index: "which groups is this employee in"
+        Index("idx_focus_group_members_employee", "employee_id", "focus_group_id"),
+    )
 
 class Outlier(Base):
     __tablename__ = "outliers"
@@ -317,6 +513,10 @@ class ActionPlan(Base):
     progress_updates = relationship("ActionPlanProgress", back_populates="action_plan")
     efficacy_measurements = relationship("EfficacyMeasurement", back_populates="action_plan")
 
+    __table_args__ = (
+        Index("idx_action_plans_created_at_id", "created_at", "id"),
+    )
+
 class ActionPlanProgress(Base):
     __tablename__ = "action_plan_progress"
 
@@ -464,6 +664,58 @@ class Feedback(Base):
     giver = relationship("Employee", back_populates="feedback_given", foreign_keys=[giver_id])
     related_review = relationship("PerformanceReview")
 
+class FeedbackCampaign(Base):
+    """A 360 feedback round: one request per (subject, rater) in feedback_requests"""
+    __tablename__ = "feedback_campaigns"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
+    name = Column(String, nullable=False)
+    description = Column(Text)
+    cycle_id = Column(UUID(as_uuid=True), ForeignKey("performance_review_cycles.id", ondelete="SET NULL"))
+    due_date = Column(Date, nullable=False)
+    status = Column(String, default='active', nullable=False)  # active, closed
+    settings = Column(JSON, default={})  # Rater selection, parameters to rate, notification platforms
+    subject_count = Column(Integer, default=0, nullable=False)
+    total_requests = Column(Integer, default=0, nullable=False)
+    completed_requests = Column(Integer, default=0, nullable=False)
+    created_by = Column(UUID(as_uuid=True), ForeignKey("users.id"))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
+    closed_at = Column(DateTime(timezone=True))
+
+    # Relationships
+    cycle = relationship("PerformanceReviewCycle")
+    creator = relationship("User")
+
+class FeedbackRequest(Base):
+    __tablename__ = "feedback_requests"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
+    campaign_id = Column(UUID(as_uuid=True), ForeignKey("feedback_campaigns.id", ondelete="CASCADE"))
+    employee_id = Column(UUID(as_uuid=True), ForeignKey("employees.id"), nullable=False)  # Subject of the feedback
+    rater_id = Column(UUID(as_uuid=True), ForeignKey("employees.id", ondelete="CASCADE"))
+    requested_by = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
+    request_type = Column(String, nullable=False)  # peer, upward, downward, self (360 for legacy whole-round rows)
+    due_date = Column(Date, nullable=False)
+    status = Column(String, default='pending')  # pending, in_progress, completed, expired
+    instructions = Column(Text)
+    feedback_id = Column(UUID(as_uuid=True), ForeignKey("feedback.id", ondelete="SET NULL"))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    completed_at = Column(DateTime(timezone=True))
+
+    # Relationships
+    campaign = relationship("FeedbackCampaign")
+    employee = relationship("Employee", foreign_keys=[employee_id])
+    rater = relationship("Employee", foreign_keys=[rater_id])
+    feedback = relationship("Feedback")
+
+    __table_args__ = (
+        Index("uq_feedback_requests_campaign_subject_rater", "campaign_id", "employee_id", "rater_id", unique=True),
+        # Status counters per campaign and "what am I asked to give"
+        Index("idx_feedback_requests_campaign_status", "campaign_id", "status", "request_type"),
+        Index("idx_feedback_requests_rater_status", "rater_id", "status"),
+    )
+
 class PraiseRecognition(Base):
     __tablename__ = "praise_recognition"
 
@@ -501,6 +753,12 @@ class AuditLog(Base):
     # Relationships
     user = relationship("User")
 
+    __table_args__ = (
+        Index("idx_audit_logs_timestamp_id", "timestamp", "id"),
+        Index("idx_audit_logs_user_timestamp_id", "user_id", "timestamp", "id"),
+        Index("idx_audit_logs_action_timestamp_id", "action", "timestamp", "id"),
+    )
+
 class ConsentRecord(Base):
     __tablename__ = "consent_records"
 
@@ -528,10 +786,99 @@ class DataRetentionPolicy(Base):
     data_type = Column(String, nullable=False)  # survey_responses, audit_logs, etc.
     retention_period_days = Column(Integer, nullable=False)
     auto_delete = Column(Boolean, default=False)
+    action = Column(String, default='delete')  # delete, anonymize
     legal_basis = Column(String)  # GDPR legal basis
     is_active = Column(Boolean, default=True)
     created_by = Column(UUID(as_uuid=True), ForeignKey("users.id"))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relationships
-    creator = relationship("User") 
\ No newline at end of file
+    creator = relationship("User")
+
+class RetentionRun(Base):
+    __tablename__ = "retention_runs"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
+    policy_id = Column(UUID(as_uuid=True), ForeignKey("data_retention_policies.id", ondelete="CASCADE"), index=True)
+    data_type = Column(String, nullable=False)
+    action = Column(String, nullable=False)  # delete, anonymize
+    status = Column(String, default='pending', nullable=False)  # pending, running, completed, failed, cancelled
+    cutoff_date = Column(DateTime(timezone=True), nullable=False)  # Fixed at creation so resumed runs target the same rows
+    total_candidates = Column(Integer, default=0)
+    processed_count = Column(Integer, default=0)
+    batches_completed = Column(Integer, default=0)
+    last_error = Column(Text)
+    started_by = Column(UUID(as_uuid=True), ForeignKey("users.id"))
+    worker_id = Column(String)  # Runner that claimed the run
+    heartbeat_at = Column(DateTime(timezone=True))  # Refreshed every batch; stale runs may be resumed elsewhere
+    started_at = Column(DateTime(timezone=True))
+    completed_at = Column(DateTime(timezone=True))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # Relationships
+    policy = relationship("DataRetentionPolicy") 
+
+# =====================================================
+# BACKGROUND JOB MODELS
+# =====================================================
+
+class BackgroundJob(Base):
+    __tablename__ = "background_jobs"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
+    job_type = Column(String, nullable=False)  # e.g. analytics.detect_outliers
+    status = Column(String, default='queued', nullable=False)  # queued, running, succeeded, failed, cancelled
+    params = Column(JSON, default={})
+    idempotency_key = Column(String)
+    progress = Column(Integer, default=0)  # 0-100
+    progress_message = Column(String)
+    result = Column(JSON)
+    error = Column(Text)
+    created_by = Column(UUID(as_uuid=True), ForeignKey("users.id"))
+    worker_id = Column(String)  # host:pid:nonce of the runner executing the job
+    heartbeat_at = Column(DateTime(timezone=True))  # Refreshed while running; stale jobs are re-queued
+    cancel_requested = Column(Boolean, default=False, nullable=False)  # Set by /jobs/{id}/cancel; the owning runner cancels the task
+    started_at = Column(DateTime(timezone=True))
+    completed_at = Column(DateTime(timezone=True))
+    expires_at = Column(DateTime(timezone=True))  # Results are purged after this
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # Relationships
+    creator = relationship("User")
+
+    __table_args__ = (
+        Index("idx_background_jobs_idempotency", "created_by", "job_type", "idempotency_key", unique=True),
+        Index("idx_background_jobs_status_created", "status", "created_at"),
+        Index("idx_background_jobs_expires_at", "expires_at"),
+    )
+
+# =====================================================
+# NOTIFICATION MODELS
+# =====================================================
+
+class NotificationQueue(Base):
+    __tablename__ = "notification_queue"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
+    recipient_id = Column(UUID(as_uuid=True), ForeignKey("users.id"))
+    type = Column(String, nullable=False)  # survey_invitation, reminder, alert, praise, feedback_request
+    title = Column(String, nullable=False)
+    message = Column(Text, nullable=False)
+    platform = Column(String, nullable=False)  # slack, teams, email, in_app
+    status = Column(String, default='pending')  # pending, sending, sent, failed, cancelled
+    scheduled_for = Column(DateTime(timezone=True), server_default=func.now())
+    sent_at = Column(DateTime(timezone=True))
+    attempts = Column(Integer, default=0)
+    last_error = Column(Text)
+    claimed_at = Column(DateTime(timezone=True))
+    metadata_ = Column("metadata", JSON, default={})
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # Relationships
+    recipient = relationship("User")
+
+    __table_args__ = (
+        Index("idx_notification_queue_status_scheduled", "status", "scheduled_for"),
+    )
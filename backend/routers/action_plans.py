@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Header
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, update, delete, func, and_, or_
 from typing import List, Optional, Dict, Any
@@ -17,7 +17,11 @@ from schemas import (
     ActionPlanProgressUpdate, ActionPlanAnalytics
 )
 from auth.dependencies import get_current_user, require_roles
+from services.pagination import (
+    COUNT_MODE_PATTERN, InvalidCursorError, keyset_paginate, build_page, approximate_count_statement
+)
 from ai_service import ai_service
+from services.jobs import JobContext, job_handler, submit_job, job_accepted_response
 
 router = APIRouter(prefix="/action-plans", tags=["action-plans"])
 
@@ -142,6 +146,8 @@ async def delete_action_plan_template(
 async def list_action_plans(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from next_cursor; takes precedence over skip"),
+    count: str = Query("exact", pattern=COUNT_MODE_PATTERN),
     status_filter: Optional[str] = None,
     department_id: Optional[uuid.UUID] = None,
     focus_group_id: Optional[uuid.UUID] = None,
@@ -150,7 +156,13 @@ async def list_action_plans(
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """List action plans with filtering and pagination"""
+    """
+    List action plans with filtering and keyset pagination.
+
+    The exact total is only computed for the first page; follow-up pages
+    requested with a cursor skip the COUNT. Use count=approximate for a
+    planner estimate or count=none to skip totals entirely.
+    """
     query = select(ActionPlan)
     count_query = select(func.count(ActionPlan.id))
     
@@ -181,19 +193,28 @@ async def list_action_plans(
         count_query = count_query.where(and_(*filters))
     
     # Get total count
-    total_result = await db.execute(count_query)
-    total = total_result.scalar()
+    total = None
+    if count == "approximate":
+        total_result = await db.execute(approximate_count_statement(ActionPlan.__tablename__))
+        total = total_result.scalar()
+    elif count == "exact" and not cursor:
+        total_result = await db.execute(count_query)
+        total = total_result.scalar()
     
     # Get paginated results
-    query = query.offset(skip).limit(limit).order_by(ActionPlan.created_at.desc())
+    try:
+        query = keyset_paginate(query, ActionPlan.created_at, ActionPlan.id, limit, cursor=cursor, skip=skip)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     result = await db.execute(query)
-    action_plans = result.scalars().all()
+    action_plans, next_cursor = build_page(result.scalars().all(), limit, "created_at")
     
     return ActionPlanList(
         items=action_plans,
         total=total,
         skip=skip,
-        limit=limit
+        limit=limit,
+        next_cursor=next_cursor
     )
 
 @router.post("", response_model=ActionPlanResponse, status_code=status.HTTP_201_CREATED)
@@ -694,10 +715,21 @@ async def generate_ai_action_plan_recommendations(
 @router.post("/ai/analyze-efficacy/{action_plan_id}")
 async def analyze_action_plan_efficacy(
     action_plan_id: uuid.UUID,
+    run_async: bool = Query(False, alias="async", description="Run as a background job and return 202 with a job ID"),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(require_roles(["admin", "hr_admin", "manager"]))
 ):
     """Analyze action plan efficacy using Cerebras AI"""
+    if run_async:
+        job = submit_job(
+            "action_plans.analyze_efficacy",
+            {"action_plan_id": action_plan_id},
+            created_by=current_user.id,
+            idempotency_key=idempotency_key
+        )
+        return job_accepted_response(job)
+    
     try:
         # Get the action plan
         action_plan = await get_action_plan(action_plan_id, db, current_user)
@@ -766,4 +798,11 @@ async def analyze_action_plan_efficacy(
         raise HTTPException(
             status_code=500,
             detail=f"Failed to analyze action plan efficacy: {str(e)}"
-        ) 
\ No newline at end of file
+        )
+
+@job_handler("action_plans.analyze_efficacy")
+async def analyze_action_plan_efficacy_job(ctx: JobContext, action_plan_id: str):
+    return await ctx.run_with_session(lambda db, user: analyze_action_plan_efficacy(
+        action_plan_id=uuid.UUID(action_plan_id), run_async=False, idempotency_key=None,
+        db=db, current_user=user
+    ))
@@ -1,12 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Header
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, or_, desc, asc, text
+from sqlalchemy import func, and_, or_, desc, asc, select, text
 from typing import List, Optional, Dict, Any, Union
 import models
 import schemas
 from database import get_db
 from auth.dependencies import get_current_active_user, require_roles
 from ai_service import ai_service
+from services.jobs import JobContext, job_handler, submit_job, job_accepted_response
+from services.org_hierarchy import can_access_employee, org_hierarchy
+from services import kpi_alerts, timeseries
+from services.survey_audience import aggregate_response_rate, surveys_targeting_department
+from services.exports import (
+    EXPORT_WRITERS, ExportError, export_filename, iter_csv, report_table, write_export_file, write_job_artifact,
+)
 import logging
 from datetime import datetime, timedelta
 import uuid
@@ -14,6 +23,9 @@ import pandas as pd
 import numpy as np
 from collections import defaultdict
 import json
+import os
+import tempfile
+from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
@@ -67,7 +79,6 @@ async def get_dashboard_overview(
         kpis_off_target = 0
         kpis_trending_up = 0
         kpis_trending_down = 0
-        critical_alerts = []
         
         for kpi in kpis:
             # Target achievement
@@ -77,30 +88,21 @@ async def get_dashboard_overview(
                     kpis_on_target += 1
                 else:
                     kpis_off_target += 1
-                    
-                # Critical alerts (>20% deviation)
-                if deviation_pct > 20:
-                    critical_alerts.append({
-                        "kpi_id": kpi.id,
-                        "kpi_name": kpi.name,
-                        "current_value": kpi.current_value,
-                        "target_value": kpi.target_value,
-                        "deviation_percentage": round(deviation_pct, 2),
-                        "priority": kpi.priority
-                    })
-            
-            # Trend analysis (last 5 measurements)
-            recent_measurements = db.query(models.KPIMeasurement).filter(
-                models.KPIMeasurement.kpi_id == kpi.id
-            ).order_by(desc(models.KPIMeasurement.measurement_date)).limit(5).all()
-            
-            if len(recent_measurements) >= 3:
-                values = [m.value for m in reversed(recent_measurements)]
-                trend = calculate_trend(values)
-                if trend > 0.05:  # 5% improvement
-                    kpis_trending_up += 1
-                elif trend < -0.05:  # 5% decline
-                    kpis_trending_down += 1
+        
+        # Critical alerts, precomputed when measurements are recorded
+        kpi_ids = [kpi.id for kpi in kpis]
+        critical_alerts = kpi_alerts.list_alerts(db, kpi_ids, severity="critical", limit=5)
+        alert_counts = kpi_alerts.count_alerts(db, kpi_ids)
+        
+        # Trend analysis: the last 5 measurements of every KPI, fitted in one pass
+        recent_series = [
+            values for values in timeseries.load_kpi_series(db, [kpi.id for kpi in kpis], latest=5).values()
+            if len(values) >= 3
+        ]
+        if recent_series:
+            trends = timeseries.trend_percentage(timeseries.pad(recent_series))
+            kpis_trending_up = int((trends > timeseries.TREND_THRESHOLD).sum())
+            kpis_trending_down = int((trends < -timeseries.TREND_THRESHOLD).sum())
         
         # Employee metrics
         employee_query = db.query(models.Employee).filter(models.Employee.is_active == True)
@@ -109,26 +111,15 @@ async def get_dashboard_overview(
         
         total_employees = employee_query.count()
         
-        # Survey response rates
-        recent_surveys = db.query(models.Survey).filter(
-            and_(
-                models.Survey.start_date >= start_date,
-                models.Survey.status == "active"
-            )
+        # Survey response rates: indexed response counts over precomputed audience sizes
+        recent_surveys = select(models.Survey.id).where(
+            models.Survey.start_date >= start_date,
+            models.Survey.status == "active"
         )
         if department_filter:
-            recent_surveys = recent_surveys.filter(
-                models.Survey.target_departments.contains(str(department_filter))
-            )
+            recent_surveys = recent_surveys.where(models.Survey.id.in_(surveys_targeting_department(department_filter)))
         
-        survey_response_rate = 0
-        if recent_surveys.count() > 0:
-            total_responses = db.query(models.SurveyResponse).join(
-                models.Survey, models.SurveyResponse.survey_id == models.Survey.id
-            ).filter(models.Survey.start_date >= start_date).count()
-            
-            expected_responses = recent_surveys.count() * total_employees
-            survey_response_rate = (total_responses / expected_responses * 100) if expected_responses > 0 else 0
+        survey_response_rate = aggregate_response_rate(db, recent_surveys, department_filter)["response_rate"]
         
         # Action Plan metrics
         action_plan_query = db.query(models.ActionPlan)
@@ -173,8 +164,9 @@ async def get_dashboard_overview(
                 }
             },
             "alerts": {
-                "critical_kpis": critical_alerts[:5],  # Top 5 critical alerts
-                "total_alerts": len(critical_alerts)
+                "critical_kpis": critical_alerts,  # Top 5 critical alerts
+                "total_alerts": alert_counts["critical"],
+                "warning_alerts": alert_counts["warning"]
             },
             "period": period,
             "department_filter": str(department_filter) if department_filter else None,
@@ -228,20 +220,28 @@ async def get_kpi_trend_charts(
             kpi_id_list = [kpi.id for kpi in top_kpis]
         
         # Get KPI data and measurements
-        chart_data = []
+        kpis_by_id = {
+            kpi.id: kpi for kpi in db.query(models.KPI).filter(models.KPI.id.in_(kpi_id_list)).all()
+        }
+        kpi_id_list = [kpi_id for kpi_id in kpi_id_list if kpi_id in kpis_by_id]
         
-        for kpi_id in kpi_id_list:
-            kpi = db.query(models.KPI).filter(models.KPI.id == kpi_id).first()
-            if not kpi:
-                continue
-            
-            # Get measurements for the period
-            measurements = db.query(models.KPIMeasurement).filter(
-                and_(
-                    models.KPIMeasurement.kpi_id == kpi_id,
-                    models.KPIMeasurement.measurement_date >= start_date
-                )
-            ).order_by(models.KPIMeasurement.measurement_date).all()
+        measurements_by_kpi = defaultdict(list)
+        for measurement in db.query(models.KPIMeasurement).filter(
+            and_(
+                models.KPIMeasurement.kpi_id.in_(kpi_id_list),
+                models.KPIMeasurement.measurement_date >= start_date
+            )
+        ).order_by(models.KPIMeasurement.kpi_id, models.KPIMeasurement.measurement_date).all():
+            measurements_by_kpi[measurement.kpi_id].append(measurement)
+        
+        # Trend, smoothing, seasonality and forecast for every chart in one pass
+        analyses = timeseries.analyze(
+            [[m.value for m in measurements_by_kpi[kpi_id]] for kpi_id in kpi_id_list]
+        )
+        
+        chart_data = []
+        for kpi_id, analysis in zip(kpi_id_list, analyses):
+            kpi = kpis_by_id[kpi_id]
             
             # Prepare data points
             data_points = [
@@ -251,13 +251,9 @@ async def get_kpi_trend_charts(
                     "target": kpi.target_value,
                     "notes": m.notes
                 }
-                for m in measurements
+                for m in measurements_by_kpi[kpi_id]
             ]
             
-            # Calculate trend
-            values = [m.value for m in measurements]
-            trend = calculate_trend(values) if len(values) >= 2 else 0
-            
             chart_data.append({
                 "kpi_id": kpi.id,
                 "kpi_name": kpi.name,
@@ -265,7 +261,8 @@ async def get_kpi_trend_charts(
                 "measurement_type": kpi.measurement_type,
                 "target_value": kpi.target_value,
                 "current_value": kpi.current_value,
-                "trend_percentage": round(trend * 100, 2),
+                "trend_percentage": round(analysis["trend_percentage"] * 100, 2),
+                "analysis": analysis,
                 "data_points": data_points,
                 "color": get_kpi_color(kpi.category)
             })
@@ -390,10 +387,21 @@ async def detect_outliers(
     threshold: float = Query(2.0, ge=1.0, le=5.0),
     department_id: Optional[uuid.UUID] = None,
     metric_type: str = Query("engagement", enum=["engagement", "performance", "satisfaction", "attendance"]),
+    run_async: bool = Query(False, alias="async", description="Run as a background job and return 202 with a job ID"),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
     current_user: models.User = Depends(require_roles(["admin", "hr_admin", "manager"])),
     db: Session = Depends(get_db)
 ):
     """Advanced outlier detection using multiple algorithms"""
+    if run_async:
+        job = submit_job(
+            "analytics.detect_outliers",
+            {"method": method, "threshold": threshold, "department_id": department_id, "metric_type": metric_type},
+            created_by=current_user.id,
+            idempotency_key=idempotency_key
+        )
+        return job_accepted_response(job)
+    
     try:
         # Get employees to analyze
         employee_query = db.query(models.Employee).filter(models.Employee.is_active == True)
@@ -514,6 +522,15 @@ async def detect_outliers(
             detail="Failed to detect outliers"
         )
 
+@job_handler("analytics.detect_outliers")
+async def detect_outliers_job(ctx: JobContext, method: str, threshold: float, department_id: Optional[str], metric_type: str):
+    return await ctx.run_with_session(lambda db, user: detect_outliers(
+        method=method, threshold=threshold,
+        department_id=uuid.UUID(department_id) if department_id else None,
+        metric_type=metric_type, run_async=False, idempotency_key=None,
+        current_user=user, db=db
+    ))
+
 @router.get("/outliers/summary")
 async def get_outlier_summary(
     department_id: Optional[uuid.UUID] = None,
@@ -605,40 +622,49 @@ async def export_dashboard_report(
     format: str = Query("json", enum=["json", "csv", "excel"]),
     department_id: Optional[uuid.UUID] = None,
     period: str = Query("3months", enum=["1month", "3months", "6months", "1year"]),
+    run_async: bool = Query(False, alias="async", description="Run as a background job and return 202 with a job ID"),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
     current_user: models.User = Depends(require_roles(["admin", "hr_admin", "manager"])),
     db: Session = Depends(get_db)
 ):
-    """Export comprehensive dashboard report"""
+    """Export comprehensive dashboard report (JSON, streamed CSV or XLSX)"""
+    if run_async:
+        job = submit_job(
+            "analytics.export_dashboard_report",
+            {"format": format, "department_id": department_id, "period": period},
+            created_by=current_user.id,
+            idempotency_key=idempotency_key
+        )
+        return job_accepted_response(job)
+    
     try:
-        # Get dashboard data
-        overview_data = await get_dashboard_overview(department_id, period, current_user, db)
-        
-        # Get KPI data
-        kpi_data = await get_kpi_trend_charts(None, period, department_id, current_user, db)
-        
-        # Get outlier data
-        outlier_data = await get_outlier_summary(department_id, None, None, current_user, db)
-        
-        report_data = {
-            "generated_at": datetime.utcnow().isoformat(),
-            "generated_by": current_user.email,
-            "period": period,
-            "department_filter": str(department_id) if department_id else "All Departments",
-            "overview": overview_data,
-            "kpi_trends": kpi_data,
-            "outlier_analysis": outlier_data
-        }
+        report_data = await build_dashboard_report(department_id, period, current_user, db)
         
         if format == "json":
             return report_data
         elif format == "csv":
-            # Convert to CSV format (flattened)
-            csv_data = flatten_for_csv(report_data)
-            return {"csv_data": csv_data, "filename": f"dashboard_report_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.csv"}
+            table = report_table("dashboard_report", report_data)
+            return StreamingResponse(
+                iter_csv(table),
+                media_type=EXPORT_WRITERS["csv"]["media_type"],
+                headers={"Content-Disposition": f'attachment; filename="{export_filename(table.name, "csv")}"'}
+            )
         elif format == "excel":
-            # Return structured data for Excel export
-            return {"excel_data": report_data, "filename": f"dashboard_report_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.xlsx"}
+            table = report_table("dashboard_report", report_data)
+            fd, tmp = tempfile.mkstemp(suffix=".xlsx")
+            os.close(fd)
+            try:
+                write_export_file(table, "xlsx", Path(tmp))
+            except Exception:
+                os.remove(tmp)
+                raise
+            return FileResponse(
+                tmp, media_type=EXPORT_WRITERS["xlsx"]["media_type"],
+                filename=export_filename(table.name, "xlsx"), background=BackgroundTask(os.remove, tmp)
+            )
         
+    except ExportError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         logger.error(f"Failed to export dashboard report: {e}")
         raise HTTPException(
@@ -646,31 +672,127 @@ async def export_dashboard_report(
             detail="Failed to export dashboard report"
         )
 
-# =============================================================================
-# HELPER FUNCTIONS
-# =============================================================================
-
-def calculate_trend(values: List[float]) -> float:
-    """Calculate trend percentage using linear regression"""
-    if len(values) < 2:
-        return 0.0
+async def build_dashboard_report(
+    department_id: Optional[uuid.UUID], period: str, current_user: models.User, db: Session
+) -> Dict[str, Any]:
+    # Get dashboard data
+    overview_data = await get_dashboard_overview(department_id, period, current_user, db)
     
-    x = list(range(len(values)))
-    n = len(values)
+    # Get KPI data
+    kpi_data = await get_kpi_trend_charts(None, period, department_id, current_user, db)
     
-    # Calculate linear regression slope
-    sum_x = sum(x)
-    sum_y = sum(values)
-    sum_xy = sum(x[i] * values[i] for i in range(n))
-    sum_x2 = sum(x[i] ** 2 for i in range(n))
+    # Get outlier data
+    outlier_data = await get_outlier_summary(department_id, None, None, current_user, db)
     
-    slope = (n * sum_xy - sum_x * sum_y) / (n * sum_x2 - sum_x ** 2) if (n * sum_x2 - sum_x ** 2) != 0 else 0
-    
-    # Convert to percentage change
-    first_value = values[0]
-    if first_value != 0:
-        return (slope * (len(values) - 1)) / first_value
-    return 0.0
+    return {
+        "generated_at": datetime.utcnow().isoformat(),
+        "generated_by": current_user.email,
+        "period": period,
+        "department_filter": str(department_id) if department_id else "All Departments",
+        "overview": overview_data,
+        "kpi_trends": kpi_data,
+        "outlier_analysis": outlier_data
+    }
+
+@job_handler("analytics.export_dashboard_report")
+async def export_dashboard_report_job(ctx: JobContext, format: str, department_id: Optional[str], period: str):
+    report_data = await ctx.run_with_session(lambda db, user: build_dashboard_report(
+        uuid.UUID(department_id) if department_id else None, period, user, db
+    ))
+    if format == "json":
+        return report_data
+    # CSV/XLSX are written to a downloadable file; the job result points at it
+    table = report_table("dashboard_report", report_data)
+    return await ctx.run_blocking(write_job_artifact, ctx.job_id, table, "xlsx" if format == "excel" else "csv")
+
+# =============================================================================
+# ORG HIERARCHY
+# =============================================================================
+
+def _org_scope_root(current_user: models.User, root_id: Optional[uuid.UUID], db: Session) -> Optional[uuid.UUID]:
+    """Managers are limited to their own reporting line; admins/HR can pick any root"""
+    if current_user.role in ["admin", "hr_admin"]:
+        return root_id
+    if not current_user.employee_id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="No employee record for current user")
+    if root_id is None:
+        return current_user.employee_id
+    if not can_access_employee(db, current_user, root_id):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Employee is outside your reporting line")
+    return root_id
+
+@router.get("/org/span-of-control")
+async def get_span_of_control(
+    root_id: Optional[uuid.UUID] = None,
+    department_id: Optional[uuid.UUID] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    current_user: models.User = Depends(require_roles(["admin", "hr_admin", "manager"])),
+    db: Session = Depends(get_db)
+):
+    """Span of control and management layers for the org, a department or a manager's subtree"""
+    root_id = _org_scope_root(current_user, root_id, db)
+    tree = org_hierarchy.tree(db)
+    if root_id is not None and root_id not in tree:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Employee not found")
+
+    summary = tree.span_of_control(root_id, department_id)
+    managers = summary["by_manager"][:limit]
+    names = dict(db.query(models.Employee.id, models.Employee.name).filter(
+        models.Employee.id.in_([uuid.UUID(row["employee_id"]) for row in managers])
+    ).all()) if managers else {}
+    for row in managers:
+        row["name"] = names.get(uuid.UUID(row["employee_id"]))
+    return {
+        **summary,
+        "root_id": str(root_id) if root_id else None,
+        "department_id": str(department_id) if department_id else None,
+        "by_manager": managers,
+    }
+
+@router.get("/org/{employee_id}/reports")
+async def get_reporting_line(
+    employee_id: uuid.UUID,
+    max_depth: Optional[int] = Query(None, ge=1, description="1 = direct reports only; omit for every level"),
+    limit: int = Query(500, ge=1, le=5000),
+    current_user: models.User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Everyone reporting to an employee (any depth) plus their management chain"""
+    if not can_access_employee(db, current_user, employee_id):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to view this employee's reports")
+    tree = org_hierarchy.tree(db)
+    if employee_id not in tree:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Employee not found")
+
+    reports = tree.reports_under(employee_id, max_depth)
+    page = reports[:limit]
+    base_depth = tree.depth[str(employee_id)]
+    rows = {
+        str(row.id): row for row in db.query(
+            models.Employee.id, models.Employee.name, models.Employee.position, models.Employee.department_id
+        ).filter(models.Employee.id.in_([uuid.UUID(report_id) for report_id in page]))
+    } if page else {}
+    return {
+        "employee_id": str(employee_id),
+        "management_chain": tree.management_chain(employee_id),
+        "total_reports": len(reports),
+        "direct_reports": len(tree.direct_reports(employee_id)),
+        "reports": [
+            {
+                "employee_id": report_id,
+                "name": rows[report_id].name if report_id in rows else None,
+                "position": rows[report_id].position if report_id in rows else None,
+                "department_id": str(rows[report_id].department_id) if report_id in rows and rows[report_id].department_id else None,
+                "manager_id": tree.manager[report_id],
+                "level": tree.depth[report_id] - base_depth,
+            }
+            for report_id in page
+        ],
+    }
+
+# =============================================================================
+# HELPER FUNCTIONS
+# =============================================================================
 
 def get_kpi_color(category: str) -> str:
     """Get color for KPI category"""
@@ -844,24 +966,6 @@ def calculate_average_resolution_time(db: Session) -> float:
     
     return total_days / len(resolved_outliers) if resolved_outliers else 0.0
 
-def flatten_for_csv(data: Dict) -> str:
-    """Flatten nested dictionary for CSV export"""
-    # Simplified CSV conversion
-    lines = []
-    lines.append("Metric,Value")
-    
-    def flatten_dict(d, prefix=""):
-        for key, value in d.items():
-            if isinstance(value, dict):
-                flatten_dict(value, f"{prefix}{key}.")
-            elif isinstance(value, list):
-                lines.append(f"{prefix}{key},{len(value)} items")
-            else:
-                lines.append(f"{prefix}{key},{value}")
-    
-    flatten_dict(data)
-    return "\\n".join(lines)
-
 # AI-Powered Analytics Endpoints using Cerebras
 @router.post("/ai/outlier-analysis")
 async def ai_outlier_analysis(
@@ -939,10 +1043,21 @@ async def ai_outlier_analysis(
 @router.post("/ai/performance-insights/{employee_id}")
 async def get_ai_performance_insights(
     employee_id: uuid.UUID,
+    run_async: bool = Query(False, alias="async", description="Run as a background job and return 202 with a job ID"),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
     current_user: models.User = Depends(require_roles(["admin", "hr_admin", "manager"])),
     db: Session = Depends(get_db)
 ):
     """Get AI-powered performance insights for an employee using Cerebras"""
+    if run_async:
+        job = submit_job(
+            "analytics.ai_performance_insights",
+            {"employee_id": employee_id},
+            created_by=current_user.id,
+            idempotency_key=idempotency_key
+        )
+        return job_accepted_response(job)
+    
     try:
         # Get employee data
         employee = db.query(models.Employee).join(models.User).filter(
@@ -954,13 +1069,12 @@ async def get_ai_performance_insights(
             raise HTTPException(status_code=404, detail="Employee not found")
         
         # Check if user can access this employee's data
-        can_access = (
-            current_user.role in ["admin", "hr_admin"] or
-            (current_user.role == "manager" and 
-             current_user.employee_id and
-             employee.department_id == db.query(models.Employee).filter(
-                 models.Employee.id == current_user.employee_id
-             ).first().department_id)
+        can_access = can_access_employee(db, current_user, employee.id) or (
+            current_user.role == "manager" and
+            current_user.employee_id and
+            employee.department_id == db.query(models.Employee.department_id).filter(
+                models.Employee.id == current_user.employee_id
+            ).scalar()
         )
         
         if not can_access:
@@ -1031,6 +1145,13 @@ async def get_ai_performance_insights(
             detail=f"Failed to generate AI performance insights: {str(e)}"
         )
 
+@job_handler("analytics.ai_performance_insights")
+async def ai_performance_insights_job(ctx: JobContext, employee_id: str):
+    return await ctx.run_with_session(lambda db, user: get_ai_performance_insights(
+        employee_id=uuid.UUID(employee_id), run_async=False, idempotency_key=None,
+        current_user=user, db=db
+    ))
+
 @router.post("/ai/analyze-outliers")
 async def analyze_outliers_with_ai(
     employee_data: List[Dict[str, Any]],
@@ -4,8 +4,10 @@ from typing import List, Optional
 import models
 import schemas
 from database import get_db
-from auth.dependencies import get_current_active_user
+from auth.dependencies import get_current_active_user, require_roles
+from services.department_metrics import get_department_metrics, invalidate_department_metrics
 import logging
+import uuid
 
 logger = logging.getLogger(__name__)
 
@@ -14,14 +16,8 @@ router = APIRouter(
     tags=["Departments"]
 )
 
-# Helper function for admin access
-def require_admin_access(current_user: models.User = Depends(get_current_active_user)):
-    if current_user.role not in ["admin", "hr_admin"]:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Admin access required"
-        )
-    return current_user
+# Role check compiled to a mask; super admins pass
+require_admin_access = require_roles(["admin", "hr_admin"], active_only=True, detail="Admin access required")
 
 @router.get("/", response_model=List[schemas.Department])
 async def get_departments(
@@ -94,6 +90,7 @@ async def create_department(
         db.add(db_department)
         db.commit()
         db.refresh(db_department)
+        invalidate_department_metrics()
         
         logger.info(f"Department created by {current_user.email}: {department.name}")
         return db_department
@@ -146,6 +143,7 @@ async def update_department(
         
         db.commit()
         db.refresh(department)
+        invalidate_department_metrics()
         
         logger.info(f"Department updated by {current_user.email}: {department.name}")
         return department
@@ -191,6 +189,7 @@ async def delete_department(
         
         db.delete(department)
         db.commit()
+        invalidate_department_metrics()
         
         logger.info(f"Department deleted by {current_user.email}: {department.name}")
         return {"message": "Department deleted successfully"}
@@ -249,44 +248,39 @@ async def get_department_stats(
 ):
     """Get department statistics"""
     try:
-        # Check if department exists
-        department = db.query(models.Department).filter(
-            models.Department.id == department_id
-        ).first()
-        
-        if not department:
+        # Metrics are keyed by the canonical UUID string; normalize before looking up
+        try:
+            department_id = uuid.UUID(department_id)
+        except ValueError:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Department not found"
             )
         
-        # Get statistics
-        total_employees = db.query(models.Employee).filter(
-            models.Employee.department_id == department_id
-        ).count()
-        
-        active_employees = db.query(models.Employee).filter(
-            models.Employee.department_id == department_id,
-            models.Employee.is_active == True
-        ).count()
-        
-        # Get surveys targeting this department
-        department_surveys = db.query(models.Survey).filter(
-            models.Survey.target_departments.contains([str(department_id)])
-        ).count()
+        stats = get_department_metrics(db).get(department_id)
         
-        stats = {
-            "department_name": department.name,
-            "total_employees": total_employees,
-            "active_employees": active_employees,
-            "inactive_employees": total_employees - active_employees,
-            "targeted_surveys": department_surveys,
-        }
+        if stats is None:
+            # Possibly created on another worker since the metrics were cached
+            department = db.query(models.Department.id).filter(
+                models.Department.id == department_id
+            ).first()
+            if not department:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Department not found"
+                )
+            invalidate_department_metrics()
+            stats = get_department_metrics(db).get(department_id)
+            if stats is None:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Department not found"
+                )
         
         return {
             "success": True,
             "message": "Department statistics retrieved successfully",
-            "data": stats
+            "data": {"department_name": stats["name"], **stats}
         }
         
     except HTTPException:
@@ -305,45 +299,10 @@ async def get_all_departments_stats(
 ):
     """Get overall department statistics"""
     try:
-        total_departments = db.query(models.Department).count()
-        
-        # Get department employee counts
-        dept_stats = db.execute("""
-            SELECT 
-                d.id,
-                d.name,
-                COUNT(e.id) as employee_count,
-                COUNT(CASE WHEN e.is_active = true THEN 1 END) as active_count
-            FROM departments d
-            LEFT JOIN employees e ON d.id = e.department_id
-            GROUP BY d.id, d.name
-            ORDER BY employee_count DESC
-        """).fetchall()
-        
-        departments_with_stats = []
-        total_employees = 0
-        
-        for dept in dept_stats:
-            dept_data = {
-                "id": dept.id,
-                "name": dept.name,
-                "employee_count": dept.employee_count,
-                "active_employees": dept.active_count
-            }
-            departments_with_stats.append(dept_data)
-            total_employees += dept.employee_count
-        
-        summary = {
-            "total_departments": total_departments,
-            "total_employees": total_employees,
-            "departments": departments_with_stats,
-            "average_size": round(total_employees / total_departments, 2) if total_departments > 0 else 0
-        }
-        
         return {
             "success": True,
             "message": "Department summary retrieved successfully",
-            "data": summary
+            "data": get_department_metrics(db).summary()
         }
         
     except Exception as e:
@@ -351,4 +310,4 @@ async def get_all_departments_stats(
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to retrieve department summary"
-        ) 
\ No newline at end of file
+        ) 
@@ -1,11 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from database import get_db
 import crud
 import schemas
 from auth.dependencies import get_current_active_user
 import models
+from services.pagination import InvalidCursorError, set_pagination_headers
+from services.department_metrics import invalidate_department_metrics
 
 router = APIRouter(
     prefix="/employees",
@@ -20,16 +22,24 @@ def create_employee(
 ):
     if current_user.role not in ["admin", "hr"]:
         raise HTTPException(status_code=403, detail="Not authorized to create employees")
-    return crud.create_employee(db=db, employee=employee)
+    db_employee = crud.create_employee(db=db, employee=employee)
+    invalidate_department_metrics()
+    return db_employee
 
 @router.get("/", response_model=List[schemas.Employee])
 def read_employees(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_active_user)
 ):
-    employees = crud.get_employees(db, skip=skip, limit=limit)
+    try:
+        employees, next_cursor = crud.get_employees_page(db, limit=limit, cursor=cursor, skip=skip)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    set_pagination_headers(response, next_cursor)
     return employees
 
 @router.get("/{employee_id}", response_model=schemas.Employee)
@@ -0,0 +1,183 @@
+from fastapi import APIRouter, Body, Depends, HTTPException, status, Query, Header
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from sqlalchemy.orm import Session
+from typing import Dict, List, Optional
+import asyncio
+from datetime import date
+from pathlib import Path
+import tempfile
+import uuid
+import os
+import logging
+
+from database import get_db
+from models import User
+from auth.dependencies import get_current_active_user, require_roles
+from services.jobs import JobContext, get_visible_job, job_handler, submit_job, job_accepted_response
+from services.exports import (
+    ARTIFACT_TYPES, EXPORT_DATASETS, EXPORT_WRITERS, ExportError, artifact_path, export_dataset_artifact,
+    export_filename, iter_dataset_csv, open_dataset, write_export_file,
+)
+from services.snapshots import SNAPSHOT_TABLES, write_snapshot
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix="/exports",
+    tags=["Exports"]
+)
+
+def _attachment(filename: str) -> dict:
+    return {"Content-Disposition": f'attachment; filename="{filename}"'}
+
+@router.get("/")
+async def list_export_datasets(
+    current_user: User = Depends(require_roles(["admin", "hr_admin", "manager"]))
+):
+    """Datasets and formats available for export"""
+    return {
+        "datasets": sorted(EXPORT_DATASETS),
+        "formats": sorted(EXPORT_WRITERS),
+        "snapshot_tables": {
+            name: {"watermark": table.watermark, "columns": dict(table.schema)}
+            for name, table in SNAPSHOT_TABLES.items()
+        },
+    }
+
+@router.post("/snapshots")
+async def create_snapshot(
+    tables: Optional[List[str]] = Body(None, embed=True),
+    watermarks: Dict[str, str] = Body({}, embed=True),
+    since_job_id: Optional[uuid.UUID] = Body(None, embed=True),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    current_user: User = Depends(require_roles(["admin", "hr_admin"])),
+    db: Session = Depends(get_db)
+):
+    """
+    Export employees, KPI values, survey responses, parameter ratings and
+    performance reviews as partitioned Parquet (zipped) in a background job.
+
+    For an incremental snapshot pass ``since_job_id`` (a previous snapshot job,
+    whose high watermarks are reused) or explicit per-table ``watermarks``.
+    """
+    unknown = [name for name in (tables or []) if name not in SNAPSHOT_TABLES]
+    if unknown:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown snapshot tables: {unknown}")
+
+    if since_job_id:
+        previous = get_visible_job(db, since_job_id, current_user)
+        if previous.job_type != "exports.snapshot" or previous.status != "succeeded":
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="since_job_id must be a finished snapshot job")
+        watermarks = {**(previous.result or {}).get("watermarks", {}), **watermarks}
+
+    job = submit_job(
+        "exports.snapshot",
+        {"tables": tables, "watermarks": {name: value for name, value in watermarks.items() if value}},
+        created_by=current_user.id,
+        idempotency_key=idempotency_key
+    )
+    return job_accepted_response(job)
+
+@router.get("/jobs/{job_id}/download")
+async def download_export(
+    job_id: uuid.UUID,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Download the file produced by a finished background export"""
+    job = get_visible_job(db, job_id, current_user)
+    result = job.result or {}
+    if job.status != "succeeded" or "filename" not in result:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Export is {job.status}, no file available")
+
+    path = artifact_path(job.id, result["format"])
+    if not path.exists():
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail="Export file has expired")
+    return FileResponse(path, media_type=ARTIFACT_TYPES[result["format"]]["media_type"], filename=result["filename"])
+
+@router.get("/{dataset}")
+async def export_dataset(
+    dataset: str,
+    format: str = Query("csv", enum=["csv", "xlsx"]),
+    survey_id: Optional[uuid.UUID] = None,
+    kpi_id: Optional[uuid.UUID] = None,
+    department_id: Optional[uuid.UUID] = None,
+    employee_id: Optional[uuid.UUID] = None,
+    parameter_id: Optional[str] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    run_async: bool = Query(False, alias="async", description="Run as a background job and return 202 with a job ID"),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    current_user: User = Depends(require_roles(["admin", "hr_admin", "manager"]))
+):
+    """
+    Export a raw dataset (survey_responses, kpi_values, parameter_ratings).
+    CSV is streamed straight from a server-side cursor; use async=true for
+    large exports and download the file when the job finishes.
+    """
+    if dataset not in EXPORT_DATASETS:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Unknown dataset '{dataset}'")
+
+    params = {
+        key: str(value) for key, value in {
+            "survey_id": survey_id, "kpi_id": kpi_id, "department_id": department_id,
+            "employee_id": employee_id, "parameter_id": parameter_id,
+            "start_date": start_date, "end_date": end_date,
+        }.items() if value is not None
+    }
+
+    if run_async:
+        job = submit_job(
+            "exports.dataset",
+            {"dataset": dataset, "format": format, "params": params},
+            created_by=current_user.id,
+            idempotency_key=idempotency_key
+        )
+        return job_accepted_response(job)
+
+    name = f"{dataset}_{survey_id}" if survey_id else dataset
+    try:
+        if format == "csv":
+            # Fail fast on bad filters before the response headers are sent
+            with open_dataset(dataset, params):
+                pass
+            return StreamingResponse(
+                iter_dataset_csv(dataset, params),
+                media_type=EXPORT_WRITERS["csv"]["media_type"],
+                headers=_attachment(export_filename(name, "csv"))
+            )
+
+        fd, tmp = tempfile.mkstemp(suffix=".xlsx")
+        os.close(fd)
+        try:
+            with open_dataset(dataset, params) as table:
+                write_export_file(table, format, Path(tmp))
+        except Exception:
+            os.remove(tmp)
+            raise
+        return FileResponse(
+            tmp, media_type=EXPORT_WRITERS[format]["media_type"], filename=export_filename(name, format),
+            background=BackgroundTask(os.remove, tmp)
+        )
+    except ExportError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        logger.error(f"Failed to export {dataset}: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to export {dataset}"
+        )
+
+@job_handler("exports.dataset")
+async def export_dataset_job(ctx: JobContext, dataset: str, format: str, params: dict):
+    return await ctx.run_blocking(export_dataset_artifact, ctx.job_id, dataset, format, params)
+
+@job_handler("exports.snapshot")
+async def snapshot_job(ctx: JobContext, tables: Optional[List[str]], watermarks: Dict[str, str]):
+    loop = asyncio.get_running_loop()
+
+    def progress(percent: int, message: str):
+        asyncio.run_coroutine_threadsafe(ctx.set_progress(percent, message), loop)
+
+    return await ctx.run_blocking(write_snapshot, ctx.job_id, tables, watermarks, progress, ctx.check_cancelled)
@@ -1,24 +1,97 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, delete, func, and_, or_
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy import select, update, delete, func, or_
 from typing import List, Optional, Dict, Any
 from datetime import datetime, date
 import uuid
 
 from database import get_db
 from models import (
-    FocusGroup, Outlier, Employee, Department, User, 
+    FocusGroup, FocusGroupMember, Outlier, Employee, User, 
     Survey, SurveyResponse, KPI, KPIValue
 )
 from schemas import (
     FocusGroupCreate, FocusGroupUpdate, FocusGroupResponse, FocusGroupList,
-    FocusGroupMemberCreate, FocusGroupMemberResponse,
-    FocusGroupAnalytics, OutlierDetectionResult, EmployeeOutlierInfo
+    FocusGroupMemberCreate, FocusGroupMemberResponse, FocusGroupBulkMembers,
+    FocusGroupMembershipList, FocusGroupAnalytics, OutlierDetectionResult, EmployeeOutlierInfo
 )
 from auth.dependencies import get_current_user, require_roles
+from services.org_hierarchy import manages
 
 router = APIRouter(prefix="/focus-groups", tags=["focus-groups"])
 
+def _groups_with_member(employee_id):
+    # Served by idx_focus_group_members_employee
+    return select(FocusGroupMember.focus_group_id).where(FocusGroupMember.employee_id == employee_id)
+
+def _groups_with_department_members(department_id):
+    return (
+        select(FocusGroupMember.focus_group_id)
+        .join(Employee, Employee.id == FocusGroupMember.employee_id)
+        .where(Employee.department_id == department_id)
+    )
+
+def _visibility_filter(db: Session, current_user: User):
+    """
+    SQL condition for the groups a user may see: admins/HR see all, managers
+    see groups they created or that include people from their department,
+    everyone sees groups they belong to
+    """
+    if current_user.role in ["admin", "hr_admin"]:
+        return None
+    conditions = [FocusGroup.created_by == current_user.id]
+    if current_user.employee_id:
+        conditions.append(FocusGroup.id.in_(_groups_with_member(current_user.employee_id)))
+    if current_user.role == "manager" and current_user.employee_id:
+        department_id = db.query(Employee.department_id).filter(Employee.id == current_user.employee_id).scalar()
+        if department_id:
+            conditions.append(FocusGroup.id.in_(_groups_with_department_members(department_id)))
+    return or_(*conditions)
+
+def _can_edit(focus_group: FocusGroup, current_user: User) -> bool:
+    return current_user.role in ["admin", "hr_admin"] or focus_group.created_by == current_user.id
+
+def _get_editable_group(focus_group_id: uuid.UUID, db: Session, current_user: User) -> FocusGroup:
+    focus_group = get_focus_group_or_404(focus_group_id, db, current_user)
+    if not _can_edit(focus_group, current_user):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied"
+        )
+    return focus_group
+
+def _add_members(db: Session, focus_group_id: uuid.UUID, employee_ids: List[uuid.UUID], role: str,
+                 notes: Optional[str], added_by: uuid.UUID) -> List[uuid.UUID]:
+    """Insert memberships, skipping existing ones; returns the employee IDs actually added"""
+    if not employee_ids:
+        return []
+    result = db.execute(
+        pg_insert(FocusGroupMember.__table__)
+        .values([
+            {"id": uuid.uuid4(), "focus_group_id": focus_group_id, "employee_id": employee_id,
+             "role": role, "notes": notes, "added_by": added_by}
+            for employee_id in employee_ids
+        ])
+        .on_conflict_do_nothing(index_elements=["focus_group_id", "employee_id"])
+        .returning(FocusGroupMember.__table__.c.employee_id)
+    )
+    return [row[0] for row in result]
+
+def _existing_employees(db: Session, employee_ids: List[uuid.UUID]) -> set:
+    return {row[0] for row in db.query(Employee.id).filter(Employee.id.in_(employee_ids))}
+
+def _check_member_scope(db: Session, current_user: User, employee_ids: List[uuid.UUID]):
+    """Managers may only add people from their own reporting line"""
+    if current_user.role != "manager":
+        return
+    outside = [employee_id for employee_id in employee_ids if not manages(db, current_user.employee_id, employee_id)]
+    if outside:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"Employees outside your reporting line: {[str(employee_id) for employee_id in outside]}"
+        )
+
 @router.get("", response_model=FocusGroupList)
 async def list_focus_groups(
     skip: int = Query(0, ge=0),
@@ -27,54 +100,35 @@ async def list_focus_groups(
     department_id: Optional[uuid.UUID] = None,
     is_active: Optional[bool] = None,
     created_by: Optional[uuid.UUID] = None,
-    db: AsyncSession = Depends(get_db),
+    db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """List focus groups with filtering and pagination"""
-    query = select(FocusGroup)
-    count_query = select(func.count(FocusGroup.id))
-    
-    # Apply filters
     filters = []
     if group_type:
-        filters.append(FocusGroup.group_type == group_type)
+        filters.append(FocusGroup.type == group_type)
     if department_id:
-        filters.append(FocusGroup.department_id == department_id)
+        filters.append(FocusGroup.id.in_(_groups_with_department_members(department_id)))
     if is_active is not None:
-        filters.append(FocusGroup.is_active == is_active)
+        filters.append(FocusGroup.status == "active" if is_active else FocusGroup.status != "active")
     if created_by:
         filters.append(FocusGroup.created_by == created_by)
     
-    # Apply role-based filtering
-    if current_user.role not in ["admin", "hr_admin"]:
-        if current_user.role == "manager":
-            # Managers can see groups for their department
-            filters.append(FocusGroup.department_id == current_user.department_id)
-        else:
-            # Employees can see groups they're part of
-            # We'll filter this after getting the results since we're using JSON arrays
-            pass
-    
-    if filters:
-        query = query.where(and_(*filters))
-        count_query = count_query.where(and_(*filters))
-    
-    # Get total count
-    total_result = await db.execute(count_query)
-    total = total_result.scalar()
-    
-    # Get paginated results
-    query = query.offset(skip).limit(limit).order_by(FocusGroup.created_at.desc())
-    result = await db.execute(query)
-    focus_groups = result.scalars().all()
-    
-    # Filter for employees - only show groups they're part of
-    if current_user.role not in ["admin", "hr_admin", "manager"]:
-        focus_groups = [
-            fg for fg in focus_groups 
-            if fg.members and str(current_user.id) in [str(m) for m in fg.members]
-        ]
-        total = len(focus_groups)
+    # Apply role-based filtering in SQL so totals and pages are consistent
+    visibility = _visibility_filter(db, current_user)
+    if visibility is not None:
+        filters.append(visibility)
+    
+    total = db.execute(select(func.count(FocusGroup.id)).where(*filters)).scalar()
+    
+    focus_groups = db.execute(
+        select(FocusGroup)
+        .where(*filters)
+        .options(selectinload(FocusGroup.memberships))
+        .order_by(FocusGroup.created_at.desc(), FocusGroup.id)
+        .offset(skip)
+        .limit(limit)
+    ).scalars().all()
     
     return FocusGroupList(
         items=focus_groups,
@@ -83,262 +137,298 @@ async def list_focus_groups(
         limit=limit
     )
 
+@router.get("/mine", response_model=FocusGroupMembershipList)
+async def list_my_focus_groups(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Focus groups the current user belongs to, served from the membership index"""
+    if not current_user.employee_id:
+        return FocusGroupMembershipList(items=[], total=0, skip=skip, limit=limit)
+    
+    membership_filter = FocusGroupMember.employee_id == current_user.employee_id
+    total = db.execute(select(func.count(FocusGroupMember.id)).where(membership_filter)).scalar()
+    memberships = db.execute(
+        select(FocusGroupMember)
+        .where(membership_filter)
+        .options(selectinload(FocusGroupMember.focus_group).selectinload(FocusGroup.memberships))
+        .order_by(FocusGroupMember.joined_at.desc(), FocusGroupMember.focus_group_id)
+        .offset(skip)
+        .limit(limit)
+    ).scalars().all()
+    
+    return FocusGroupMembershipList(
+        items=[
+            {"focus_group": membership.focus_group, "role": membership.role, "joined_at": membership.joined_at}
+            for membership in memberships
+        ],
+        total=total,
+        skip=skip,
+        limit=limit
+    )
+
 @router.post("", response_model=FocusGroupResponse, status_code=status.HTTP_201_CREATED)
 async def create_focus_group(
     focus_group: FocusGroupCreate,
-    db: AsyncSession = Depends(get_db),
+    db: Session = Depends(get_db),
     current_user: User = Depends(require_roles(["admin", "hr_admin", "manager"]))
 ):
     """Create a new focus group"""
-    # Validate department exists if provided
-    if focus_group.department_id:
-        dept_result = await db.execute(
-            select(Department).where(Department.id == focus_group.department_id)
+    member_ids = list(dict.fromkeys(focus_group.members))
+    missing = set(member_ids) - _existing_employees(db, member_ids) if member_ids else set()
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid employee_ids: {sorted(str(employee_id) for employee_id in missing)}"
         )
-        if not dept_result.scalar_one_or_none():
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Invalid department_id"
-            )
-    
-    # If manager, can only create groups for their department
-    if current_user.role == "manager":
-        if not focus_group.department_id or focus_group.department_id != current_user.department_id:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Managers can only create focus groups for their department"
-            )
+    _check_member_scope(db, current_user, member_ids)
     
     db_focus_group = FocusGroup(
-        **focus_group.dict(),
+        **focus_group.dict(exclude={"members", "created_by"}),
         created_by=current_user.id
     )
     
     db.add(db_focus_group)
-    await db.commit()
-    await db.refresh(db_focus_group)
+    db.flush()
+    _add_members(db, db_focus_group.id, member_ids, "member", None, current_user.id)
+    db.commit()
+    db.refresh(db_focus_group)
     
     return db_focus_group
 
+def get_focus_group_or_404(focus_group_id: uuid.UUID, db: Session, current_user: User) -> FocusGroup:
+    filters = [FocusGroup.id == focus_group_id]
+    visibility = _visibility_filter(db, current_user)
+    if visibility is not None:
+        filters.append(visibility)
+    focus_group = db.execute(select(FocusGroup).where(*filters)).scalar_one_or_none()
+    
+    if not focus_group:
+        exists = db.execute(select(FocusGroup.id).where(FocusGroup.id == focus_group_id)).first()
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN if exists else status.HTTP_404_NOT_FOUND,
+            detail="Access denied" if exists else "Focus group not found"
+        )
+    return focus_group
+
 @router.get("/{focus_group_id}", response_model=FocusGroupResponse)
 async def get_focus_group(
     focus_group_id: uuid.UUID,
-    db: AsyncSession = Depends(get_db),
+    db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Get a specific focus group"""
-    result = await db.execute(
-        select(FocusGroup).where(FocusGroup.id == focus_group_id)
-    )
-    focus_group = result.scalar_one_or_none()
-    
-    if not focus_group:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Focus group not found"
-        )
-    
-    # Check permissions
-    if current_user.role not in ["admin", "hr_admin"]:
-        if current_user.role == "manager":
-            if focus_group.department_id != current_user.department_id:
-                raise HTTPException(
-                    status_code=status.HTTP_403_FORBIDDEN,
-                    detail="Access denied"
-                )
-        else:
-            # Check if employee is a member of this group
-            members = focus_group.members or []
-            if str(current_user.id) not in [str(m) for m in members]:
-                raise HTTPException(
-                    status_code=status.HTTP_403_FORBIDDEN,
-                    detail="Access denied"
-                )
-    
-    return focus_group
+    return get_focus_group_or_404(focus_group_id, db, current_user)
 
 @router.put("/{focus_group_id}", response_model=FocusGroupResponse)
 async def update_focus_group(
     focus_group_id: uuid.UUID,
     focus_group_update: FocusGroupUpdate,
-    db: AsyncSession = Depends(get_db),
+    db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Update a focus group"""
-    result = await db.execute(
-        select(FocusGroup).where(FocusGroup.id == focus_group_id)
-    )
-    focus_group = result.scalar_one_or_none()
-    
-    if not focus_group:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Focus group not found"
-        )
-    
-    # Check permissions
-    can_edit = (
-        current_user.role in ["admin", "hr_admin"] or
-        focus_group.created_by == current_user.id or
-        (current_user.role == "manager" and focus_group.department_id == current_user.department_id)
-    )
-    
-    if not can_edit:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Access denied"
-        )
+    focus_group = _get_editable_group(focus_group_id, db, current_user)
     
     update_data = focus_group_update.dict(exclude_unset=True)
+    # FocusGroupUpdate uses the older field names; department scope comes from members, not a column
+    update_data.pop("department_id", None)
+    if "group_type" in update_data:
+        update_data["type"] = update_data.pop("group_type")
+    if "is_active" in update_data:
+        update_data["status"] = "active" if update_data.pop("is_active") else "archived"
     for field, value in update_data.items():
-        setattr(focus_group, field, value)
+        if value is not None:
+            setattr(focus_group, field, value)
     
     focus_group.updated_at = datetime.utcnow()
     
-    await db.commit()
-    await db.refresh(focus_group)
+    db.commit()
+    db.refresh(focus_group)
     
     return focus_group
 
 @router.delete("/{focus_group_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_focus_group(
     focus_group_id: uuid.UUID,
-    db: AsyncSession = Depends(get_db),
+    db: Session = Depends(get_db),
     current_user: User = Depends(require_roles(["admin", "hr_admin"]))
 ):
     """Delete a focus group"""
-    result = await db.execute(
-        select(FocusGroup).where(FocusGroup.id == focus_group_id)
-    )
-    focus_group = result.scalar_one_or_none()
-    
-    if not focus_group:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Focus group not found"
-        )
+    get_focus_group_or_404(focus_group_id, db, current_user)
     
     # Delete all members first
-    await db.execute(
+    db.execute(
         delete(FocusGroupMember).where(FocusGroupMember.focus_group_id == focus_group_id)
     )
     
     # Delete the focus group
-    await db.execute(
+    db.execute(
         delete(FocusGroup).where(FocusGroup.id == focus_group_id)
     )
     
-    await db.commit()
+    db.commit()
 
 # Focus Group Members
 @router.get("/{focus_group_id}/members", response_model=List[uuid.UUID])
 async def list_focus_group_members(
     focus_group_id: uuid.UUID,
-    db: AsyncSession = Depends(get_db),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(1000, ge=1, le=10000),
+    db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """List members of a focus group"""
-    # Verify focus group exists and user has access
-    focus_group = await get_focus_group(focus_group_id, db, current_user)
-    
-    # Return members from JSON column
-    return focus_group.members or []
+    """List member employee IDs of a focus group, oldest membership first"""
+    get_focus_group_or_404(focus_group_id, db, current_user)
+    
+    return db.execute(
+        select(FocusGroupMember.employee_id)
+        .where(FocusGroupMember.focus_group_id == focus_group_id)
+        .order_by(FocusGroupMember.joined_at, FocusGroupMember.employee_id)
+        .offset(skip)
+        .limit(limit)
+    ).scalars().all()
+
+@router.get("/{focus_group_id}/members/details", response_model=List[FocusGroupMemberResponse])
+async def list_focus_group_member_details(
+    focus_group_id: uuid.UUID,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """List memberships with role, notes and who added them"""
+    get_focus_group_or_404(focus_group_id, db, current_user)
+    
+    return db.execute(
+        select(FocusGroupMember)
+        .where(FocusGroupMember.focus_group_id == focus_group_id)
+        .order_by(FocusGroupMember.joined_at, FocusGroupMember.employee_id)
+        .offset(skip)
+        .limit(limit)
+    ).scalars().all()
 
 @router.post("/{focus_group_id}/members", response_model=Dict[str, Any], status_code=status.HTTP_201_CREATED)
 async def add_focus_group_member(
     focus_group_id: uuid.UUID,
     employee_id: uuid.UUID,
-    db: AsyncSession = Depends(get_db),
+    role: str = Query("member", pattern="^(member|coordinator|leader)$"),
+    notes: Optional[str] = None,
+    db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Add a member to a focus group"""
-    # Verify focus group exists and user has access
-    focus_group = await get_focus_group(focus_group_id, db, current_user)
+    focus_group = _get_editable_group(focus_group_id, db, current_user)
     
-    # Check if user can edit this focus group
-    can_edit = (
-        current_user.role in ["admin", "hr_admin"] or
-        focus_group.created_by == current_user.id
-    )
-    
-    if not can_edit:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Access denied"
-        )
-    
-    # Verify employee exists
-    employee_result = await db.execute(
-        select(Employee).where(Employee.id == employee_id)
-    )
-    employee = employee_result.scalar_one_or_none()
-    
-    if not employee:
+    if not _existing_employees(db, [employee_id]):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid employee_id"
         )
+    _check_member_scope(db, current_user, [employee_id])
     
-    # Check if member already exists
-    members = focus_group.members or []
-    if str(employee_id) in [str(m) for m in members]:
+    if not _add_members(db, focus_group.id, [employee_id], role, notes, current_user.id):
+        db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Employee is already a member of this focus group"
         )
     
-    # Add member to JSON array
-    members.append(str(employee_id))
-    focus_group.members = members
     focus_group.updated_at = datetime.utcnow()
-    
-    await db.commit()
-    await db.refresh(focus_group)
+    db.commit()
     
     return {
         "employee_id": str(employee_id),
+        "role": role,
         "added_at": datetime.utcnow().isoformat(),
         "added_by": str(current_user.id)
     }
 
+@router.post("/{focus_group_id}/members/bulk", response_model=Dict[str, Any])
+async def bulk_add_focus_group_members(
+    focus_group_id: uuid.UUID,
+    payload: FocusGroupBulkMembers,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Add many members in one statement; existing members and unknown employees are reported, not errors"""
+    focus_group = _get_editable_group(focus_group_id, db, current_user)
+    
+    requested = list(dict.fromkeys(payload.employee_ids))
+    valid = _existing_employees(db, requested)
+    _check_member_scope(db, current_user, [employee_id for employee_id in requested if employee_id in valid])
+    added = _add_members(
+        db, focus_group.id, [employee_id for employee_id in requested if employee_id in valid],
+        payload.role, payload.notes, current_user.id
+    )
+    if added:
+        focus_group.updated_at = datetime.utcnow()
+    db.commit()
+    
+    added_set = set(added)
+    return {
+        "added": [str(employee_id) for employee_id in added],
+        "already_members": [str(employee_id) for employee_id in requested if employee_id in valid and employee_id not in added_set],
+        "invalid_employee_ids": [str(employee_id) for employee_id in requested if employee_id not in valid],
+    }
+
+@router.post("/{focus_group_id}/members/bulk-remove", response_model=Dict[str, Any])
+async def bulk_remove_focus_group_members(
+    focus_group_id: uuid.UUID,
+    payload: FocusGroupBulkMembers,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Remove many members in one statement"""
+    focus_group = _get_editable_group(focus_group_id, db, current_user)
+    
+    removed = db.execute(
+        delete(FocusGroupMember)
+        .where(
+            FocusGroupMember.focus_group_id == focus_group.id,
+            FocusGroupMember.employee_id.in_(payload.employee_ids)
+        )
+        .returning(FocusGroupMember.employee_id)
+    ).scalars().all()
+    if removed:
+        focus_group.updated_at = datetime.utcnow()
+    db.commit()
+    
+    removed_set = set(removed)
+    return {
+        "removed": [str(employee_id) for employee_id in removed],
+        "not_members": [str(employee_id) for employee_id in dict.fromkeys(payload.employee_ids) if employee_id not in removed_set],
+    }
+
 @router.delete("/{focus_group_id}/members/{employee_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def remove_focus_group_member(
     focus_group_id: uuid.UUID,
     employee_id: uuid.UUID,
-    db: AsyncSession = Depends(get_db),
+    db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Remove a member from a focus group"""
-    # Verify focus group exists and user has access
-    focus_group = await get_focus_group(focus_group_id, db, current_user)
+    focus_group = _get_editable_group(focus_group_id, db, current_user)
     
-    # Check if user can edit this focus group
-    can_edit = (
-        current_user.role in ["admin", "hr_admin"] or
-        focus_group.created_by == current_user.id
-    )
-    
-    if not can_edit:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Access denied"
+    result = db.execute(
+        delete(FocusGroupMember).where(
+            FocusGroupMember.focus_group_id == focus_group.id,
+            FocusGroupMember.employee_id == employee_id
         )
+    )
     
-    # Remove member from JSON array
-    members = focus_group.members or []
-    original_length = len(members)
-    members = [m for m in members if str(m) != str(employee_id)]
-    
-    if len(members) == original_length:
+    if result.rowcount == 0:
+        db.rollback()
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Member not found in this focus group"
         )
     
-    focus_group.members = members
     focus_group.updated_at = datetime.utcnow()
     
-    await db.commit()
+    db.commit()
 
 # Outlier Detection
 @router.post("/detect-outliers", response_model=OutlierDetectionResult)
@@ -347,7 +437,7 @@ async def detect_outliers(
     kpi_id: Optional[uuid.UUID] = None,
     department_id: Optional[uuid.UUID] = None,
     threshold: float = Query(2.0, ge=1.0, le=3.0),
-    db: AsyncSession = Depends(get_db),
+    db: Session = Depends(get_db),
     current_user: User = Depends(require_roles(["admin", "hr_admin", "manager"]))
 ):
     """
@@ -358,10 +448,10 @@ async def detect_outliers(
     
     if survey_id:
         # Detect outliers based on survey responses
-        outliers = await _detect_survey_outliers(db, survey_id, department_id, threshold)
+        outliers = _detect_survey_outliers(db, survey_id, department_id, threshold)
     elif kpi_id:
         # Detect outliers based on KPI values
-        outliers = await _detect_kpi_outliers(db, kpi_id, department_id, threshold)
+        outliers = _detect_kpi_outliers(db, kpi_id, department_id, threshold)
     else:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -376,8 +466,8 @@ async def detect_outliers(
         detected_at=datetime.utcnow()
     )
 
-async def _detect_survey_outliers(
-    db: AsyncSession, 
+def _detect_survey_outliers(
+    db: Session, 
     survey_id: uuid.UUID, 
     department_id: Optional[uuid.UUID], 
     threshold: float
@@ -389,7 +479,7 @@ async def _detect_survey_outliers(
     if department_id:
         query = query.join(Employee).where(Employee.department_id == department_id)
     
-    result = await db.execute(query)
+    result = db.execute(query)
     responses = result.scalars().all()
     
     if len(responses) < 3:  # Need at least 3 responses for statistical analysis
@@ -430,7 +520,7 @@ async def _detect_survey_outliers(
         
         if z_score > threshold:
             # Get employee details
-            emp_result = await db.execute(
+            emp_result = db.execute(
                 select(Employee).where(Employee.id == emp_id)
             )
             employee = emp_result.scalar_one_or_none()
@@ -447,8 +537,8 @@ async def _detect_survey_outliers(
     
     return outliers
 
-async def _detect_kpi_outliers(
-    db: AsyncSession, 
+def _detect_kpi_outliers(
+    db: Session, 
     kpi_id: uuid.UUID, 
     department_id: Optional[uuid.UUID], 
     threshold: float
@@ -465,7 +555,7 @@ async def _detect_kpi_outliers(
     thirty_days_ago = datetime.utcnow() - timedelta(days=30)
     query = query.where(KPIValue.recorded_at >= thirty_days_ago)
     
-    result = await db.execute(query)
+    result = db.execute(query)
     kpi_values = result.scalars().all()
     
     if len(kpi_values) < 3:
@@ -501,7 +591,7 @@ async def _detect_kpi_outliers(
         
         if z_score > threshold:
             # Get employee details
-            emp_result = await db.execute(
+            emp_result = db.execute(
                 select(Employee).where(Employee.id == emp_id)
             )
             employee = emp_result.scalar_one_or_none()
@@ -524,7 +614,7 @@ async def create_focus_group_from_outliers(
     group_name: str,
     group_description: str,
     department_id: Optional[uuid.UUID] = None,
-    db: AsyncSession = Depends(get_db),
+    db: Session = Depends(get_db),
     current_user: User = Depends(require_roles(["admin", "hr_admin", "manager"]))
 ):
     """Create a focus group automatically from detected outliers"""
@@ -538,28 +628,35 @@ async def create_focus_group_from_outliers(
     focus_group = FocusGroup(
         name=group_name,
         description=group_description,
-        group_type="outlier_based",
-        department_id=department_id,
+        type="performance",
         created_by=current_user.id,
-        criteria=f"Auto-generated from outlier detection with threshold {outliers.threshold_used}"
+        criteria={
+            "source": "outlier_detection",
+            "threshold": outliers.threshold_used,
+            "detection_criteria": outliers.detection_criteria,
+            "department_id": str(department_id) if department_id else None
+        }
     )
     
     db.add(focus_group)
-    await db.commit()
-    await db.refresh(focus_group)
+    db.flush()
     
-    # Add outliers as members
+    # Add outliers as members in the same transaction
+    seen = set()
     for outlier in outliers.outliers:
-        member = FocusGroupMember(
+        if outlier.employee_id in seen:
+            continue
+        seen.add(outlier.employee_id)
+        db.add(FocusGroupMember(
             focus_group_id=focus_group.id,
             employee_id=outlier.employee_id,
             role="member",
             added_by=current_user.id,
             notes=f"Z-score: {outlier.z_score}, Deviation: {outlier.deviation_type}"
-        )
-        db.add(member)
+        ))
     
-    await db.commit()
+    db.commit()
+    db.refresh(focus_group)
     
     return focus_group
 
@@ -568,53 +665,52 @@ async def create_focus_group_from_outliers(
 async def get_focus_group_analytics(
     department_id: Optional[uuid.UUID] = None,
     group_type: Optional[str] = None,
-    db: AsyncSession = Depends(get_db),
+    db: Session = Depends(get_db),
     current_user: User = Depends(require_roles(["admin", "hr_admin", "manager"]))
 ):
     """Get focus group analytics and statistics"""
-    query = select(FocusGroup)
-    
     # Apply filters
     filters = []
     if department_id:
-        filters.append(FocusGroup.department_id == department_id)
+        filters.append(FocusGroup.id.in_(_groups_with_department_members(department_id)))
     if group_type:
-        filters.append(FocusGroup.group_type == group_type)
+        filters.append(FocusGroup.type == group_type)
         
     # Apply role-based filtering
-    if current_user.role == "manager":
-        filters.append(FocusGroup.department_id == current_user.department_id)
-    
-    if filters:
-        query = query.where(and_(*filters))
-    
-    result = await db.execute(query)
-    focus_groups = result.scalars().all()
+    visibility = _visibility_filter(db, current_user)
+    if visibility is not None:
+        filters.append(visibility)
+    
+    # One grouped query instead of a member count per group
+    member_counts = (
+        select(FocusGroupMember.focus_group_id, func.count(FocusGroupMember.id).label("members"))
+        .group_by(FocusGroupMember.focus_group_id)
+        .subquery()
+    )
+    rows = db.execute(
+        select(
+            func.coalesce(FocusGroup.type, "other"),
+            FocusGroup.status == "active",
+            func.count(FocusGroup.id),
+            func.coalesce(func.sum(member_counts.c.members), 0)
+        )
+        .outerjoin(member_counts, member_counts.c.focus_group_id == FocusGroup.id)
+        .where(*filters)
+        .group_by(func.coalesce(FocusGroup.type, "other"), FocusGroup.status == "active")
+    ).all()
     
     # Calculate statistics
-    total_groups = len(focus_groups)
-    active_groups = len([fg for fg in focus_groups if fg.is_active])
+    total_groups = sum(row[2] for row in rows)
+    active_groups = sum(row[2] for row in rows if row[1])
     inactive_groups = total_groups - active_groups
+    total_members = int(sum(row[3] for row in rows))
     
     # Group type distribution
     type_distribution = {}
-    for fg in focus_groups:
-        group_type = fg.group_type or "other"
-        type_distribution[group_type] = type_distribution.get(group_type, 0) + 1
-    
-    # Get member count statistics
-    member_counts = []
-    for fg in focus_groups:
-        member_result = await db.execute(
-            select(func.count(FocusGroupMember.id)).where(
-                FocusGroupMember.focus_group_id == fg.id
-            )
-        )
-        member_count = member_result.scalar()
-        member_counts.append(member_count)
+    for group_type, _, count, _ in rows:
+        type_distribution[group_type] = type_distribution.get(group_type, 0) + count
     
-    avg_members_per_group = sum(member_counts) / len(member_counts) if member_counts else 0
-    total_members = sum(member_counts)
+    avg_members_per_group = total_members / total_groups if total_groups else 0
     
     return FocusGroupAnalytics(
         total_groups=total_groups,
@@ -623,4 +719,4 @@ async def get_focus_group_analytics(
         total_members=total_members,
         average_members_per_group=round(avg_members_per_group, 2),
         group_type_distribution=type_distribution
-    ) 
\ No newline at end of file
+    ) 
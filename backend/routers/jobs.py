@@ -0,0 +1,63 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy.orm import Session
+from typing import Optional
+import uuid
+import logging
+
+from database import get_db
+from models import User, BackgroundJob
+from auth.dependencies import get_current_active_user
+from services.jobs import cancel_job, get_visible_job, serialize_job
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix="/jobs",
+    tags=["Background Jobs"]
+)
+
+@router.get("/")
+async def list_jobs(
+    status_filter: Optional[str] = Query(None, alias="status"),
+    job_type: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """List the current user's background jobs, newest first"""
+    query = db.query(BackgroundJob).filter(BackgroundJob.created_by == current_user.id)
+    if status_filter:
+        query = query.filter(BackgroundJob.status == status_filter)
+    if job_type:
+        query = query.filter(BackgroundJob.job_type == job_type)
+
+    jobs = query.order_by(BackgroundJob.created_at.desc()).limit(limit).all()
+    return {"jobs": [serialize_job(job, include_result=False) for job in jobs]}
+
+@router.get("/{job_id}")
+async def get_job(
+    job_id: uuid.UUID,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Get job status, progress and (once finished) its result"""
+    return serialize_job(get_visible_job(db, job_id, current_user))
+
+@router.post("/{job_id}/cancel")
+async def cancel_background_job(
+    job_id: uuid.UUID,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Cancel a queued job, or request cancellation of a running one. A running
+    job stops at its worker's next heartbeat, so poll until it is 'cancelled'.
+    """
+    job = get_visible_job(db, job_id, current_user)
+    outcome = cancel_job(job.id)
+    db.refresh(job)
+    if outcome is None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Job is already {job.status}")
+
+    message = "Job cancelled" if outcome == "cancelled" else "Cancellation requested"
+    return {**serialize_job(job, include_result=False), "message": message}
@@ -6,6 +6,9 @@ import models
 import schemas
 from database import get_db
 from auth.dependencies import get_current_active_user, require_roles
+from services import timeseries
+from services.kpi_alerts import RULES, SEVERITIES, STATUSES, count_alerts, evaluate_all, evaluate_kpi, list_alerts
+from services.bulk import BulkResult, apply_updates, fetch_existing, record_bulk_event
 import logging
 from datetime import datetime, timedelta
 import uuid
@@ -18,6 +21,9 @@ router = APIRouter(
     tags=["KPIs"]
 )
 
+# KPI fields that alert rules read; updating any of them re-evaluates alerts
+ALERT_INPUTS = {"target_value", "current_value", "alert_threshold_low", "alert_threshold_high", "is_active"}
+
 # Predefined KPI Categories and Options
 class KPICategory(str, Enum):
     ENGAGEMENT = "Employee Engagement"
@@ -270,6 +276,56 @@ async def create_kpi(
             detail="Failed to create KPI"
         )
 
+@router.get("/alerts")
+async def get_kpi_alerts(
+    status_filter: str = Query("active", alias="status", enum=[*STATUSES, "all"]),
+    severity: Optional[str] = Query(None, enum=list(SEVERITIES)),
+    rule: Optional[str] = Query(None, enum=list(RULES)),
+    kpi_id: Optional[uuid.UUID] = None,
+    limit: int = Query(100, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    current_user: models.User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """List KPI alerts; state is maintained when measurements are recorded"""
+    try:
+        alert_status = None if status_filter == "all" else status_filter
+        kpi_ids = [kpi_id] if kpi_id else None
+        return {
+            "alerts": list_alerts(db, kpi_ids, alert_status, severity, rule, limit=limit, offset=offset),
+            "counts": count_alerts(db, kpi_ids, alert_status),
+            "status": status_filter
+        }
+        
+    except Exception as e:
+        logger.error(f"Failed to get KPI alerts: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to retrieve KPI alerts"
+        )
+
+@router.post("/alerts/evaluate")
+async def evaluate_kpi_alerts(
+    kpi_id: Optional[uuid.UUID] = None,
+    current_user: models.User = Depends(require_roles(["admin", "hr_admin"])),
+    db: Session = Depends(get_db)
+):
+    """Re-evaluate alert rules for one KPI or all KPIs, e.g. after alert settings change"""
+    try:
+        result = evaluate_all(db, [kpi_id] if kpi_id else None)
+        db.commit()
+        
+        logger.info(f"KPI alerts re-evaluated by {current_user.email}: {result}")
+        return result
+        
+    except Exception as e:
+        logger.error(f"Failed to evaluate KPI alerts: {e}")
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to evaluate KPI alerts"
+        )
+
 @router.get("/{kpi_id}", response_model=schemas.KPI)
 async def get_kpi(
     kpi_id: uuid.UUID,
@@ -344,10 +400,14 @@ async def update_kpi(
                     )
         
         # Update fields
-        for field, value in kpi_update.dict(exclude_unset=True).items():
+        updates = kpi_update.dict(exclude_unset=True)
+        for field, value in updates.items():
             setattr(kpi, field, value)
         
         kpi.updated_at = datetime.utcnow()
+        if ALERT_INPUTS.intersection(updates):
+            db.flush()
+            evaluate_kpi(db, kpi)
         db.commit()
         db.refresh(kpi)
         
@@ -396,6 +456,10 @@ async def add_kpi_measurement(
         kpi.last_measured_at = db_measurement.measurement_date
         kpi.updated_at = datetime.utcnow()
         
+        # Evaluate alert rules against the new value in the same transaction
+        db.flush()
+        evaluate_kpi(db, kpi, measured_at=db_measurement.measurement_date)
+        
         db.commit()
         db.refresh(db_measurement)
         
@@ -507,17 +571,10 @@ async def get_kpi_analytics(
         min_value = min(values) if values else None
         max_value = max(values) if values else None
         
-        # Calculate trend
-        if len(values) >= 2:
-            first_half = values[:len(values)//2]
-            second_half = values[len(values)//2:]
-            first_avg = sum(first_half) / len(first_half)
-            second_avg = sum(second_half) / len(second_half)
-            trend = "improving" if second_avg > first_avg else "declining" if second_avg < first_avg else "stable"
-            trend_percentage = ((second_avg - first_avg) / first_avg * 100) if first_avg != 0 else 0
-        else:
-            trend = "insufficient_data"
-            trend_percentage = 0
+        # Trend: least-squares fit with confidence, smoothing, seasonality and a short forecast
+        series = timeseries.analyze([values])[0]
+        trend = series["direction"]
+        trend_percentage = series["trend_percentage"] * 100
         
         # Target achievement
         target_achievement = None
@@ -551,6 +608,8 @@ async def get_kpi_analytics(
                 "target_achievement_percentage": round(target_achievement, 2) if target_achievement else None,
                 "on_target": on_target,
                 "variance": round(variance, 2) if variance else None,
+                "trend_confidence": series["confidence"],
+                "time_series": series,
                 "measurement_count": len(measurements),
                 "measurement_frequency": kpi.measurement_frequency
             },
@@ -629,24 +688,10 @@ async def get_kpi_dashboard_summary(
             elif kpi.target_value is not None:
                 kpis_without_data += 1
         
-        # Get recent alerts (KPIs significantly off target)
-        alerts = []
-        for kpi in kpis:
-            if kpi.current_value is not None and kpi.target_value is not None:
-                deviation = abs(kpi.current_value - kpi.target_value) / kpi.target_value * 100
-                if deviation > 20:  # More than 20% off target
-                    alerts.append({
-                        "kpi_id": kpi.id,
-                        "kpi_name": kpi.name,
-                        "current_value": kpi.current_value,
-                        "target_value": kpi.target_value,
-                        "deviation_percentage": round(deviation, 2),
-                        "priority": kpi.priority,
-                        "last_measured": kpi.last_measured_at
-                    })
-        
-        # Sort alerts by deviation
-        alerts.sort(key=lambda x: x["deviation_percentage"], reverse=True)
+        # Active alerts, precomputed when measurements are recorded
+        kpi_ids = [kpi.id for kpi in kpis]
+        alerts = list_alerts(db, kpi_ids, limit=10)
+        alert_counts = count_alerts(db, kpi_ids)
         
         return {
             "summary": {
@@ -661,7 +706,8 @@ async def get_kpi_dashboard_summary(
                 "by_category": category_breakdown,
                 "by_priority": priority_breakdown
             },
-            "alerts": alerts[:10],  # Top 10 alerts
+            "alerts": alerts,  # Top 10 alerts
+            "alert_counts": alert_counts,
             "last_updated": datetime.utcnow().isoformat()
         }
         
@@ -680,39 +726,32 @@ async def bulk_prioritize_kpis(
 ):
     """Bulk update KPI priorities"""
     try:
-        updated_count = 0
-        failed_updates = []
-        
-        for update in kpi_priorities:
-            try:
-                kpi_id = update.get("kpi_id")
-                priority = update.get("priority")
-                
-                if not kpi_id or priority not in ["high", "medium", "low"]:
-                    failed_updates.append({"kpi_id": kpi_id, "error": "Invalid kpi_id or priority"})
-                    continue
-                
-                kpi = db.query(models.KPI).filter(models.KPI.id == kpi_id).first()
-                if not kpi:
-                    failed_updates.append({"kpi_id": kpi_id, "error": "KPI not found"})
-                    continue
-                
-                kpi.priority = priority
-                kpi.updated_at = datetime.utcnow()
-                updated_count += 1
-                
-            except Exception as e:
-                logger.error(f"Failed to update priority for KPI {kpi_id}: {e}")
-                failed_updates.append({"kpi_id": kpi_id, "error": str(e)})
+        result = BulkResult("kpi_id", [update.get("kpi_id") for update in kpi_priorities])
+        for position, update in enumerate(kpi_priorities):
+            if not update.get("kpi_id") or update.get("priority") not in ["high", "medium", "low"]:
+                result.fail(position, "Invalid kpi_id or priority")
+        
+        ids = result.parse_ids()
+        kpis = fetch_existing(db, models.KPI.id, ids.values())
+        for position, kpi_id in list(ids.items()):
+            if kpi_id not in kpis:
+                result.fail(position, "KPI not found")
+                del ids[position]
+        
+        applied = apply_updates(
+            db, models.KPI.__table__,
+            [{"id": kpi_id, "priority": kpi_priorities[position]["priority"]} for position, kpi_id in ids.items()]
+        )
+        result.mark_applied(ids, applied, "KPI not found")
         
         db.commit()
-        
-        logger.info(f"Bulk KPI prioritization by {current_user.email}: {updated_count} KPIs updated")
+        record_bulk_event(current_user, "bulk_prioritize_kpis", result)
         
         return {
-            "message": f"Successfully updated {updated_count} KPI priorities",
-            "updated_count": updated_count,
-            "failed_updates": failed_updates
+            "message": f"Successfully updated {result.updated_count} KPI priorities",
+            "updated_count": result.updated_count,
+            "failed_updates": result.failures(),
+            "results": result.items()
         }
         
     except HTTPException:
@@ -1,12 +1,13 @@
-from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi import APIRouter, HTTPException, Depends, Query, Header
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 from datetime import date, datetime
 from uuid import UUID
 import uuid
-from services.database import get_db_connection
+from services.database import get_db_connection, db_service
 from services.ai_service import AIService
 from auth.dependencies import get_current_user
+from services.jobs import JobContext, job_handler, submit_job, job_accepted_response
 import json
 
 router = APIRouter(prefix="/parameters", tags=["Employee Parameters"])
@@ -416,9 +417,21 @@ async def calculate_employee_kpi(
 async def calculate_all_kpis(
     period_start: Optional[date] = Query(None, description="Calculation period start"),
     period_end: Optional[date] = Query(None, description="Calculation period end"),
+    run_async: bool = Query(False, alias="async", description="Run as a background job and return 202 with a job ID"),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    current_user=Depends(get_current_user),
     db=Depends(get_db_connection)
 ):
     """Calculate all KPIs for all employees"""
+    if run_async:
+        job = submit_job(
+            "parameters.calculate_all_kpis",
+            {"period_start": period_start, "period_end": period_end},
+            created_by=current_user.id,
+            idempotency_key=idempotency_key
+        )
+        return job_accepted_response(job)
+    
     try:
         # Set default period if not provided
         if not period_start:
@@ -442,6 +455,23 @@ async def calculate_all_kpis(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to calculate KPIs: {str(e)}")
 
+async def _run_with_connection(endpoint, **kwargs):
+    """Call an endpoint function from a background job with a pooled connection"""
+    db = await db_service.get_connection()
+    try:
+        return await endpoint(run_async=False, idempotency_key=None, db=db, **kwargs)
+    finally:
+        await db_service.release_connection(db)
+
+@job_handler("parameters.calculate_all_kpis")
+async def calculate_all_kpis_job(ctx: JobContext, period_start: Optional[str], period_end: Optional[str]):
+    return await _run_with_connection(
+        calculate_all_kpis,
+        period_start=date.fromisoformat(period_start) if period_start else None,
+        period_end=date.fromisoformat(period_end) if period_end else None,
+        current_user=None
+    )
+
 @router.get("/kpis/employees/{employee_id}", response_model=List[KPICalculationResult])
 async def get_employee_kpi_values(
     employee_id: UUID,
@@ -520,9 +550,21 @@ async def create_feedback_request(
 async def generate_ai_evaluation_insights(
     employee_id: UUID,
     insight_type: str = Query(..., description="Type of insight: risk_assessment, potential_prediction, development_recommendation"),
+    run_async: bool = Query(False, alias="async", description="Run as a background job and return 202 with a job ID"),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    current_user=Depends(get_current_user),
     db=Depends(get_db_connection)
 ):
     """Generate AI-powered insights based on employee parameter ratings"""
+    if run_async:
+        job = submit_job(
+            "parameters.generate_evaluation_insights",
+            {"employee_id": employee_id, "insight_type": insight_type},
+            created_by=current_user.id,
+            idempotency_key=idempotency_key
+        )
+        return job_accepted_response(job)
+    
     try:
         # Get employee parameter ratings
         ratings = await db.fetch("""
@@ -595,6 +637,15 @@ async def generate_ai_evaluation_insights(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate AI insights: {str(e)}")
 
+@job_handler("parameters.generate_evaluation_insights")
+async def generate_evaluation_insights_job(ctx: JobContext, employee_id: str, insight_type: str):
+    return await _run_with_connection(
+        generate_ai_evaluation_insights,
+        employee_id=UUID(employee_id),
+        insight_type=insight_type,
+        current_user=None
+    )
+
 @router.get("/analytics/department-comparison")
 async def get_department_parameter_comparison(
     parameter_id: Optional[str] = Query(None, description="Specific parameter to analyze"),
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Header
 from sqlalchemy.orm import Session
 from sqlalchemy import func, and_, or_, desc, asc
 from typing import List, Optional, Dict, Any
@@ -7,10 +7,19 @@ import schemas
 from database import get_db
 from auth.dependencies import get_current_active_user, require_roles
 import logging
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import uuid
 from decimal import Decimal
 from ai_service import ai_service
+from services.jobs import JobContext, job_handler, submit_job, job_accepted_response
+from services.org_hierarchy import can_access_employee
+from services import performance_analytics, timeseries
+from services.calibration import CalibrationError, calibrate_cycle
+from services.feedback_campaigns import (
+    CampaignError, add_requests, campaign_progress, close_campaign, complete_requests, default_due_date,
+    launch_campaign, notify_raters, serialize_campaign,
+)
+from services.notifications import SUPPORTED_PLATFORMS
 
 logger = logging.getLogger(__name__)
 
@@ -53,6 +62,8 @@ async def create_feedback(
         )
         
         db.add(db_feedback)
+        db.flush()
+        complete_requests(db, current_user.employee_id, feedback.recipient_id, db_feedback.id)
         db.commit()
         db.refresh(db_feedback)
         
@@ -80,19 +91,8 @@ async def get_employee_feedback(
 ):
     """Get feedback for an employee"""
     try:
-        # Check permissions
-        can_view = False
-        if current_user.role in ["admin", "hr_admin"]:
-            can_view = True
-        elif current_user.employee_id == employee_id:
-            can_view = True
-        elif current_user.role == "manager":
-            # Check if this is their direct report
-            employee = db.query(models.Employee).filter(models.Employee.id == employee_id).first()
-            if employee and current_user.employee_id:
-                manager = db.query(models.Employee).filter(models.Employee.id == current_user.employee_id).first()
-                if manager and employee.manager_id == manager.id:
-                    can_view = True
+        # Check permissions (managers can see anyone in their reporting line)
+        can_view = can_access_employee(db, current_user, employee_id)
         
         if not can_view:
             raise HTTPException(
@@ -163,78 +163,265 @@ async def request_360_feedback(
                 detail="Employee not found"
             )
         
+        try:
+            due_date = date.fromisoformat(str(feedback_request["due_date"])[:10]) \
+                if feedback_request.get("due_date") else default_due_date()
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="due_date must be an ISO date"
+            )
+        
         # Get feedback providers
         peer_ids = feedback_request.get("peer_ids", [])
         manager_ids = feedback_request.get("manager_ids", [])
         direct_report_ids = feedback_request.get("direct_report_ids", [])
         include_self = feedback_request.get("include_self", True)
         
-        feedback_requests = []
-        
-        # Create peer feedback requests
-        for peer_id in peer_ids:
-            feedback_requests.append({
-                "recipient_id": employee_id,
-                "requested_from": peer_id,
-                "feedback_type": "peer",
-                "due_date": feedback_request.get("due_date"),
-                "instructions": feedback_request.get("peer_instructions", "Please provide honest feedback on this colleague's performance.")
-            })
-        
-        # Create manager feedback requests
-        for manager_id in manager_ids:
-            feedback_requests.append({
-                "recipient_id": employee_id,
-                "requested_from": manager_id,
-                "feedback_type": "downward",
-                "due_date": feedback_request.get("due_date"),
-                "instructions": feedback_request.get("manager_instructions", "Please provide feedback as this employee's manager.")
-            })
-        
-        # Create direct report feedback requests
-        for report_id in direct_report_ids:
-            feedback_requests.append({
-                "recipient_id": employee_id,
-                "requested_from": report_id,
-                "feedback_type": "upward",
-                "due_date": feedback_request.get("due_date"),
-                "instructions": feedback_request.get("report_instructions", "Please provide feedback on your manager's leadership.")
+        campaign = models.FeedbackCampaign(
+            name=f"360 feedback: {employee.name}",
+            due_date=due_date,
+            status="active",
+            settings={"include_self": include_self},
+            created_by=current_user.id
+        )
+        db.add(campaign)
+        
+        if peer_ids or manager_ids or direct_report_ids:
+            raters = [(employee_id, uuid.UUID(str(rater_id)), "peer") for rater_id in peer_ids]
+            raters += [(employee_id, uuid.UUID(str(rater_id)), "downward") for rater_id in manager_ids]
+            raters += [(employee_id, uuid.UUID(str(rater_id)), "upward") for rater_id in direct_report_ids]
+            if include_self:
+                raters.append((employee_id, employee_id, "self"))
+            rater_ids = {rater_id for _, rater_id, _ in raters}
+            known = {row[0] for row in db.query(models.Employee.id).filter(models.Employee.id.in_(rater_ids)).all()}
+            if rater_ids - known:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Unknown employees: {', '.join(sorted(str(rater_id) for rater_id in rater_ids - known))}"
+                )
+            add_requests(db, campaign, current_user.id, raters, instructions={
+                request_type: feedback_request[key]
+                for request_type, key in [("peer", "peer_instructions"), ("downward", "manager_instructions"),
+                                          ("upward", "report_instructions"), ("self", "self_instructions")]
+                if feedback_request.get(key)
             })
+        else:
+            # No raters named: pick them from the org chart
+            launch_campaign(db, campaign, current_user.id, subject_ids=[employee_id])
         
-        # Self-assessment request
-        if include_self:
-            feedback_requests.append({
-                "recipient_id": employee_id,
-                "requested_from": employee_id,
-                "feedback_type": "self",
-                "due_date": feedback_request.get("due_date"),
-                "instructions": feedback_request.get("self_instructions", "Please complete your self-assessment.")
-            })
+        notify_raters(db, campaign)
+        db.commit()
         
-        # Store feedback requests (you might want to create a FeedbackRequest model)
-        # For now, we'll return the request structure
+        feedback_requests = db.query(models.FeedbackRequest).filter(
+            models.FeedbackRequest.campaign_id == campaign.id
+        ).all()
         
         logger.info(f"360-degree feedback requested by {current_user.email} for employee {employee_id}")
         
         return {
             "message": f"360-degree feedback requested for {employee.name}",
             "employee_id": employee_id,
+            "campaign_id": str(campaign.id),
             "total_requests": len(feedback_requests),
-            "feedback_requests": feedback_requests,
-            "due_date": feedback_request.get("due_date"),
+            "feedback_requests": [
+                {
+                    "id": str(request.id),
+                    "recipient_id": request.employee_id,
+                    "requested_from": request.rater_id,
+                    "feedback_type": request.request_type,
+                    "due_date": request.due_date.isoformat(),
+                    "instructions": request.instructions,
+                    "status": request.status
+                }
+                for request in feedback_requests
+            ],
+            "due_date": due_date.isoformat(),
             "requested_by": current_user.email,
             "requested_at": datetime.utcnow().isoformat()
         }
         
     except HTTPException:
         raise
+    except ValueError as e:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         logger.error(f"Failed to request 360 feedback: {e}")
+        db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to request 360-degree feedback"
         )
 
+# =============================================================================
+# 360 FEEDBACK CAMPAIGNS
+# =============================================================================
+
+def _get_campaign(db: Session, campaign_id: uuid.UUID) -> models.FeedbackCampaign:
+    campaign = db.query(models.FeedbackCampaign).filter(models.FeedbackCampaign.id == campaign_id).first()
+    if not campaign:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Feedback campaign not found"
+        )
+    return campaign
+
+@router.post("/feedback-campaigns", status_code=status.HTTP_201_CREATED)
+async def create_feedback_campaign(
+    campaign_data: schemas.FeedbackCampaignCreate,
+    current_user: models.User = Depends(require_roles(["admin", "hr_admin"])),
+    db: Session = Depends(get_db)
+):
+    """Launch a 360 feedback campaign for many subjects at once, with raters picked from the org chart"""
+    unknown_platforms = set(campaign_data.platforms) - set(SUPPORTED_PLATFORMS)
+    if unknown_platforms:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported notification platforms: {', '.join(sorted(unknown_platforms))}"
+        )
+    if campaign_data.cycle_id and not db.query(models.PerformanceReviewCycle.id).filter(
+        models.PerformanceReviewCycle.id == campaign_data.cycle_id
+    ).first():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Performance review cycle not found"
+        )
+    
+    try:
+        campaign = models.FeedbackCampaign(
+            name=campaign_data.name,
+            description=campaign_data.description,
+            cycle_id=campaign_data.cycle_id,
+            due_date=campaign_data.due_date,
+            status="active",
+            settings={
+                "include_self": campaign_data.include_self,
+                "include_manager": campaign_data.include_manager,
+                "max_reports": campaign_data.max_reports,
+                "peers_per_subject": campaign_data.peers_per_subject,
+                "parameters_to_rate": campaign_data.parameters_to_rate,
+                "instructions": campaign_data.instructions,
+                "platforms": campaign_data.platforms,
+                "subject_ids": [str(subject_id) for subject_id in campaign_data.subject_ids],
+                "department_ids": [str(department_id) for department_id in campaign_data.department_ids],
+            },
+            created_by=current_user.id
+        )
+        db.add(campaign)
+        launch_campaign(
+            db, campaign, current_user.id,
+            subject_ids=campaign_data.subject_ids, department_ids=campaign_data.department_ids
+        )
+        notifications = notify_raters(db, campaign) if campaign_data.notify else {"raters": 0, "queued": 0}
+        db.commit()
+        db.refresh(campaign)
+        
+        logger.info(f"Feedback campaign {campaign.id} launched by {current_user.email}: "
+                    f"{campaign.total_requests} requests for {campaign.subject_count} subjects")
+        
+        return {**serialize_campaign(campaign), "notifications": notifications}
+        
+    except CampaignError as e:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        logger.error(f"Failed to launch feedback campaign: {e}")
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to launch feedback campaign"
+        )
+
+@router.get("/feedback-campaigns")
+async def list_feedback_campaigns(
+    campaign_status: Optional[str] = Query(None, alias="status", enum=["active", "closed"]),
+    limit: int = Query(50, ge=1, le=200),
+    current_user: models.User = Depends(require_roles(["admin", "hr_admin"])),
+    db: Session = Depends(get_db)
+):
+    """List feedback campaigns with their completion counters"""
+    query = db.query(models.FeedbackCampaign)
+    if campaign_status:
+        query = query.filter(models.FeedbackCampaign.status == campaign_status)
+    campaigns = query.order_by(desc(models.FeedbackCampaign.created_at)).limit(limit).all()
+    return {"campaigns": [serialize_campaign(campaign) for campaign in campaigns], "total": len(campaigns)}
+
+@router.get("/feedback-campaigns/{campaign_id}")
+async def get_feedback_campaign_progress(
+    campaign_id: uuid.UUID,
+    current_user: models.User = Depends(require_roles(["admin", "hr_admin"])),
+    db: Session = Depends(get_db)
+):
+    """Campaign progress by request type and status"""
+    return campaign_progress(db, _get_campaign(db, campaign_id))
+
+@router.post("/feedback-campaigns/{campaign_id}/remind")
+async def remind_feedback_campaign_raters(
+    campaign_id: uuid.UUID,
+    current_user: models.User = Depends(require_roles(["admin", "hr_admin"])),
+    db: Session = Depends(get_db)
+):
+    """Queue one reminder per rater who still has open requests"""
+    campaign = _get_campaign(db, campaign_id)
+    if campaign.status != "active":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Only active campaigns can send reminders"
+        )
+    notifications = notify_raters(db, campaign, reminder=True)
+    db.commit()
+    return {"campaign_id": str(campaign_id), **notifications}
+
+@router.post("/feedback-campaigns/{campaign_id}/close")
+async def close_feedback_campaign(
+    campaign_id: uuid.UUID,
+    current_user: models.User = Depends(require_roles(["admin", "hr_admin"])),
+    db: Session = Depends(get_db)
+):
+    """Close a campaign; its open requests expire"""
+    campaign = _get_campaign(db, campaign_id)
+    expired = close_campaign(db, campaign)
+    db.commit()
+    
+    logger.info(f"Feedback campaign {campaign_id} closed by {current_user.email}: {expired} requests expired")
+    return {**serialize_campaign(campaign), "expired_requests": expired}
+
+@router.get("/feedback-requests/mine")
+async def get_my_feedback_requests(
+    request_status: str = Query("pending", alias="status", enum=["pending", "in_progress", "completed", "expired"]),
+    limit: int = Query(100, ge=1, le=500),
+    current_user: models.User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Feedback the current user has been asked to give"""
+    if not current_user.employee_id:
+        return {"requests": [], "total": 0}
+    
+    rows = db.query(models.FeedbackRequest, models.Employee.name).join(
+        models.Employee, models.Employee.id == models.FeedbackRequest.employee_id
+    ).filter(
+        models.FeedbackRequest.rater_id == current_user.employee_id,
+        models.FeedbackRequest.status == request_status
+    ).order_by(asc(models.FeedbackRequest.due_date)).limit(limit).all()
+    
+    return {
+        "requests": [
+            {
+                "id": str(request.id),
+                "campaign_id": str(request.campaign_id) if request.campaign_id else None,
+                "subject_id": str(request.employee_id),
+                "subject_name": subject_name,
+                "request_type": request.request_type,
+                "due_date": request.due_date.isoformat(),
+                "instructions": request.instructions,
+                "status": request.status
+            }
+            for request, subject_name in rows
+        ],
+        "total": len(rows)
+    }
+
 # =============================================================================
 # PERFORMANCE REVIEW CYCLES
 # =============================================================================
@@ -368,18 +555,8 @@ async def get_employee_reviews(
 ):
     """Get performance reviews for an employee"""
     try:
-        # Check permissions
-        can_view = False
-        if current_user.role in ["admin", "hr_admin"]:
-            can_view = True
-        elif current_user.employee_id == employee_id:
-            can_view = True
-        elif current_user.role == "manager":
-            employee = db.query(models.Employee).filter(models.Employee.id == employee_id).first()
-            if employee and current_user.employee_id:
-                manager = db.query(models.Employee).filter(models.Employee.id == current_user.employee_id).first()
-                if manager and employee.manager_id == manager.id:
-                    can_view = True
+        # Check permissions (managers can see anyone in their reporting line)
+        can_view = can_access_employee(db, current_user, employee_id)
         
         if not can_view:
             raise HTTPException(
@@ -404,15 +581,10 @@ async def get_employee_reviews(
             ratings = [r.rating for r in reviews]
             avg_rating = sum(ratings) / len(ratings)
         
-        # Rating trend
+        # Rating trend: least-squares fit over the reviews in chronological order
         rating_trend = "stable"
         if len(reviews) >= 2:
-            recent_avg = sum([r.rating for r in reviews[:3]]) / min(3, len(reviews))
-            older_avg = sum([r.rating for r in reviews[-3:]]) / min(3, len(reviews))
-            if recent_avg > older_avg + 0.2:
-                rating_trend = "improving"
-            elif recent_avg < older_avg - 0.2:
-                rating_trend = "declining"
+            rating_trend = timeseries.analyze([[r.rating for r in reversed(reviews)]], horizon=0)[0]["direction"]
         
         return {
             "employee_id": employee_id,
@@ -518,6 +690,62 @@ async def calibrate_review(
             detail="Failed to calibrate performance review"
         )
 
+@router.post("/review-cycles/{cycle_id}/calibrate")
+async def calibrate_review_cycle(
+    cycle_id: uuid.UUID,
+    options: schemas.ReviewCycleCalibration,
+    run_async: bool = Query(False, alias="async", description="Run as a background job and return 202 with a job ID"),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    current_user: models.User = Depends(require_roles(["admin", "hr_admin"])),
+    db: Session = Depends(get_db)
+):
+    """Calibrate every review of a cycle against its peer groups in one pass"""
+    cycle = db.query(models.PerformanceReviewCycle).filter(models.PerformanceReviewCycle.id == cycle_id).first()
+    if not cycle:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Performance review cycle not found"
+        )
+    
+    if run_async:
+        job = submit_job(
+            "performance.calibrate_cycle",
+            {"cycle_id": str(cycle_id), "options": options.dict()},
+            created_by=current_user.id,
+            idempotency_key=idempotency_key
+        )
+        return job_accepted_response(job)
+    
+    try:
+        summary = calibrate_cycle(db, cycle_id, **options.dict())
+        db.commit()
+        
+        logger.info(f"Review cycle calibrated by {current_user.email}: {cycle_id}")
+        
+        return {
+            "cycle_id": str(cycle_id),
+            "strategy": options.strategy,
+            "dry_run": options.dry_run,
+            **summary
+        }
+        
+    except CalibrationError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        logger.error(f"Failed to calibrate review cycle {cycle_id}: {e}")
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to calibrate review cycle"
+        )
+
+@job_handler("performance.calibrate_cycle")
+async def calibrate_review_cycle_job(ctx: JobContext, cycle_id: str, options: Dict[str, Any]):
+    return await ctx.run_with_session(lambda db, user: calibrate_review_cycle(
+        cycle_id=uuid.UUID(cycle_id), options=schemas.ReviewCycleCalibration(**options),
+        run_async=False, idempotency_key=None, current_user=user, db=db
+    ))
+
 # =============================================================================
 # 1:1 MEETING MANAGEMENT
 # =============================================================================
@@ -586,18 +814,8 @@ async def get_employee_meetings(
 ):
     """Get 1:1 meetings for an employee"""
     try:
-        # Check permissions
-        can_view = False
-        if current_user.role in ["admin", "hr_admin"]:
-            can_view = True
-        elif current_user.employee_id == employee_id:
-            can_view = True
-        elif current_user.role == "manager":
-            employee = db.query(models.Employee).filter(models.Employee.id == employee_id).first()
-            if employee and current_user.employee_id:
-                manager = db.query(models.Employee).filter(models.Employee.id == current_user.employee_id).first()
-                if manager and employee.manager_id == manager.id:
-                    can_view = True
+        # Check permissions (managers can see anyone in their reporting line)
+        can_view = can_access_employee(db, current_user, employee_id)
         
         if not can_view:
             raise HTTPException(
@@ -667,65 +885,29 @@ async def get_team_performance_analytics(
         period_days = {"3months": 90, "6months": 180, "1year": 365}
         start_date = datetime.utcnow() - timedelta(days=period_days[period])
         
-        # Get employees to analyze
-        employee_query = db.query(models.Employee).filter(models.Employee.is_active == True)
-        if department_id:
-            employee_query = employee_query.filter(models.Employee.department_id == department_id)
-        elif current_user.role == "manager" and current_user.employee_id:
-            # Managers see their direct reports
-            employee_query = employee_query.filter(models.Employee.manager_id == current_user.employee_id)
-        
-        employees = employee_query.all()
-        
-        # Get performance reviews for these employees
-        employee_ids = [emp.id for emp in employees]
-        reviews = db.query(models.PerformanceReview).filter(
-            and_(
-                models.PerformanceReview.employee_id.in_(employee_ids),
-                models.PerformanceReview.created_at >= start_date
-            )
-        ).all()
-        
-        # Calculate analytics
-        total_employees = len(employees)
-        total_reviews = len(reviews)
-        
-        # Rating distribution
-        rating_distribution = {1: 0, 2: 0, 3: 0, 4: 0, 5: 0}
-        if reviews:
-            for review in reviews:
-                if review.rating in rating_distribution:
-                    rating_distribution[review.rating] += 1
-        
-        # Average rating
-        avg_rating = None
-        if reviews:
-            avg_rating = sum([r.rating for r in reviews]) / len(reviews)
-        
-        # Top performers (rating >= 4)
-        top_performers = [r for r in reviews if r.rating >= 4]
-        top_performer_rate = (len(top_performers) / total_reviews * 100) if total_reviews > 0 else 0
-        
-        # Feedback metrics
-        feedback_count = db.query(models.Feedback).filter(
-            and_(
-                models.Feedback.recipient_id.in_(employee_ids),
-                models.Feedback.created_at >= start_date
-            )
-        ).count()
+        # Employees to analyze, as a subquery; nothing is loaded per employee
+        employee_ids = performance_analytics.employee_scope(
+            department_id=department_id,
+            # Managers see everyone under them, not just direct reports
+            manager_employee_id=current_user.employee_id if current_user.role == "manager" else None,
+        )
         
+        total_employees = performance_analytics.count_employees(db, employee_ids)
+        reviews = performance_analytics.review_summary(db, employee_ids, since=start_date)
+        feedback_count = performance_analytics.count_feedback(db, employee_ids, since=start_date)
         feedback_per_employee = feedback_count / total_employees if total_employees > 0 else 0
         
         return {
             "team_analytics": {
                 "total_employees": total_employees,
-                "total_reviews": total_reviews,
-                "average_rating": round(avg_rating, 2) if avg_rating else None,
-                "top_performer_rate": round(top_performer_rate, 2),
+                "total_reviews": reviews["total_reviews"],
+                "average_rating": reviews["average_rating"],
+                "top_performer_rate": reviews["top_performer_rate"],
                 "feedback_count": feedback_count,
                 "feedback_per_employee": round(feedback_per_employee, 2)
             },
-            "rating_distribution": rating_distribution,
+            "rating_distribution": reviews["rating_distribution"],
+            "monthly_trends": performance_analytics.review_trend(db, start_date, employee_ids),
             "period": period,
             "department_id": str(department_id) if department_id else None,
             "analysis_date": datetime.utcnow().isoformat()
@@ -746,61 +928,32 @@ async def get_feedback_culture_metrics(
 ):
     """Get feedback culture metrics and insights"""
     try:
-        # Base feedback query
-        feedback_query = db.query(models.Feedback)
-        
+        now = datetime.utcnow()
+        recipient_ids = population = None
         if department_id:
-            feedback_query = feedback_query.join(
-                models.Employee, models.Feedback.recipient_id == models.Employee.id
-            ).filter(models.Employee.department_id == department_id)
-        
-        all_feedback = feedback_query.all()
-        
-        # Calculate metrics
-        total_feedback = len(all_feedback)
-        
-        # Feedback frequency (last 30 days)
-        recent_feedback = [f for f in all_feedback if f.created_at >= datetime.utcnow() - timedelta(days=30)]
-        feedback_velocity = len(recent_feedback)
-        
-        # Feedback type distribution
-        type_distribution = {"peer": 0, "upward": 0, "downward": 0, "self": 0}
-        for feedback in all_feedback:
-            if feedback.feedback_type in type_distribution:
-                type_distribution[feedback.feedback_type] += 1
-        
-        # Anonymous vs. identified feedback
-        anonymous_count = len([f for f in all_feedback if f.is_anonymous])
-        anonymous_rate = (anonymous_count / total_feedback * 100) if total_feedback > 0 else 0
+            recipient_ids = performance_analytics.employee_scope(department_id=department_id, active_only=False)
+            population = performance_analytics.employee_scope(department_id=department_id)
         
-        # Average feedback quality (based on ratings)
-        rated_feedback = [f for f in all_feedback if f.rating is not None]
-        avg_feedback_quality = sum([f.rating for f in rated_feedback]) / len(rated_feedback) if rated_feedback else None
-        
-        # Most active feedback givers
-        giver_stats = {}
-        for feedback in all_feedback:
-            if feedback.giver_id not in giver_stats:
-                giver_stats[feedback.giver_id] = 0
-            giver_stats[feedback.giver_id] += 1
-        
-        top_givers = sorted(giver_stats.items(), key=lambda x: x[1], reverse=True)[:5]
+        feedback = performance_analytics.feedback_summary(
+            db, recent_since=now - timedelta(days=30), recipient_ids=recipient_ids, population=population
+        )
         
         return {
             "feedback_culture_metrics": {
-                "total_feedback_count": total_feedback,
-                "monthly_feedback_velocity": feedback_velocity,
-                "anonymous_feedback_rate": round(anonymous_rate, 2),
-                "average_feedback_quality": round(avg_feedback_quality, 2) if avg_feedback_quality else None
+                "total_feedback_count": feedback["total"],
+                "monthly_feedback_velocity": feedback["recent"],
+                "anonymous_feedback_rate": feedback["anonymous_rate"],
+                "average_feedback_quality": feedback["average_rating"]
             },
             "distributions": {
-                "by_feedback_type": type_distribution
+                "by_feedback_type": feedback["type_distribution"]
             },
             "engagement_indicators": {
-                "top_feedback_givers": len(top_givers),
-                "feedback_participation_rate": round((len(giver_stats) / db.query(models.Employee).filter(models.Employee.is_active == True).count() * 100), 2)
+                "top_feedback_givers": min(feedback["givers"], 5),
+                "feedback_participation_rate": feedback["participation_rate"]
             },
-            "analysis_date": datetime.utcnow().isoformat()
+            "monthly_trends": performance_analytics.feedback_trend(db, now - timedelta(days=180), recipient_ids),
+            "analysis_date": now.isoformat()
         }
         
     except Exception as e:
@@ -818,10 +971,21 @@ async def get_feedback_culture_metrics(
 async def generate_ai_performance_insights(
     employee_data: Dict[str, Any],
     performance_history: List[Dict[str, Any]],
+    run_async: bool = Query(False, alias="async", description="Run as a background job and return 202 with a job ID"),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
     current_user: models.User = Depends(require_roles(["admin", "hr_admin", "manager"])),
     db: Session = Depends(get_db)
 ):
     """Generate AI-powered performance insights - matches frontend API call"""
+    if run_async:
+        job = submit_job(
+            "performance.generate_ai_insights",
+            {"employee_data": employee_data, "performance_history": performance_history},
+            created_by=current_user.id,
+            idempotency_key=idempotency_key
+        )
+        return job_accepted_response(job)
+    
     try:
         # Generate AI insights using Cerebras
         ai_insights = ai_service.generate_performance_insights(
@@ -842,4 +1006,11 @@ async def generate_ai_performance_insights(
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to generate AI performance insights: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+@job_handler("performance.generate_ai_insights")
+async def generate_ai_performance_insights_job(ctx: JobContext, employee_data: Dict[str, Any], performance_history: List[Dict[str, Any]]):
+    return await ctx.run_with_session(lambda db, user: generate_ai_performance_insights(
+        employee_data=employee_data, performance_history=performance_history,
+        run_async=False, idempotency_key=None, current_user=user, db=db
+    ))
@@ -1,7 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query, Body
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Body, Header
+from fastapi.responses import JSONResponse, StreamingResponse, FileResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import select, func, and_, or_, desc
+from sqlalchemy import select, func, and_, or_
+from sqlalchemy.exc import IntegrityError
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timedelta
 import uuid
@@ -10,10 +11,20 @@ import json
 import logging
 
 from database import get_db
-from models import User, AuditLog, DataRetentionPolicy, ConsentRecord, SurveyResponse, PerformanceReview
-import models
+from models import User, AuditLog, BackgroundJob, DataRetentionPolicy, RetentionRun, ConsentRecord
 import schemas
 from auth.dependencies import get_current_active_user, require_roles
+from services.gdpr_export import (
+    EXPORT_FORMAT_PATTERN, EXPORT_MEDIA_TYPES, iter_export, export_filename,
+    export_artifact_path, write_export_artifact
+)
+from services.retention import (
+    RETENTION_ACTIONS, RETENTION_TARGETS, policy_action, policy_cutoff, count_candidates,
+    create_retention_run, launch_retention_run, cancel_retention_run, is_run_live, serialize_run
+)
+from services.audit import audit_writer, record_audit_event
+from services.jobs import JobContext, get_visible_job, job_handler, job_accepted_response, serialize_job, submit_job
+from services.pagination import COUNT_MODE_PATTERN, InvalidCursorError, keyset_paginate, build_page, count_total
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/security", tags=["Security & Compliance"])
@@ -57,82 +68,90 @@ async def record_user_consent(
         logger.error(f"Failed to record consent: {e}")
         raise HTTPException(status_code=500, detail="Failed to record consent")
 
+@job_handler("gdpr.data_export")
+async def data_export_job(ctx: JobContext, user_id: str, format: str):
+    return await ctx.run_blocking(write_export_artifact, ctx.job_id, uuid.UUID(user_id), format, ctx.check_cancelled)
+
+def _get_export_job(db: Session, job_id: uuid.UUID, current_user: User) -> BackgroundJob:
+    job = get_visible_job(db, job_id, current_user)
+    if job.job_type != "gdpr.data_export":
+        raise HTTPException(status_code=404, detail="Export job not found")
+    return job
+
+@router.get("/gdpr/data-export/jobs/{job_id}")
+async def get_data_export_job(
+    job_id: uuid.UUID,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Get the status of a background data export job"""
+    return serialize_job(_get_export_job(db, job_id, current_user))
+
+@router.get("/gdpr/data-export/jobs/{job_id}/download")
+async def download_data_export(
+    job_id: uuid.UUID,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Download the file produced by a completed background data export job"""
+    job = _get_export_job(db, job_id, current_user)
+    result = job.result or {}
+    if job.status != "succeeded" or "filename" not in result:
+        raise HTTPException(status_code=409, detail=f"Export job is {job.status}")
+    
+    path = export_artifact_path(job.id, result["format"])
+    if not path.exists():
+        raise HTTPException(status_code=410, detail="Export file has expired")
+    return FileResponse(path, media_type=EXPORT_MEDIA_TYPES[result["format"]], filename=result["filename"])
+
 @router.get("/gdpr/data-export/{user_id}")
 async def export_user_data(
     user_id: uuid.UUID,
+    format: str = Query("ndjson", pattern=EXPORT_FORMAT_PATTERN),
+    run_async: bool = Query(False, alias="async", description="Generate the export in the background and return a job ID"),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
-    """Export all user data (GDPR Article 20 - Right to Data Portability)"""
+    """
+    Export all user data (GDPR Article 20 - Right to Data Portability).
+
+    Streams NDJSON (or a zip with one NDJSON file per section) straight from
+    server-side cursors. With ``async=true`` the export runs as a background
+    job and a job ID is returned for polling/download.
+    """
     try:
         # Check if user can access this data (admin or self)
         if current_user.role not in ["admin", "hr_admin"] and current_user.id != user_id:
             raise HTTPException(status_code=403, detail="Access denied")
         
-        # Collect user data from all tables
-        user_data = {}
-        
-        # Basic user information
-        user = db.query(User).filter(User.id == user_id).first()
-        if not user:
+        if not db.query(User.id).filter(User.id == user_id).first():
             raise HTTPException(status_code=404, detail="User not found")
         
-        user_data["profile"] = {
-            "id": str(user.id),
-            "email": user.email,
-            "role": user.role,
-            "created_at": user.created_at.isoformat(),
-            "last_login": user.last_login.isoformat() if user.last_login else None
-        }
-        
-        # Survey responses (anonymized if required)
-        survey_responses = db.query(SurveyResponse).filter(SurveyResponse.employee_id == user_id).all()
-        user_data["survey_responses"] = [
-            {
-                "survey_id": str(response.survey_id),
-                "submitted_at": response.submitted_at.isoformat(),
-                "responses": response.responses,
-                "is_anonymous": response.is_anonymous
-            }
-            for response in survey_responses
-        ]
-        
-        # Performance reviews
-        performance_reviews = db.query(PerformanceReview).filter(PerformanceReview.employee_id == user_id).all()
-        user_data["performance_reviews"] = [
-            {
-                "id": str(review.id),
-                "review_period": review.review_period,
-                "scores": review.scores,
-                "created_at": review.created_at.isoformat()
-            }
-            for review in performance_reviews
-        ]
-        
-        # Audit logs
-        audit_logs = db.query(AuditLog).filter(AuditLog.user_id == user_id).order_by(desc(AuditLog.timestamp)).all()
-        user_data["audit_logs"] = [
-            {
-                "action": log.action,
-                "timestamp": log.timestamp.isoformat(),
-                "ip_address": log.ip_address,
-                "user_agent": log.user_agent
-            }
-            for log in audit_logs
-        ]
-        
         # Log data export action
         log_audit_event(
             db, current_user.id, "data_exported",
-            {"target_user_id": str(user_id), "export_timestamp": datetime.utcnow().isoformat()}
+            {"target_user_id": str(user_id), "format": format, "async": run_async,
+             "export_timestamp": datetime.utcnow().isoformat()}
         )
         
-        return {
-            "user_id": str(user_id),
-            "export_timestamp": datetime.utcnow().isoformat(),
-            "data": user_data
-        }
+        if run_async:
+            job = submit_job(
+                "gdpr.data_export",
+                {"user_id": str(user_id), "format": format},
+                created_by=current_user.id,
+                idempotency_key=idempotency_key
+            )
+            return job_accepted_response(job)
+        
+        return StreamingResponse(
+            iter_export(user_id, format),
+            media_type=EXPORT_MEDIA_TYPES[format],
+            headers={"Content-Disposition": f'attachment; filename="{export_filename(user_id, format)}"'}
+        )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Failed to export user data: {e}")
         raise HTTPException(status_code=500, detail="Failed to export user data")
@@ -187,19 +206,15 @@ def log_audit_event(
     ip_address: Optional[str] = None,
     user_agent: Optional[str] = None
 ):
-    """Log audit event for compliance tracking"""
+    """
+    Log audit event for compliance tracking.
+
+    The event is handed to the background audit writer and flushed in a batch,
+    so the calling request does not pay for the insert. ``db`` is kept for
+    backwards compatibility with existing callers.
+    """
     try:
-        audit_log = AuditLog(
-            user_id=user_id,
-            action=action,
-            details=details,
-            ip_address=ip_address,
-            user_agent=user_agent,
-            timestamp=datetime.utcnow()
-        )
-        
-        db.add(audit_log)
-        db.commit()
+        record_audit_event(user_id, action, details, ip_address, user_agent)
         
     except Exception as e:
         logger.error(f"Failed to log audit event: {e}")
@@ -212,10 +227,12 @@ async def get_audit_logs(
     end_date: Optional[datetime] = Query(None),
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from next_cursor; takes precedence over skip"),
+    count: str = Query("exact", pattern=COUNT_MODE_PATTERN),
     current_user: User = Depends(require_roles(["admin", "hr_admin"])),
     db: Session = Depends(get_db)
 ):
-    """Get audit logs with filtering (Admin only)"""
+    """Get audit logs with filtering and keyset pagination (Admin only)"""
     try:
         query = select(AuditLog)
         
@@ -229,14 +246,18 @@ async def get_audit_logs(
         if end_date:
             query = query.where(AuditLog.timestamp <= end_date)
         
-        # Get total count
-        total = db.query(AuditLog).count()
+        # Get total count (skipped on cursor pages, the client already has it)
+        total = None
+        if not cursor or count == "approximate":
+            total, _ = count_total(db, query, AuditLog.__tablename__, count)
         
         # Get logs with pagination
-        logs = db.query(AuditLog).order_by(desc(AuditLog.timestamp)).offset(skip).limit(limit).all()
+        page_query = keyset_paginate(query, AuditLog.timestamp, AuditLog.id, limit, cursor=cursor, skip=skip)
+        logs, next_cursor = build_page(db.execute(page_query).scalars().all(), limit, "timestamp")
         
         return {
             "total": total,
+            "next_cursor": next_cursor,
             "logs": [
                 {
                     "id": str(log.id),
@@ -251,10 +272,25 @@ async def get_audit_logs(
             ]
         }
         
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Failed to get audit logs: {e}")
         raise HTTPException(status_code=500, detail="Failed to retrieve audit logs")
 
+@router.get("/audit-logs/pipeline/status")
+async def get_audit_pipeline_status(
+    current_user: User = Depends(require_roles(["admin", "hr_admin"]))
+):
+    """Get background audit writer status and counters (Admin only)"""
+    return {
+        "running": audit_writer.is_running,
+        "buffer_capacity": audit_writer.max_queue_size,
+        "batch_size": audit_writer.batch_size,
+        "flush_interval_seconds": audit_writer.flush_interval,
+        "stats": dict(audit_writer.stats)
+    }
+
 # =====================================================
 # DATA RETENTION POLICIES
 # =====================================================
@@ -267,12 +303,16 @@ async def create_retention_policy(
 ):
     """Create data retention policy"""
     try:
+        if policy_data.get("action", "delete") not in RETENTION_ACTIONS:
+            raise HTTPException(status_code=400, detail=f"action must be one of {list(RETENTION_ACTIONS)}")
+        
         policy = DataRetentionPolicy(
             name=policy_data["name"],
             description=policy_data.get("description"),
             data_type=policy_data["data_type"],
             retention_period_days=policy_data["retention_period_days"],
             auto_delete=policy_data.get("auto_delete", False),
+            action=policy_data.get("action", "delete"),
             legal_basis=policy_data.get("legal_basis"),
             created_by=current_user.id,
             created_at=datetime.utcnow()
@@ -288,6 +328,8 @@ async def create_retention_policy(
         
         return {"message": "Retention policy created", "policy_id": str(policy.id)}
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Failed to create retention policy: {e}")
         raise HTTPException(status_code=500, detail="Failed to create retention policy")
@@ -298,7 +340,7 @@ async def get_cleanup_candidates(
     current_user: User = Depends(require_roles(["admin", "hr_admin"])),
     db: Session = Depends(get_db)
 ):
-    """Get data that can be cleaned up based on retention policies"""
+    """Get aggregate counts of data that can be cleaned up based on retention policies"""
     try:
         # Get active retention policies
         policies = db.query(DataRetentionPolicy).filter(DataRetentionPolicy.is_active == True).all()
@@ -308,44 +350,26 @@ async def get_cleanup_candidates(
         for policy in policies:
             if data_type and policy.data_type != data_type:
                 continue
-                
-            cutoff_date = datetime.utcnow() - timedelta(days=policy.retention_period_days)
+            if policy.data_type not in RETENTION_TARGETS:
+                continue
             
-            # Check different data types
-            if policy.data_type == "survey_responses":
-                candidates_result = await db.execute(
-                    select(models.SurveyResponse)
-                    .where(models.SurveyResponse.submitted_at < cutoff_date)
-                )
-                candidates = candidates_result.scalars().all()
-                
-                cleanup_candidates.extend([
-                    {
-                        "type": "survey_response",
-                        "id": str(candidate.id),
-                        "created_at": candidate.submitted_at.isoformat(),
-                        "policy": policy.name,
-                        "auto_delete": policy.auto_delete
-                    }
-                    for candidate in candidates
-                ])
+            action = policy_action(policy)
+            cutoff_date = policy_cutoff(policy)
+            candidates = count_candidates(db, policy.data_type, action, cutoff_date)
             
-            elif policy.data_type == "audit_logs":
-                candidates = db.query(AuditLog).filter(AuditLog.timestamp < cutoff_date).all()
-                
-                cleanup_candidates.extend([
-                    {
-                        "type": "audit_log",
-                        "id": str(candidate.id),
-                        "created_at": candidate.timestamp.isoformat(),
-                        "policy": policy.name,
-                        "auto_delete": policy.auto_delete
-                    }
-                    for candidate in candidates
-                ])
+            cleanup_candidates.append({
+                "policy_id": str(policy.id),
+                "policy": policy.name,
+                "data_type": policy.data_type,
+                "action": action,
+                "auto_delete": policy.auto_delete,
+                "cutoff_date": cutoff_date.isoformat(),
+                "count": candidates["count"],
+                "oldest": candidates["oldest"].isoformat() if candidates["oldest"] else None
+            })
         
         return {
-            "total_candidates": len(cleanup_candidates),
+            "total_candidates": sum(candidate["count"] for candidate in cleanup_candidates),
             "candidates": cleanup_candidates
         }
         
@@ -353,6 +377,92 @@ async def get_cleanup_candidates(
         logger.error(f"Failed to get cleanup candidates: {e}")
         raise HTTPException(status_code=500, detail="Failed to get cleanup candidates")
 
+@router.post("/data-retention/policies/{policy_id}/execute", status_code=status.HTTP_202_ACCEPTED)
+async def execute_retention_policy(
+    policy_id: uuid.UUID,
+    current_user: User = Depends(require_roles(["admin", "hr_admin"])),
+    db: Session = Depends(get_db)
+):
+    """Start a background retention run for a policy and return its run ID"""
+    try:
+        policy = db.query(DataRetentionPolicy).filter(DataRetentionPolicy.id == policy_id).first()
+        if not policy:
+            raise HTTPException(status_code=404, detail="Retention policy not found")
+        if policy.data_type not in RETENTION_TARGETS:
+            raise HTTPException(status_code=400, detail=f"Unsupported data type: {policy.data_type}")
+        
+        active_run = db.query(RetentionRun).filter(
+            RetentionRun.policy_id == policy_id,
+            RetentionRun.status.in_(["pending", "running"])
+        ).first()
+        if active_run:
+            raise HTTPException(status_code=409, detail=f"Retention run {active_run.id} is already in progress")
+        
+        try:
+            run = create_retention_run(db, policy, started_by=current_user.id)
+        except IntegrityError:
+            # Another worker started a run for this policy concurrently
+            db.rollback()
+            raise HTTPException(status_code=409, detail="A retention run for this policy is already in progress")
+        launch_retention_run(run.id)
+        
+        log_audit_event(
+            db, current_user.id, "retention_run_started",
+            {"policy_id": str(policy_id), "run_id": str(run.id), "action": run.action,
+             "total_candidates": run.total_candidates}
+        )
+        
+        return serialize_run(run)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to execute retention policy {policy_id}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to execute retention policy")
+
+@router.get("/data-retention/runs/{run_id}")
+async def get_retention_run(
+    run_id: uuid.UUID,
+    current_user: User = Depends(require_roles(["admin", "hr_admin"])),
+    db: Session = Depends(get_db)
+):
+    """Get progress of a retention run"""
+    run = db.query(RetentionRun).filter(RetentionRun.id == run_id).first()
+    if not run:
+        raise HTTPException(status_code=404, detail="Retention run not found")
+    return serialize_run(run)
+
+@router.post("/data-retention/runs/{run_id}/cancel")
+async def cancel_retention(
+    run_id: uuid.UUID,
+    current_user: User = Depends(require_roles(["admin", "hr_admin"])),
+    db: Session = Depends(get_db)
+):
+    """Cancel a running retention run after its current batch"""
+    if not cancel_retention_run(run_id):
+        raise HTTPException(status_code=409, detail="Retention run is not running in this worker")
+    
+    log_audit_event(db, current_user.id, "retention_run_cancelled", {"run_id": str(run_id)})
+    return {"message": "Cancellation requested", "run_id": str(run_id)}
+
+@router.post("/data-retention/runs/{run_id}/resume", status_code=status.HTTP_202_ACCEPTED)
+async def resume_retention(
+    run_id: uuid.UUID,
+    current_user: User = Depends(require_roles(["admin", "hr_admin"])),
+    db: Session = Depends(get_db)
+):
+    """Resume a failed, cancelled or interrupted retention run from where it stopped"""
+    run = db.query(RetentionRun).filter(RetentionRun.id == run_id).first()
+    if not run:
+        raise HTTPException(status_code=404, detail="Retention run not found")
+    if run.status == "completed" or is_run_live(db, run_id):
+        raise HTTPException(status_code=409, detail=f"Retention run is {run.status}")
+    
+    launch_retention_run(run_id, statuses=("pending", "failed", "cancelled"))
+    
+    log_audit_event(db, current_user.id, "retention_run_resumed", {"run_id": str(run_id)})
+    return serialize_run(run)
+
 # =====================================================
 # DATA ENCRYPTION UTILITIES
 # =====================================================
@@ -1,16 +1,32 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query, Body
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Body, Response, Header, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from database import get_db
+from database import get_db, SessionLocal
 import models
 import schemas
-from auth.dependencies import get_current_active_user, require_roles
+from auth.dependencies import get_current_active_user, get_current_user, require_roles
+import asyncio
+import json
 import logging
-from datetime import datetime, timedelta
-from sqlalchemy import select, func, distinct
+from datetime import datetime
+from sqlalchemy import select, func, text
 import uuid
 from ai_service import ai_service
+from services.jobs import JobContext, job_handler, submit_job, job_accepted_response
+from services.notifications import queue_survey_notifications, survey_notification_status
+from services.survey_scheduler import SCHEDULE_FREQUENCIES, initial_run_at, survey_scheduler
+from services.live_counters import SurveyNotFound, live_counters
+from services.response_quality import response_quality
+from services.survey_answers import answer_crosstab, answer_distribution, rebuild_survey_answers
+from services.survey_branching import BranchingCompileError, compile_branching
+from services.survey_audience import resolve_audience, response_rate
+from services.response_ingestion import (
+    DuplicateResponse, ResponseValidationError, SurveyUnavailable, build_response_row, response_ingestor, survey_definitions, validate_response
+)
+from services.pagination import (
+    COUNT_MODE_PATTERN, InvalidCursorError, keyset_paginate, build_page, count_total, set_pagination_headers
+)
 
 logger = logging.getLogger(__name__)
 
@@ -19,23 +35,9 @@ router = APIRouter(
     tags=["Surveys"]
 )
 
-# Helper function for manager+ access
-def require_manager_access(current_user: models.User = Depends(get_current_active_user)):
-    if current_user.role not in ["admin", "hr_admin", "manager"]:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Manager access required"
-        )
-    return current_user
-
-# Helper function for admin access
-def require_admin_access(current_user: models.User = Depends(get_current_active_user)):
-    if current_user.role not in ["admin", "hr_admin"]:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Admin access required"
-        )
-    return current_user
+# Role checks compiled to masks; super admins pass both
+require_manager_access = require_roles(["admin", "hr_admin", "manager"], active_only=True, detail="Manager access required")
+require_admin_access = require_roles(["admin", "hr_admin"], active_only=True, detail="Admin access required")
 
 # =====================================================
 # SURVEY TEMPLATES ENDPOINTS
@@ -125,8 +127,11 @@ async def create_survey_from_template(
 
 @router.get("/", response_model=List[schemas.Survey])
 async def get_surveys(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from X-Next-Cursor; takes precedence over skip"),
+    count: str = Query("none", pattern=COUNT_MODE_PATTERN),
     is_active: Optional[bool] = None,
     survey_type: Optional[str] = None,
     current_user: models.User = Depends(get_current_active_user),
@@ -142,9 +147,16 @@ async def get_surveys(
         if survey_type:
             query = query.filter(models.Survey.survey_type == survey_type)
         
-        surveys = query.offset(skip).limit(limit).all()
+        total, approximate = count_total(db, query, "surveys", count)
+        rows = keyset_paginate(
+            query, models.Survey.created_at, models.Survey.id, limit, cursor=cursor, skip=skip
+        ).all()
+        surveys, next_cursor = build_page(rows, limit, "created_at")
+        set_pagination_headers(response, next_cursor, total, approximate)
         return surveys
         
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         logger.error(f"Failed to get surveys: {e}")
         raise HTTPException(
@@ -189,15 +201,19 @@ async def create_survey(
         # Create survey
         db_survey = models.Survey(**survey.dict(exclude={'questions'}))
         db.add(db_survey)
+        if db_survey.status == "active":
+            resolve_audience(db, db_survey)
         db.commit()
         db.refresh(db_survey)
         
-        # Add questions if provided
+        # Add questions if provided; position follows the requested order, then list order
         if survey.questions:
-            for question_data in survey.questions:
+            ordered = sorted(survey.questions, key=lambda question_data: question_data.order)
+            for position, question_data in enumerate(ordered):
                 question = models.SurveyQuestion(
                     survey_id=db_survey.id,
-                    **question_data.dict()
+                    position=position,
+                    **question_data.dict(exclude={'order', 'required'})
                 )
                 db.add(question)
         
@@ -231,11 +247,19 @@ async def update_survey(
             )
         
         # Update fields
-        for field, value in survey_update.dict(exclude_unset=True).items():
+        update_data = survey_update.dict(exclude_unset=True)
+        was_active = survey.status == "active"
+        for field, value in update_data.items():
             setattr(survey, field, value)
         
+        # Resolve the audience on deployment, and again if an active survey is retargeted
+        retargeted = "target_departments" in update_data or "target_employees" in update_data
+        if survey.status == "active" and (not was_active or retargeted):
+            resolve_audience(db, survey)
+        
         db.commit()
         db.refresh(survey)
+        survey_definitions.invalidate(survey_id)
         
         logger.info(f"Survey updated by {current_user.email}: {survey.title}")
         return survey
@@ -267,6 +291,7 @@ async def delete_survey(
         
         db.delete(survey)
         db.commit()
+        survey_definitions.invalidate(survey_id)
         
         logger.info(f"Survey deleted by {current_user.email}: {survey.title}")
         return {"message": "Survey deleted successfully"}
@@ -303,7 +328,7 @@ async def get_survey_questions(
         
         questions = db.query(models.SurveyQuestion).filter(
             models.SurveyQuestion.survey_id == survey_id
-        ).order_by(models.SurveyQuestion.order).all()
+        ).order_by(models.SurveyQuestion.position, models.SurveyQuestion.id).all()
         
         return questions
         
@@ -333,13 +358,19 @@ async def add_survey_question(
                 detail="Survey not found"
             )
         
+        # New questions go after the existing ones
+        last_position = db.query(func.max(models.SurveyQuestion.position)).filter(
+            models.SurveyQuestion.survey_id == survey_id
+        ).scalar()
         db_question = models.SurveyQuestion(
             survey_id=survey_id,
-            **question.dict()
+            position=0 if last_position is None else last_position + 1,
+            **question.dict(exclude={'order', 'required'})
         )
         db.add(db_question)
         db.commit()
         db.refresh(db_question)
+        survey_definitions.invalidate(survey_id)
         
         logger.info(f"Question added to survey {survey_id} by {current_user.email}")
         return db_question
@@ -358,70 +389,53 @@ async def add_survey_question(
 # SURVEY RESPONSES ENDPOINTS
 # =====================================================
 
-@router.post("/{survey_id}/responses", response_model=schemas.SurveyResponse)
+@router.post("/{survey_id}/responses", status_code=status.HTTP_202_ACCEPTED)
 async def submit_survey_response(
-    survey_id: str,
+    survey_id: uuid.UUID,
     response: schemas.SurveyResponseCreate,
-    current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: models.User = Depends(get_current_active_user)
 ):
-    """Submit a response to a survey"""
+    """
+    Submit a response to a survey.
+
+    The response is validated against the cached survey definition and queued
+    for a group commit; 202 is returned without waiting for the write. A
+    repeated submission by the same employee is rejected with 400.
+    """
     try:
-        # Check if survey exists
-        survey = db.query(models.Survey).filter(models.Survey.id == survey_id).first()
-        if not survey:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Survey not found"
-            )
-        
-        # Check if survey is active
-        if not survey.is_active:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Survey is not active"
-            )
-        
-        # Check if user already responded
-        existing_response = db.query(models.SurveyResponse).filter(
-            models.SurveyResponse.survey_id == survey_id,
-            models.SurveyResponse.employee_id == current_user.employee_id
-        ).first()
-        
-        if existing_response:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Response already submitted"
-            )
-        
-        # Create response
-        db_response = models.SurveyResponse(
-            survey_id=survey_id,
-            employee_id=current_user.employee_id,
-            **response.dict()
-        )
-        db.add(db_response)
-        db.commit()
-        db.refresh(db_response)
-        
-        logger.info(f"Survey response submitted by {current_user.email} for survey {survey_id}")
-        return db_response
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Failed to submit survey response: {e}")
-        db.rollback()
+        definition = await survey_definitions.get(survey_id)
+        validate_response(definition, response.responses)
+    except SurveyUnavailable as e:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Failed to submit survey response"
+            status_code=status.HTTP_404_NOT_FOUND if definition is None else status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
         )
+    except ResponseValidationError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    
+    row = build_response_row(
+        survey_id,
+        current_user.employee_id,
+        response.responses,
+        completion_time_seconds=response.completion_time_seconds,
+        is_anonymous=response.is_anonymous or definition.is_anonymous,
+        metadata=response.metadata
+    )
+    try:
+        await response_ingestor.submit(row)
+    except DuplicateResponse as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    return {"response_id": str(row["id"]), "survey_id": str(survey_id), "status": "accepted"}
 
 @router.get("/{survey_id}/responses", response_model=List[schemas.SurveyResponse])
 async def get_survey_responses(
     survey_id: str,
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from X-Next-Cursor; takes precedence over skip"),
+    count: str = Query("none", pattern=COUNT_MODE_PATTERN),
     current_user: models.User = Depends(require_manager_access),
     db: Session = Depends(get_db)
 ):
@@ -435,14 +449,22 @@ async def get_survey_responses(
                 detail="Survey not found"
             )
         
-        responses = db.query(models.SurveyResponse).filter(
+        query = db.query(models.SurveyResponse).filter(
             models.SurveyResponse.survey_id == survey_id
-        ).offset(skip).limit(limit).all()
+        )
         
+        total, approximate = count_total(db, query, "survey_responses", count)
+        rows = keyset_paginate(
+            query, models.SurveyResponse.submitted_at, models.SurveyResponse.id, limit, cursor=cursor, skip=skip
+        ).all()
+        responses, next_cursor = build_page(rows, limit, "submitted_at")
+        set_pagination_headers(response, next_cursor, total, approximate)
         return responses
         
     except HTTPException:
         raise
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         logger.error(f"Failed to get responses for survey {survey_id}: {e}")
         raise HTTPException(
@@ -466,38 +488,35 @@ async def get_survey_analytics(
                 detail="Survey not found"
             )
         
-        # Get response statistics
-        total_responses = db.query(models.SurveyResponse).filter(
-            models.SurveyResponse.survey_id == survey_id
-        ).count()
-        
-        # Get completion rate (if we have target employees)
-        target_count = len(survey.target_employees) if survey.target_employees else 0
-        completion_rate = (total_responses / target_count * 100) if target_count > 0 else 0
+        # Response count against the precomputed audience size
+        rate = response_rate(db, survey)
         
         # Get response distribution by department
-        dept_responses = db.execute("""
+        dept_responses = db.execute(text("""
             SELECT d.name, COUNT(sr.id) as response_count
             FROM survey_responses sr
             JOIN employees e ON sr.employee_id = e.id
             JOIN departments d ON e.department_id = d.id
             WHERE sr.survey_id = :survey_id
             GROUP BY d.name
-        """, {"survey_id": survey_id}).fetchall()
+        """), {"survey_id": survey_id}).fetchall()
+        
+        last_response = db.query(func.max(models.SurveyResponse.submitted_at)).filter(
+            models.SurveyResponse.survey_id == survey_id
+        ).scalar()
         
         analytics = {
             "survey_id": survey_id,
             "survey_title": survey.title,
-            "total_responses": total_responses,
-            "target_employees": target_count,
-            "completion_rate": round(completion_rate, 2),
+            "total_responses": rate["responses"],
+            "target_employees": rate["audience"],
+            "completion_rate": rate["response_rate"],
             "response_by_department": [
                 {"department": dept[0], "responses": dept[1]}
                 for dept in dept_responses
             ],
-            "last_response": db.query(models.SurveyResponse).filter(
-                models.SurveyResponse.survey_id == survey_id
-            ).order_by(models.SurveyResponse.created_at.desc()).first().created_at if total_responses > 0 else None
+            "last_response": last_response,
+            "questions": answer_distribution(db, survey_id)
         }
         
         return {
@@ -515,6 +534,79 @@ async def get_survey_analytics(
             detail="Failed to retrieve survey analytics"
         )
 
+@router.get("/{survey_id}/analytics/distribution")
+async def get_survey_answer_distribution(
+    survey_id: uuid.UUID,
+    question_id: Optional[uuid.UUID] = Query(None, description="Limit to one question"),
+    department_id: Optional[uuid.UUID] = Query(None, description="Limit to one department"),
+    current_user: models.User = Depends(require_manager_access),
+    db: Session = Depends(get_db)
+):
+    """Per-question distributions, Likert histograms, top-box % and NPS from the columnar answer store"""
+    try:
+        await get_survey(survey_id, current_user, db)
+        return {
+            "survey_id": str(survey_id),
+            "department_id": str(department_id) if department_id else None,
+            "questions": answer_distribution(db, survey_id, question_id=question_id, department_id=department_id)
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to get answer distribution for survey {survey_id}: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to retrieve answer distribution"
+        )
+
+@router.get("/{survey_id}/analytics/crosstab")
+async def get_survey_answer_crosstab(
+    survey_id: uuid.UUID,
+    question_id: uuid.UUID = Query(..., description="Question to break down by department"),
+    min_group_size: int = Query(5, ge=0, description="Departments with fewer respondents are suppressed"),
+    current_user: models.User = Depends(require_manager_access),
+    db: Session = Depends(get_db)
+):
+    """Question x department cross-tab from the columnar answer store"""
+    try:
+        await get_survey(survey_id, current_user, db)
+        crosstab = answer_crosstab(db, survey_id, question_id, min_group_size=min_group_size)
+        if crosstab is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Question not found")
+        return crosstab
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to get answer cross-tab for survey {survey_id}: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to retrieve answer cross-tab"
+        )
+
+@router.post("/{survey_id}/analytics/rebuild", status_code=status.HTTP_202_ACCEPTED)
+async def rebuild_survey_answer_store(
+    survey_id: uuid.UUID,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    current_user: models.User = Depends(require_manager_access),
+    db: Session = Depends(get_db)
+):
+    """Re-project a survey's responses into the columnar answer store (background job)"""
+    await get_survey(survey_id, current_user, db)
+    job = submit_job(
+        "surveys.rebuild_answers",
+        {"survey_id": str(survey_id)},
+        created_by=current_user.id,
+        idempotency_key=idempotency_key
+    )
+    return job_accepted_response(job)
+
+@job_handler("surveys.rebuild_answers")
+async def rebuild_survey_answer_store_job(ctx: JobContext, survey_id: str):
+    projected = await ctx.run_blocking(rebuild_survey_answers, survey_id)
+    return {"survey_id": survey_id, "answer_rows": projected}
+
 @router.get("/stats/summary")
 async def get_survey_stats(
     current_user: models.User = Depends(require_manager_access),
@@ -603,7 +695,7 @@ async def schedule_survey(
 ):
     """Schedule survey deployment with recurring options"""
     try:
-        survey = await get_survey(survey_id, current_user)
+        survey = await get_survey(survey_id, current_user, db)
         
         # Update survey with scheduling information
         schedule_config = {
@@ -614,13 +706,34 @@ async def schedule_survey(
             "reminder_settings": schedule_data.get("reminder_settings", {}),
             "auto_deploy": schedule_data.get("auto_deploy", False)
         }
-        
-        survey.platform_integrations["scheduling"] = schedule_config
+        if schedule_config["frequency"] not in SCHEDULE_FREQUENCIES:
+            raise HTTPException(status_code=400, detail=f"Unsupported frequency {schedule_config['frequency']}")
+        
+        try:
+            next_run_at = initial_run_at(schedule_config)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid start_date")
+        
+        # Reassign so the JSON column change is detected
+        survey.platform_integrations = {**(survey.platform_integrations or {}), "scheduling": schedule_config}
+        survey.frequency = schedule_config["frequency"]
+        survey.next_run_at = next_run_at
         survey.status = "scheduled"
         
-        await db.commit()
-        return {"message": "Survey scheduled successfully", "schedule": schedule_config}
+        db.commit()
+        survey_definitions.invalidate(survey.id)
+        
+        # The scheduler deploys the survey (and queues invitations) when due
+        survey_scheduler.schedule(survey.id, next_run_at)
+        
+        return {
+            "message": "Survey scheduled successfully",
+            "schedule": schedule_config,
+            "next_run_at": next_run_at.isoformat() if next_run_at else None
+        }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Failed to schedule survey: {e}")
         raise HTTPException(
@@ -638,7 +751,7 @@ async def configure_platform_integrations(
 ):
     """Configure platform integrations for survey distribution"""
     try:
-        survey = await get_survey(survey_id, current_user)
+        survey = await get_survey(survey_id, current_user, db)
         
         # Validate and configure integrations
         supported_platforms = ["slack", "teams", "zoom", "email"]
@@ -654,7 +767,7 @@ async def configure_platform_integrations(
                     "channel_ids": config.get("channel_ids", []),
                     "user_groups": config.get("user_groups", []),
                     "notification_type": config.get("notification_type", "message"),
-                    "reminder_enabled": config.get("reminder_enabled", True)
+                    "reminder_enabled": config.get("reminder_enabled")  # None: follow the schedule's reminder_settings
                 }
             elif platform == "teams":
                 configured_integrations[platform] = {
@@ -672,14 +785,16 @@ async def configure_platform_integrations(
                 configured_integrations[platform] = {
                     "template_id": config.get("template_id"),
                     "sender_name": config.get("sender_name", "HR Team"),
-                    "reminder_schedule": config.get("reminder_schedule", ["3_days", "1_day"])
+                    "reminder_schedule": config.get("reminder_schedule")  # None: follow the schedule's reminder_settings
                 }
         
-        survey.platform_integrations.update(configured_integrations)
-        await db.commit()
+        survey.platform_integrations = {**(survey.platform_integrations or {}), **configured_integrations}
+        db.commit()
         
         return {"message": "Platform integrations configured", "integrations": configured_integrations}
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Failed to configure platform integrations: {e}")
         raise HTTPException(
@@ -687,52 +802,56 @@ async def configure_platform_integrations(
             detail="Failed to configure platform integrations"
         )
 
-# Real-time Response Collection
-@router.get("/{survey_id}/responses/real-time")
-async def get_real_time_responses(
+# Survey Notification Operations
+@router.post("/{survey_id}/notifications/send")
+async def send_survey_notifications(
     survey_id: uuid.UUID,
+    send_at: Optional[datetime] = Body(None, embed=True),
+    include_reminders: bool = Body(True, embed=True),
     current_user: models.User = Depends(require_manager_access),
     db: Session = Depends(get_db)
 ):
-    """Get real-time response aggregation and statistics"""
+    """Queue invitations and reminders on the survey's configured platforms"""
     try:
-        survey = await get_survey(survey_id, current_user)
-        
-        # Get response statistics
-        response_stats = await db.execute(
-            select(
-                func.count(models.SurveyResponse.id).label("total_responses"),
-                func.count(distinct(models.SurveyResponse.employee_id)).label("unique_respondents"),
-                func.avg(models.SurveyResponse.completion_time_seconds).label("avg_completion_time")
-            ).where(models.SurveyResponse.survey_id == survey_id)
-        )
-        stats = response_stats.first()
-        
-        # Calculate response rate
-        target_count = len(survey.target_employees) if survey.target_employees else 0
-        response_rate = (stats.unique_respondents / target_count * 100) if target_count > 0 else 0
-        
-        # Get recent responses (last 24 hours)
-        recent_cutoff = datetime.utcnow() - timedelta(hours=24)
-        recent_responses = await db.execute(
-            select(func.count(models.SurveyResponse.id))
-            .where(
-                models.SurveyResponse.survey_id == survey_id,
-                models.SurveyResponse.submitted_at >= recent_cutoff
-            )
-        )
+        survey = await get_survey(survey_id, current_user, db)
+        result = queue_survey_notifications(db, survey, send_at=send_at, include_reminders=include_reminders)
+        logger.info(f"Survey notifications queued by {current_user.email} for survey {survey_id}: {result['queued']}")
+        return result
         
-        return {
-            "survey_id": survey_id,
-            "total_responses": stats.total_responses or 0,
-            "unique_respondents": stats.unique_respondents or 0,
-            "response_rate": round(response_rate, 2),
-            "avg_completion_time": round(stats.avg_completion_time or 0, 2),
-            "recent_responses_24h": recent_responses.scalar() or 0,
-            "target_count": target_count,
-            "status": survey.status
-        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to queue survey notifications: {e}")
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to queue survey notifications"
+        )
+
+@router.get("/{survey_id}/notifications/status")
+async def get_survey_notification_status(
+    survey_id: uuid.UUID,
+    current_user: models.User = Depends(require_manager_access),
+    db: Session = Depends(get_db)
+):
+    """Delivery status of the survey's invitations and reminders"""
+    return survey_notification_status(db, survey_id)
+
+# Real-time Response Collection
+@router.get("/{survey_id}/responses/real-time")
+async def get_real_time_responses(
+    survey_id: uuid.UUID,
+    current_user: models.User = Depends(require_manager_access)
+):
+    """Get real-time response aggregation and statistics (served from in-memory counters)"""
+    try:
+        return await live_counters.snapshot(survey_id)
         
+    except SurveyNotFound:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Survey not found"
+        )
     except Exception as e:
         logger.error(f"Failed to get real-time responses: {e}")
         raise HTTPException(
@@ -740,6 +859,88 @@ async def get_real_time_responses(
             detail="Failed to retrieve real-time responses"
         )
 
+SSE_KEEPALIVE_SECONDS = 15
+
+@router.get("/{survey_id}/responses/live")
+async def stream_live_responses(
+    survey_id: uuid.UUID,
+    request: Request,
+    current_user: models.User = Depends(require_manager_access)
+):
+    """Server-sent events: a snapshot on connect, then a delta per new response"""
+    try:
+        queue = await live_counters.subscribe(survey_id)
+    except SurveyNotFound:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Survey not found")
+    
+    async def events():
+        try:
+            while not await request.is_disconnected():
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if message is None:
+                    break
+                yield f"event: {message['type']}\ndata: {json.dumps(message, default=str)}\n\n"
+        finally:
+            live_counters.unsubscribe(survey_id, queue)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.websocket("/{survey_id}/responses/ws")
+async def live_responses_websocket(
+    websocket: WebSocket,
+    survey_id: uuid.UUID,
+    token: str = Query(..., description="Bearer token (browsers can't set headers on WebSockets)")
+):
+    """WebSocket variant of the live response stream"""
+    db = SessionLocal()
+    try:
+        user = await get_current_user(token=token, db=db)
+    except HTTPException:
+        user = None
+    finally:
+        db.close()
+    if not user or not user.is_active or user.role not in ["admin", "hr_admin", "manager"]:
+        await websocket.close(code=1008)
+        return
+    
+    try:
+        queue = await live_counters.subscribe(survey_id)
+    except SurveyNotFound:
+        await websocket.close(code=1008)
+        return
+    
+    await websocket.accept()
+    receiver = asyncio.create_task(websocket.receive_text())
+    try:
+        while True:
+            getter = asyncio.create_task(queue.get())
+            done, _ = await asyncio.wait({getter, receiver}, return_when=asyncio.FIRST_COMPLETED)
+            if getter in done:
+                message = getter.result()
+                if message is None:
+                    await websocket.close()
+                    break
+                await websocket.send_text(json.dumps(message, default=str))
+            else:
+                getter.cancel()
+            if receiver in done:
+                # Client messages are ignored; this raises WebSocketDisconnect once the client goes away
+                receiver.result()
+                receiver = asyncio.create_task(websocket.receive_text())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+        live_counters.unsubscribe(survey_id, queue)
+
 # Survey Branching Logic
 @router.post("/{survey_id}/branching")
 async def configure_survey_branching(
@@ -750,7 +951,7 @@ async def configure_survey_branching(
 ):
     """Configure conditional branching logic for surveys"""
     try:
-        survey = await get_survey(survey_id, current_user)
+        survey = await get_survey(survey_id, current_user, db)
         
         # Validate branching rules structure
         validated_rules = []
@@ -758,93 +959,143 @@ async def configure_survey_branching(
             validated_rule = {
                 "question_id": rule["question_id"],
                 "condition": rule["condition"],  # equals, greater_than, contains, etc.
-                "value": rule["value"],
+                "value": rule.get("value"),
                 "action": rule["action"],  # show_question, skip_to, end_survey
                 "target": rule.get("target")  # target question or section
             }
             validated_rules.append(validated_rule)
         
-        # Store branching configuration
-        survey.platform_integrations["branching"] = {
-            "enabled": True,
-            "rules": validated_rules,
-            "default_flow": branching_rules.get("default_flow", "linear")
+        # Compile against the current question order so broken rules are rejected up front
+        question_order = [
+            str(question_id) for (question_id,) in db.query(models.SurveyQuestion.id)
+            .filter(models.SurveyQuestion.survey_id == survey_id)
+            .order_by(models.SurveyQuestion.position, models.SurveyQuestion.id)
+        ]
+        try:
+            compile_branching(question_order, {"enabled": True, "rules": validated_rules})
+        except BranchingCompileError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        # Store branching configuration; reassign so the JSON column change is detected
+        survey.platform_integrations = {
+            **(survey.platform_integrations or {}),
+            "branching": {
+                "enabled": True,
+                "rules": validated_rules,
+                "default_flow": branching_rules.get("default_flow", "linear")
+            }
         }
         
-        await db.commit()
+        db.commit()
+        survey_definitions.invalidate(survey_id)
         return {"message": "Branching logic configured", "rules": validated_rules}
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Failed to configure survey branching: {e}")
+        db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to configure survey branching"
         )
 
+@router.post("/{survey_id}/next-question")
+async def get_next_questions(
+    survey_id: uuid.UUID,
+    answers: dict = Body({}, embed=True),
+    current_question_id: Optional[str] = Body(None, embed=True),
+    limit: int = Body(10, embed=True, ge=1, le=100),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """
+    Next question(s) for a partial response, following the compiled branching rules.
+
+    Returns the unanswered questions up to and including the next branch point,
+    since questions after that depend on the answer given there.
+    """
+    definition = await survey_definitions.get(survey_id)
+    if definition is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Survey not found")
+    
+    program = definition.program
+    if current_question_id is not None and current_question_id not in program.position:
+        raise HTTPException(status_code=400, detail=f"Unknown question {current_question_id}")
+    
+    question_ids = program.next_questions(answers, current=current_question_id, limit=limit)
+    return {
+        "survey_id": str(survey_id),
+        "questions": [{"id": question_id, **definition.questions[question_id]} for question_id in question_ids],
+        "complete": not question_ids,
+        "branch_point": bool(question_ids) and question_ids[-1] in program.branch_points
+    }
+
 # Survey Quality & Validation
 @router.get("/{survey_id}/quality-check")
 async def perform_survey_quality_check(
     survey_id: uuid.UUID,
+    limit: int = Query(100, ge=0, le=5000, description="Max flagged responses listed (counts always cover all responses)"),
+    current_user: models.User = Depends(require_manager_access)
+):
+    """
+    Statistical quality check of survey responses: straight-lining, speeders
+    (median/MAD of completion time), duplicate or near-duplicate text and
+    reverse-coded inconsistencies. Results are cached and updated incrementally.
+    """
+    try:
+        return await response_quality.check(survey_id, limit=limit)
+    except SurveyNotFound:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Survey not found")
+    except Exception as e:
+        logger.error(f"Failed to perform survey quality check: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to perform survey quality check"
+        )
+
+@router.post("/{survey_id}/quality-config")
+async def configure_survey_quality(
+    survey_id: uuid.UUID,
+    quality_config: dict = Body(...),
     current_user: models.User = Depends(require_manager_access),
     db: Session = Depends(get_db)
 ):
-    """Perform comprehensive quality check on survey responses"""
+    """Configure reverse-coded question pairs and quality thresholds for a survey"""
     try:
-        survey = await get_survey(survey_id, current_user)
+        survey = await get_survey(survey_id, current_user, db)
         
-        # Get all responses for analysis
-        responses_result = await db.execute(
-            select(models.SurveyResponse).where(models.SurveyResponse.survey_id == survey_id)
-        )
-        responses = responses_result.scalars().all()
-        
-        quality_metrics = {
-            "total_responses": len(responses),
-            "completion_rate": 0,
-            "average_completion_time": 0,
-            "response_quality_score": 0,
-            "outlier_responses": [],
-            "validation_flags": []
+        scale_questions = {
+            str(question_id) for (question_id,) in db.query(models.SurveyQuestion.id).filter(
+                models.SurveyQuestion.survey_id == survey_id,
+                models.SurveyQuestion.type == "scale"
+            )
         }
+        pairs = []
+        for pair in quality_config.get("reverse_coded_pairs", []):
+            if len(pair) != 2 or not {str(question_id) for question_id in pair} <= scale_questions:
+                raise HTTPException(status_code=400, detail=f"Reverse-coded pair {pair} must name two scale questions")
+            pairs.append([str(question_id) for question_id in pair])
+        
+        config = {"reverse_coded_pairs": pairs}
+        for key in ("speeder_z", "near_duplicate_similarity", "min_text_length"):
+            if quality_config.get(key) is not None:
+                config[key] = quality_config[key]
+        
+        # Reassign so the JSON column change is detected
+        survey.platform_integrations = {**(survey.platform_integrations or {}), "quality": config}
+        db.commit()
+        response_quality.invalidate(survey_id)
         
-        if responses:
-            # Calculate completion metrics
-            completion_times = [r.completion_time_seconds for r in responses if r.completion_time_seconds]
-            if completion_times:
-                quality_metrics["average_completion_time"] = sum(completion_times) / len(completion_times)
-                
-                # Identify outliers (responses too fast or too slow)
-                median_time = sorted(completion_times)[len(completion_times) // 2]
-                for i, response in enumerate(responses):
-                    if response.completion_time_seconds:
-                        if response.completion_time_seconds < median_time * 0.2:  # Too fast
-                            quality_metrics["outlier_responses"].append({
-                                "response_id": str(response.id),
-                                "issue": "suspiciously_fast",
-                                "completion_time": response.completion_time_seconds
-                            })
-                        elif response.completion_time_seconds > median_time * 5:  # Too slow
-                            quality_metrics["outlier_responses"].append({
-                                "response_id": str(response.id),
-                                "issue": "unusually_slow",
-                                "completion_time": response.completion_time_seconds
-                            })
-            
-            # Response quality scoring
-            quality_score = 100
-            if len(quality_metrics["outlier_responses"]) > len(responses) * 0.1:
-                quality_score -= 20
-                quality_metrics["validation_flags"].append("high_outlier_rate")
-            
-            quality_metrics["response_quality_score"] = quality_score
-        
-        return quality_metrics
+        return {"message": "Quality settings saved", "quality": config}
         
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Failed to perform survey quality check: {e}")
+        logger.error(f"Failed to configure survey quality settings: {e}")
+        db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Failed to perform survey quality check"
+            detail="Failed to configure survey quality settings"
         )
 
 # =====================================================
@@ -888,10 +1139,21 @@ async def generate_ai_survey_questions(
 @router.post("/ai/analyze-sentiment")
 async def analyze_survey_sentiment(
     survey_id: uuid.UUID,
+    run_async: bool = Query(False, alias="async", description="Run as a background job and return 202 with a job ID"),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
     current_user: models.User = Depends(require_manager_access),
     db: Session = Depends(get_db)
 ):
     """Analyze sentiment of survey responses using AI"""
+    if run_async:
+        job = submit_job(
+            "surveys.analyze_sentiment",
+            {"survey_id": survey_id},
+            created_by=current_user.id,
+            idempotency_key=idempotency_key
+        )
+        return job_accepted_response(job)
+    
     try:
         # Get survey responses
         responses = db.query(models.SurveyResponse).filter(
@@ -941,4 +1203,11 @@ async def analyze_survey_sentiment(
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to analyze survey sentiment: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+@job_handler("surveys.analyze_sentiment")
+async def analyze_survey_sentiment_job(ctx: JobContext, survey_id: str):
+    return await ctx.run_with_session(lambda db, user: analyze_survey_sentiment(
+        survey_id=uuid.UUID(survey_id), run_async=False, idempotency_key=None,
+        current_user=user, db=db
+    ))
\ No newline at end of file
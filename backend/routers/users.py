@@ -1,11 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from sqlalchemy.orm import Session
 from sqlalchemy import func, and_, or_
 from typing import List, Optional, Dict, Any
 import models
 import schemas
 from database import get_db
-from auth.dependencies import get_current_active_user, is_super_admin
+from auth.dependencies import (
+    get_current_active_user, get_current_principal, get_password_hash, is_super_admin, require_roles
+)
+from auth.permissions import USER_PERMISSIONS, Principal
+from services.pagination import (
+    COUNT_MODE_PATTERN, InvalidCursorError, keyset_paginate, build_page, count_total, set_pagination_headers
+)
+from services.org_hierarchy import org_hierarchy
+from services.department_metrics import invalidate_department_metrics
+from services.bulk import BulkResult, apply_updates, fetch_existing, record_bulk_event
 import logging
 from datetime import datetime
 import uuid
@@ -17,57 +26,8 @@ router = APIRouter(
     tags=["Users"]
 )
 
-# User Permissions Matrix
-USER_PERMISSIONS = {
-    "admin": {
-        "users": ["create", "read", "update", "delete"],
-        "employees": ["create", "read", "update", "delete"],
-        "departments": ["create", "read", "update", "delete"],
-        "kpis": ["create", "read", "update", "delete"],
-        "surveys": ["create", "read", "update", "delete"],
-        "action_plans": ["create", "read", "update", "delete"],
-        "focus_groups": ["create", "read", "update", "delete"],
-        "analytics": ["read", "export"],
-        "system": ["configure", "backup"]
-    },
-    "hr_admin": {
-        "users": ["create", "read", "update"],
-        "employees": ["create", "read", "update", "delete"],
-        "departments": ["create", "read", "update"],
-        "kpis": ["create", "read", "update"],
-        "surveys": ["create", "read", "update", "delete"],
-        "action_plans": ["create", "read", "update", "delete"],
-        "focus_groups": ["create", "read", "update", "delete"],
-        "analytics": ["read", "export"]
-    },
-    "manager": {
-        "employees": ["read", "update"],  # Only in their department
-        "kpis": ["read"],
-        "surveys": ["read", "update"],  # Only their department surveys
-        "action_plans": ["create", "read", "update"],  # Only their department
-        "focus_groups": ["create", "read", "update"],  # Only their department
-        "analytics": ["read"]  # Only their department data
-    },
-    "employee": {
-        "surveys": ["read", "respond"],
-        "action_plans": ["read"],  # Only assigned to them
-        "focus_groups": ["read"],  # Only groups they're in
-        "profile": ["read", "update"]  # Their own profile
-    }
-}
-
-# Helper function to check admin permissions
-def require_admin_access(current_user: models.User = Depends(get_current_active_user)):
-    # Super admins can access everything
-    if is_super_admin(current_user):
-        return current_user
-        
-    if current_user.role not in ["admin", "hr_admin"]:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not enough permissions"
-        )
-    return current_user
+# Admin or HR admin (or super admin), checked against the compiled role masks
+require_admin_access = require_roles(["admin", "hr_admin"], active_only=True, detail="Not enough permissions")
 
 @router.get("/permissions/{role}")
 async def get_role_permissions(
@@ -125,8 +85,11 @@ async def get_permissions_matrix(
 
 @router.get("/", response_model=List[schemas.User])
 async def get_all_users(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from X-Next-Cursor; takes precedence over skip"),
+    count: str = Query("none", pattern=COUNT_MODE_PATTERN),
     role: Optional[schemas.UserRole] = None,
     is_active: Optional[bool] = None,
     department_id: Optional[uuid.UUID] = None,
@@ -155,9 +118,16 @@ async def get_all_users(
                 )
             )
         
-        users = query.offset(skip).limit(limit).all()
+        total, approximate = count_total(db, query, "users", count)
+        rows = keyset_paginate(
+            query, models.User.created_at, models.User.id, limit, cursor=cursor, skip=skip
+        ).all()
+        users, next_cursor = build_page(rows, limit, "created_at")
+        set_pagination_headers(response, next_cursor, total, approximate)
         return users
         
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         logger.error(f"Failed to get users: {e}")
         raise HTTPException(
@@ -355,7 +325,7 @@ async def create_user(
             )
         
         # Create new user
-        hashed_password = auth.get_password_hash(user.password)
+        hashed_password = get_password_hash(user.password)
         db_user = models.User(
             email=user.email,
             hashed_password=hashed_password,
@@ -566,37 +536,37 @@ async def bulk_assign_department(
                 detail="Department not found"
             )
         
-        updated_count = 0
-        failed_users = []
-        
-        for user_id in user_ids:
-            try:
-                user = db.query(models.User).filter(models.User.id == user_id).first()
-                if not user or not user.employee_id:
-                    failed_users.append(user_id)
-                    continue
-                
-                employee = db.query(models.Employee).filter(models.Employee.id == user.employee_id).first()
-                if employee:
-                    employee.department_id = department_id
-                    employee.updated_at = datetime.utcnow()
-                    updated_count += 1
-                else:
-                    failed_users.append(user_id)
-                    
-            except Exception as e:
-                logger.error(f"Failed to assign user {user_id} to department: {e}")
-                failed_users.append(user_id)
+        result = BulkResult("user_id", user_ids)
+        ids = result.parse_ids()
+        users = fetch_existing(db, models.User.id, ids.values(), models.User.employee_id)
+        
+        employee_positions = {}
+        for position, user_id in ids.items():
+            user = users.get(user_id)
+            if not user:
+                result.fail(position, "User not found")
+            elif not user.employee_id:
+                result.fail(position, "User has no employee record")
+            else:
+                employee_positions[position] = user.employee_id
+        
+        applied = apply_updates(
+            db, models.Employee.__table__,
+            [{"id": employee_id, "department_id": department_id} for employee_id in set(employee_positions.values())]
+        )
+        result.mark_applied(employee_positions, applied, "Employee record not found")
         
         db.commit()
-        
-        logger.info(f"Bulk department assignment by {current_user.email}: {updated_count} users assigned to {department.name}")
+        org_hierarchy.invalidate()
+        invalidate_department_metrics()
+        record_bulk_event(current_user, "bulk_assign_department", result, department_id=department_id)
         
         return {
-            "message": f"Successfully assigned {updated_count} users to department",
+            "message": f"Successfully assigned {result.updated_count} users to department",
             "department": department.name,
-            "updated_count": updated_count,
-            "failed_users": failed_users
+            "updated_count": result.updated_count,
+            "failed_users": [failure["user_id"] for failure in result.failures()],
+            "results": result.items()
         }
         
     except HTTPException:
@@ -617,43 +587,34 @@ async def bulk_update_roles(
 ):
     """Bulk update user roles"""
     try:
-        updated_count = 0
-        failed_updates = []
-        
-        for update in role_updates:
-            try:
-                user_id = update.get("user_id")
-                new_role = update.get("role")
-                
-                if not user_id or not new_role:
-                    failed_updates.append({"user_id": user_id, "error": "Missing user_id or role"})
-                    continue
-                
-                if new_role not in USER_PERMISSIONS:
-                    failed_updates.append({"user_id": user_id, "error": "Invalid role"})
-                    continue
-                
-                user = db.query(models.User).filter(models.User.id == user_id).first()
-                if not user:
-                    failed_updates.append({"user_id": user_id, "error": "User not found"})
-                    continue
-                
-                user.role = new_role
-                user.updated_at = datetime.utcnow()
-                updated_count += 1
-                
-            except Exception as e:
-                logger.error(f"Failed to update role for user {user_id}: {e}")
-                failed_updates.append({"user_id": user_id, "error": str(e)})
+        result = BulkResult("user_id", [update.get("user_id") for update in role_updates])
+        for position, update in enumerate(role_updates):
+            if not update.get("user_id") or not update.get("role"):
+                result.fail(position, "Missing user_id or role")
+            elif update["role"] not in USER_PERMISSIONS:
+                result.fail(position, "Invalid role")
+        
+        ids = result.parse_ids()
+        users = fetch_existing(db, models.User.id, ids.values())
+        for position, user_id in list(ids.items()):
+            if user_id not in users:
+                result.fail(position, "User not found")
+                del ids[position]
+        
+        applied = apply_updates(
+            db, models.User.__table__,
+            [{"id": user_id, "role": role_updates[position]["role"]} for position, user_id in ids.items()]
+        )
+        result.mark_applied(ids, applied, "User not found")
         
         db.commit()
-        
-        logger.info(f"Bulk role update by {current_user.email}: {updated_count} users updated")
+        record_bulk_event(current_user, "bulk_update_roles", result)
         
         return {
-            "message": f"Successfully updated {updated_count} user roles",
-            "updated_count": updated_count,
-            "failed_updates": failed_updates
+            "message": f"Successfully updated {result.updated_count} user roles",
+            "updated_count": result.updated_count,
+            "failed_updates": result.failures(),
+            "results": result.items()
         }
         
     except HTTPException:
@@ -753,33 +714,18 @@ async def get_user_role_distribution(
 
 @router.get("/me/permissions")
 async def get_my_permissions(
-    current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    principal: Principal = Depends(get_current_principal),
+    current_user: models.User = Depends(get_current_active_user)
 ):
     """Get current user's permissions and capabilities"""
-    try:
-        permissions = USER_PERMISSIONS.get(current_user.role, {})
-        
-        # Super admins get all permissions
-        if auth.is_super_admin(current_user):
-            permissions = USER_PERMISSIONS.get("admin", {})
-            permissions["system"] = ["configure", "backup", "super_admin"]
-        
-        return {
-            "user_id": current_user.id,
-            "email": current_user.email,
-            "role": current_user.role,
-            "is_super_admin": auth.is_super_admin(current_user),
-            "permissions": permissions,
-            "profile_settings": current_user.profile_settings
-        }
-        
-    except Exception as e:
-        logger.error(f"Failed to get user permissions: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Failed to retrieve user permissions"
-        )
+    return {
+        "user_id": current_user.id,
+        "email": current_user.email,
+        "role": current_user.role,
+        "is_super_admin": principal.is_super_admin,
+        "permissions": principal.permissions(),
+        "profile_settings": current_user.profile_settings
+    }
 
 @router.get("/stats/summary")
 async def get_user_stats(
@@ -797,7 +743,7 @@ async def get_user_stats(
             "managers": db.query(models.User).filter(models.User.role == "manager").count(),
             "employees": db.query(models.User).filter(models.User.role == "employee").count(),
             "users_without_passwords": db.query(models.User).filter(models.User.hashed_password.is_(None)).count(),
-            "super_admins": len([u for u in db.query(models.User).all() if auth.is_super_admin(u)]),
+            "super_admins": len([u for u in db.query(models.User).all() if is_super_admin(u)]),
         }
         
         return {
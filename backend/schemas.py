@@ -31,6 +31,7 @@ class SurveyType(str, Enum):
 class SurveyStatus(str, Enum):
     DRAFT = "draft"
     ACTIVE = "active"
+    SCHEDULED = "scheduled"
     COMPLETED = "completed"
     ARCHIVED = "archived"
 
@@ -310,6 +311,9 @@ class SurveyUpdate(BaseSchema):
 
 class Survey(SurveyBase):
     id: uuid.UUID
+    parent_survey_id: Optional[uuid.UUID] = None
+    occurrence_at: Optional[datetime] = None
+    next_run_at: Optional[datetime] = None
     created_at: datetime
     updated_at: datetime
 
@@ -527,6 +531,15 @@ class PerformanceReview(PerformanceReviewBase):
     created_at: datetime
     updated_at: datetime
 
+class ReviewCycleCalibration(BaseSchema):
+    """Options for calibrating every review of a cycle in one pass"""
+    strategy: str = Field(default="outlier", pattern="^(outlier|mean_shift|forced_distribution|quantile)$")
+    adjustment_factor: Optional[float] = Field(None, ge=0, le=1)  # per-strategy default when omitted
+    z_threshold: float = Field(default=2.0, gt=0)
+    distribution: Optional[Dict[int, float]] = None  # forced_distribution: share of reviews per rating
+    min_peers: int = Field(default=3, ge=1)
+    dry_run: bool = False
+
 class FeedbackBase(BaseSchema):
     recipient_id: uuid.UUID
     giver_id: uuid.UUID
@@ -545,6 +558,23 @@ class Feedback(FeedbackBase):
     id: uuid.UUID
     created_at: datetime
 
+class FeedbackCampaignCreate(BaseSchema):
+    """A 360 round; subjects are the listed employees plus the listed departments (everyone when both are empty)"""
+    name: str = Field(..., min_length=1, max_length=200)
+    description: Optional[str] = None
+    cycle_id: Optional[uuid.UUID] = None
+    due_date: date
+    subject_ids: List[uuid.UUID] = Field(default=[], max_length=50000)
+    department_ids: List[uuid.UUID] = []
+    include_self: bool = True
+    include_manager: bool = True
+    max_reports: int = Field(default=5, ge=0, le=50)
+    peers_per_subject: int = Field(default=3, ge=0, le=20)
+    parameters_to_rate: List[str] = []
+    instructions: Optional[str] = None
+    platforms: List[str] = Field(default=["in_app"], min_length=1)
+    notify: bool = True
+
 # =====================================================
 # ANALYTICS & DASHBOARD SCHEMAS
 # =====================================================
@@ -674,9 +704,10 @@ class ActionPlanProgressUpdate(BaseSchema):
 
 class ActionPlanList(BaseSchema):
     items: List[ActionPlan]
-    total: int
+    total: Optional[int] = None
     skip: int
     limit: int
+    next_cursor: Optional[str] = None
 
 class ActionPlanResponse(ActionPlan):
     pass
@@ -762,9 +793,26 @@ class FocusGroupMemberCreate(FocusGroupMemberBase):
 class FocusGroupMemberResponse(FocusGroupMemberBase):
     id: uuid.UUID
     focus_group_id: uuid.UUID
-    added_by: uuid.UUID
+    added_by: Optional[uuid.UUID] = None
+    joined_at: datetime
+
+class FocusGroupBulkMembers(BaseSchema):
+    employee_ids: List[uuid.UUID] = Field(..., min_length=1, max_length=5000)
+    role: str = Field(default="member", pattern="^(member|coordinator|leader)$")
+    notes: Optional[str] = None
+
+class FocusGroupMembership(BaseSchema):
+    """A group the current employee belongs to, with their role in it"""
+    focus_group: FocusGroup
+    role: str
     joined_at: datetime
 
+class FocusGroupMembershipList(BaseSchema):
+    items: List[FocusGroupMembership]
+    total: int
+    skip: int
+    limit: int
+
 # Outlier Detection
 class EmployeeOutlierInfo(BaseSchema):
     employee_id: uuid.UUID
@@ -0,0 +1,235 @@
+"""
+Asynchronous audit log pipeline.
+
+Request handlers hand audit events to an in-process bounded queue and return
+immediately. A single background writer drains the queue and inserts events
+in batches (one executemany per flush), either when a batch fills up or when
+the flush interval elapses. On shutdown the queue is drained before the
+process exits.
+
+If the writer is not running (scripts, tests) or the buffer is full, callers
+fall back to a synchronous insert so that no audit event is silently lost.
+A failed flush is retried with backoff. If it keeps failing, the events are
+written one by one, and any that still fail go to the ``audit`` dead-letter
+file (see ``services.dead_letter``).
+"""
+
+import asyncio
+import logging
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import insert, text
+
+from config import settings
+from database import SessionLocal, engine
+from models import AuditLog
+from services.dead_letter import write_with_fallback
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class AuditWriter:
+    """Background batch writer for audit events"""
+
+    def __init__(self, max_queue_size: int, batch_size: int, flush_interval: float):
+        self.max_queue_size = max_queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+        self.stats = {"enqueued": 0, "written": 0, "batches": 0, "fallback_writes": 0, "failed": 0}  # failed = dead-lettered
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        """Start the writer task on the running event loop"""
+        if self.is_running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run(), name="audit-writer")
+        await self._loop.run_in_executor(None, ensure_audit_partitions)
+        logger.info("✅ Audit writer started")
+
+    async def stop(self, timeout: float = 10.0):
+        """Flush everything still queued and stop the writer"""
+        if not self.is_running:
+            return
+        self._queue.put_nowait(_STOP)
+        try:
+            await asyncio.wait_for(self._task, timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"Audit writer did not drain within {timeout}s; {self._pending} events lost")
+            self._task.cancel()
+        self._task = None
+        logger.info("✅ Audit writer drained and stopped")
+
+    def enqueue(self, event: Dict[str, Any]) -> bool:
+        """
+        Queue an event for the background writer.
+
+        Safe to call from the event loop or from worker threads. Returns False
+        when the writer is not running or the buffer is full.
+        """
+        if not self.is_running:
+            return False
+
+        with self._pending_lock:
+            if self._pending >= self.max_queue_size:
+                return False
+            self._pending += 1
+
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+
+        if running_loop is self._loop:
+            self._queue.put_nowait(event)
+        else:
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, event)
+        self.stats["enqueued"] += 1
+        return True
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            batch: List[Dict[str, Any]] = []
+            item = await self._queue.get()
+            if item is _STOP:
+                stopping = True
+            else:
+                batch.append(item)
+
+            # Collect up to batch_size events or until the flush interval elapses
+            deadline = self._loop.time() + self.flush_interval
+            while not stopping and len(batch) < self.batch_size:
+                remaining = deadline - self._loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+                if item is _STOP:
+                    stopping = True
+                else:
+                    batch.append(item)
+
+            # On shutdown, take whatever is still buffered
+            if stopping:
+                while not self._queue.empty():
+                    item = self._queue.get_nowait()
+                    if item is not _STOP:
+                        batch.append(item)
+
+            for start in range(0, len(batch), self.batch_size):
+                await self._flush(batch[start:start + self.batch_size])
+
+    async def _flush(self, batch: List[Dict[str, Any]]):
+        if not batch:
+            return
+        try:
+            _, dead = await write_with_fallback(self._loop, write_audit_batch, batch, "audit")
+            self.stats["written"] += len(batch) - len(dead)
+            self.stats["batches"] += 1
+            self.stats["failed"] += len(dead)
+        finally:
+            with self._pending_lock:
+                self._pending -= len(batch)
+
+
+def build_audit_event(
+    user_id: Optional[uuid.UUID],
+    action: str,
+    details: Optional[Dict[str, Any]] = None,
+    ip_address: Optional[str] = None,
+    user_agent: Optional[str] = None
+) -> Dict[str, Any]:
+    """Build an audit row; the timestamp is taken when the event happens, not when it is flushed"""
+    return {
+        "id": uuid.uuid4(),
+        "user_id": user_id,
+        "action": action,
+        "details": details or {},
+        "ip_address": ip_address,
+        "user_agent": user_agent,
+        "timestamp": datetime.utcnow(),
+    }
+
+
+def write_audit_batch(batch: List[Dict[str, Any]]):
+    """Insert a batch of audit rows in a single executemany round-trip"""
+    with engine.begin() as conn:
+        conn.execute(insert(AuditLog.__table__), batch)
+
+
+def ensure_audit_partitions(months_ahead: int = 2):
+    """
+    Make sure monthly partitions exist for the current and upcoming months.
+
+    No-op unless audit_logs has been converted to a partitioned table by the
+    audit partitioning migration (which defines create_audit_log_partition).
+    """
+    if engine.dialect.name != "postgresql":
+        return
+    try:
+        with engine.begin() as conn:
+            is_partitioned = conn.execute(text(
+                "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table "
+                "WHERE partrelid = to_regclass('audit_logs'))"
+            )).scalar()
+            if not is_partitioned:
+                return
+            month = datetime.utcnow().date().replace(day=1)
+            for _ in range(months_ahead + 1):
+                conn.execute(text("SELECT create_audit_log_partition(:month)"), {"month": month})
+                month = (month + timedelta(days=32)).replace(day=1)
+    except Exception as e:
+        logger.warning(f"Could not ensure audit log partitions: {e}")
+
+
+audit_writer = AuditWriter(
+    max_queue_size=settings.AUDIT_QUEUE_MAX_SIZE,
+    batch_size=settings.AUDIT_BATCH_SIZE,
+    flush_interval=settings.AUDIT_FLUSH_INTERVAL_SECONDS,
+)
+
+
+def record_audit_event(
+    user_id: Optional[uuid.UUID],
+    action: str,
+    details: Optional[Dict[str, Any]] = None,
+    ip_address: Optional[str] = None,
+    user_agent: Optional[str] = None
+):
+    """Queue an audit event, writing it synchronously if the pipeline cannot take it"""
+    event = build_audit_event(user_id, action, details, ip_address, user_agent)
+    if audit_writer.enqueue(event):
+        return
+
+    audit_writer.stats["fallback_writes"] += 1
+    db = SessionLocal()
+    try:
+        db.execute(insert(AuditLog.__table__), [event])
+        db.commit()
+    finally:
+        db.close()
+
+
+async def start_audit_writer():
+    await audit_writer.start()
+
+
+async def stop_audit_writer():
+    await audit_writer.stop()
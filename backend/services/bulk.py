@@ -0,0 +1,172 @@
+"""
+Bulk mutation layer.
+
+The bulk endpoints (department assignment, role updates, KPI priorities)
+used to loop over their input with one or two ``SELECT ... first()`` calls
+per ID before mutating ORM objects, so a 5k-person reorg cost 10k round
+trips. A bulk operation is now a fixed number of statements per batch of
+``BULK_BATCH_SIZE`` items:
+
+1. ``BulkResult.parse_ids`` rejects malformed IDs without touching the
+   database.
+2. ``fetch_existing`` validates the rest with a single ``IN`` query.
+3. ``apply_updates`` writes per-row values with one
+   ``UPDATE ... FROM (VALUES ...)`` statement and returns the keys that were
+   actually updated.
+
+``BulkResult`` keeps the per-item outcome in input order. ``record_bulk_event``
+writes one audit event for the whole operation instead of one per row; any
+cache invalidation is likewise done once by the caller after commit.
+"""
+
+import logging
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Set
+
+from sqlalchemy import column, update, values
+from sqlalchemy.orm import Session
+
+from config import settings
+from services.audit import record_audit_event
+
+logger = logging.getLogger(__name__)
+
+
+def _chunks(items: Sequence, size: int) -> Iterator[Sequence]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class BulkResult:
+    """Per-item outcome of a bulk operation, reported in input order"""
+
+    def __init__(self, key_name: str, keys: Iterable[Any]):
+        self.key_name = key_name
+        self.keys = list(keys)
+        self.errors: Dict[int, str] = {}
+        self.updated: Set[int] = set()
+
+    def fail(self, position: int, error: str):
+        self.errors.setdefault(position, error)
+
+    def pending(self) -> List[int]:
+        """Positions that have neither failed nor been applied yet"""
+        return [position for position in range(len(self.keys))
+                if position not in self.errors and position not in self.updated]
+
+    def parse_ids(self) -> Dict[int, uuid.UUID]:
+        """UUIDs for the pending positions; malformed IDs fail, earlier duplicates are superseded"""
+        parsed: Dict[int, uuid.UUID] = {}
+        last_position: Dict[uuid.UUID, int] = {}
+        for position in self.pending():
+            raw = self.keys[position]
+            try:
+                key = raw if isinstance(raw, uuid.UUID) else uuid.UUID(str(raw))
+            except (TypeError, ValueError):
+                self.fail(position, f"Invalid {self.key_name}")
+                continue
+            if key in last_position:
+                self.fail(last_position[key], "Superseded by a later entry for the same ID")
+                del parsed[last_position[key]]
+            parsed[position] = key
+            last_position[key] = position
+        return parsed
+
+    def mark_applied(self, positions: Dict[int, Any], applied_keys: Set[Any], missing_error: str):
+        """Record which positions the UPDATE touched; the rest vanished between validation and write"""
+        for position, key in positions.items():
+            if key in applied_keys:
+                self.updated.add(position)
+            else:
+                self.fail(position, missing_error)
+
+    @property
+    def updated_count(self) -> int:
+        return len(self.updated)
+
+    def failures(self) -> List[Dict[str, Any]]:
+        return [
+            {self.key_name: self._key(position), "error": error}
+            for position, error in sorted(self.errors.items())
+        ]
+
+    def items(self) -> List[Dict[str, Any]]:
+        return [
+            {self.key_name: self._key(position), "status": "updated"}
+            if position in self.updated else
+            {self.key_name: self._key(position), "status": "failed", "error": self.errors.get(position, "Not applied")}
+            for position in range(len(self.keys))
+        ]
+
+    def updated_keys(self) -> List[str]:
+        return [self._key(position) for position in sorted(self.updated)]
+
+    def _key(self, position: int) -> Optional[str]:
+        key = self.keys[position]
+        return None if key is None else str(key)
+
+
+def fetch_existing(db: Session, key_column, keys: Iterable[Any], *columns) -> Dict[Any, Any]:
+    """Rows for the keys that exist, as ``{key: row}``, with one ``IN`` query per batch"""
+    keys = list(dict.fromkeys(keys))
+    found: Dict[Any, Any] = {}
+    for chunk in _chunks(keys, settings.BULK_BATCH_SIZE):
+        rows = db.query(key_column, *columns).filter(key_column.in_(chunk)).all()
+        found.update({row[0]: row for row in rows})
+    return found
+
+
+def apply_updates(
+    db: Session,
+    table,
+    rows: Sequence[Dict[str, Any]],
+    key: str = "id",
+    touch: Optional[str] = "updated_at"
+) -> Set[Any]:
+    """
+    Write per-row values with ``UPDATE table SET ... FROM (VALUES ...)``.
+
+    Every row must carry the same columns: ``key`` plus the columns to set.
+    Returns the keys that were updated; the caller commits.
+    """
+    if not rows:
+        return set()
+    names = [key] + [name for name in rows[0] if name != key]
+    applied: Set[Any] = set()
+    now = datetime.utcnow()
+    if db.get_bind().dialect.name != "postgresql":
+        # Development SQLite fallback has no VALUES column aliases; update row by row
+        for row in rows:
+            assignments = {name: row[name] for name in names[1:]}
+            if touch:
+                assignments[touch] = now
+            if db.execute(update(table).where(table.c[key] == row[key]).values(assignments)).rowcount:
+                applied.add(row[key])
+        return applied
+    for chunk in _chunks(rows, settings.BULK_BATCH_SIZE):
+        data = values(
+            *[column(name, table.c[name].type) for name in names], name="bulk_values"
+        ).data([tuple(row[name] for name in names) for row in chunk])
+        assignments = {name: data.c[name] for name in names[1:]}
+        if touch:
+            assignments[touch] = now
+        statement = (
+            update(table)
+            .where(table.c[key] == data.c[key])
+            .values(assignments)
+            .returning(table.c[key])
+        )
+        applied.update(db.execute(statement).scalars())
+    return applied
+
+
+def record_bulk_event(user, action: str, result: BulkResult, **details):
+    """One audit event and log line for the whole operation"""
+    logger.info(f"{action} by {user.email}: {result.updated_count} updated, {len(result.errors)} failed")
+    record_audit_event(user.id, action, {
+        **{name: str(value) if isinstance(value, uuid.UUID) else value for name, value in details.items()},
+        "updated_count": result.updated_count,
+        "failed_count": len(result.errors),
+        f"{result.key_name}s": result.updated_keys(),
+    })
@@ -0,0 +1,80 @@
+"""
+Per-worker cache for computed read models, with tag-based invalidation.
+
+Each entry is stored with a TTL and a set of tags such as ``"employees"`` or
+``"departments"``. Write paths call ``invalidate_tags`` after they commit.
+Every tag has a version counter, and an entry records the versions of its
+tags at the moment its computation started. A computation that overlaps an
+invalidation therefore never serves a stale result, even if it finishes
+after the invalidation has run.
+
+Invalidation only reaches the local worker. The TTL bounds how stale other
+workers, and writes made outside the invalidating code paths, can be.
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Iterable, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class TaggedCache:
+    """Key/value cache with TTLs and tag versions; one computation per key at a time"""
+
+    def __init__(self):
+        self._entries: Dict[Hashable, Tuple[Any, float, Dict[str, int]]] = {}
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._key_locks: Dict[Hashable, threading.Lock] = {}
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def _fresh(self, key: Hashable):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at, versions = entry
+        if time.monotonic() >= expires_at or any(self._versions.get(tag, 0) != version for tag, version in versions.items()):
+            return None
+        return entry
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any], tags: Iterable[str], ttl: float) -> Any:
+        with self._lock:
+            entry = self._fresh(key)
+            if entry is not None:
+                self.stats["hits"] += 1
+                return entry[0]
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            # Another thread may have filled the entry while we waited
+            with self._lock:
+                entry = self._fresh(key)
+                if entry is not None:
+                    self.stats["hits"] += 1
+                    return entry[0]
+                versions = {tag: self._versions.get(tag, 0) for tag in tags}
+                self.stats["misses"] += 1
+
+            value = compute()
+            with self._lock:
+                self._entries[key] = (value, time.monotonic() + ttl, versions)
+            return value
+
+    def invalidate_tags(self, *tags: str):
+        """Drop every entry tagged with any of ``tags``; call after the write commits"""
+        with self._lock:
+            for tag in tags:
+                self._versions[tag] = self._versions.get(tag, 0) + 1
+            stale = [key for key, (_, _, versions) in self._entries.items() if any(tag in versions for tag in tags)]
+            for key in stale:
+                del self._entries[key]
+            self.stats["invalidations"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+read_model_cache = TaggedCache()
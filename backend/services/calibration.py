@@ -0,0 +1,205 @@
+"""
+Review calibration for a whole cycle.
+
+``calibrate_cycle`` calibrates every review of a performance review cycle in
+one pass:
+
+1. The cycle's reviews are loaded once, together with each employee's
+   department and position, into a DataFrame.
+2. Peer groups are (department, position, review_type), as in per-review
+   calibration, and their statistics come from grouped transforms.
+3. Each review's peer mean and standard deviation leave the review itself
+   out, so z-scores match ``/reviews/{id}/calibrate``.
+4. The scores are written with one ``UPDATE ... FROM (VALUES ...)`` per
+   batch.
+
+Strategies:
+
+* ``outlier``: a review more than ``z_threshold`` peer standard deviations
+  from its peer mean moves ``adjustment_factor`` of the way towards that
+  mean. This is the per-review behaviour.
+* ``mean_shift``: moves a group's ratings so the group mean lands on the
+  cycle mean, which removes group leniency or severity.
+* ``forced_distribution``: ranks reviews within their group and assigns
+  ratings so each group matches a target share per rating. Ranks are
+  ordinal (ties broken by employee, then review), so tied ratings are
+  split across levels when a quota requires it.
+* ``quantile``: maps a review's percentile within its group to the same
+  percentile of the cycle-wide rating distribution.
+
+For the last three strategies ``adjustment_factor`` blends the original
+rating with the target, and it defaults to the full target. A review with
+fewer than ``min_peers`` peers is left uncalibrated.
+"""
+
+import logging
+import time
+from decimal import Decimal
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+
+from models import Employee, PerformanceReview
+from services.bulk import apply_updates
+
+logger = logging.getLogger(__name__)
+
+STRATEGIES = ("outlier", "mean_shift", "forced_distribution", "quantile")
+DEFAULT_ADJUSTMENT = {"outlier": 0.3, "mean_shift": 1.0, "forced_distribution": 1.0, "quantile": 1.0}
+DEFAULT_DISTRIBUTION = {1: 0.05, 2: 0.15, 3: 0.5, 4: 0.2, 5: 0.1}
+PEER_GROUP = ["department_id", "position", "review_type"]
+MIN_RATING, MAX_RATING = 1, 5
+
+
+class CalibrationError(ValueError):
+    pass
+
+
+def load_cycle_reviews(db, cycle_id) -> pd.DataFrame:
+    rows = db.execute(
+        select(
+            PerformanceReview.id, PerformanceReview.employee_id, PerformanceReview.rating,
+            PerformanceReview.review_type, Employee.department_id, Employee.position,
+        )
+        .join(Employee, Employee.id == PerformanceReview.employee_id)
+        .where(PerformanceReview.cycle_id == cycle_id)
+    ).all()
+    return pd.DataFrame(rows, columns=["id", "employee_id", "rating", "review_type", "department_id", "position"])
+
+
+def _ordinal_percentile(frame: pd.DataFrame, ratings: pd.Series, keys, size: pd.Series) -> pd.Series:
+    """
+    Mid-rank percentile from a strict ordering within each group: rating,
+    then employee_id, then review id. Tied ratings get distinct percentiles,
+    so the distribution's quotas hold exactly.
+    """
+    tie_break = [name for name in ("employee_id", "id") if name in frame.columns]
+    order = frame.assign(_rating=ratings).sort_values(["_rating", *tie_break], kind="mergesort").index
+    position = pd.Series(0, index=frame.index)
+    position.loc[order] = ratings.loc[order].groupby([key.loc[order] for key in keys], dropna=False, sort=False).cumcount()
+    return (position + 0.5) / size
+
+
+def _distribution_bounds(distribution: Dict[int, float]):
+    """Ratings in ascending order and the cumulative share at which each one ends"""
+    shares = {int(rating): float(share) for rating, share in distribution.items()}
+    if not shares or any(rating < MIN_RATING or rating > MAX_RATING for rating in shares):
+        raise CalibrationError(f"Distribution ratings must be between {MIN_RATING} and {MAX_RATING}")
+    if any(share < 0 for share in shares.values()) or not np.isclose(sum(shares.values()), 1.0, atol=0.01):
+        raise CalibrationError("Distribution shares must be non-negative and sum to 1")
+    ratings = np.array(sorted(shares), dtype=float)
+    return ratings, np.cumsum([shares[int(rating)] for rating in ratings])
+
+
+def calibrate_frame(
+    frame: pd.DataFrame,
+    strategy: str = "outlier",
+    adjustment_factor: Optional[float] = None,
+    z_threshold: float = 2.0,
+    distribution: Optional[Dict[int, float]] = None,
+    min_peers: int = 3,
+) -> pd.DataFrame:
+    """
+    Add peer statistics and ``calibrated_score`` to a frame of reviews.
+    ``calibrated_score`` is NaN for reviews with too few peers.
+    """
+    if strategy not in STRATEGIES:
+        raise CalibrationError(f"Unknown calibration strategy '{strategy}'")
+    factor = DEFAULT_ADJUSTMENT[strategy] if adjustment_factor is None else adjustment_factor
+    frame = frame.copy()
+    if frame.empty:
+        for name in ("peer_count", "peer_mean", "peer_std", "z_score", "calibrated_score"):
+            frame[name] = pd.Series(dtype=float)
+        return frame
+
+    ratings = frame["rating"].astype(float)
+    keys = [frame[name] for name in PEER_GROUP]
+    groups = ratings.groupby(keys, dropna=False, sort=False)
+    size = groups.transform("size")
+    total = groups.transform("sum")
+    total_sq = (ratings ** 2).groupby(keys, dropna=False, sort=False).transform("sum")
+
+    # Leave-one-out peer statistics (population std, as per-review calibration)
+    peer_count = size - 1
+    peers = peer_count.where(peer_count > 0)
+    peer_mean = (total - ratings) / peers
+    peer_std = np.sqrt(((total_sq - ratings ** 2) / peers - peer_mean ** 2).clip(lower=0))
+    z_score = ((ratings - peer_mean) / peer_std.where(peer_std > 0)).fillna(0.0)
+
+    if strategy == "outlier":
+        target = ratings.where(z_score.abs() <= z_threshold, peer_mean)
+    elif strategy == "mean_shift":
+        target = ratings - (total / size - ratings.mean())
+    elif strategy == "forced_distribution":
+        # Ordinal ranks, so ties are split across rating levels to meet the quotas
+        percentile = _ordinal_percentile(frame, ratings, keys, size)
+        levels, bounds = _distribution_bounds(distribution or DEFAULT_DISTRIBUTION)
+        index = np.minimum(np.searchsorted(bounds, percentile.to_numpy()), len(levels) - 1)
+        target = pd.Series(levels[index], index=frame.index)
+    else:
+        # Mid-rank percentile within the group: ties share a percentile
+        percentile = (groups.rank(method="average") - 0.5) / size
+        target = pd.Series(np.quantile(ratings.to_numpy(), percentile.to_numpy()), index=frame.index)
+
+    calibrated = (ratings + factor * (target - ratings)).clip(MIN_RATING, MAX_RATING).round(2)
+    frame["peer_count"] = peer_count
+    frame["peer_mean"] = peer_mean.round(2)
+    frame["peer_std"] = peer_std.round(2)
+    frame["z_score"] = z_score.round(2)
+    frame["calibrated_score"] = calibrated.where(peer_count >= min_peers)
+    return frame
+
+
+def _summarize(frame: pd.DataFrame) -> Dict[str, Any]:
+    calibrated = frame[frame["calibrated_score"].notna()]
+    by_group = frame.groupby(PEER_GROUP, dropna=False, sort=True).agg(
+        reviews=("rating", "size"),
+        mean_rating=("rating", "mean"),
+        mean_calibrated_score=("calibrated_score", "mean"),
+        calibrated=("calibrated_score", "count"),
+    ).reset_index()
+    return {
+        "reviews": len(frame),
+        "calibrated": len(calibrated),
+        "skipped": len(frame) - len(calibrated),
+        "adjusted": int((calibrated["calibrated_score"] != calibrated["rating"]).sum()),
+        "mean_rating": round(float(frame["rating"].mean()), 2) if len(frame) else None,
+        "mean_calibrated_score": round(float(calibrated["calibrated_score"].mean()), 2) if len(calibrated) else None,
+        "peer_groups": [
+            {
+                "department_id": str(group.department_id) if pd.notna(group.department_id) else None,
+                "position": group.position if pd.notna(group.position) else None,
+                "review_type": group.review_type if pd.notna(group.review_type) else None,
+                "reviews": int(group.reviews),
+                "calibrated": int(group.calibrated),
+                "mean_rating": round(float(group.mean_rating), 2),
+                "mean_calibrated_score": round(float(group.mean_calibrated_score), 2)
+                if pd.notna(group.mean_calibrated_score) else None,
+            }
+            for group in by_group.itertuples(index=False)
+        ],
+    }
+
+
+def calibrate_cycle(db, cycle_id, dry_run: bool = False, **options) -> Dict[str, Any]:
+    """
+    Calibrate every review of a cycle and store ``calibration_score`` in bulk.
+    With ``dry_run`` nothing is written. The caller commits.
+    """
+    started = time.perf_counter()
+    frame = calibrate_frame(load_cycle_reviews(db, cycle_id), **options)
+    summary = _summarize(frame)
+
+    if not dry_run:
+        calibrated = frame[frame["calibrated_score"].notna()]
+        apply_updates(db, PerformanceReview.__table__, [
+            {"id": review_id, "calibration_score": Decimal(str(score))}
+            for review_id, score in zip(calibrated["id"], calibrated["calibrated_score"])
+        ])
+
+    logger.info(f"Calibrated {summary['calibrated']}/{summary['reviews']} reviews of cycle {cycle_id} "
+                f"({options.get('strategy', 'outlier')}, dry_run={dry_run}) "
+                f"in {(time.perf_counter() - started) * 1000:.0f}ms")
+    return summary
@@ -0,0 +1,105 @@
+"""
+Failure handling for background batch writers.
+
+The audit writer and the survey response ingestor acknowledge rows before
+they reach the database, so a failed flush must not drop them.
+``write_with_fallback`` does the following:
+
+1. It retries a failed batch ``WRITER_RETRY_ATTEMPTS`` times with exponential
+   backoff, which covers transient connection or lock errors.
+2. If the batch still fails, it writes the rows one by one, each in its own
+   transaction. One bad row then no longer takes the rest of the batch with
+   it.
+3. Rows that still fail are appended to a JSON-lines dead-letter file under
+   ``DEAD_LETTER_DIR``, one file per stream and day, for inspection and
+   replay. If even that file cannot be written, the rows are logged at
+   CRITICAL level.
+"""
+
+import asyncio
+import json
+import logging
+import threading
+import uuid
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+_file_lock = threading.Lock()
+
+
+def _json_default(value: Any):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (uuid.UUID, Decimal)):
+        return str(value)
+    return repr(value)
+
+
+def dead_letter(stream: str, failures: List[Tuple[Dict[str, Any], str]]) -> Optional[Path]:
+    """Append ``(row, error)`` pairs to the stream's dead-letter file; returns the file path"""
+    if not failures:
+        return None
+    now = datetime.now(timezone.utc)
+    path = Path(settings.DEAD_LETTER_DIR) / f"{stream}-{now:%Y%m%d}.jsonl"
+    lines = [
+        json.dumps({"stream": stream, "failed_at": now, "error": error, "row": row}, default=_json_default)
+        for row, error in failures
+    ]
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with _file_lock, path.open("a", encoding="utf-8") as handle:
+            handle.write("\n".join(lines) + "\n")
+    except OSError as e:
+        logger.critical(f"Could not dead-letter {len(lines)} {stream} rows to {path}: {e}")
+        for line in lines:
+            logger.critical(f"Dead letter: {line}")
+        return None
+    logger.error(f"Dead-lettered {len(lines)} {stream} rows to {path}")
+    return path
+
+
+async def write_with_fallback(
+    loop: asyncio.AbstractEventLoop,
+    write: Callable[[List[Dict[str, Any]]], Any],
+    batch: List[Dict[str, Any]],
+    stream: str,
+    attempts: Optional[int] = None,
+    base_delay: Optional[float] = None,
+) -> Tuple[List[Any], List[Dict[str, Any]]]:
+    """
+    Run ``write(rows)`` in the default executor with retries, then row by row.
+    Returns the results of the successful ``write`` calls and the rows that
+    were dead-lettered.
+    """
+    attempts = max(1, attempts or settings.WRITER_RETRY_ATTEMPTS)
+    base_delay = settings.WRITER_RETRY_BASE_SECONDS if base_delay is None else base_delay
+    for attempt in range(attempts):
+        try:
+            return [await loop.run_in_executor(None, write, batch)], []
+        except Exception as e:
+            error = e
+        if attempt + 1 < attempts:
+            delay = base_delay * 2 ** attempt
+            logger.warning(f"Writing {len(batch)} {stream} rows failed (attempt {attempt + 1}/{attempts}); "
+                           f"retrying in {delay:.1f}s: {error}")
+            await asyncio.sleep(delay)
+
+    if len(batch) == 1:
+        dead_letter(stream, [(batch[0], str(error))])
+        return [], batch
+
+    logger.error(f"Writing {len(batch)} {stream} rows failed {attempts} times; writing row by row: {error}")
+    results, failures = [], []
+    for row in batch:
+        try:
+            results.append(await loop.run_in_executor(None, write, [row]))
+        except Exception as e:
+            failures.append((row, str(e)))
+    dead_letter(stream, failures)
+    return results, [row for row, _ in failures]
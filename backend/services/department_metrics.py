@@ -0,0 +1,205 @@
+"""
+Department metrics.
+
+The department stats endpoints used to run several counts per department and
+a ``target_departments`` containment scan over every survey. Here all
+departments are measured in a single grouped query. The result is kept in
+the tagged read-model cache, and both ``/departments/{id}/stats`` and
+``/departments/stats/summary`` are served from it.
+
+The grouped query is PostgreSQL-only (``FILTER``, jsonb, ``LATERAL``). On
+the development SQLite fallback the same figures are assembled from a few
+portable grouped queries instead.
+
+Entries are tagged ``employees`` and ``departments``. The employee and
+department write paths call ``invalidate_department_metrics`` after they
+commit. Survey, action plan and focus group changes are picked up when the
+TTL (``DEPARTMENT_METRICS_TTL_SECONDS``) expires.
+"""
+
+import logging
+import time
+from collections import Counter
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import case, distinct, func, text
+
+from config import settings
+from models import ActionPlan, Department, Employee, FocusGroupMember, Survey, SurveyTargetDepartment
+from services.cache import read_model_cache
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY = "department_metrics"
+CACHE_TAGS = ("employees", "departments")
+
+_METRICS_SQL = text("""
+    WITH employee_counts AS (
+        SELECT department_id,
+               COUNT(*) AS total_employees,
+               COUNT(*) FILTER (WHERE is_active) AS active_employees
+        FROM employees
+        WHERE department_id IS NOT NULL
+        GROUP BY department_id
+    ),
+    survey_counts AS (
+        SELECT t.department_id,
+               COUNT(*) AS targeted_surveys,
+               COUNT(*) FILTER (WHERE s.status = 'active') AS active_surveys
+        FROM survey_target_departments t
+        JOIN surveys s ON s.id = t.survey_id
+        GROUP BY t.department_id
+    ),
+    action_plan_counts AS (
+        SELECT target.department_id,
+               COUNT(DISTINCT ap.id) AS action_plans,
+               COUNT(DISTINCT ap.id) FILTER (WHERE ap.status IN ('planned', 'in_progress')) AS open_action_plans
+        FROM action_plans ap
+        CROSS JOIN LATERAL jsonb_array_elements_text(
+            CASE WHEN jsonb_typeof(ap.target_departments::jsonb) = 'array'
+                 THEN ap.target_departments::jsonb ELSE '[]'::jsonb END
+        ) AS target(department_id)
+        GROUP BY target.department_id
+    ),
+    focus_group_counts AS (
+        SELECT e.department_id, COUNT(DISTINCT m.focus_group_id) AS focus_groups
+        FROM focus_group_members m
+        JOIN employees e ON e.id = m.employee_id
+        WHERE e.department_id IS NOT NULL
+        GROUP BY e.department_id
+    )
+    SELECT d.id,
+           d.name,
+           COALESCE(ec.total_employees, 0) AS total_employees,
+           COALESCE(ec.active_employees, 0) AS active_employees,
+           COALESCE(sc.targeted_surveys, 0) AS targeted_surveys,
+           COALESCE(sc.active_surveys, 0) AS active_surveys,
+           COALESCE(apc.action_plans, 0) AS action_plans,
+           COALESCE(apc.open_action_plans, 0) AS open_action_plans,
+           COALESCE(fgc.focus_groups, 0) AS focus_groups
+    FROM departments d
+    LEFT JOIN employee_counts ec ON ec.department_id = d.id
+    LEFT JOIN survey_counts sc ON sc.department_id = d.id
+    LEFT JOIN action_plan_counts apc ON apc.department_id = d.id::text
+    LEFT JOIN focus_group_counts fgc ON fgc.department_id = d.id
+    ORDER BY total_employees DESC, d.name
+""")
+
+
+class DepartmentMetrics:
+    """Counts for every department from one query, plus the org-wide rollup"""
+
+    def __init__(self, rows):
+        self.computed_at = time.time()
+        self.departments: List[Dict[str, Any]] = []
+        self.by_id: Dict[str, Dict[str, Any]] = {}
+        for row in rows:
+            metrics = {
+                "id": row.id,
+                "name": row.name,
+                "total_employees": row.total_employees,
+                "active_employees": row.active_employees,
+                "inactive_employees": row.total_employees - row.active_employees,
+                "targeted_surveys": row.targeted_surveys,
+                "active_surveys": row.active_surveys,
+                "action_plans": row.action_plans,
+                "open_action_plans": row.open_action_plans,
+                "focus_groups": row.focus_groups,
+            }
+            self.departments.append(metrics)
+            self.by_id[str(row.id)] = metrics
+
+    def get(self, department_id) -> Optional[Dict[str, Any]]:
+        return self.by_id.get(str(department_id))
+
+    def summary(self) -> Dict[str, Any]:
+        total_departments = len(self.departments)
+        total_employees = sum(metrics["total_employees"] for metrics in self.departments)
+        return {
+            "total_departments": total_departments,
+            "total_employees": total_employees,
+            "active_employees": sum(metrics["active_employees"] for metrics in self.departments),
+            "departments": [
+                {
+                    "id": metrics["id"],
+                    "name": metrics["name"],
+                    "employee_count": metrics["total_employees"],
+                    "active_employees": metrics["active_employees"],
+                    "targeted_surveys": metrics["targeted_surveys"],
+                    "open_action_plans": metrics["open_action_plans"],
+                    "focus_groups": metrics["focus_groups"],
+                }
+                for metrics in self.departments
+            ],
+            "average_size": round(total_employees / total_departments, 2) if total_departments > 0 else 0,
+        }
+
+
+def _portable_metric_rows(db) -> List[SimpleNamespace]:
+    """The ``_METRICS_SQL`` figures from portable queries, for the SQLite fallback"""
+    employees = {
+        department_id: (total, active or 0)
+        for department_id, total, active in db.query(
+            Employee.department_id, func.count(Employee.id),
+            func.sum(case((Employee.is_active == True, 1), else_=0)),
+        ).filter(Employee.department_id.isnot(None)).group_by(Employee.department_id)
+    }
+    surveys = {
+        department_id: (total, active or 0)
+        for department_id, total, active in db.query(
+            SurveyTargetDepartment.department_id, func.count(),
+            func.sum(case((Survey.status == "active", 1), else_=0)),
+        ).join(Survey, Survey.id == SurveyTargetDepartment.survey_id).group_by(SurveyTargetDepartment.department_id)
+    }
+    focus_groups = dict(
+        db.query(Employee.department_id, func.count(distinct(FocusGroupMember.focus_group_id)))
+        .join(Employee, Employee.id == FocusGroupMember.employee_id)
+        .filter(Employee.department_id.isnot(None))
+        .group_by(Employee.department_id)
+    )
+    action_plans, open_action_plans = Counter(), Counter()
+    for status, targets in db.query(ActionPlan.status, ActionPlan.target_departments):
+        for department_id in set(targets if isinstance(targets, list) else []):
+            action_plans[str(department_id)] += 1
+            if status in ("planned", "in_progress"):
+                open_action_plans[str(department_id)] += 1
+
+    rows = []
+    for department_id, name in db.query(Department.id, Department.name):
+        total, active = employees.get(department_id, (0, 0))
+        targeted, active_surveys = surveys.get(department_id, (0, 0))
+        rows.append(SimpleNamespace(
+            id=department_id, name=name, total_employees=total, active_employees=active,
+            targeted_surveys=targeted, active_surveys=active_surveys,
+            action_plans=action_plans[str(department_id)], open_action_plans=open_action_plans[str(department_id)],
+            focus_groups=focus_groups.get(department_id, 0),
+        ))
+    rows.sort(key=lambda row: (-row.total_employees, row.name))
+    return rows
+
+
+def compute_department_metrics(db) -> DepartmentMetrics:
+    started = time.perf_counter()
+    if db.get_bind().dialect.name == "postgresql":
+        rows = db.execute(_METRICS_SQL).all()
+    else:
+        rows = _portable_metric_rows(db)
+    metrics = DepartmentMetrics(rows)
+    logger.info(f"Department metrics computed for {len(metrics.departments)} departments "
+                f"in {(time.perf_counter() - started) * 1000:.0f}ms")
+    return metrics
+
+
+def get_department_metrics(db) -> DepartmentMetrics:
+    return read_model_cache.get_or_compute(
+        CACHE_KEY,
+        lambda: compute_department_metrics(db),
+        tags=CACHE_TAGS,
+        ttl=settings.DEPARTMENT_METRICS_TTL_SECONDS,
+    )
+
+
+def invalidate_department_metrics():
+    """Call after committing employee or department writes"""
+    read_model_cache.invalidate_tags(*CACHE_TAGS)
@@ -0,0 +1,384 @@
+"""
+Tabular export subsystem.
+
+A dataset is a function registered with ``@export_dataset(name)``. It receives
+a database connection and the request filters, and returns an
+``ExportTable``: a header plus a lazy row iterator. Rows are read through a
+server-side cursor (``stream_results``/``yield_per``), so memory stays flat
+however large the table is.
+
+Writers are registered in ``EXPORT_WRITERS``:
+
+* ``csv``  - streamed to the client in ~64KB chunks as rows are read
+* ``xlsx`` - written with XlsxWriter in constant-memory mode (rows are
+  flushed to disk as they are written), rolling over to a new sheet at
+  Excel's row limit
+
+Large exports run as background jobs (``exports.dataset``). The job writes the
+file to ``EXPORT_DIR`` as ``<job_id>.<ext>``, and the file is downloaded from
+``GET /exports/jobs/{job_id}/download`` until ``EXPORT_RETENTION_HOURS`` has
+passed.
+"""
+
+import csv
+import io
+import json
+import logging
+import os
+import time
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+
+from sqlalchemy import select, text
+
+from config import settings
+from database import engine
+from models import Department, Employee, KPI, KPIValue, Survey, SurveyQuestion, SurveyResponse
+
+logger = logging.getLogger(__name__)
+
+STREAM_YIELD_PER = 1000
+CSV_CHUNK_BYTES = 64 * 1024
+XLSX_MAX_ROWS = 1_048_576
+
+
+class ExportError(ValueError):
+    pass
+
+
+class ExportTable:
+    def __init__(self, name: str, header: Sequence[str], rows: Iterable[Sequence[Any]]):
+        self.name = name
+        self.header = list(header)
+        self.rows = rows
+
+
+def cell_value(value: Any) -> Any:
+    """Flatten a database value into something a CSV/XLSX cell can hold"""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, (list, tuple)):
+        return "; ".join(str(cell_value(item)) for item in value)
+    return json.dumps(value, default=str)
+
+
+# =====================================================
+# DATASETS
+# =====================================================
+
+EXPORT_DATASETS: Dict[str, Callable[[Any, Dict[str, Any]], ExportTable]] = {}
+
+
+def export_dataset(name: str):
+    """Register ``func(conn, params) -> ExportTable`` as an exportable dataset"""
+    def decorator(func):
+        EXPORT_DATASETS[name] = func
+        return func
+    return decorator
+
+
+def _stream(conn, statement, params: Optional[Dict[str, Any]] = None) -> Iterator:
+    result = conn.execution_options(stream_results=True, yield_per=STREAM_YIELD_PER).execute(statement, params or {})
+    for row in result:
+        yield row
+
+
+@export_dataset("survey_responses")
+def survey_responses_dataset(conn, params: Dict[str, Any]) -> ExportTable:
+    """Raw responses of one survey, one column per question"""
+    survey_id = params.get("survey_id")
+    if not survey_id:
+        raise ExportError("survey_responses export requires survey_id")
+    survey = conn.execute(select(Survey.title, Survey.is_anonymous).where(Survey.id == survey_id)).first()
+    if survey is None:
+        raise ExportError("Survey not found")
+
+    questions = conn.execute(
+        select(SurveyQuestion.id, SurveyQuestion.text)
+        .where(SurveyQuestion.survey_id == survey_id)
+        .order_by(SurveyQuestion.position, SurveyQuestion.id)
+    ).all()
+    question_ids = [str(question_id) for question_id, _ in questions]
+
+    statement = (
+        select(SurveyResponse.id, SurveyResponse.employee_id, Employee.department_id, SurveyResponse.is_anonymous,
+               SurveyResponse.submitted_at, SurveyResponse.completion_time_seconds, SurveyResponse.responses)
+        .outerjoin(Employee, Employee.id == SurveyResponse.employee_id)
+        .where(SurveyResponse.survey_id == survey_id)
+        .order_by(SurveyResponse.submitted_at, SurveyResponse.id)
+    )
+    if params.get("department_id"):
+        statement = statement.where(Employee.department_id == params["department_id"])
+    if params.get("start_date"):
+        statement = statement.where(SurveyResponse.submitted_at >= params["start_date"])
+    if params.get("end_date"):
+        statement = statement.where(SurveyResponse.submitted_at <= params["end_date"])
+
+    def rows():
+        for row in _stream(conn, statement):
+            anonymous = survey.is_anonymous or row.is_anonymous
+            answers = row.responses or {}
+            yield [
+                row.id, None if anonymous else row.employee_id, row.department_id,
+                row.submitted_at, row.completion_time_seconds,
+                *(answers.get(question_id) for question_id in question_ids),
+            ]
+
+    header = ["response_id", "employee_id", "department_id", "submitted_at", "completion_time_seconds"]
+    return ExportTable(f"survey_{survey_id}", header + [question_text for _, question_text in questions], rows())
+
+
+@export_dataset("kpi_values")
+def kpi_values_dataset(conn, params: Dict[str, Any]) -> ExportTable:
+    """KPI measurements with KPI and department names"""
+    statement = (
+        select(KPIValue.id, KPIValue.kpi_id, KPI.name, KPI.unit, KPIValue.value, KPIValue.period_start,
+               KPIValue.period_end, KPIValue.department_id, Department.name, KPIValue.created_at)
+        .join(KPI, KPI.id == KPIValue.kpi_id)
+        .outerjoin(Department, Department.id == KPIValue.department_id)
+        .order_by(KPIValue.period_start, KPIValue.id)
+    )
+    if params.get("kpi_id"):
+        statement = statement.where(KPIValue.kpi_id == params["kpi_id"])
+    if params.get("department_id"):
+        statement = statement.where(KPIValue.department_id == params["department_id"])
+    if params.get("start_date"):
+        statement = statement.where(KPIValue.period_start >= params["start_date"])
+    if params.get("end_date"):
+        statement = statement.where(KPIValue.period_end <= params["end_date"])
+
+    header = ["id", "kpi_id", "kpi_name", "unit", "value", "period_start", "period_end",
+              "department_id", "department_name", "recorded_at"]
+    return ExportTable("kpi_values", header, (list(row) for row in _stream(conn, statement)))
+
+
+@export_dataset("parameter_ratings")
+def parameter_ratings_dataset(conn, params: Dict[str, Any]) -> ExportTable:
+    """Employee evaluation-parameter ratings (tables managed by the parameters API)"""
+    clauses, values = [], {}
+    for key, clause in (
+        ("employee_id", "epr.employee_id = :employee_id"),
+        ("department_id", "e.department_id = :department_id"),
+        ("parameter_id", "epr.parameter_id = :parameter_id"),
+        ("start_date", "epr.rating_period_start >= :start_date"),
+        ("end_date", "epr.rating_period_end <= :end_date"),
+    ):
+        if params.get(key):
+            clauses.append(clause)
+            values[key] = params[key]
+
+    statement = text(f"""
+        SELECT epr.id, epr.employee_id, e.name AS employee_name, e.department_id,
+               epr.parameter_id, ep.name AS parameter_name, ep.category,
+               epr.rating_value, epr.rater_id, epr.rater_type, epr.confidence_score,
+               epr.rating_period_start, epr.rating_period_end, epr.evidence_text, epr.created_at
+        FROM employee_parameter_ratings epr
+        JOIN employees e ON e.id = epr.employee_id
+        JOIN evaluation_parameters ep ON ep.parameter_id = epr.parameter_id
+        {"WHERE " + " AND ".join(clauses) if clauses else ""}
+        ORDER BY epr.rating_period_start, epr.id
+    """)
+    header = ["id", "employee_id", "employee_name", "department_id", "parameter_id", "parameter_name",
+              "category", "rating_value", "rater_id", "rater_type", "confidence_score",
+              "rating_period_start", "rating_period_end", "evidence_text", "created_at"]
+    return ExportTable("parameter_ratings", header, (list(row) for row in _stream(conn, statement, values)))
+
+
+def flatten_report(data: Dict[str, Any], prefix: str = "") -> Iterator[List[Any]]:
+    """(metric, value) rows for a nested report; list items get an index in the path"""
+    for key, value in data.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            yield from flatten_report(value, f"{path}.")
+        elif isinstance(value, list) and any(isinstance(item, (dict, list)) for item in value):
+            for index, item in enumerate(value):
+                if isinstance(item, dict):
+                    yield from flatten_report(item, f"{path}[{index}].")
+                else:
+                    yield [f"{path}[{index}]", item]
+        else:
+            yield [path, value]
+
+
+def report_table(name: str, data: Dict[str, Any]) -> ExportTable:
+    return ExportTable(name, ["metric", "value"], flatten_report(data))
+
+
+# =====================================================
+# WRITERS
+# =====================================================
+
+def iter_csv(table: ExportTable) -> Iterator[bytes]:
+    """Encode a table as CSV, yielding ~CSV_CHUNK_BYTES chunks"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # BOM so Excel opens the UTF-8 file with the right encoding
+    buffer.write("\ufeff")
+    writer.writerow(table.header)
+    for row in table.rows:
+        writer.writerow([cell_value(value) for value in row])
+        if buffer.tell() >= CSV_CHUNK_BYTES:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def _counted(rows: Iterable[Sequence[Any]], counter: List[int]) -> Iterator[Sequence[Any]]:
+    for row in rows:
+        counter[0] += 1
+        yield row
+
+
+def write_csv(table: ExportTable, path: Path) -> int:
+    counter = [0]
+    counted = ExportTable(table.name, table.header, _counted(table.rows, counter))
+    with open(path, "wb") as handle:
+        for chunk in iter_csv(counted):
+            handle.write(chunk)
+    return counter[0]
+
+
+def write_xlsx(table: ExportTable, path: Path) -> int:
+    try:
+        import xlsxwriter
+    except ImportError:
+        raise ExportError("XLSX export requires the XlsxWriter package")
+
+    # constant_memory flushes each row to disk as soon as the next one starts,
+    # so rows must be written strictly in order
+    workbook = xlsxwriter.Workbook(str(path), {"constant_memory": True, "strings_to_urls": False})
+    bold = workbook.add_format({"bold": True})
+    written, sheets, sheet, sheet_row = 0, 0, None, XLSX_MAX_ROWS
+    try:
+        for row in table.rows:
+            if sheet_row >= XLSX_MAX_ROWS:
+                sheets += 1
+                sheet = workbook.add_worksheet(f"{table.name[:24]}_{sheets}")
+                sheet.write_row(0, 0, table.header, bold)
+                sheet_row = 1
+            sheet.write_row(sheet_row, 0, [cell_value(value) for value in row])
+            sheet_row += 1
+            written += 1
+        if sheet is None:
+            workbook.add_worksheet(table.name[:31]).write_row(0, 0, table.header, bold)
+    finally:
+        workbook.close()
+    return written
+
+
+EXPORT_WRITERS: Dict[str, Dict[str, Any]] = {
+    "csv": {"extension": "csv", "media_type": "text/csv; charset=utf-8", "write": write_csv},
+    "xlsx": {
+        "extension": "xlsx",
+        "media_type": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        "write": write_xlsx,
+    },
+}
+
+# Everything a job can leave behind for download: writer formats plus Parquet snapshot archives
+ARTIFACT_TYPES: Dict[str, Dict[str, str]] = {
+    **{fmt: {"extension": w["extension"], "media_type": w["media_type"]} for fmt, w in EXPORT_WRITERS.items()},
+    "snapshot": {"extension": "zip", "media_type": "application/zip"},
+}
+
+
+def export_filename(name: str, fmt: str) -> str:
+    return f"{name}_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.{ARTIFACT_TYPES[fmt]['extension']}"
+
+
+def export_dir(subdir: str = "datasets") -> Path:
+    """``EXPORT_DIR/<subdir>``, created on first use"""
+    path = Path(settings.EXPORT_DIR) / subdir
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def open_dataset(dataset: str, params: Dict[str, Any]):
+    """Context-managed connection plus the dataset's table; validates the dataset name"""
+    if dataset not in EXPORT_DATASETS:
+        raise ExportError(f"Unknown dataset '{dataset}'")
+    return _DatasetCursor(dataset, params)
+
+
+class _DatasetCursor:
+    def __init__(self, dataset: str, params: Dict[str, Any]):
+        self.dataset, self.params = dataset, params
+        self._conn = None
+
+    def __enter__(self) -> ExportTable:
+        self._conn = engine.connect()
+        try:
+            return EXPORT_DATASETS[self.dataset](self._conn, self.params)
+        except Exception:
+            self._conn.close()
+            raise
+
+    def __exit__(self, *exc):
+        self._conn.close()
+
+
+def iter_dataset_csv(dataset: str, params: Dict[str, Any]) -> Iterator[bytes]:
+    """
+    Stream a dataset as CSV. Opens its own connection so the generator can
+    outlive the request while ``StreamingResponse`` iterates it.
+    """
+    with open_dataset(dataset, params) as table:
+        yield from iter_csv(table)
+
+
+def write_export_file(table: ExportTable, fmt: str, path: Path) -> Dict[str, Any]:
+    """Write a table to ``path`` atomically; returns row count and size"""
+    if fmt not in EXPORT_WRITERS:
+        raise ExportError(f"Unsupported export format '{fmt}'")
+    partial = path.with_name(path.name + ".part")
+    try:
+        rows = EXPORT_WRITERS[fmt]["write"](table, partial)
+        os.replace(partial, path)
+    finally:
+        if partial.exists():
+            partial.unlink()
+    return {"rows": rows, "bytes": path.stat().st_size}
+
+
+def artifact_path(job_id, fmt: str) -> Path:
+    return export_dir() / f"{job_id}.{ARTIFACT_TYPES[fmt]['extension']}"
+
+
+def write_job_artifact(job_id, table: ExportTable, fmt: str) -> Dict[str, Any]:
+    """Write a background job's export file; the result is stored on the job"""
+    cleanup_expired()
+    path = artifact_path(job_id, fmt)
+    stats = write_export_file(table, fmt, path)
+    return {
+        "format": fmt,
+        "filename": export_filename(table.name, fmt),
+        "download_url": f"/api/v1/exports/jobs/{job_id}/download",
+        **stats,
+    }
+
+
+def export_dataset_artifact(job_id, dataset: str, fmt: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    with open_dataset(dataset, params) as table:
+        return write_job_artifact(job_id, table, fmt)
+
+
+def cleanup_expired(subdir: str = "datasets"):
+    """Remove files under ``EXPORT_DIR/<subdir>`` older than the retention window"""
+    cutoff = time.time() - settings.EXPORT_RETENTION_HOURS * 3600
+    for path in export_dir(subdir).iterdir():
+        try:
+            if path.is_file() and path.stat().st_mtime < cutoff:
+                path.unlink()
+        except OSError as e:
+            logger.warning(f"Could not remove expired export {path}: {e}")
@@ -0,0 +1,331 @@
+"""
+360 feedback campaigns.
+
+A campaign requests feedback on many subjects at once. ``launch_campaign``
+picks each subject's raters from the org chart and inserts every request
+into ``feedback_requests`` with a single ``INSERT ... SELECT``:
+
+* self: the subject
+* downward: the subject's manager
+* upward: up to ``max_reports`` of the subject's direct reports
+* peer: up to ``peers_per_subject`` colleagues who share the subject's
+  manager, picked at random. Subjects without a manager draw from their
+  department instead.
+
+Raters are then notified in batches: each rater gets one queued
+notification per platform, however many requests they received.
+
+``feedback_campaigns`` keeps denormalized ``total_requests`` and
+``completed_requests`` counters, so listing campaigns never scans requests.
+Per-type and per-status breakdowns are read through the
+``(campaign_id, status, request_type)`` index. When a rater submits
+feedback on a subject, ``complete_requests`` closes the rater's open request
+for that subject and increments the counter.
+"""
+
+import logging
+import uuid
+from collections import Counter, defaultdict
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import Date, and_, case, func, literal, or_, select, union_all, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import aliased
+
+from models import Employee, FeedbackCampaign, FeedbackRequest, User
+from services.notifications import enqueue_notifications
+
+logger = logging.getLogger(__name__)
+
+OPEN_STATUSES = ("pending", "in_progress")
+DEFAULT_DUE_DAYS = 14
+DEFAULT_INSTRUCTIONS = {
+    "peer": "Please provide honest feedback on this colleague's performance.",
+    "downward": "Please provide feedback as this employee's manager.",
+    "upward": "Please provide feedback on your manager's leadership.",
+    "self": "Please complete your self-assessment.",
+}
+
+
+class CampaignError(ValueError):
+    pass
+
+
+def default_due_date() -> date:
+    return date.today() + timedelta(days=DEFAULT_DUE_DAYS)
+
+
+def subject_query(subject_ids: Optional[Iterable[uuid.UUID]] = None,
+                  department_ids: Optional[Iterable[uuid.UUID]] = None):
+    """Active employees listed or in the listed departments; everyone active when neither is given"""
+    query = select(Employee.id, Employee.manager_id, Employee.department_id).where(Employee.is_active == True)
+    conditions = []
+    if subject_ids:
+        conditions.append(Employee.id.in_(list(subject_ids)))
+    if department_ids:
+        conditions.append(Employee.department_id.in_(list(department_ids)))
+    if conditions:
+        query = query.where(or_(*conditions))
+    return query
+
+
+def _raters(subject_id, rater_id, request_type: str):
+    return select(subject_id.label("subject_id"), rater_id.label("rater_id"), literal(request_type).label("request_type"))
+
+
+def _ranked(subjects, rater, join_condition, limit: int, *conditions):
+    """Subject and rater columns of a random per-subject ranking, and the condition keeping ``limit`` per subject"""
+    ranked = (
+        select(
+            subjects.c.id.label("subject_id"),
+            rater.id.label("rater_id"),
+            func.row_number().over(partition_by=subjects.c.id, order_by=func.random()).label("rank"),
+        )
+        .join(rater, join_condition)
+        .where(rater.is_active == True, *conditions)
+        .subquery()
+    )
+    return ranked.c.subject_id, ranked.c.rater_id, ranked.c.rank <= limit
+
+
+def rater_query(subjects, include_self: bool = True, include_manager: bool = True,
+                max_reports: int = 5, peers_per_subject: int = 3):
+    """UNION ALL of (subject_id, rater_id, request_type) for every subject in the ``subjects`` CTE"""
+    parts = []
+    if include_self:
+        parts.append(_raters(subjects.c.id, subjects.c.id, "self"))
+    if include_manager:
+        manager = aliased(Employee)
+        parts.append(
+            _raters(subjects.c.id, manager.id, "downward")
+            .join(manager, manager.id == subjects.c.manager_id)
+            .where(manager.is_active == True)
+        )
+    if max_reports:
+        report = aliased(Employee)
+        subject_id, rater_id, within_limit = _ranked(subjects, report, report.manager_id == subjects.c.id, max_reports)
+        parts.append(_raters(subject_id, rater_id, "upward").where(within_limit))
+    if peers_per_subject:
+        peer = aliased(Employee)
+        colleagues = or_(
+            peer.manager_id == subjects.c.manager_id,
+            and_(subjects.c.manager_id.is_(None), peer.department_id == subjects.c.department_id),
+        )
+        subject_id, rater_id, within_limit = _ranked(
+            subjects, peer, colleagues, peers_per_subject,
+            peer.id != subjects.c.id,
+            # A subject's manager and reports are asked as such, never as peers
+            or_(subjects.c.manager_id.is_(None), peer.id != subjects.c.manager_id),
+            or_(peer.manager_id.is_(None), peer.manager_id != subjects.c.id),
+        )
+        parts.append(_raters(subject_id, rater_id, "peer").where(within_limit))
+    if not parts:
+        raise CampaignError("A campaign needs at least one kind of rater")
+    return union_all(*parts)
+
+
+def _instructions(campaign: FeedbackCampaign, request_type):
+    custom = (campaign.settings or {}).get("instructions")
+    if custom:
+        return literal(custom)
+    return case(DEFAULT_INSTRUCTIONS, value=request_type)
+
+
+def _record_totals(db, campaign: FeedbackCampaign, inserted: int):
+    campaign.total_requests = (campaign.total_requests or 0) + inserted
+    campaign.subject_count = db.query(func.count(func.distinct(FeedbackRequest.employee_id))).filter(
+        FeedbackRequest.campaign_id == campaign.id
+    ).scalar()
+    campaign.updated_at = datetime.now(timezone.utc)
+
+
+def launch_campaign(db, campaign: FeedbackCampaign, requested_by: uuid.UUID,
+                    subject_ids=None, department_ids=None) -> int:
+    """
+    Insert every request of the campaign in one statement; subjects already
+    asked to the same rater are skipped. Runs in the caller's transaction.
+    """
+    settings = campaign.settings or {}
+    db.flush()
+    subjects = subject_query(subject_ids, department_ids).cte("subjects")
+    raters = rater_query(
+        subjects,
+        include_self=settings.get("include_self", True),
+        include_manager=settings.get("include_manager", True),
+        max_reports=settings.get("max_reports", 5),
+        peers_per_subject=settings.get("peers_per_subject", 3),
+    ).subquery()
+    statement = pg_insert(FeedbackRequest).from_select(
+        ["id", "campaign_id", "employee_id", "rater_id", "requested_by", "request_type",
+         "due_date", "status", "instructions"],
+        select(
+            func.gen_random_uuid(),
+            literal(campaign.id, FeedbackRequest.campaign_id.type),
+            raters.c.subject_id,
+            raters.c.rater_id,
+            literal(requested_by, FeedbackRequest.requested_by.type),
+            raters.c.request_type,
+            literal(campaign.due_date, Date),
+            literal("pending"),
+            _instructions(campaign, raters.c.request_type),
+        )
+    ).on_conflict_do_nothing()
+    inserted = db.execute(statement).rowcount or 0
+    _record_totals(db, campaign, inserted)
+    logger.info(f"Campaign {campaign.id} launched: {inserted} requests for {campaign.subject_count} subjects")
+    return inserted
+
+
+def add_requests(db, campaign: FeedbackCampaign, requested_by: uuid.UUID,
+                 raters: List[Tuple[uuid.UUID, uuid.UUID, str]],
+                 instructions: Optional[Dict[str, str]] = None) -> int:
+    """
+    Insert explicitly chosen (subject_id, rater_id, request_type) requests in
+    one statement. ``instructions`` overrides the default text per request type.
+    """
+    if not raters:
+        return 0
+    db.flush()
+    custom = (campaign.settings or {}).get("instructions")
+    instructions = {**DEFAULT_INSTRUCTIONS, **(instructions or {})}
+    rows = [
+        {
+            "id": uuid.uuid4(), "campaign_id": campaign.id, "employee_id": subject_id, "rater_id": rater_id,
+            "requested_by": requested_by, "request_type": request_type, "due_date": campaign.due_date,
+            "status": "pending", "instructions": custom or instructions[request_type],
+        }
+        for subject_id, rater_id, request_type in raters
+    ]
+    inserted = db.execute(pg_insert(FeedbackRequest).values(rows).on_conflict_do_nothing()).rowcount or 0
+    _record_totals(db, campaign, inserted)
+    return inserted
+
+
+def notify_raters(db, campaign: FeedbackCampaign, reminder: bool = False) -> Dict[str, Any]:
+    """
+    Queue one notification per rater with open requests and per platform.
+    Joins the caller's transaction.
+    """
+    raters = (
+        db.query(User.id, User.email, FeedbackRequest.rater_id, func.count(FeedbackRequest.id))
+        .join(User, User.employee_id == FeedbackRequest.rater_id)
+        .filter(
+            FeedbackRequest.campaign_id == campaign.id,
+            FeedbackRequest.status.in_(OPEN_STATUSES),
+            User.is_active == True,
+        )
+        .group_by(User.id, User.email, FeedbackRequest.rater_id)
+        .all()
+    )
+    platforms = (campaign.settings or {}).get("platforms") or ["in_app"]
+    due = f"{campaign.due_date:%Y-%m-%d}"
+    now = datetime.now(timezone.utc)
+    rows = []
+    for user_id, email, employee_id, open_requests in raters:
+        noun = "request" if open_requests == 1 else "requests"
+        if reminder:
+            title = f"Reminder: {campaign.name}"
+            message = f"You still have {open_requests} feedback {noun} open, due {due}."
+        else:
+            title = f"Feedback requested: {campaign.name}"
+            message = f"You have {open_requests} feedback {noun} to complete by {due}."
+        metadata = {"campaign_id": str(campaign.id), "email": email, "employee_id": str(employee_id)}
+        for platform in platforms:
+            rows.append({
+                "id": uuid.uuid4(), "recipient_id": user_id, "type": "reminder" if reminder else "feedback_request",
+                "title": title, "message": message, "platform": platform, "status": "pending",
+                "scheduled_for": now, "attempts": 0, "metadata": metadata,
+            })
+    enqueue_notifications(db, rows, commit=False)
+    return {"raters": len(raters), "queued": len(rows)}
+
+
+def complete_requests(db, rater_id: Optional[uuid.UUID], subject_id: uuid.UUID,
+                      feedback_id: Optional[uuid.UUID] = None) -> int:
+    """Close the rater's open requests on a subject in active campaigns; call when feedback is given"""
+    if rater_id is None:
+        return 0
+    active = select(FeedbackCampaign.id).where(FeedbackCampaign.status == "active")
+    campaign_ids = db.execute(
+        update(FeedbackRequest)
+        .where(
+            FeedbackRequest.rater_id == rater_id,
+            FeedbackRequest.employee_id == subject_id,
+            FeedbackRequest.status.in_(OPEN_STATUSES),
+            FeedbackRequest.campaign_id.in_(active),
+        )
+        .values(status="completed", completed_at=func.now(), feedback_id=feedback_id)
+        .returning(FeedbackRequest.campaign_id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    for campaign_id, completed in Counter(campaign_ids).items():
+        db.execute(
+            update(FeedbackCampaign)
+            .where(FeedbackCampaign.id == campaign_id)
+            .values(completed_requests=FeedbackCampaign.completed_requests + completed, updated_at=func.now())
+            .execution_options(synchronize_session=False)
+        )
+    return len(campaign_ids)
+
+
+def close_campaign(db, campaign: FeedbackCampaign) -> int:
+    """Expire the campaign's open requests and close it; returns the number expired"""
+    expired = db.execute(
+        update(FeedbackRequest)
+        .where(FeedbackRequest.campaign_id == campaign.id, FeedbackRequest.status.in_(OPEN_STATUSES))
+        .values(status="expired")
+        .execution_options(synchronize_session=False)
+    ).rowcount or 0
+    now = datetime.now(timezone.utc)
+    campaign.status = "closed"
+    campaign.closed_at = now
+    campaign.updated_at = now
+    return expired
+
+
+def serialize_campaign(campaign: FeedbackCampaign) -> Dict[str, Any]:
+    total = campaign.total_requests or 0
+    completed = campaign.completed_requests or 0
+    return {
+        "id": str(campaign.id),
+        "name": campaign.name,
+        "description": campaign.description,
+        "cycle_id": str(campaign.cycle_id) if campaign.cycle_id else None,
+        "due_date": campaign.due_date.isoformat() if campaign.due_date else None,
+        "status": campaign.status,
+        "subject_count": campaign.subject_count or 0,
+        "total_requests": total,
+        "completed_requests": completed,
+        "completion_rate": round(completed / total * 100, 2) if total else 0,
+        "created_at": campaign.created_at.isoformat() if campaign.created_at else None,
+        "closed_at": campaign.closed_at.isoformat() if campaign.closed_at else None,
+    }
+
+
+def campaign_progress(db, campaign: FeedbackCampaign) -> Dict[str, Any]:
+    """Counters plus request counts by type and status, and fully completed subjects"""
+    by_type: Dict[str, Dict[str, int]] = defaultdict(dict)
+    by_status: Dict[str, int] = defaultdict(int)
+    for request_type, request_status, count in (
+        db.query(FeedbackRequest.request_type, FeedbackRequest.status, func.count(FeedbackRequest.id))
+        .filter(FeedbackRequest.campaign_id == campaign.id)
+        .group_by(FeedbackRequest.request_type, FeedbackRequest.status)
+        .all()
+    ):
+        by_type[request_type][request_status] = count
+        by_status[request_status] += count
+
+    completed_subjects = (
+        select(FeedbackRequest.employee_id)
+        .where(FeedbackRequest.campaign_id == campaign.id)
+        .group_by(FeedbackRequest.employee_id)
+        .having(func.count(FeedbackRequest.id).filter(FeedbackRequest.status != "completed") == 0)
+        .subquery()
+    )
+    return {
+        **serialize_campaign(campaign),
+        "by_status": dict(by_status),
+        "by_request_type": dict(by_type),
+        "completed_subjects": db.query(func.count()).select_from(completed_subjects).scalar(),
+    }
@@ -0,0 +1,231 @@
+"""
+Streaming GDPR data export (Article 20 - Right to Data Portability).
+
+Each section of a user's data is read with a server-side cursor
+(``yield_per``) and serialized record by record, so memory use stays flat no
+matter how many survey responses or audit logs a user has. Two formats are
+supported:
+
+* ``ndjson`` - one JSON object per line: ``{"section": ..., "record": ...}``
+* ``zip``    - one ``<section>.ndjson`` file per section inside a zip archive
+
+Exports can be streamed straight to the client, or generated by a
+``gdpr.data_export`` background job (see ``services.jobs``) into
+``EXPORT_DIR/gdpr/<job_id>.<ext>``. Any worker can serve the file once the job
+has succeeded, and it is kept for ``EXPORT_RETENTION_HOURS``.
+"""
+
+import json
+import logging
+import os
+import uuid
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models import AuditLog, ConsentRecord, Employee, Feedback, PerformanceReview, SurveyResponse, User
+from services.exports import cleanup_expired, export_dir
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMAT_PATTERN = "^(ndjson|zip)$"
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "zip": "application/zip"}
+YIELD_PER = 500
+
+
+def _json_default(value: Any):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _dumps(payload: Any) -> bytes:
+    return (json.dumps(payload, default=_json_default) + "\n").encode("utf-8")
+
+
+def _row_to_dict(obj, columns) -> Dict[str, Any]:
+    return {column: getattr(obj, column) for column in columns}
+
+
+def _section_queries(db: Session, user: User):
+    """(section name, query, exported columns) for every table holding the user's data"""
+    sections = []
+
+    if user.employee_id:
+        employee_id = user.employee_id
+        sections += [
+            ("survey_responses",
+             db.query(SurveyResponse).filter(SurveyResponse.employee_id == employee_id).order_by(SurveyResponse.submitted_at),
+             ("survey_id", "submitted_at", "responses", "is_anonymous", "completion_time_seconds")),
+            ("performance_reviews",
+             db.query(PerformanceReview).filter(PerformanceReview.employee_id == employee_id).order_by(PerformanceReview.created_at),
+             ("id", "cycle_id", "review_type", "rating", "comments", "status", "self_assessment",
+              "manager_feedback", "goals_for_next_period", "created_at")),
+            ("feedback_received",
+             db.query(Feedback).filter(Feedback.recipient_id == employee_id).order_by(Feedback.created_at),
+             ("id", "feedback_type", "category", "content", "rating", "is_anonymous", "created_at")),
+            ("feedback_given",
+             db.query(Feedback).filter(Feedback.giver_id == employee_id).order_by(Feedback.created_at),
+             ("id", "recipient_id", "feedback_type", "category", "content", "rating", "created_at")),
+        ]
+
+    sections += [
+        ("consent_records",
+         db.query(ConsentRecord).filter(ConsentRecord.user_id == user.id).order_by(ConsentRecord.created_at),
+         ("id", "consent_type", "purpose", "data_categories", "consent_given", "created_at", "expires_at")),
+        ("audit_logs",
+         db.query(AuditLog).filter(AuditLog.user_id == user.id).order_by(AuditLog.timestamp.desc()),
+         ("action", "timestamp", "ip_address", "user_agent")),
+    ]
+    return sections
+
+
+def iter_user_records(db: Session, user: User) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Yield (section, record) pairs for a user, one row at a time"""
+    yield "profile", {
+        "id": user.id,
+        "email": user.email,
+        "role": user.role,
+        "created_at": user.created_at,
+        "last_login": user.last_login,
+    }
+
+    if user.employee_id:
+        employee = db.query(Employee).filter(Employee.id == user.employee_id).first()
+        if employee:
+            yield "employee", _row_to_dict(employee, (
+                "id", "first_name", "last_name", "name", "email", "phone", "department_id",
+                "manager_id", "position", "hire_date", "status", "skills", "competencies"
+            ))
+
+    for section, query, columns in _section_queries(db, user):
+        for obj in query.yield_per(YIELD_PER):
+            yield section, _row_to_dict(obj, columns)
+        # Drop identity-map references so long sections don't accumulate
+        db.expunge_all()
+
+
+def _export_header(user_id: uuid.UUID, fmt: str) -> Dict[str, Any]:
+    return {"user_id": user_id, "export_timestamp": datetime.utcnow(), "format": fmt}
+
+
+def _ndjson_chunks(db: Session, user: User) -> Iterator[bytes]:
+    yield _dumps({"section": "export", "record": _export_header(user.id, "ndjson")})
+    for section, record in iter_user_records(db, user):
+        yield _dumps({"section": section, "record": record})
+
+
+class _ChunkSink:
+    """Write-only, unseekable file object whose contents are drained by a generator"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _zip_chunks(db: Session, user: User) -> Iterator[bytes]:
+    # zipfile supports unseekable outputs (it writes data descriptors), so the
+    # archive is emitted incrementally as each record is compressed.
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("manifest.json", json.dumps(_export_header(user.id, "zip"), default=_json_default))
+
+        current_section, handle = None, None
+        for section, record in iter_user_records(db, user):
+            if section != current_section:
+                if handle:
+                    handle.close()
+                current_section = section
+                handle = archive.open(f"{section}.ndjson", mode="w", force_zip64=True)
+            handle.write(_dumps(record))
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+        if handle:
+            handle.close()
+    chunk = sink.drain()
+    if chunk:
+        yield chunk
+
+
+def iter_export(user_id: uuid.UUID, fmt: str = "ndjson") -> Iterator[bytes]:
+    """
+    Stream a user's export as bytes.
+
+    Opens its own session so the generator can outlive the request-scoped one
+    while ``StreamingResponse`` iterates it.
+    """
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.id == user_id).first()
+        if not user:
+            return
+        chunks = _zip_chunks(db, user) if fmt == "zip" else _ndjson_chunks(db, user)
+        for chunk in chunks:
+            yield chunk
+    finally:
+        db.close()
+
+
+def export_filename(user_id: uuid.UUID, fmt: str) -> str:
+    extension = "zip" if fmt == "zip" else "ndjson"
+    return f"gdpr-export-{user_id}-{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}.{extension}"
+
+
+# =====================================================
+# BACKGROUND EXPORT ARTIFACTS
+# =====================================================
+
+EXPORT_SUBDIR = "gdpr"
+
+
+def export_artifact_path(job_id, fmt: str) -> Path:
+    return export_dir(EXPORT_SUBDIR) / f"{job_id}.{'zip' if fmt == 'zip' else 'ndjson'}"
+
+
+def write_export_artifact(job_id, user_id: uuid.UUID, fmt: str,
+                          check_cancelled: Optional[Callable[[], None]] = None) -> Dict[str, Any]:
+    """Write a background job's export file; the result is stored on the job"""
+    cleanup_expired(EXPORT_SUBDIR)
+    target = export_artifact_path(job_id, fmt)
+    partial = target.with_suffix(target.suffix + ".part")
+    bytes_written = 0
+    try:
+        with open(partial, "wb") as handle:
+            for chunk in iter_export(user_id, fmt):
+                if check_cancelled is not None:
+                    check_cancelled()
+                handle.write(chunk)
+                bytes_written += len(chunk)
+        os.replace(partial, target)
+    finally:
+        if partial.exists():
+            partial.unlink()
+    return {
+        "user_id": str(user_id),
+        "format": fmt,
+        "filename": export_filename(user_id, fmt),
+        "bytes_written": bytes_written,
+        "download_url": f"/api/v1/security/gdpr/data-export/jobs/{job_id}/download",
+    }
+
@@ -0,0 +1,449 @@
+"""
+In-process background job runner.
+
+Long-running endpoints submit work here instead of doing it inside the
+request. Jobs are persisted in ``background_jobs`` (status, progress, result)
+and executed by a fixed-size pool of asyncio workers. Blocking handler code
+runs in worker threads, so it doesn't stall the event loop.
+
+Features:
+* idempotency keys - resubmitting with the same key returns the existing job
+* progress reporting and cooperative cancellation through ``JobContext``.
+  Cancelling a running job sets ``cancel_requested`` on its row, and the
+  owning runner's heartbeat picks the flag up and cancels the task, so any
+  worker can accept the request
+* result retention - finished jobs are purged after ``JOB_RESULT_TTL_HOURS``
+* restart safety - each running job records the claiming worker and a
+  heartbeat. A job is re-queued only once its heartbeat is older than
+  ``JOB_STALE_AFTER_SECONDS``, so jobs that live workers in other processes
+  are running are left alone. Every runner does this check at startup and
+  then periodically, so jobs from a crashed process get picked up
+
+Handlers are registered with ``@job_handler("<type>")`` next to the endpoint
+they serve and must return a JSON-serializable result.
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from fastapi import HTTPException, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import and_, delete, func, select, update
+from sqlalchemy.exc import IntegrityError
+
+from config import settings
+from database import SessionLocal, engine
+from models import BackgroundJob, User
+
+logger = logging.getLogger(__name__)
+
+JOB_HANDLERS: Dict[str, Callable[..., Awaitable[Any]]] = {}
+TERMINAL_STATUSES = ("succeeded", "failed", "cancelled")
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def job_handler(job_type: str):
+    """Register an async handler ``handler(ctx, **params)`` for a job type"""
+    def decorator(func):
+        JOB_HANDLERS[job_type] = func
+        return func
+    return decorator
+
+
+def _update_job(job_id: uuid.UUID, **values):
+    values["updated_at"] = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(update(BackgroundJob).where(BackgroundJob.id == job_id).values(**values))
+
+
+class JobContext:
+    """Handle passed to job handlers for progress, cancellation and DB access"""
+
+    def __init__(self, job_id: uuid.UUID, created_by: Optional[uuid.UUID]):
+        self.job_id = job_id
+        self.created_by = created_by
+        self.cancel_requested = False
+
+    def check_cancelled(self):
+        if self.cancel_requested:
+            raise JobCancelled()
+
+    async def set_progress(self, progress: int, message: Optional[str] = None):
+        """Persist progress (0-100); also a cancellation point"""
+        self.check_cancelled()
+        await asyncio.get_running_loop().run_in_executor(
+            None, lambda: _update_job(self.job_id, progress=max(0, min(100, int(progress))), progress_message=message)
+        )
+
+    async def run_blocking(self, func: Callable, *args):
+        """Run blocking code in a worker thread"""
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    async def run_with_session(self, coroutine_factory: Callable[[Any, Optional[User]], Awaitable[Any]]):
+        """
+        Run ``coroutine_factory(db, user)`` in a worker thread with its own
+        session and event loop. Used to reuse existing endpoint functions, which
+        do synchronous ORM work inside ``async def``, without blocking the main
+        loop. ``user`` is the job submitter reloaded in that session.
+        """
+        def _run():
+            db = SessionLocal()
+            try:
+                user = db.query(User).filter(User.id == self.created_by).first() if self.created_by else None
+                return asyncio.run(coroutine_factory(db, user))
+            finally:
+                db.close()
+
+        return await self.run_blocking(_run)
+
+
+class JobRunner:
+    """Fixed-size asyncio worker pool consuming persisted jobs"""
+
+    def __init__(self, concurrency: int):
+        self.concurrency = max(1, concurrency)
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers = []
+        self._janitor: Optional[asyncio.Task] = None
+        self._heartbeat: Optional[asyncio.Task] = None
+        self._active: Dict[uuid.UUID, asyncio.Task] = {}
+        self._contexts: Dict[uuid.UUID, JobContext] = {}
+        self._stopping = False
+
+    @property
+    def is_running(self) -> bool:
+        return bool(self._workers)
+
+    async def start(self):
+        if self.is_running:
+            return
+        self._stopping = False
+        self._queue = asyncio.Queue()
+        loop = asyncio.get_running_loop()
+        for job_id in await loop.run_in_executor(None, _recover_jobs, True):
+            self._queue.put_nowait(job_id)
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"job-worker-{i}") for i in range(self.concurrency)
+        ]
+        self._janitor = asyncio.create_task(self._purge_expired_loop(), name="job-janitor")
+        self._heartbeat = asyncio.create_task(self._heartbeat_loop(), name="job-heartbeat")
+        logger.info(f"✅ Job runner started with {self.concurrency} workers")
+
+    async def stop(self):
+        """Stop workers; interrupted jobs go back to 'queued' and run again after restart"""
+        if not self.is_running:
+            return
+        self._stopping = True
+        for task in list(self._active.values()):
+            task.cancel()
+        for worker in self._workers + [self._janitor, self._heartbeat]:
+            worker.cancel()
+        await asyncio.gather(*self._workers, self._janitor, self._heartbeat, return_exceptions=True)
+        self._workers = []
+        self._janitor = None
+        self._heartbeat = None
+        logger.info("✅ Job runner stopped")
+
+    def enqueue(self, job_id: uuid.UUID):
+        if self._queue is not None:
+            self._queue.put_nowait(job_id)
+
+    def cancel(self, job_id: uuid.UUID) -> bool:
+        """Request cancellation of a running job in this process"""
+        context = self._contexts.get(job_id)
+        task = self._active.get(job_id)
+        if not context or not task:
+            return False
+        context.cancel_requested = True
+        task.cancel()
+        return True
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job_id = await self._queue.get()
+            job = await loop.run_in_executor(None, _claim_job, job_id)
+            if job is None:
+                continue
+
+            handler = JOB_HANDLERS.get(job["job_type"])
+            if handler is None:
+                await loop.run_in_executor(None, lambda: _update_job(
+                    job_id, status="failed", error=f"No handler for job type {job['job_type']}",
+                    completed_at=datetime.utcnow()
+                ))
+                continue
+
+            context = JobContext(job_id, job["created_by"])
+            task = asyncio.create_task(handler(context, **(job["params"] or {})))
+            self._contexts[job_id] = context
+            self._active[job_id] = task
+            try:
+                result = await task
+                values = dict(status="succeeded", progress=100, result=jsonable_encoder(result))
+            except (asyncio.CancelledError, JobCancelled):
+                if self._stopping and not context.cancel_requested:
+                    values = dict(status="queued", started_at=None, worker_id=None, heartbeat_at=None)
+                else:
+                    values = dict(status="cancelled")
+            except Exception as e:
+                logger.error(f"Job {job_id} ({job['job_type']}) failed: {e}")
+                values = dict(status="failed", error=str(e))
+            finally:
+                self._contexts.pop(job_id, None)
+                self._active.pop(job_id, None)
+
+            if values["status"] in TERMINAL_STATUSES:
+                values["completed_at"] = datetime.utcnow()
+                values["expires_at"] = datetime.utcnow() + timedelta(hours=settings.JOB_RESULT_TTL_HOURS)
+            await loop.run_in_executor(None, lambda: _update_job(job_id, **values))
+            if self._stopping:
+                return
+
+    async def _heartbeat_loop(self):
+        """Keep this worker's running jobs fresh and re-queue stale ones from dead workers"""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(settings.JOB_HEARTBEAT_SECONDS)
+            try:
+                if self._active:
+                    for job_id in await loop.run_in_executor(None, _heartbeat_jobs, list(self._active)):
+                        self.cancel(job_id)
+                for job_id in await loop.run_in_executor(None, _recover_jobs, False):
+                    self._queue.put_nowait(job_id)
+            except Exception as e:
+                logger.error(f"Job heartbeat failed: {e}")
+
+    async def _purge_expired_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                purged = await loop.run_in_executor(None, _purge_expired_jobs)
+                if purged:
+                    logger.info(f"Purged {purged} expired background jobs")
+            except Exception as e:
+                logger.error(f"Failed to purge expired jobs: {e}")
+            await asyncio.sleep(3600)
+
+
+def _heartbeat_jobs(job_ids) -> List[uuid.UUID]:
+    """Refresh this worker's running jobs; returns the ones with a pending cancel request"""
+    with engine.begin() as conn:
+        rows = conn.execute(
+            update(BackgroundJob)
+            .where(BackgroundJob.id.in_(job_ids), BackgroundJob.worker_id == WORKER_ID,
+                   BackgroundJob.status == "running")
+            .values(heartbeat_at=datetime.utcnow())
+            .returning(BackgroundJob.id, BackgroundJob.cancel_requested)
+        ).all()
+    return [row.id for row in rows if row.cancel_requested]
+
+
+def _recover_jobs(include_queued: bool):
+    """
+    Re-queue running jobs whose worker stopped heartbeating and return the IDs
+    to enqueue. With ``include_queued`` (startup) that is every queued job.
+    Otherwise it is the re-queued jobs plus queued jobs left untouched for the
+    stale interval, for example because the process that queued them died.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=settings.JOB_STALE_AFTER_SECONDS)
+    stale = and_(
+        BackgroundJob.status == "running",
+        func.coalesce(BackgroundJob.heartbeat_at, BackgroundJob.started_at, BackgroundJob.updated_at) < cutoff,
+    )
+    try:
+        with engine.begin() as conn:
+            # A dead worker's job that was asked to cancel is not run again
+            conn.execute(
+                update(BackgroundJob)
+                .where(stale, BackgroundJob.cancel_requested == True)
+                .values(status="cancelled", completed_at=datetime.utcnow(), updated_at=datetime.utcnow(),
+                        expires_at=datetime.utcnow() + timedelta(hours=settings.JOB_RESULT_TTL_HOURS))
+            )
+            requeued = [row.id for row in conn.execute(
+                update(BackgroundJob)
+                .where(stale)
+                .values(status="queued", started_at=None, worker_id=None, heartbeat_at=None,
+                        updated_at=datetime.utcnow())
+                .returning(BackgroundJob.id)
+            )]
+            if requeued:
+                logger.warning(f"Re-queued {len(requeued)} background jobs with a stale heartbeat")
+            if include_queued:
+                return [row.id for row in conn.execute(
+                    select(BackgroundJob.id).where(BackgroundJob.status == "queued").order_by(BackgroundJob.created_at)
+                )]
+            # Touch orphaned queued jobs so each is announced once per stale interval
+            orphaned = [row.id for row in conn.execute(
+                update(BackgroundJob)
+                .where(BackgroundJob.status == "queued", BackgroundJob.updated_at < cutoff)
+                .values(updated_at=datetime.utcnow())
+                .returning(BackgroundJob.id)
+            )]
+            return requeued + orphaned
+    except Exception as e:
+        logger.error(f"Failed to recover background jobs: {e}")
+        return []
+
+
+def _claim_job(job_id: uuid.UUID) -> Optional[Dict[str, Any]]:
+    """Atomically move a queued job to running; returns None if it was cancelled or claimed elsewhere"""
+    with engine.begin() as conn:
+        claimed = conn.execute(
+            update(BackgroundJob)
+            .where(BackgroundJob.id == job_id, BackgroundJob.status == "queued")
+            .values(status="running", worker_id=WORKER_ID, started_at=datetime.utcnow(),
+                    heartbeat_at=datetime.utcnow(), updated_at=datetime.utcnow())
+            .returning(BackgroundJob.job_type, BackgroundJob.params, BackgroundJob.created_by)
+        ).first()
+    if not claimed:
+        return None
+    return {"job_type": claimed.job_type, "params": claimed.params, "created_by": claimed.created_by}
+
+
+def _purge_expired_jobs() -> int:
+    with engine.begin() as conn:
+        return conn.execute(
+            delete(BackgroundJob).where(BackgroundJob.expires_at < datetime.utcnow())
+        ).rowcount or 0
+
+
+job_runner = JobRunner(concurrency=settings.JOB_WORKER_CONCURRENCY)
+
+
+# =====================================================
+# PUBLIC API
+# =====================================================
+
+def submit_job(
+    job_type: str,
+    params: Dict[str, Any],
+    created_by: Optional[uuid.UUID] = None,
+    idempotency_key: Optional[str] = None
+) -> BackgroundJob:
+    """
+    Persist and queue a job. If ``idempotency_key`` was already used by the same
+    submitter for the same job type, the existing job is returned instead.
+    """
+    if job_type not in JOB_HANDLERS:
+        raise ValueError(f"Unknown job type: {job_type}")
+
+    db = SessionLocal()
+    try:
+        if idempotency_key:
+            existing = db.query(BackgroundJob).filter(
+                BackgroundJob.idempotency_key == idempotency_key,
+                BackgroundJob.created_by == created_by,
+                BackgroundJob.job_type == job_type
+            ).first()
+            if existing:
+                return existing
+
+        job = BackgroundJob(
+            job_type=job_type,
+            status="queued",
+            params=jsonable_encoder(params),
+            idempotency_key=idempotency_key,
+            progress=0,
+            created_by=created_by
+        )
+        db.add(job)
+        try:
+            db.commit()
+        except IntegrityError:
+            # Lost a race with a concurrent submit using the same key
+            db.rollback()
+            return db.query(BackgroundJob).filter(
+                BackgroundJob.idempotency_key == idempotency_key,
+                BackgroundJob.created_by == created_by,
+                BackgroundJob.job_type == job_type
+            ).first()
+        db.refresh(job)
+        db.expunge(job)
+    finally:
+        db.close()
+
+    job_runner.enqueue(job.id)
+    return job
+
+
+def cancel_job(job_id: uuid.UUID) -> Optional[str]:
+    """
+    Cancel a queued job, or request cancellation of a running one. Both are
+    conditional UPDATEs, so a job claimed concurrently is never marked
+    cancelled while it runs. Returns "cancelled", "cancellation_requested",
+    or None when the job had already finished.
+    """
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        cancelled = conn.execute(
+            update(BackgroundJob)
+            .where(BackgroundJob.id == job_id, BackgroundJob.status == "queued")
+            .values(status="cancelled", completed_at=now, updated_at=now,
+                    expires_at=now + timedelta(hours=settings.JOB_RESULT_TTL_HOURS))
+            .returning(BackgroundJob.id)
+        ).first()
+        if cancelled:
+            return "cancelled"
+        requested = conn.execute(
+            update(BackgroundJob)
+            .where(BackgroundJob.id == job_id, BackgroundJob.status == "running")
+            .values(cancel_requested=True, updated_at=now)
+            .returning(BackgroundJob.id)
+        ).first()
+    if not requested:
+        return None
+    # Takes effect at once if this process runs the job; otherwise at the owner's next heartbeat
+    job_runner.cancel(job_id)
+    return "cancellation_requested"
+
+
+def get_visible_job(db, job_id: uuid.UUID, user: User) -> BackgroundJob:
+    """Load a job the user may see (their own; admins see all) or raise 404"""
+    job = db.query(BackgroundJob).filter(BackgroundJob.id == job_id).first()
+    if not job or (user.role not in ["admin", "hr_admin"] and job.created_by != user.id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return job
+
+
+def serialize_job(job: BackgroundJob, include_result: bool = True) -> Dict[str, Any]:
+    data = {
+        "job_id": str(job.id),
+        "job_type": job.job_type,
+        "status": job.status,
+        "progress": job.progress or 0,
+        "progress_message": job.progress_message,
+        "cancel_requested": bool(job.cancel_requested),
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "completed_at": job.completed_at.isoformat() if job.completed_at else None,
+        "expires_at": job.expires_at.isoformat() if job.expires_at else None,
+        "status_url": f"/api/v1/jobs/{job.id}",
+    }
+    if include_result:
+        data["result"] = job.result
+    return data
+
+
+def job_accepted_response(job: BackgroundJob) -> JSONResponse:
+    """202 response returned by endpoints running in ``async=true`` mode"""
+    return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content=serialize_job(job, include_result=False))
+
+
+async def start_job_runner():
+    await job_runner.start()
+
+
+async def stop_job_runner():
+    await job_runner.stop()
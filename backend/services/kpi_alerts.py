@@ -0,0 +1,363 @@
+"""
+KPI alert rules, evaluated when a KPI is written.
+
+Dashboards used to rescan every KPI for deviations on each request, and
+nobody was notified. Now ``evaluate_kpi`` runs when a measurement is recorded
+or a KPI's target changes, and the result is kept in ``kpi_alerts``. The
+dashboards and ``/kpis/alerts`` only read that table.
+
+Rules:
+
+* ``deviation``: how far the current value is from ``target_value``, in
+  percent.
+* ``threshold``: the current value is outside the KPI's
+  ``alert_threshold_low``/``alert_threshold_high`` band. This is always
+  critical.
+* ``trend``: the fitted change over the latest ``KPI_ALERT_TREND_WINDOW``
+  measurements (see ``services.timeseries``). It counts when the series moves
+  away from the target, or downwards if the KPI has no target, and the
+  slope confidence reaches ``KPI_ALERT_TREND_CONFIDENCE``.
+* ``rate_of_change``: the change from the previous measurement, in percent.
+
+A KPI has at most one active alert per rule, enforced by a partial unique
+index. A repeated breach updates that alert and increments ``occurrences``
+instead of adding a row.
+
+Alerts clear with hysteresis. An open alert stays active until its metric
+falls ``KPI_ALERT_HYSTERESIS`` below the warning level, or
+``KPI_ALERT_THRESHOLD_MARGIN`` back inside a threshold band. This keeps a
+value hovering at a limit from flapping. Severity only escalates while an
+alert is active.
+
+Notifications are queued when an alert opens or escalates. They go to the
+KPI's creator and to users with one of ``KPI_ALERT_RECIPIENT_ROLES``.
+"""
+
+import logging
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy import case, desc, func, or_, select
+
+from config import settings
+from models import KPI, KPIAlert, User
+from services import timeseries
+from services.notifications import enqueue_notifications
+
+logger = logging.getLogger(__name__)
+
+RULES = ("deviation", "threshold", "trend", "rate_of_change")
+SEVERITIES = ("warning", "critical")
+STATUSES = ("active", "resolved")
+SEVERITY_RANK = {"warning": 1, "critical": 2}
+MIN_TREND_POINTS = 4
+
+
+# =====================================================
+# RULES
+# =====================================================
+# Each rule returns None when it does not apply to the KPI (no target, too
+# few measurements), else an evaluation: the rule metric, the severity it
+# reaches (None below the warning level) and whether an active alert holds.
+
+def _format(value: float) -> str:
+    return f"{value:,.2f}".rstrip("0").rstrip(".")
+
+
+def _graded(metric: float, warning: float, critical: float) -> Dict[str, Any]:
+    return {
+        "metric": round(metric, 2),
+        "severity": "critical" if metric > critical else "warning" if metric > warning else None,
+        "holds": metric > warning * (1 - settings.KPI_ALERT_HYSTERESIS),
+    }
+
+
+def _deviation_rule(kpi: KPI, current: Optional[float], values: List[float]) -> Optional[Dict[str, Any]]:
+    if current is None or not kpi.target_value:
+        return None
+    target = float(kpi.target_value)
+    deviation = abs(current - target) / abs(target) * 100
+    evaluation = _graded(deviation, settings.KPI_ALERT_DEVIATION_WARNING, settings.KPI_ALERT_DEVIATION_CRITICAL)
+    side = "above" if current > target else "below"
+    evaluation["message"] = f"{kpi.name} is {deviation:.1f}% {side} its target of {_format(target)}"
+    evaluation["details"] = {"target_value": target}
+    return evaluation
+
+
+def _beyond(value: float, limit: float, direction: int) -> float:
+    """Percent of the limit by which ``value`` is past it (negative when inside)"""
+    distance = (value - limit) * direction
+    return distance / abs(limit) * 100 if limit else distance
+
+
+def _threshold_rule(kpi: KPI, current: Optional[float], values: List[float]) -> Optional[Dict[str, Any]]:
+    if current is None or (kpi.alert_threshold_low is None and kpi.alert_threshold_high is None):
+        return None
+    breaches = []
+    if kpi.alert_threshold_low is not None:
+        breaches.append((_beyond(current, float(kpi.alert_threshold_low), -1), "below", float(kpi.alert_threshold_low)))
+    if kpi.alert_threshold_high is not None:
+        breaches.append((_beyond(current, float(kpi.alert_threshold_high), 1), "above", float(kpi.alert_threshold_high)))
+    metric, side, limit = max(breaches)
+    return {
+        "metric": round(metric, 2),
+        "severity": "critical" if metric > 0 else None,
+        "holds": metric > -settings.KPI_ALERT_THRESHOLD_MARGIN,
+        "message": f"{kpi.name} is {side} its alert threshold of {_format(limit)} ({_format(current)})",
+        "details": {
+            "alert_threshold_low": float(kpi.alert_threshold_low) if kpi.alert_threshold_low is not None else None,
+            "alert_threshold_high": float(kpi.alert_threshold_high) if kpi.alert_threshold_high is not None else None,
+        },
+    }
+
+
+def _trend_rule(kpi: KPI, current: Optional[float], values: List[float]) -> Optional[Dict[str, Any]]:
+    values = values[-settings.KPI_ALERT_TREND_WINDOW:]
+    if len(values) < MIN_TREND_POINTS:
+        return None
+    padded = timeseries.pad([values])
+    trend = timeseries.linear_trend(padded)
+    change = float(timeseries.trend_percentage(padded, trend)[0]) * 100
+    confidence = float(trend["confidence"][0])
+
+    # Adverse means moving away from the target; without a target, downwards
+    reference = float(kpi.target_value) if kpi.target_value is not None else None
+    latest = current if current is not None else values[-1]
+    if reference is None or latest < reference:
+        adverse = change < 0
+    else:
+        adverse = change > 0 and latest > reference
+    evaluation = _graded(abs(change) if adverse else 0.0,
+                         settings.KPI_ALERT_TREND_WARNING, settings.KPI_ALERT_TREND_CRITICAL)
+    required = settings.KPI_ALERT_TREND_CONFIDENCE
+    if confidence < required:
+        evaluation["severity"] = None
+    evaluation["holds"] = evaluation["holds"] and confidence >= required * (1 - settings.KPI_ALERT_HYSTERESIS)
+    direction = "declined" if change < 0 else "risen"
+    evaluation["message"] = f"{kpi.name} has {direction} {abs(change):.1f}% over its last {len(values)} measurements"
+    evaluation["details"] = {
+        "trend_percentage": round(change, 2),
+        "confidence": round(confidence, 4),
+        "points": len(values),
+    }
+    return evaluation
+
+
+def _rate_of_change_rule(kpi: KPI, current: Optional[float], values: List[float]) -> Optional[Dict[str, Any]]:
+    if len(values) < 2 or values[-2] == 0:
+        return None
+    previous, latest = values[-2], values[-1]
+    change = (latest - previous) / abs(previous) * 100
+    evaluation = _graded(abs(change), settings.KPI_ALERT_CHANGE_WARNING, settings.KPI_ALERT_CHANGE_CRITICAL)
+    direction = "dropped" if change < 0 else "jumped"
+    evaluation["message"] = (f"{kpi.name} {direction} {abs(change):.1f}% since the previous measurement "
+                             f"({_format(previous)} to {_format(latest)})")
+    evaluation["details"] = {"previous_value": previous, "change_percentage": round(change, 2)}
+    return evaluation
+
+
+RULE_EVALUATORS: Dict[str, Callable[[KPI, Optional[float], List[float]], Optional[Dict[str, Any]]]] = {
+    "deviation": _deviation_rule,
+    "threshold": _threshold_rule,
+    "trend": _trend_rule,
+    "rate_of_change": _rate_of_change_rule,
+}
+
+
+# =====================================================
+# EVALUATION
+# =====================================================
+
+def _resolve(alert: KPIAlert, now: datetime):
+    alert.status = "resolved"
+    alert.resolved_at = now
+    alert.last_evaluated_at = now
+
+
+def evaluate_kpi(db, kpi: KPI, measured_at: Optional[datetime] = None) -> Dict[str, int]:
+    """
+    Run every rule against the KPI's current value and latest measurements,
+    and open, update, escalate or resolve its alerts. Joins the caller's
+    transaction; call after the measurement or target change is flushed.
+    """
+    # Serializes concurrent evaluations of one KPI so the active alert stays unique
+    db.execute(select(KPI.id).where(KPI.id == kpi.id).with_for_update())
+    active = {
+        alert.rule: alert
+        for alert in db.query(KPIAlert).filter(KPIAlert.kpi_id == kpi.id, KPIAlert.status == "active").all()
+    }
+    now = datetime.now(timezone.utc)
+    opened, escalated, resolved = [], [], []
+
+    evaluations = {}
+    if kpi.is_active:
+        window = max(settings.KPI_ALERT_TREND_WINDOW, 2)
+        values = timeseries.load_kpi_series(db, [kpi.id], latest=window).get(kpi.id, [])
+        current = float(kpi.current_value) if kpi.current_value is not None else (values[-1] if values else None)
+        for rule, evaluator in RULE_EVALUATORS.items():
+            evaluation = evaluator(kpi, current, values)
+            if evaluation is not None:
+                evaluations[rule] = evaluation
+    else:
+        current = None
+
+    for rule, evaluation in evaluations.items():
+        alert = active.pop(rule, None)
+        if alert is None:
+            if evaluation["severity"]:
+                alert = KPIAlert(
+                    id=uuid.uuid4(), kpi_id=kpi.id, rule=rule, severity=evaluation["severity"], status="active",
+                    value=current, metric=evaluation["metric"], message=evaluation["message"],
+                    details=evaluation["details"], occurrences=1, measured_at=measured_at,
+                    triggered_at=now, last_evaluated_at=now,
+                )
+                db.add(alert)
+                opened.append(alert)
+        elif evaluation["holds"]:
+            alert.value = current
+            alert.metric = evaluation["metric"]
+            alert.message = evaluation["message"]
+            alert.details = evaluation["details"]
+            alert.measured_at = measured_at or alert.measured_at
+            alert.last_evaluated_at = now
+            if evaluation["severity"]:
+                alert.occurrences += 1
+                if SEVERITY_RANK[evaluation["severity"]] > SEVERITY_RANK[alert.severity]:
+                    alert.severity = evaluation["severity"]
+                    escalated.append(alert)
+        else:
+            _resolve(alert, now)
+            resolved.append(alert)
+
+    # Rules that no longer apply (target removed, KPI deactivated) clear their alerts
+    for alert in active.values():
+        _resolve(alert, now)
+        resolved.append(alert)
+
+    queued = 0
+    if opened or escalated:
+        db.flush()
+        queued = notify_alerts(db, kpi, opened + escalated, escalated=set(alert.id for alert in escalated))
+
+    if opened or escalated or resolved:
+        logger.info(f"KPI alerts for {kpi.name}: {len(opened)} opened, {len(escalated)} escalated, "
+                    f"{len(resolved)} resolved")
+    return {"opened": len(opened), "escalated": len(escalated), "resolved": len(resolved), "notifications": queued}
+
+
+def evaluate_all(db, kpi_ids: Optional[Iterable[uuid.UUID]] = None) -> Dict[str, int]:
+    """Re-evaluate many KPIs, e.g. after rule settings change. Joins the caller's transaction"""
+    query = db.query(KPI)
+    if kpi_ids is not None:
+        query = query.filter(KPI.id.in_(list(kpi_ids)))
+    totals = {"kpis": 0, "opened": 0, "escalated": 0, "resolved": 0, "notifications": 0}
+    for kpi in query.all():
+        totals["kpis"] += 1
+        for key, count in evaluate_kpi(db, kpi).items():
+            totals[key] += count
+    return totals
+
+
+def notify_alerts(db, kpi: KPI, alerts: List[KPIAlert], escalated=frozenset()) -> int:
+    """Queue one notification per alert, recipient and platform. Joins the caller's transaction"""
+    recipients = (
+        db.query(User.id, User.email)
+        .filter(
+            User.is_active == True,
+            or_(User.id == kpi.created_by, User.role.in_(settings.KPI_ALERT_RECIPIENT_ROLES)),
+        )
+        .all()
+    )
+    now = datetime.now(timezone.utc)
+    rows = []
+    for alert in alerts:
+        prefix = "escalated to critical" if alert.id in escalated else alert.severity
+        title = f"KPI alert ({prefix}): {kpi.name}"
+        for user_id, email in recipients:
+            metadata = {
+                "kpi_id": str(kpi.id), "alert_id": str(alert.id), "rule": alert.rule,
+                "severity": alert.severity, "email": email,
+            }
+            for platform in settings.KPI_ALERT_PLATFORMS:
+                rows.append({
+                    "id": uuid.uuid4(), "recipient_id": user_id, "type": "alert", "title": title,
+                    "message": alert.message, "platform": platform, "status": "pending",
+                    "scheduled_for": now, "attempts": 0, "metadata": metadata,
+                })
+        alert.notified_at = now
+    return enqueue_notifications(db, rows, commit=False)
+
+
+# =====================================================
+# READS
+# =====================================================
+
+def _alert_filters(kpi_ids=None, status: Optional[str] = "active", severity: Optional[str] = None,
+                   rule: Optional[str] = None) -> List[Any]:
+    filters = []
+    if kpi_ids is not None:
+        filters.append(KPIAlert.kpi_id.in_(kpi_ids))
+    if status is not None:
+        filters.append(KPIAlert.status == status)
+    if severity is not None:
+        filters.append(KPIAlert.severity == severity)
+    if rule is not None:
+        filters.append(KPIAlert.rule == rule)
+    return filters
+
+
+def list_alerts(db, kpi_ids=None, status: Optional[str] = "active", severity: Optional[str] = None,
+                rule: Optional[str] = None, limit: int = 100, offset: int = 0) -> List[Dict[str, Any]]:
+    """Alerts with their KPI, critical first, then by metric and recency"""
+    rows = (
+        db.query(KPIAlert, KPI)
+        .join(KPI, KPI.id == KPIAlert.kpi_id)
+        .filter(*_alert_filters(kpi_ids, status, severity, rule))
+        .order_by(
+            case((KPIAlert.severity == "critical", 0), else_=1),
+            desc(KPIAlert.metric),
+            desc(KPIAlert.triggered_at),
+        )
+        .offset(offset)
+        .limit(limit)
+        .all()
+    )
+    return [serialize_alert(alert, kpi) for alert, kpi in rows]
+
+
+def count_alerts(db, kpi_ids=None, status: Optional[str] = "active") -> Dict[str, int]:
+    """Alert counts per severity from one ``GROUP BY``"""
+    counts = {severity: 0 for severity in SEVERITIES}
+    for severity, count in (
+        db.query(KPIAlert.severity, func.count(KPIAlert.id))
+        .filter(*_alert_filters(kpi_ids, status))
+        .group_by(KPIAlert.severity)
+        .all()
+    ):
+        counts[severity] = count
+    return counts
+
+
+def serialize_alert(alert: KPIAlert, kpi: KPI) -> Dict[str, Any]:
+    return {
+        "id": alert.id,
+        "kpi_id": alert.kpi_id,
+        "kpi_name": kpi.name,
+        "priority": kpi.priority,
+        "rule": alert.rule,
+        "severity": alert.severity,
+        "status": alert.status,
+        "message": alert.message,
+        "current_value": alert.value,
+        "target_value": kpi.target_value,
+        "metric": alert.metric,
+        "deviation_percentage": alert.metric if alert.rule == "deviation" else None,
+        "details": alert.details or {},
+        "occurrences": alert.occurrences,
+        "triggered_at": alert.triggered_at,
+        "last_measured": alert.measured_at,
+        "last_evaluated_at": alert.last_evaluated_at,
+        "notified_at": alert.notified_at,
+        "resolved_at": alert.resolved_at,
+    }
@@ -0,0 +1,283 @@
+"""
+Live survey participation counters.
+
+Each worker keeps in-memory counters per survey:
+* total responses
+* unique respondents
+* running mean of completion time
+* per-department counts
+* a sliding 24h window
+
+The counters are seeded from the database once, on first access. After that
+they are updated incrementally from ``submit_survey_response``, so dashboards
+polling ``/responses/real-time`` never touch ``survey_responses``.
+
+Subscribers (SSE streams and WebSockets) get a snapshot on connect and a
+delta message for every new response. Responses submitted on other workers
+are picked up when counters with subscribers are resynced every
+``LIVE_COUNTER_RESYNC_SECONDS``. A resync costs one set of queries per survey
+per worker, however many dashboards are watching.
+"""
+
+import asyncio
+import logging
+import uuid
+from collections import defaultdict, deque
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional, Set
+
+from config import settings
+from database import SessionLocal
+from models import Employee, Survey, SurveyResponse
+from services.survey_audience import audience_size
+
+logger = logging.getLogger(__name__)
+
+RECENT_WINDOW = timedelta(hours=24)
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+class SurveyNotFound(Exception):
+    pass
+
+
+def _aware(value: Optional[datetime]) -> datetime:
+    if value is None:
+        return datetime.now(timezone.utc)
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+class SurveyCounters:
+    """Aggregates for one survey; ``apply`` is idempotent per response ID"""
+
+    def __init__(self, survey_id: str, target_count: int, survey_status: str):
+        self.survey_id = survey_id
+        self.target_count = target_count
+        self.status = survey_status
+        self.response_ids: Set[str] = set()
+        self.respondents: Set[str] = set()
+        self.timed_count = 0
+        self.mean_completion_time = 0.0
+        self.department_counts: Dict[str, int] = defaultdict(int)
+        self.recent: deque = deque()
+        self.seeded_at = datetime.now(timezone.utc)
+
+    def apply(self, response_id: str, employee_id: Optional[str], department_id: Optional[str],
+              completion_time: Optional[float], submitted_at: datetime) -> bool:
+        if response_id in self.response_ids:
+            return False
+        self.response_ids.add(response_id)
+        if employee_id:
+            self.respondents.add(employee_id)
+        if completion_time is not None:
+            # Welford-style running mean, no need to keep every value
+            self.timed_count += 1
+            self.mean_completion_time += (float(completion_time) - self.mean_completion_time) / self.timed_count
+        if department_id:
+            self.department_counts[department_id] += 1
+        submitted_at = _aware(submitted_at)
+        if submitted_at >= datetime.now(timezone.utc) - RECENT_WINDOW:
+            self.recent.append(submitted_at)
+        return True
+
+    def recent_count(self) -> int:
+        cutoff = datetime.now(timezone.utc) - RECENT_WINDOW
+        while self.recent and self.recent[0] < cutoff:
+            self.recent.popleft()
+        return len(self.recent)
+
+    def snapshot(self) -> Dict[str, Any]:
+        unique = len(self.respondents)
+        return {
+            "survey_id": self.survey_id,
+            "total_responses": len(self.response_ids),
+            "unique_respondents": unique,
+            "response_rate": round(unique / self.target_count * 100, 2) if self.target_count else 0,
+            "avg_completion_time": round(self.mean_completion_time, 2),
+            "recent_responses_24h": self.recent_count(),
+            "department_counts": dict(self.department_counts),
+            "target_count": self.target_count,
+            "status": self.status,
+        }
+
+
+def _seed_counters(survey_id: str) -> SurveyCounters:
+    """Build counters from the database (runs in a worker thread)"""
+    db = SessionLocal()
+    try:
+        survey = db.query(Survey).filter(Survey.id == survey_id).first()
+        if not survey:
+            raise SurveyNotFound(survey_id)
+
+        counters = SurveyCounters(survey_id, audience_size(db, survey), survey.status)
+        rows = (
+            db.query(SurveyResponse.id, SurveyResponse.employee_id, Employee.department_id,
+                     SurveyResponse.completion_time_seconds, SurveyResponse.submitted_at)
+            .outerjoin(Employee, Employee.id == SurveyResponse.employee_id)
+            .filter(SurveyResponse.survey_id == survey_id)
+            .order_by(SurveyResponse.submitted_at)
+            .yield_per(1000)
+        )
+        for response_id, employee_id, department_id, completion_time, submitted_at in rows:
+            counters.apply(
+                str(response_id), str(employee_id) if employee_id else None,
+                str(department_id) if department_id else None, completion_time, submitted_at
+            )
+        return counters
+    finally:
+        db.close()
+
+
+class LiveCounterHub:
+    """Per-process counter cache with pub/sub fan-out to live dashboards"""
+
+    def __init__(self, resync_seconds: float):
+        self.resync_seconds = resync_seconds
+        self._counters: Dict[str, SurveyCounters] = {}
+        self._seeding: Dict[str, asyncio.Future] = {}
+        self._pending: Dict[str, list] = defaultdict(list)
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = defaultdict(set)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._task = asyncio.create_task(self._resync_loop(), name="live-counter-resync")
+        logger.info("✅ Live survey counters started")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        for queues in self._subscribers.values():
+            for queue in queues:
+                queue.put_nowait(None)
+        logger.info("✅ Live survey counters stopped")
+
+    async def get_counters(self, survey_id: uuid.UUID) -> SurveyCounters:
+        """Counters for a survey, seeding them from the database at most once concurrently"""
+        key = str(survey_id)
+        counters = self._counters.get(key)
+        if counters is not None:
+            return counters
+
+        future = self._seeding.get(key) or self._start_seed(key)
+        return await asyncio.shield(future)
+
+    def _start_seed(self, key: str) -> asyncio.Future:
+        # Registered synchronously so responses arriving meanwhile are buffered
+        future = asyncio.ensure_future(self._seed(key))
+        self._seeding[key] = future
+        return future
+
+    async def _seed(self, key: str) -> SurveyCounters:
+        try:
+            counters = await asyncio.get_running_loop().run_in_executor(None, _seed_counters, key)
+            # Responses recorded while the seed query ran; apply() skips duplicates
+            for event in self._pending.pop(key, []):
+                counters.apply(*event)
+            self._counters[key] = counters
+            return counters
+        finally:
+            self._seeding.pop(key, None)
+            self._pending.pop(key, None)
+
+    async def snapshot(self, survey_id: uuid.UUID) -> Dict[str, Any]:
+        return (await self.get_counters(survey_id)).snapshot()
+
+    def record_response(self, survey_id, response_id, employee_id=None, department_id=None,
+                        completion_time=None, submitted_at=None):
+        """Apply a committed response and publish the delta. Safe to call from any thread."""
+        if self._loop is None:
+            return
+        event = (
+            str(response_id), str(employee_id) if employee_id else None,
+            str(department_id) if department_id else None, completion_time, _aware(submitted_at)
+        )
+        self._loop.call_soon_threadsafe(self._apply_event, str(survey_id), event)
+
+    def _apply_event(self, key: str, event: tuple):
+        if key in self._seeding:
+            self._pending[key].append(event)
+            return
+        counters = self._counters.get(key)
+        # Not loaded yet: the first reader seeds from the database, which includes this response
+        if counters is None or not counters.apply(*event):
+            return
+
+        department_id = event[2]
+        self._publish(key, {
+            "type": "delta",
+            "survey_id": key,
+            "total_responses": len(counters.response_ids),
+            "unique_respondents": len(counters.respondents),
+            "avg_completion_time": round(counters.mean_completion_time, 2),
+            "recent_responses_24h": counters.recent_count(),
+            "department_id": department_id,
+            "department_count": counters.department_counts.get(department_id, 0) if department_id else None,
+            "submitted_at": event[4].isoformat(),
+        })
+
+    def _publish(self, key: str, message: Dict[str, Any]):
+        snapshot = None
+        for queue in list(self._subscribers.get(key, ())):
+            if not queue.full():
+                queue.put_nowait(message)
+                continue
+            # Slow consumer: drop its backlog and resend the full state instead;
+            # other subscribers still get the original message
+            while not queue.empty():
+                queue.get_nowait()
+            if snapshot is None:
+                snapshot = {"type": "snapshot", **self._counters[key].snapshot()}
+            queue.put_nowait(snapshot)
+
+    async def subscribe(self, survey_id: uuid.UUID) -> asyncio.Queue:
+        """Queue that receives a snapshot followed by deltas; ``None`` means the hub stopped"""
+        counters = await self.get_counters(survey_id)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        queue.put_nowait({"type": "snapshot", **counters.snapshot()})
+        self._subscribers[str(survey_id)].add(queue)
+        return queue
+
+    def unsubscribe(self, survey_id: uuid.UUID, queue: asyncio.Queue):
+        key = str(survey_id)
+        self._subscribers[key].discard(queue)
+        if not self._subscribers[key]:
+            self._subscribers.pop(key, None)
+
+    async def _resync_loop(self):
+        while True:
+            await asyncio.sleep(self.resync_seconds)
+            now = datetime.now(timezone.utc)
+            for key, counters in list(self._counters.items()):
+                if key not in self._subscribers:
+                    # Unwatched counters are dropped once stale and reseeded on next read
+                    if now - counters.seeded_at > timedelta(seconds=self.resync_seconds):
+                        self._counters.pop(key, None)
+                    continue
+                try:
+                    fresh = await (self._seeding.get(key) or self._start_seed(key))
+                except SurveyNotFound:
+                    self._counters.pop(key, None)
+                    continue
+                except Exception as e:
+                    logger.error(f"Failed to resync live counters for survey {key}: {e}")
+                    continue
+                if len(fresh.response_ids) != len(counters.response_ids) or fresh.status != counters.status:
+                    self._publish(key, {"type": "snapshot", **fresh.snapshot()})
+
+
+live_counters = LiveCounterHub(resync_seconds=settings.LIVE_COUNTER_RESYNC_SECONDS)
+
+
+async def start_live_counters():
+    await live_counters.start()
+
+
+async def stop_live_counters():
+    await live_counters.stop()
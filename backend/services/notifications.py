@@ -0,0 +1,739 @@
+"""
+Notification queue dispatcher.
+
+Survey invitations, reminders and other notifications are written to
+``notification_queue`` with a ``scheduled_for`` time. A background dispatcher
+claims due rows in batches (``FOR UPDATE SKIP LOCKED``, so several app
+instances can dispatch side by side), fans them out concurrently through one
+sender per platform, and records delivery results with one bulk UPDATE per
+outcome.
+
+Each platform has its own concurrency cap and token-bucket rate limit. Failed
+deliveries are retried with exponential backoff by re-scheduling the row, and
+are marked failed after ``NOTIFICATION_MAX_ATTEMPTS``.
+
+Survey notifications are routed by the survey's platform configuration. Slack
+users with a ``slack_user_id`` in their profile settings get a direct message.
+Each configured Slack or Teams channel gets one post for the whole audience,
+not one per recipient. Reminder times come from the schedule's
+``reminder_settings``, and a platform's own ``reminder_schedule`` overrides
+them.
+
+Senders are pluggable: subclass ``NotificationSender`` and call
+``register_sender``. With ``NOTIFICATION_SENDER_MODE=stub`` (the default) every
+platform uses ``StubSender``, which only records deliveries locally.
+"""
+
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+import random
+import smtplib
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from email.message import EmailMessage
+from typing import Any, Dict, Iterable, List, Optional
+
+import httpx
+from sqlalchemy import Text, bindparam, func, insert, literal_column, select, update
+
+from config import settings
+from database import engine
+from models import Employee, NotificationQueue, Survey, SurveyAudience, SurveyResponse, User
+from services.survey_audience import audience_query
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_PLATFORMS = ("slack", "teams", "email", "in_app")
+INSERT_CHUNK_SIZE = 1000
+# Used when neither the platform nor the survey schedule sets reminders
+DEFAULT_REMINDER_SCHEDULES = {"slack": ["1_day"], "teams": ["1_day"], "email": ["3_days", "1_day"]}
+SEND_TIMEOUT_SECONDS = 30
+
+_queue_table = NotificationQueue.__table__
+
+# Plain ``metadata ->> 'survey_id'``, exactly the idx_notification_queue_survey_id
+# expression (JSON ``as_string()`` adds a CAST, which the index would not match)
+_queue_survey_id = NotificationQueue.metadata_.op("->>", return_type=Text)(literal_column("'survey_id'"))
+
+
+class DeliveryError(Exception):
+    """Raised by senders; ``retryable=False`` fails the notification immediately"""
+
+    def __init__(self, message: str, retryable: bool = True, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+
+# =====================================================
+# SENDERS
+# =====================================================
+
+class NotificationSender(ABC):
+    """Base class for platform senders"""
+
+    platform: str = ""
+    rate_limit_per_second: float = 0  # 0 = unlimited
+
+    @abstractmethod
+    async def send(self, notification: Dict[str, Any]):
+        """Deliver one queued row; raise ``DeliveryError`` on failure"""
+
+    async def close(self):
+        pass
+
+
+class StubSender(NotificationSender):
+    """Local sender for development and tests; records deliveries in memory"""
+
+    def __init__(self, platform: str, rate_limit_per_second: float = 0, latency_seconds: float = 0.0,
+                 failure_rate: float = 0.0, keep_last: int = 1000):
+        self.platform = platform
+        self.rate_limit_per_second = rate_limit_per_second
+        self.latency_seconds = latency_seconds
+        self.failure_rate = failure_rate
+        self.keep_last = keep_last
+        self.delivered: List[Dict[str, Any]] = []
+        self.delivered_count = 0
+
+    async def send(self, notification: Dict[str, Any]):
+        if self.latency_seconds:
+            await asyncio.sleep(self.latency_seconds)
+        if self.failure_rate and random.random() < self.failure_rate:
+            raise DeliveryError(f"Simulated {self.platform} failure")
+        self.delivered_count += 1
+        self.delivered.append(notification)
+        if len(self.delivered) > self.keep_last:
+            del self.delivered[: len(self.delivered) - self.keep_last]
+
+
+class InAppSender(NotificationSender):
+    """The queued row is itself the in-app notification; nothing to deliver"""
+
+    platform = "in_app"
+
+    async def send(self, notification: Dict[str, Any]):
+        return None
+
+
+class _HttpSender(NotificationSender):
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=SEND_TIMEOUT_SECONDS)
+        return self._client
+
+    @staticmethod
+    def _raise_for_status(response: httpx.Response):
+        if response.status_code == 429:
+            retry_after = response.headers.get("Retry-After")
+            raise DeliveryError("Rate limited", retry_after=float(retry_after) if retry_after else None)
+        if response.status_code >= 500:
+            raise DeliveryError(f"HTTP {response.status_code}")
+        if response.status_code >= 400:
+            raise DeliveryError(f"HTTP {response.status_code}: {response.text[:200]}", retryable=False)
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class SlackSender(_HttpSender):
+    """Posts via chat.postMessage to the recipient's Slack user ID or a channel"""
+
+    platform = "slack"
+
+    def __init__(self, token: str, rate_limit_per_second: float):
+        super().__init__()
+        self.token = token
+        self.rate_limit_per_second = rate_limit_per_second
+
+    async def send(self, notification: Dict[str, Any]):
+        metadata = notification.get("metadata") or {}
+        channel = metadata.get("slack_user_id") or metadata.get("slack_channel")
+        if not channel:
+            raise DeliveryError("No Slack user or channel for recipient", retryable=False)
+
+        # Channel posts mention the survey's user groups
+        mentions = " ".join(f"<!subteam^{group}>" for group in metadata.get("slack_user_groups") or [])
+        text = f"*{notification['title']}*\n{notification['message']}"
+        response = await self.client.post(
+            "https://slack.com/api/chat.postMessage",
+            headers={"Authorization": f"Bearer {self.token}"},
+            json={"channel": channel, "text": f"{mentions}\n{text}" if mentions else text}
+        )
+        self._raise_for_status(response)
+        payload = response.json()
+        if not payload.get("ok"):
+            error = payload.get("error", "unknown_error")
+            raise DeliveryError(f"Slack error: {error}", retryable=error in ("ratelimited", "internal_error", "service_unavailable"))
+
+
+class TeamsSender(_HttpSender):
+    """
+    Posts a message card to a Teams incoming webhook: the survey channel's
+    webhook from ``channel_webhooks``, or the default one for surveys without
+    channels
+    """
+
+    platform = "teams"
+
+    def __init__(self, webhook_url: Optional[str], channel_webhooks: Dict[str, str], rate_limit_per_second: float):
+        super().__init__()
+        self.webhook_url = webhook_url
+        self.channel_webhooks = channel_webhooks
+        self.rate_limit_per_second = rate_limit_per_second
+
+    async def send(self, notification: Dict[str, Any]):
+        metadata = notification.get("metadata") or {}
+        channel = metadata.get("teams_channel_id")
+        if channel:
+            webhook_url = metadata.get("teams_webhook_url") or self.channel_webhooks.get(channel)
+            if not webhook_url:
+                raise DeliveryError(f"No Teams webhook configured for channel {channel}", retryable=False)
+        else:
+            webhook_url = metadata.get("teams_webhook_url") or self.webhook_url
+        if not webhook_url:
+            raise DeliveryError("No Teams webhook configured", retryable=False)
+
+        response = await self.client.post(webhook_url, json={
+            "@type": "MessageCard",
+            "@context": "https://schema.org/extensions",
+            "title": notification["title"],
+            "text": notification["message"],
+        })
+        self._raise_for_status(response)
+
+
+class EmailSender(NotificationSender):
+    """Sends through SMTP; each send runs in a worker thread"""
+
+    platform = "email"
+
+    def __init__(self, rate_limit_per_second: float):
+        self.rate_limit_per_second = rate_limit_per_second
+
+    def _send_sync(self, address: str, title: str, body: str):
+        message = EmailMessage()
+        message["From"] = settings.SMTP_SENDER
+        message["To"] = address
+        message["Subject"] = title
+        message.set_content(body)
+        with smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT, timeout=SEND_TIMEOUT_SECONDS) as smtp:
+            smtp.starttls()
+            if settings.SMTP_USERNAME:
+                smtp.login(settings.SMTP_USERNAME, settings.SMTP_PASSWORD or "")
+            smtp.send_message(message)
+
+    async def send(self, notification: Dict[str, Any]):
+        address = (notification.get("metadata") or {}).get("email")
+        if not address:
+            raise DeliveryError("No email address for recipient", retryable=False)
+        try:
+            await asyncio.get_running_loop().run_in_executor(
+                None, self._send_sync, address, notification["title"], notification["message"]
+            )
+        except smtplib.SMTPRecipientsRefused as e:
+            raise DeliveryError(f"Recipient refused: {e}", retryable=False)
+        except (smtplib.SMTPException, OSError) as e:
+            raise DeliveryError(f"SMTP error: {e}")
+
+
+NOTIFICATION_SENDERS: Dict[str, NotificationSender] = {}
+
+
+def register_sender(sender: NotificationSender):
+    """Install (or replace) the sender used for ``sender.platform``"""
+    NOTIFICATION_SENDERS[sender.platform] = sender
+
+
+def build_default_senders() -> Dict[str, NotificationSender]:
+    rate_limits = {
+        "slack": settings.SLACK_RATE_LIMIT_PER_SECOND,
+        "teams": settings.TEAMS_RATE_LIMIT_PER_SECOND,
+        "email": settings.EMAIL_RATE_LIMIT_PER_SECOND,
+        "in_app": 0,
+    }
+    if settings.NOTIFICATION_SENDER_MODE != "live":
+        return {platform: StubSender(platform, rate_limits[platform]) for platform in SUPPORTED_PLATFORMS}
+
+    senders: Dict[str, NotificationSender] = {"in_app": InAppSender()}
+    if settings.SLACK_BOT_TOKEN:
+        senders["slack"] = SlackSender(settings.SLACK_BOT_TOKEN, rate_limits["slack"])
+    senders["teams"] = TeamsSender(settings.TEAMS_WEBHOOK_URL, settings.TEAMS_CHANNEL_WEBHOOKS, rate_limits["teams"])
+    if settings.SMTP_HOST:
+        senders["email"] = EmailSender(rate_limits["email"])
+    return senders
+
+
+class RateLimiter:
+    """Async token bucket allowing ``rate`` acquisitions per second"""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self._tokens = max(rate, 1.0)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(max(self.rate, 1.0), self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+# =====================================================
+# QUEUE OPERATIONS
+# =====================================================
+
+def claim_due_notifications(batch_size: int) -> List[Dict[str, Any]]:
+    """Atomically mark up to ``batch_size`` due notifications as 'sending' and return them"""
+    due = (
+        select(NotificationQueue.id)
+        .where(NotificationQueue.status == "pending", NotificationQueue.scheduled_for <= func.now())
+        .order_by(NotificationQueue.scheduled_for)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    with engine.begin() as conn:
+        rows = conn.execute(
+            update(_queue_table)
+            .where(_queue_table.c.id.in_(due))
+            .values(status="sending", claimed_at=func.now(), attempts=func.coalesce(_queue_table.c.attempts, 0) + 1)
+            .returning(
+                _queue_table.c.id, _queue_table.c.recipient_id, _queue_table.c.type, _queue_table.c.title,
+                _queue_table.c.message, _queue_table.c.platform, _queue_table.c.attempts, _queue_table.c["metadata"]
+            )
+        ).mappings().all()
+    return [dict(row) for row in rows]
+
+
+def release_stale_claims() -> int:
+    """Return rows stuck in 'sending' (e.g. the process died mid-batch) to the queue"""
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=settings.NOTIFICATION_CLAIM_TIMEOUT_SECONDS)
+    with engine.begin() as conn:
+        return conn.execute(
+            update(_queue_table)
+            .where(_queue_table.c.status == "sending", _queue_table.c.claimed_at < cutoff)
+            .values(status="pending", claimed_at=None)
+        ).rowcount or 0
+
+
+def filter_answered_reminders(rows: List[Dict[str, Any]]) -> List[uuid.UUID]:
+    """IDs of survey reminders whose recipient has already responded"""
+    reminders = [
+        row for row in rows
+        if row["type"] == "reminder" and (row["metadata"] or {}).get("survey_id") and row["recipient_id"]
+    ]
+    if not reminders:
+        return []
+
+    survey_ids = {row["metadata"]["survey_id"] for row in reminders}
+    recipient_ids = {row["recipient_id"] for row in reminders}
+    with engine.connect() as conn:
+        answered = {
+            (str(survey_id), user_id)
+            for survey_id, user_id in conn.execute(
+                select(SurveyResponse.survey_id, User.id)
+                .join(User, User.employee_id == SurveyResponse.employee_id)
+                .where(SurveyResponse.survey_id.in_(survey_ids), User.id.in_(recipient_ids))
+            )
+        }
+    return [row["id"] for row in reminders if (row["metadata"]["survey_id"], row["recipient_id"]) in answered]
+
+
+def record_delivery_results(
+    sent: Iterable[uuid.UUID] = (),
+    retry: Iterable[Dict[str, Any]] = (),
+    failed: Iterable[Dict[str, Any]] = (),
+    cancelled: Iterable[uuid.UUID] = ()
+):
+    """
+    Persist a batch of outcomes in one transaction. ``retry`` and ``failed``
+    items are ``{"id", "error"}`` dicts; retries also carry ``scheduled_for``.
+    """
+    sent, retry, failed, cancelled = list(sent), list(retry), list(failed), list(cancelled)
+    with engine.begin() as conn:
+        if sent:
+            conn.execute(
+                update(_queue_table).where(_queue_table.c.id.in_(sent))
+                .values(status="sent", sent_at=func.now(), last_error=None)
+            )
+        if cancelled:
+            conn.execute(
+                update(_queue_table).where(_queue_table.c.id.in_(cancelled)).values(status="cancelled")
+            )
+        if retry:
+            conn.execute(
+                update(_queue_table).where(_queue_table.c.id == bindparam("_id"))
+                .values(status="pending", claimed_at=None,
+                        scheduled_for=bindparam("_scheduled_for"), last_error=bindparam("_error")),
+                [{"_id": item["id"], "_scheduled_for": item["scheduled_for"], "_error": item["error"]} for item in retry]
+            )
+        if failed:
+            conn.execute(
+                update(_queue_table).where(_queue_table.c.id == bindparam("_id"))
+                .values(status="failed", last_error=bindparam("_error")),
+                [{"_id": item["id"], "_error": item["error"]} for item in failed]
+            )
+
+
+def retry_delay(attempts: int, retry_after: Optional[float] = None) -> float:
+    """Exponential backoff with jitter; honours a sender-provided Retry-After"""
+    if retry_after:
+        return retry_after
+    base = settings.NOTIFICATION_RETRY_BASE_SECONDS * (2 ** max(0, attempts - 1))
+    return base * random.uniform(0.8, 1.2)
+
+
+# =====================================================
+# DISPATCHER
+# =====================================================
+
+class NotificationDispatcher:
+    """Polls the queue and delivers due notifications in concurrent batches"""
+
+    def __init__(self, senders: Optional[Dict[str, NotificationSender]] = None):
+        self.senders = senders if senders is not None else NOTIFICATION_SENDERS
+        self._limiters: Dict[str, RateLimiter] = {}
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._stop_event: Optional[asyncio.Event] = None
+        self.stats = defaultdict(int)
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        if self.is_running:
+            return
+        released = await asyncio.get_running_loop().run_in_executor(None, release_stale_claims)
+        if released:
+            logger.info(f"Released {released} stale notification claims")
+        self._stop_event = asyncio.Event()
+        self._task = asyncio.create_task(self._run(), name="notification-dispatcher")
+        logger.info(f"✅ Notification dispatcher started ({settings.NOTIFICATION_SENDER_MODE} senders)")
+
+    async def stop(self, timeout: float = 30.0):
+        """Stop polling; the batch in flight is finished and recorded first"""
+        if not self.is_running:
+            return
+        self._stop_event.set()
+        try:
+            await asyncio.wait_for(self._task, timeout=timeout)
+        except asyncio.TimeoutError:
+            # Unrecorded rows stay 'sending' and are released after the claim timeout
+            logger.error(f"Notification dispatcher did not finish its batch within {timeout}s")
+            self._task.cancel()
+        self._task = None
+        for sender in self.senders.values():
+            await sender.close()
+        logger.info("✅ Notification dispatcher stopped")
+
+    async def _run(self):
+        last_release = time.monotonic()
+        while not self._stop_event.is_set():
+            try:
+                claimed = await self.dispatch_batch()
+            except Exception as e:
+                logger.error(f"Notification dispatch failed: {e}")
+                claimed = 0
+
+            if time.monotonic() - last_release > settings.NOTIFICATION_CLAIM_TIMEOUT_SECONDS:
+                last_release = time.monotonic()
+                await asyncio.get_running_loop().run_in_executor(None, release_stale_claims)
+
+            # A full batch means there is probably more due work; keep going
+            if claimed < settings.NOTIFICATION_BATCH_SIZE:
+                try:
+                    await asyncio.wait_for(self._stop_event.wait(), timeout=settings.NOTIFICATION_POLL_INTERVAL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def dispatch_batch(self, batch_size: Optional[int] = None) -> int:
+        """Claim, deliver and record one batch; returns the number of rows claimed"""
+        loop = asyncio.get_running_loop()
+        rows = await loop.run_in_executor(None, claim_due_notifications, batch_size or settings.NOTIFICATION_BATCH_SIZE)
+        if not rows:
+            return 0
+
+        cancelled = set(await loop.run_in_executor(None, filter_answered_reminders, rows))
+        outcome = {"sent": [], "retry": [], "failed": []}
+        await asyncio.gather(*(
+            self._deliver(row, outcome) for row in rows if row["id"] not in cancelled
+        ))
+        await loop.run_in_executor(None, lambda: record_delivery_results(
+            outcome["sent"], outcome["retry"], outcome["failed"], cancelled
+        ))
+
+        self.stats["claimed"] += len(rows)
+        self.stats["cancelled"] += len(cancelled)
+        for key, items in outcome.items():
+            self.stats[key] += len(items)
+        return len(rows)
+
+    def _limits_for(self, sender: NotificationSender):
+        platform = sender.platform
+        if platform not in self._limiters:
+            self._limiters[platform] = RateLimiter(sender.rate_limit_per_second)
+            self._semaphores[platform] = asyncio.Semaphore(settings.NOTIFICATION_PLATFORM_CONCURRENCY)
+        return self._limiters[platform], self._semaphores[platform]
+
+    async def _deliver(self, row: Dict[str, Any], outcome: Dict[str, list]):
+        sender = self.senders.get(row["platform"])
+        if sender is None:
+            outcome["failed"].append({"id": row["id"], "error": f"No sender configured for platform {row['platform']}"})
+            return
+
+        limiter, semaphore = self._limits_for(sender)
+        async with semaphore:
+            await limiter.acquire()
+            try:
+                await asyncio.wait_for(sender.send(row), timeout=SEND_TIMEOUT_SECONDS)
+                outcome["sent"].append(row["id"])
+                return
+            except DeliveryError as e:
+                error, retryable, retry_after = str(e), e.retryable, e.retry_after
+            except asyncio.TimeoutError:
+                error, retryable, retry_after = "Delivery timed out", True, None
+            except Exception as e:
+                error, retryable, retry_after = f"{type(e).__name__}: {e}", True, None
+
+        attempts = row["attempts"] or 1
+        if retryable and attempts < settings.NOTIFICATION_MAX_ATTEMPTS:
+            outcome["retry"].append({
+                "id": row["id"],
+                "error": error,
+                "scheduled_for": datetime.now(timezone.utc) + timedelta(seconds=retry_delay(attempts, retry_after)),
+            })
+        else:
+            outcome["failed"].append({"id": row["id"], "error": error})
+
+
+notification_dispatcher = NotificationDispatcher()
+
+
+async def start_notification_dispatcher():
+    NOTIFICATION_SENDERS.update(build_default_senders())
+    await notification_dispatcher.start()
+
+
+async def stop_notification_dispatcher():
+    await notification_dispatcher.stop()
+
+
+# =====================================================
+# SURVEY INVITATIONS & REMINDERS
+# =====================================================
+
+def enqueue_notifications(db, notifications: List[Dict[str, Any]], commit: bool = True) -> int:
+    """Bulk insert queue rows (dicts of NotificationQueue columns) in chunks"""
+    for start in range(0, len(notifications), INSERT_CHUNK_SIZE):
+        db.execute(insert(_queue_table), notifications[start:start + INSERT_CHUNK_SIZE])
+    if commit:
+        db.commit()
+    return len(notifications)
+
+
+def survey_platforms(survey: Survey) -> Dict[str, Dict[str, Any]]:
+    """Configured delivery platforms for a survey; in-app only when none are set"""
+    integrations = survey.platform_integrations or {}
+    platforms = {
+        platform: integrations[platform]
+        for platform in ("slack", "teams", "email")
+        if isinstance(integrations.get(platform), dict)
+    }
+    return platforms or {"in_app": {}}
+
+
+def _parse_offset(value: str) -> Optional[timedelta]:
+    """'3_days' / '12_hours' -> timedelta"""
+    try:
+        amount, unit = str(value).split("_", 1)
+        unit = unit.rstrip("s")
+        if unit == "day":
+            return timedelta(days=int(amount))
+        if unit == "hour":
+            return timedelta(hours=int(amount))
+    except ValueError:
+        pass
+    return None
+
+
+def reminder_offsets(platform: str, config: Dict[str, Any], defaults: Optional[Dict[str, Any]] = None) -> List[timedelta]:
+    """
+    Reminder offsets before ``end_date``. ``defaults`` is the schedule's
+    ``reminder_settings`` (``{"enabled", "schedule"}``). The platform's
+    ``reminder_enabled`` and ``reminder_schedule`` override it when set.
+    """
+    defaults = defaults if isinstance(defaults, dict) else {}
+    enabled = config.get("reminder_enabled")
+    if enabled is None:
+        enabled = defaults.get("enabled", True)
+    if not enabled:
+        return []
+    schedule = (
+        config.get("reminder_schedule")
+        or defaults.get("schedule")
+        or DEFAULT_REMINDER_SCHEDULES.get(platform, [])
+    )
+    return [offset for offset in (_parse_offset(value) for value in schedule) if offset]
+
+
+def resolve_survey_recipients(db, survey: Survey):
+    """(user_id, email, employee_id, profile_settings) rows for the survey's target audience"""
+    if survey.audience_resolved_at is not None:
+        audience = select(SurveyAudience.employee_id).where(SurveyAudience.survey_id == survey.id)
+    else:
+        audience = select(audience_query(survey.id).subquery().c.id)
+    return (
+        db.query(User.id, User.email, User.employee_id, User.profile_settings)
+        .join(Employee, Employee.id == User.employee_id)
+        .filter(User.is_active == True, Employee.is_active == True, User.employee_id.in_(audience))
+        .all()
+    )
+
+
+def notification_routes(platform: str, config: Dict[str, Any], recipients) -> List[Dict[str, Any]]:
+    """
+    Delivery targets for one platform as ``{"recipient_id", "metadata"}``
+    dicts. Metadata carries the routing the sender needs, and channel targets
+    have no recipient.
+    """
+    if platform == "slack":
+        # Users with a known Slack ID get a DM; everyone else is reached through the channels
+        routes = [
+            {"recipient_id": user_id, "metadata": {"email": email, "employee_id": str(employee_id),
+                                                   "slack_user_id": (profile or {}).get("slack_user_id")}}
+            for user_id, email, employee_id, profile in recipients
+            if (profile or {}).get("slack_user_id")
+        ]
+        groups = list(config.get("user_groups") or [])
+        routes += [
+            {"recipient_id": None, "metadata": {"slack_channel": channel, "slack_user_groups": groups}}
+            for channel in config.get("channel_ids") or []
+        ]
+        return routes
+    if platform == "teams":
+        channels = config.get("channel_ids") or []
+        team_ids = list(config.get("team_ids") or [])
+        if not channels:
+            # Default webhook
+            return [{"recipient_id": None, "metadata": {"teams_team_ids": team_ids}}]
+        return [
+            {"recipient_id": None, "metadata": {"teams_channel_id": channel, "teams_team_ids": team_ids}}
+            for channel in channels
+        ]
+    return [
+        {"recipient_id": user_id, "metadata": {"email": email, "employee_id": str(employee_id)}}
+        for user_id, email, employee_id, _ in recipients
+    ]
+
+
+def queue_survey_notifications(
+    db,
+    survey: Survey,
+    send_at: Optional[datetime] = None,
+    include_reminders: bool = True,
+    commit: bool = True
+) -> Dict[str, Any]:
+    """
+    Queue invitations (and reminders before ``end_date``) for the survey's
+    audience on every configured platform, routed by ``notification_routes``.
+    Pending notifications previously queued for the survey are cancelled first,
+    so re-queueing never double-sends. With ``commit=False`` the rows join the
+    caller's transaction. Reminder defaults come from the schedule's
+    ``reminder_settings``; a scheduled instance uses its parent's schedule.
+    """
+    now = datetime.now(timezone.utc)
+    send_at = send_at or now
+    if send_at.tzinfo is None:
+        send_at = send_at.replace(tzinfo=timezone.utc)
+    end_date = survey.end_date
+    if end_date is not None and end_date.tzinfo is None:
+        end_date = end_date.replace(tzinfo=timezone.utc)
+
+    cancelled = db.query(NotificationQueue).filter(
+        NotificationQueue.status == "pending",
+        _queue_survey_id == str(survey.id)
+    ).update({NotificationQueue.status: "cancelled"}, synchronize_session=False)
+
+    recipients = resolve_survey_recipients(db, survey)
+    platforms = survey_platforms(survey)
+    integrations = survey.platform_integrations or {}
+    if "scheduling" not in integrations and survey.parent_survey_id:
+        integrations = db.query(Survey.platform_integrations).filter(Survey.id == survey.parent_survey_id).scalar() or {}
+    reminder_settings = (integrations.get("scheduling") or {}).get("reminder_settings")
+    invitation_message = f"You're invited to take the survey \"{survey.title}\"."
+    rows = []
+    counts = defaultdict(int)
+
+    for platform, config in platforms.items():
+        reminder_times = []
+        if include_reminders and end_date is not None:
+            reminder_times = [
+                end_date - offset for offset in reminder_offsets(platform, config, reminder_settings)
+                if end_date - offset > send_at
+            ]
+
+        routes = notification_routes(platform, config, recipients)
+        if not routes:
+            logger.warning(f"Survey {survey.id} has no {platform} recipients or channels to notify")
+        for route in routes:
+            metadata = {"survey_id": str(survey.id), **route["metadata"]}
+            rows.append({
+                "id": uuid.uuid4(), "recipient_id": route["recipient_id"], "type": "survey_invitation",
+                "title": survey.title, "message": invitation_message, "platform": platform,
+                "status": "pending", "scheduled_for": send_at, "attempts": 0, "metadata": metadata,
+            })
+            for remind_at in reminder_times:
+                rows.append({
+                    "id": uuid.uuid4(), "recipient_id": route["recipient_id"], "type": "reminder",
+                    "title": f"Reminder: {survey.title}",
+                    "message": f"The survey \"{survey.title}\" closes on {end_date:%Y-%m-%d}.",
+                    "platform": platform, "status": "pending", "scheduled_for": remind_at,
+                    "attempts": 0, "metadata": metadata,
+                })
+            counts[platform] += 1 + len(reminder_times)
+
+    enqueue_notifications(db, rows, commit=commit)
+    return {
+        "survey_id": str(survey.id),
+        "recipients": len(recipients),
+        "queued": len(rows),
+        "by_platform": dict(counts),
+        "previously_pending_cancelled": cancelled,
+        "send_at": send_at.isoformat(),
+    }
+
+
+def survey_notification_status(db, survey_id: uuid.UUID) -> Dict[str, Any]:
+    """Delivery counts for a survey grouped by type, platform and status"""
+    rows = db.query(
+        NotificationQueue.type, NotificationQueue.platform, NotificationQueue.status, func.count(NotificationQueue.id)
+    ).filter(
+        _queue_survey_id == str(survey_id)
+    ).group_by(
+        NotificationQueue.type, NotificationQueue.platform, NotificationQueue.status
+    ).all()
+
+    summary: Dict[str, Dict[str, Dict[str, int]]] = defaultdict(lambda: defaultdict(dict))
+    for notification_type, platform, status, count in rows:
+        summary[notification_type][platform][status] = count
+    return {"survey_id": str(survey_id), "notifications": {k: dict(v) for k, v in summary.items()}}
@@ -0,0 +1,244 @@
+"""
+Org hierarchy index.
+
+``Employee.manager_id`` is an adjacency list, so answering "is X somewhere
+above Y?" used to take a chain of lookups, and permission checks only
+recognised direct reports. There are two indexes over it:
+
+* ``employee_hierarchy``, a closure table (ancestor, descendant, depth)
+  maintained by a trigger on ``employees`` (migration
+  20261019_org_hierarchy.sql). Use it in SQL for "everyone under X"
+  filters; see ``reports_subquery``.
+* ``OrgTree``, an in-memory tree per worker with preorder intervals. Each
+  employee gets a preorder index and a subtree size. "Is A an ancestor of B"
+  is then two integer comparisons, and "all reports under A" is a contiguous
+  slice of the preorder list.
+
+The tree is rebuilt only when the employees table changes, detected by a
+cheap (count, max(updated_at)) stamp checked at most every
+``ORG_HIERARCHY_REFRESH_SECONDS``. Manager changes bump ``updated_at``
+through the existing trigger.
+"""
+
+import logging
+import statistics
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, select
+
+from config import settings
+from database import SessionLocal
+from models import Employee, EmployeeHierarchy
+
+logger = logging.getLogger(__name__)
+
+NARROW_SPAN = 3
+WIDE_SPAN = 15
+
+
+class OrgTree:
+    """Immutable snapshot of the reporting lines"""
+
+    def __init__(self, rows: Iterable[Tuple[Any, Any, Any]]):
+        """``rows`` are (employee_id, manager_id, department_id)"""
+        self.manager: Dict[str, Optional[str]] = {}
+        self.department: Dict[str, Optional[str]] = {}
+        for employee_id, manager_id, department_id in rows:
+            self.manager[str(employee_id)] = str(manager_id) if manager_id else None
+            self.department[str(employee_id)] = str(department_id) if department_id else None
+
+        self.children: Dict[str, List[str]] = {employee_id: [] for employee_id in self.manager}
+        roots = []
+        for employee_id, manager_id in self.manager.items():
+            if manager_id in self.children and manager_id != employee_id:
+                self.children[manager_id].append(employee_id)
+            else:
+                roots.append(employee_id)
+
+        self.order: List[str] = []
+        self.index: Dict[str, int] = {}
+        self.size: Dict[str, int] = {}
+        self.depth: Dict[str, int] = {}
+        self.height: Dict[str, int] = {}
+        for root in roots:
+            self._walk(root)
+        # Employees on a manager_id cycle are unreachable from any root; cut the cycle where found
+        for employee_id in self.manager:
+            if employee_id not in self.index:
+                logger.warning(f"Reporting cycle through employee {employee_id}; treating it as a root")
+                self._walk(employee_id)
+
+    def _walk(self, root: str):
+        # Iterative preorder DFS; each employee is entered once, so manager_id cycles terminate
+        self.depth[root] = 0
+        stack = [root]
+        entered = []
+        while stack:
+            node = stack.pop()
+            self.index[node] = len(self.order)
+            self.order.append(node)
+            entered.append(node)
+            for child in reversed(self.children[node]):
+                if child not in self.index and child not in self.depth:
+                    self.depth[child] = self.depth[node] + 1
+                    stack.append(child)
+        # Children finish before their parents in reverse preorder
+        for node in reversed(entered):
+            subtree = [child for child in self.children[node] if self.depth[child] == self.depth[node] + 1
+                       and self.index[child] > self.index[node]]
+            self.size[node] = 1 + sum(self.size[child] for child in subtree)
+            self.height[node] = 1 + max((self.height[child] for child in subtree), default=-1)
+
+    def __contains__(self, employee_id) -> bool:
+        return str(employee_id) in self.index
+
+    def is_ancestor(self, ancestor_id, employee_id) -> bool:
+        """True when ``employee_id`` reports to ``ancestor_id`` at any depth"""
+        a = self.index.get(str(ancestor_id))
+        b = self.index.get(str(employee_id))
+        if a is None or b is None:
+            return False
+        return a < b < a + self.size[str(ancestor_id)]
+
+    def reports_under(self, manager_id, max_depth: Optional[int] = None) -> List[str]:
+        """Everyone below ``manager_id``, in preorder; ``max_depth=1`` is direct reports only"""
+        key = str(manager_id)
+        if key not in self.index:
+            return []
+        start = self.index[key]
+        reports = self.order[start + 1:start + self.size[key]]
+        if max_depth is not None:
+            limit = self.depth[key] + max_depth
+            reports = [employee_id for employee_id in reports if self.depth[employee_id] <= limit]
+        return reports
+
+    def direct_reports(self, manager_id) -> List[str]:
+        return list(self.children.get(str(manager_id), []))
+
+    def management_chain(self, employee_id) -> List[str]:
+        """Managers above ``employee_id``, nearest first"""
+        chain, seen = [], {str(employee_id)}
+        manager_id = self.manager.get(str(employee_id))
+        while manager_id and manager_id in self.manager and manager_id not in seen:
+            chain.append(manager_id)
+            seen.add(manager_id)
+            manager_id = self.manager[manager_id]
+        return chain
+
+    def span_of_control(self, root_id=None, department_id=None) -> Dict[str, Any]:
+        """Per-manager spans and layer counts for a subtree, a department or the whole org"""
+        if root_id is not None:
+            scope = [str(root_id)] + self.reports_under(root_id) if root_id in self else []
+        else:
+            scope = self.order
+        if department_id is not None:
+            scope = [employee_id for employee_id in scope if self.department[employee_id] == str(department_id)]
+
+        managers = [
+            {
+                "employee_id": employee_id,
+                "department_id": self.department[employee_id],
+                "direct_reports": len(self.children[employee_id]),
+                "total_reports": self.size[employee_id] - 1,
+                "layers_below": self.height[employee_id],
+                "level": self.depth[employee_id],
+            }
+            for employee_id in scope if self.children[employee_id]
+        ]
+        managers.sort(key=lambda row: row["direct_reports"], reverse=True)
+        spans = [row["direct_reports"] for row in managers]
+        levels = [self.depth[employee_id] for employee_id in scope]
+        return {
+            "employees": len(scope),
+            "managers": len(managers),
+            "average_span": round(statistics.mean(spans), 2) if spans else 0,
+            "median_span": statistics.median(spans) if spans else 0,
+            "max_span": max(spans, default=0),
+            "layers": max(levels) - min(levels) + 1 if levels else 0,
+            "narrow_span_managers": sum(1 for span in spans if span <= NARROW_SPAN),
+            "wide_span_managers": sum(1 for span in spans if span >= WIDE_SPAN),
+            "by_manager": managers,
+        }
+
+
+def _load_rows(db) -> List[Tuple[Any, Any, Any]]:
+    return db.execute(select(Employee.id, Employee.manager_id, Employee.department_id)).all()
+
+
+def _stamp(db) -> Tuple[int, Any]:
+    return tuple(db.execute(select(func.count(Employee.id), func.max(Employee.updated_at))).one())
+
+
+class OrgHierarchyCache:
+    """Per-worker OrgTree, rebuilt when the employees stamp changes"""
+
+    def __init__(self, refresh_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self._tree: Optional[OrgTree] = None
+        self._stamp = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def tree(self, db=None) -> OrgTree:
+        """Current tree; ``db`` is an optional session to run the staleness check on"""
+        if self._tree is not None and time.monotonic() - self._checked_at < self.refresh_seconds:
+            return self._tree
+        with self._lock:
+            if self._tree is not None and time.monotonic() - self._checked_at < self.refresh_seconds:
+                return self._tree
+            session = db or SessionLocal()
+            try:
+                stamp = _stamp(session)
+                if self._tree is None or stamp != self._stamp:
+                    started = time.perf_counter()
+                    self._tree = OrgTree(_load_rows(session))
+                    self._stamp = stamp
+                    logger.info(f"Org hierarchy rebuilt: {len(self._tree.order)} employees "
+                                f"in {(time.perf_counter() - started) * 1000:.0f}ms")
+                self._checked_at = time.monotonic()
+            finally:
+                if db is None:
+                    session.close()
+        return self._tree
+
+    def invalidate(self):
+        """Force a stamp check on the next access (after a local manager/department change)"""
+        self._checked_at = 0.0
+        self._stamp = None
+
+
+org_hierarchy = OrgHierarchyCache(refresh_seconds=settings.ORG_HIERARCHY_REFRESH_SECONDS)
+
+
+def _as_uuid(value) -> Optional[uuid.UUID]:
+    try:
+        return value if isinstance(value, uuid.UUID) else uuid.UUID(str(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def manages(db, manager_id, employee_id) -> bool:
+    """True when ``employee_id`` is in ``manager_id``'s reporting line at any depth"""
+    if not manager_id or not employee_id:
+        return False
+    return org_hierarchy.tree(db).is_ancestor(manager_id, employee_id)
+
+
+def can_access_employee(db, current_user, employee_id) -> bool:
+    """Admins/HR see everyone, employees see themselves, managers see their whole reporting line"""
+    if current_user.role in ["admin", "hr_admin"]:
+        return True
+    if current_user.employee_id and str(current_user.employee_id) == str(employee_id):
+        return True
+    return current_user.role == "manager" and manages(db, current_user.employee_id, employee_id)
+
+
+def reports_subquery(manager_id, include_self: bool = False):
+    """``SELECT descendant_id`` from the closure table, for ``Employee.id.in_(...)`` filters"""
+    query = select(EmployeeHierarchy.descendant_id).where(EmployeeHierarchy.ancestor_id == _as_uuid(manager_id))
+    if not include_self:
+        query = query.where(EmployeeHierarchy.depth > 0)
+    return query
@@ -0,0 +1,174 @@
+"""
+Keyset (cursor) pagination helpers shared by list endpoints.
+
+A cursor is an opaque, URL-safe token that encodes the (sort_key, id) pair of
+the last row on a page. The next page is fetched with a row-value comparison
+on those two columns, so a composite index on (sort_key, id) turns every page
+into an index range scan instead of an OFFSET scan over all previous rows.
+Endpoints keep accepting ``skip`` as a fallback when no cursor is given.
+"""
+
+import base64
+import json
+import logging
+import uuid
+from datetime import date, datetime
+from typing import Any, List, Optional, Sequence, Tuple
+
+from sqlalchemy import func, select, text, tuple_
+from sqlalchemy.orm import Query, Session
+
+logger = logging.getLogger(__name__)
+
+COUNT_MODE_PATTERN = "^(exact|approximate|none)$"
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a client sends a cursor that cannot be decoded"""
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"t": "dt", "v": value.isoformat()}
+    if isinstance(value, date):
+        return {"t": "d", "v": value.isoformat()}
+    if isinstance(value, uuid.UUID):
+        return {"t": "uuid", "v": str(value)}
+    return {"t": "raw", "v": value}
+
+
+def _decode_value(payload: Any) -> Any:
+    kind, value = payload.get("t"), payload.get("v")
+    if value is None:
+        return None
+    if kind == "dt":
+        return datetime.fromisoformat(value)
+    if kind == "d":
+        return date.fromisoformat(value)
+    if kind == "uuid":
+        return uuid.UUID(value)
+    return value
+
+
+def encode_cursor(sort_value: Any, row_id: Any) -> str:
+    """Encode the (sort_key, id) of a row into an opaque cursor"""
+    payload = {"k": _encode_value(sort_value), "id": _encode_value(row_id)}
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, Any]:
+    """Decode a cursor back into its (sort_key, id) pair"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return _decode_value(payload["k"]), _decode_value(payload["id"])
+    except Exception as e:
+        raise InvalidCursorError(f"Invalid pagination cursor: {e}")
+
+
+def keyset_paginate(
+    query,
+    sort_column,
+    id_column,
+    limit: int,
+    cursor: Optional[str] = None,
+    skip: int = 0,
+    descending: bool = True
+):
+    """
+    Apply keyset ordering and filtering to a ``Query`` or ``Select``.
+
+    One extra row is requested so that ``build_page`` can tell whether there
+    is a next page without a separate COUNT. When no cursor is supplied the
+    legacy ``skip`` offset is honoured so existing clients keep working.
+    """
+    if cursor:
+        sort_value, row_id = decode_cursor(cursor)
+        boundary = tuple_(sort_column, id_column)
+        if descending:
+            query = query.filter(boundary < tuple_(sort_value, row_id))
+        else:
+            query = query.filter(boundary > tuple_(sort_value, row_id))
+
+    if descending:
+        query = query.order_by(None).order_by(sort_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(None).order_by(sort_column.asc(), id_column.asc())
+
+    if skip and not cursor:
+        query = query.offset(skip)
+
+    return query.limit(limit + 1)
+
+
+def build_page(
+    rows: Sequence[Any],
+    limit: int,
+    sort_attr: str,
+    id_attr: str = "id"
+) -> Tuple[List[Any], Optional[str]]:
+    """Trim the look-ahead row and return (items, next_cursor)"""
+    items = list(rows[:limit])
+    if len(rows) <= limit or not items:
+        return items, None
+
+    last = items[-1]
+    return items, encode_cursor(getattr(last, sort_attr), getattr(last, id_attr))
+
+
+def approximate_count_statement(table_name: str):
+    """Planner row estimate for a table, read from ``pg_class.reltuples``"""
+    return text(
+        "SELECT GREATEST(reltuples, 0)::bigint FROM pg_class "
+        "WHERE oid = to_regclass(:table_name)"
+    ).bindparams(table_name=table_name)
+
+
+def approximate_count(db: Session, table_name: str) -> Optional[int]:
+    """
+    Return the planner's row estimate for ``table_name``.
+
+    The estimate covers the whole table, ignoring any filters, and is only as
+    fresh as the last ANALYZE/autovacuum. Returns None when the database does
+    not expose ``pg_class`` (e.g. the SQLite fallback).
+    """
+    if db.bind is not None and db.bind.dialect.name != "postgresql":
+        return None
+    try:
+        return db.execute(approximate_count_statement(table_name)).scalar()
+    except Exception as e:
+        logger.warning(f"Could not read row estimate for {table_name}: {e}")
+        return None
+
+
+def count_total(db: Session, query, table_name: str, mode: str) -> Tuple[Optional[int], bool]:
+    """
+    Resolve the total for a page according to ``mode``.
+
+    Returns (total, is_approximate). ``approximate`` falls back to an exact
+    count when no planner estimate is available.
+    """
+    if mode == "none":
+        return None, False
+
+    if mode == "approximate":
+        estimate = approximate_count(db, table_name)
+        if estimate is not None:
+            return estimate, True
+
+    if isinstance(query, Query):
+        return query.order_by(None).count(), False
+
+    count_stmt = select(func.count()).select_from(query.order_by(None).subquery())
+    return db.execute(count_stmt).scalar(), False
+
+
+def set_pagination_headers(response, next_cursor: Optional[str], total: Optional[int] = None, approximate: bool = False):
+    """Expose cursor and total metadata on endpoints that return bare lists"""
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    if total is not None:
+        response.headers["X-Total-Count"] = str(total)
+        if approximate:
+            response.headers["X-Total-Count-Approximate"] = "true"
@@ -0,0 +1,244 @@
+"""
+Performance analytics.
+
+The team performance, feedback culture and dashboard analytics used to load
+every review and feedback row in scope and count them in Python. Here each
+figure is a grouped query:
+
+* rating histograms come from ``GROUP BY rating``;
+* averages and rates come from aggregates with ``FILTER`` clauses;
+* monthly trends group by ``date_trunc('month', created_at)`` and join to a
+  ``generate_series`` of months, so empty months are reported as zeros;
+* rolling averages are window functions over those months.
+
+Result sizes are bounded by the number of ratings, feedback types and months,
+so memory use stays flat as review history grows. Callers pass the
+population as a SELECT of employee IDs (see ``employee_scope``), which is
+applied as an ``IN (subquery)`` filter rather than a materialized ID list.
+"""
+
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import DateTime, cast, distinct, func, literal_column, select
+
+from models import Department, Employee, Feedback, PerformanceReview
+from services.org_hierarchy import reports_subquery
+
+logger = logging.getLogger(__name__)
+
+RATINGS = (1, 2, 3, 4, 5)
+TOP_PERFORMER_RATING = 4
+FEEDBACK_TYPES = ("peer", "upward", "downward", "self")
+ROLLING_MONTHS = 3
+
+
+def employee_scope(department_id=None, manager_employee_id=None, active_only: bool = True):
+    """SELECT employee_id for a department, or everyone under a manager, for ``IN`` filters"""
+    query = select(Employee.id)
+    if active_only:
+        query = query.where(Employee.is_active == True)
+    if department_id is not None:
+        query = query.where(Employee.department_id == department_id)
+    elif manager_employee_id is not None:
+        query = query.where(Employee.id.in_(reports_subquery(manager_employee_id)))
+    return query
+
+
+def _rate(part, whole) -> float:
+    return round(part / whole * 100, 2) if whole else 0
+
+
+def _round(value) -> Optional[float]:
+    return round(float(value), 2) if value is not None else None
+
+
+def _review_filters(employee_ids=None, since: Optional[datetime] = None) -> List[Any]:
+    filters = []
+    if employee_ids is not None:
+        filters.append(PerformanceReview.employee_id.in_(employee_ids))
+    if since is not None:
+        filters.append(PerformanceReview.created_at >= since)
+    return filters
+
+
+def count_employees(db, employee_ids) -> int:
+    return db.query(func.count()).select_from(employee_ids.subquery()).scalar()
+
+
+def review_summary(db, employee_ids=None, since: Optional[datetime] = None) -> Dict[str, Any]:
+    """Rating histogram, average and top-performer rate from one ``GROUP BY rating``"""
+    rows = (
+        db.query(PerformanceReview.rating, func.count(PerformanceReview.id))
+        .filter(*_review_filters(employee_ids, since))
+        .group_by(PerformanceReview.rating)
+        .all()
+    )
+    distribution = {rating: 0 for rating in RATINGS}
+    total = rating_sum = top = 0
+    for rating, count in rows:
+        if rating in distribution:
+            distribution[rating] += count
+        total += count
+        rating_sum += rating * count
+        if rating >= TOP_PERFORMER_RATING:
+            top += count
+    return {
+        "total_reviews": total,
+        "average_rating": round(rating_sum / total, 2) if total else None,
+        "top_performer_rate": _rate(top, total),
+        "rating_distribution": distribution,
+    }
+
+
+def _months_since(since: datetime):
+    """One row per calendar month from ``since`` through the current month"""
+    start = func.date_trunc("month", cast(since, DateTime(timezone=True)))
+    return select(
+        func.generate_series(start, func.date_trunc("month", func.now()), literal_column("interval '1 month'"))
+        .label("month")
+    ).subquery("months")
+
+
+def _monthly_trend(db, created_at, rating, since: datetime, filters: List[Any]) -> List[Dict[str, Any]]:
+    month = func.date_trunc("month", created_at)
+    buckets = (
+        select(
+            month.label("month"),
+            func.count().label("total"),
+            func.count(rating).label("rated"),
+            func.sum(rating).label("rating_sum"),
+            func.count().filter(rating >= TOP_PERFORMER_RATING).label("top"),
+        )
+        .where(created_at >= since, *filters)
+        .group_by(month)
+        .subquery("buckets")
+    )
+    months = _months_since(since)
+    window = {"order_by": months.c.month, "rows": (-(ROLLING_MONTHS - 1), 0)}
+    rated = func.coalesce(buckets.c.rated, 0)
+    rating_sum = func.coalesce(buckets.c.rating_sum, 0)
+    rows = db.execute(
+        select(
+            months.c.month,
+            func.coalesce(buckets.c.total, 0).label("total"),
+            rated.label("rated"),
+            func.coalesce(buckets.c.top, 0).label("top"),
+            (rating_sum / func.nullif(rated, 0)).label("average_rating"),
+            (func.sum(rating_sum).over(**window)
+             / func.nullif(func.sum(rated).over(**window), 0)).label("rolling_average_rating"),
+        )
+        .select_from(months.outerjoin(buckets, buckets.c.month == months.c.month))
+        .order_by(months.c.month)
+    ).all()
+    return [
+        {
+            "month": row.month.strftime("%Y-%m"),
+            "count": row.total,
+            "rated": row.rated,
+            "top": row.top,
+            "average_rating": _round(row.average_rating),
+            "rolling_average_rating": _round(row.rolling_average_rating),
+        }
+        for row in rows
+    ]
+
+
+def review_trend(db, since: datetime, employee_ids=None) -> List[Dict[str, Any]]:
+    """Reviews, average rating and top-performer rate per month, with a rolling average"""
+    return [
+        {
+            "month": month["month"],
+            "reviews": month["count"],
+            "average_rating": month["average_rating"],
+            "rolling_average_rating": month["rolling_average_rating"],
+            "top_performer_rate": _rate(month["top"], month["count"]),
+        }
+        for month in _monthly_trend(
+            db, PerformanceReview.created_at, PerformanceReview.rating, since, _review_filters(employee_ids)
+        )
+    ]
+
+
+def department_ratings(db) -> List[Dict[str, Any]]:
+    """Average review rating of every department; departments without reviews report 0"""
+    rows = (
+        db.query(Department.name, func.avg(PerformanceReview.rating))
+        .outerjoin(Employee, Employee.department_id == Department.id)
+        .outerjoin(PerformanceReview, PerformanceReview.employee_id == Employee.id)
+        .group_by(Department.id, Department.name)
+        .order_by(Department.name)
+        .all()
+    )
+    return [{"name": name, "value": _round(average) or 0} for name, average in rows]
+
+
+def _feedback_filters(recipient_ids=None) -> List[Any]:
+    return [Feedback.recipient_id.in_(recipient_ids)] if recipient_ids is not None else []
+
+
+def count_feedback(db, recipient_ids=None, since: Optional[datetime] = None) -> int:
+    filters = _feedback_filters(recipient_ids)
+    if since is not None:
+        filters.append(Feedback.created_at >= since)
+    return db.query(func.count(Feedback.id)).filter(*filters).scalar()
+
+
+def feedback_summary(db, recent_since: datetime, recipient_ids=None, population=None) -> Dict[str, Any]:
+    """
+    Totals, recent velocity, anonymity and quality in one aggregate, plus the
+    type histogram and giver participation. ``population`` is the set of
+    employees whose participation is measured (defaults to all active).
+    """
+    filters = _feedback_filters(recipient_ids)
+    totals = db.query(
+        func.count(Feedback.id).label("total"),
+        func.count(Feedback.id).filter(Feedback.created_at >= recent_since).label("recent"),
+        func.count(Feedback.id).filter(Feedback.is_anonymous == True).label("anonymous"),
+        func.avg(Feedback.rating).label("average_rating"),
+        func.count(distinct(Feedback.giver_id)).label("givers"),
+    ).filter(*filters).one()
+
+    type_distribution = {feedback_type: 0 for feedback_type in FEEDBACK_TYPES}
+    for feedback_type, count in (
+        db.query(Feedback.feedback_type, func.count(Feedback.id))
+        .filter(*filters)
+        .group_by(Feedback.feedback_type)
+        .all()
+    ):
+        if feedback_type in type_distribution:
+            type_distribution[feedback_type] = count
+
+    if population is None:
+        population = employee_scope()
+    population_size = count_employees(db, population)
+    participating = db.query(func.count(distinct(Feedback.giver_id))).filter(
+        Feedback.giver_id.in_(population)
+    ).scalar()
+
+    return {
+        "total": totals.total,
+        "recent": totals.recent,
+        "anonymous_rate": _rate(totals.anonymous, totals.total),
+        "average_rating": _round(totals.average_rating),
+        "givers": totals.givers,
+        "participating_givers": participating,
+        "participation_rate": _rate(participating, population_size),
+        "type_distribution": type_distribution,
+    }
+
+
+def feedback_trend(db, since: datetime, recipient_ids=None) -> List[Dict[str, Any]]:
+    """Feedback volume and average rating per month, with a rolling average rating"""
+    return [
+        {
+            "month": month["month"],
+            "feedback": month["count"],
+            "average_rating": month["average_rating"],
+            "rolling_average_rating": month["rolling_average_rating"],
+        }
+        for month in _monthly_trend(
+            db, Feedback.created_at, Feedback.rating, since, _feedback_filters(recipient_ids)
+        )
+    ]
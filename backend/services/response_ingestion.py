@@ -0,0 +1,451 @@
+"""
+High-throughput survey response ingestion.
+
+``POST /surveys/{id}/responses`` validates a submission against a cached
+survey definition (status, open window, questions and branching rules) and
+hands it to an in-process ingestor, then returns 202 without touching the
+database.
+
+The ingestor group-commits submissions in micro-batches. A batch is flushed
+once it reaches ``INGEST_BATCH_SIZE`` rows, or after ``INGEST_FLUSH_INTERVAL_MS``
+at most. Each flush is one multi-row
+``INSERT ... ON CONFLICT (survey_id, employee_id) DO NOTHING RETURNING`` in a
+single transaction.
+
+A repeated submission by the same employee is rejected at submit time with
+``DuplicateResponse``. The ingestor tracks the (survey, employee) pairs it
+still has in flight, and everything else is checked with one indexed
+existence lookup. The unique index and ``ON CONFLICT DO NOTHING`` remain the
+backstop for races between workers.
+
+A failed flush is retried with backoff. If it keeps failing, the batch is
+written response by response, so one bad row cannot sink the others, and
+rows that still fail go to the ``survey_responses`` dead-letter file (see
+``services.dead_letter``). Accepted responses are never silently dropped.
+
+The queue is bounded: when it is full, submitters wait (backpressure) instead
+of growing memory without limit. On shutdown the queue is drained before the
+process exits. Listeners registered with ``add_ingest_listener`` are called
+with the rows that were actually inserted, for example to update the live
+counters.
+"""
+
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from config import settings
+from database import SessionLocal, engine
+from models import Employee, Survey, SurveyQuestion, SurveyResponse
+from services.dead_letter import write_with_fallback
+from services.live_counters import live_counters
+from services.survey_answers import project_answers, scale_bounds
+from services.survey_branching import (
+    BranchingCompileError, BranchingProgram, UnreachableAnswerError, compile_branching
+)
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+_response_table = SurveyResponse.__table__
+
+class SurveyUnavailable(Exception):
+    """The survey does not exist or is not accepting responses"""
+
+
+class ResponseValidationError(ValueError):
+    pass
+
+
+class DuplicateResponse(ValueError):
+    """The employee has already submitted a response to this survey"""
+
+
+# =====================================================
+# CACHED SURVEY DEFINITIONS
+# =====================================================
+
+class SurveyDefinition:
+    """Immutable snapshot of what a valid response to a survey looks like"""
+
+    def __init__(self, survey_id: str, status: str, start_date: Optional[datetime], end_date: Optional[datetime],
+                 is_anonymous: bool, questions: Dict[str, Dict[str, Any]], question_order: List[str],
+                 branching: Dict[str, Any]):
+        self.survey_id = survey_id
+        self.status = status
+        self.start_date = start_date
+        self.end_date = end_date
+        self.is_anonymous = is_anonymous
+        self.questions = questions
+        self.question_order = question_order
+        self.branching = branching
+        self._program: Optional[BranchingProgram] = None
+
+    @property
+    def program(self) -> BranchingProgram:
+        """Compiled branching rules; rules that no longer compile fall back to linear flow"""
+        if self._program is None:
+            try:
+                self._program = compile_branching(self.question_order, self.branching)
+            except BranchingCompileError as e:
+                logger.error(f"Branching rules for survey {self.survey_id} are invalid, using linear flow: {e}")
+                self._program = compile_branching(self.question_order, {})
+        return self._program
+
+    def accepting_responses(self, now: Optional[datetime] = None) -> bool:
+        now = now or datetime.now(timezone.utc)
+        if self.status != "active":
+            return False
+        if self.start_date and now < self.start_date:
+            return False
+        if self.end_date and now > self.end_date:
+            return False
+        return True
+
+
+def _aware(value: Optional[datetime]) -> Optional[datetime]:
+    if value is None:
+        return None
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def load_survey_definition(survey_id: str) -> Optional[SurveyDefinition]:
+    db = SessionLocal()
+    try:
+        survey = db.query(Survey).filter(Survey.id == survey_id).first()
+        if not survey:
+            return None
+        questions = (
+            db.query(SurveyQuestion.id, SurveyQuestion.text, SurveyQuestion.type, SurveyQuestion.options)
+            .filter(SurveyQuestion.survey_id == survey_id)
+            .order_by(SurveyQuestion.position, SurveyQuestion.id)
+            .all()
+        )
+        return SurveyDefinition(
+            survey_id=str(survey.id),
+            status=survey.status,
+            start_date=_aware(survey.start_date),
+            end_date=_aware(survey.end_date),
+            is_anonymous=bool(survey.is_anonymous),
+            questions={str(q.id): {"text": q.text, "type": q.type, "options": q.options} for q in questions},
+            question_order=[str(q.id) for q in questions],
+            branching=(survey.platform_integrations or {}).get("branching") or {},
+        )
+    finally:
+        db.close()
+
+
+class SurveyDefinitionCache:
+    """TTL cache of survey definitions; concurrent misses share one load"""
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._entries: Dict[str, tuple] = {}
+        self._loading: Dict[str, asyncio.Future] = {}
+
+    async def get(self, survey_id) -> Optional[SurveyDefinition]:
+        key = str(survey_id)
+        loop = asyncio.get_running_loop()
+        entry = self._entries.get(key)
+        if entry and entry[0] > loop.time():
+            return entry[1]
+
+        future = self._loading.get(key)
+        if future is None:
+            future = loop.run_in_executor(None, load_survey_definition, key)
+            self._loading[key] = future
+            try:
+                definition = await future
+                self._entries[key] = (loop.time() + self.ttl_seconds, definition)
+                return definition
+            finally:
+                self._loading.pop(key, None)
+        return await asyncio.shield(future)
+
+    def invalidate(self, survey_id):
+        self._entries.pop(str(survey_id), None)
+
+
+survey_definitions = SurveyDefinitionCache(ttl_seconds=settings.SURVEY_DEFINITION_CACHE_SECONDS)
+
+
+# =====================================================
+# VALIDATION
+# =====================================================
+
+def _validate_answer(question_id: str, question: Dict[str, Any], value: Any):
+    question_type = question["type"]
+    options = question.get("options") or []
+
+    if value is None:
+        return
+    if question_type == "scale":
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ResponseValidationError(f"Question {question_id} expects a number")
+        low, high = scale_bounds(options)
+        if not low <= value <= high:
+            raise ResponseValidationError(f"Question {question_id} answer must be between {low:g} and {high:g}")
+    elif question_type == "boolean":
+        if not isinstance(value, bool):
+            raise ResponseValidationError(f"Question {question_id} expects true or false")
+    elif question_type == "single_choice":
+        if options and value not in options:
+            raise ResponseValidationError(f"Question {question_id} answer is not one of the options")
+    elif question_type == "multiple_choice":
+        choices = value if isinstance(value, list) else [value]
+        if options and any(choice not in options for choice in choices):
+            raise ResponseValidationError(f"Question {question_id} answer is not one of the options")
+    elif question_type == "text":
+        if not isinstance(value, str):
+            raise ResponseValidationError(f"Question {question_id} expects text")
+
+
+def validate_response(definition: Optional[SurveyDefinition], answers: Dict[str, Any]):
+    if definition is None:
+        raise SurveyUnavailable("Survey not found")
+    if not definition.accepting_responses():
+        raise SurveyUnavailable("Survey is not active")
+    if not isinstance(answers, dict) or not answers:
+        raise ResponseValidationError("Response must contain at least one answer")
+
+    if definition.questions:
+        unknown = [key for key in answers if key not in definition.questions]
+        if unknown:
+            raise ResponseValidationError(f"Unknown questions: {unknown}")
+        for question_id, value in answers.items():
+            _validate_answer(question_id, definition.questions[question_id], value)
+    try:
+        definition.program.validate(answers)
+    except UnreachableAnswerError as e:
+        raise ResponseValidationError(str(e))
+
+
+def build_response_row(
+    survey_id,
+    employee_id,
+    answers: Dict[str, Any],
+    completion_time_seconds: Optional[int] = None,
+    is_anonymous: bool = False,
+    metadata: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """Row for survey_responses; ID and timestamp are assigned at submission, not at flush"""
+    return {
+        "id": uuid.uuid4(),
+        "survey_id": uuid.UUID(str(survey_id)),
+        "employee_id": employee_id,
+        "responses": answers,
+        "completion_time_seconds": completion_time_seconds,
+        "is_anonymous": is_anonymous,
+        "submitted_at": datetime.now(timezone.utc),
+        "metadata": metadata or {},
+    }
+
+
+# =====================================================
+# GROUP-COMMIT INGESTOR
+# =====================================================
+
+def write_response_batch(batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Insert a batch in one statement and return the rows actually inserted
+    (duplicates are skipped), annotated with the respondent's department.
+    """
+    with engine.begin() as conn:
+        inserted_ids = set(conn.execute(
+            pg_insert(_response_table)
+            .values(batch)
+            .on_conflict_do_nothing(index_elements=["survey_id", "employee_id"])
+            .returning(_response_table.c.id)
+        ).scalars())
+
+        inserted = [row for row in batch if row["id"] in inserted_ids]
+        employee_ids = {row["employee_id"] for row in inserted if row["employee_id"]}
+        departments = dict(conn.execute(
+            select(Employee.id, Employee.department_id).where(Employee.id.in_(employee_ids))
+        ).all()) if employee_ids else {}
+        for row in inserted:
+            row["department_id"] = departments.get(row["employee_id"])
+
+        # Columnar answer rows commit (or roll back) together with their responses
+        project_answers(conn, inserted)
+    return inserted
+
+
+def response_exists(survey_id: uuid.UUID, employee_id: uuid.UUID) -> bool:
+    """Indexed lookup on (survey_id, employee_id)"""
+    with engine.connect() as conn:
+        return conn.execute(
+            select(_response_table.c.id).where(
+                _response_table.c.survey_id == survey_id,
+                _response_table.c.employee_id == employee_id,
+            ).limit(1)
+        ).first() is not None
+
+
+class ResponseIngestor:
+    """Bounded queue + background task that group-commits survey responses"""
+
+    def __init__(self, max_queue_size: int, batch_size: int, flush_interval: float):
+        self.max_queue_size = max_queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._listeners: List[Callable[[List[Dict[str, Any]]], None]] = []
+        self._in_flight: Set[Tuple[uuid.UUID, uuid.UUID]] = set()  # (survey_id, employee_id) accepted, not yet written
+        self.stats = {"accepted": 0, "inserted": 0, "duplicates": 0, "batches": 0, "failed": 0, "sync_writes": 0}
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def add_listener(self, listener: Callable[[List[Dict[str, Any]]], None]):
+        self._listeners.append(listener)
+
+    async def start(self):
+        if self.is_running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._task = asyncio.create_task(self._run(), name="response-ingestor")
+        logger.info("✅ Survey response ingestor started")
+
+    async def stop(self, timeout: float = 30.0):
+        """Flush everything still queued and stop"""
+        if not self.is_running:
+            return
+        await self._queue.put(_STOP)
+        try:
+            await asyncio.wait_for(self._task, timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"Response ingestor did not drain within {timeout}s; {self.queue_depth} responses lost")
+            self._task.cancel()
+        self._task = None
+        logger.info("✅ Survey response ingestor drained and stopped")
+
+    async def submit(self, row: Dict[str, Any]):
+        """
+        Queue a response row; waits if the buffer is full. Writes inline when
+        not running. Raises ``DuplicateResponse`` if the employee already
+        responded or has a response in flight.
+        """
+        key = (row["survey_id"], row["employee_id"])
+        if row["employee_id"] is not None:
+            if key in self._in_flight:
+                raise DuplicateResponse("Response already submitted")
+            self._in_flight.add(key)
+            try:
+                exists = await asyncio.get_running_loop().run_in_executor(None, response_exists, *key)
+            except Exception:
+                self._in_flight.discard(key)
+                raise
+            if exists:
+                self._in_flight.discard(key)
+                raise DuplicateResponse("Response already submitted")
+        self.stats["accepted"] += 1
+        if not self.is_running:
+            self.stats["sync_writes"] += 1
+            await self._write(asyncio.get_running_loop(), [row])
+            return
+        try:
+            await self._queue.put(row)
+        except BaseException:
+            self._in_flight.discard(key)
+            raise
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            batch: List[Dict[str, Any]] = []
+            item = await self._queue.get()
+            if item is _STOP:
+                stopping = True
+            else:
+                batch.append(item)
+
+            # Collect up to batch_size rows or until the flush latency bound elapses
+            deadline = self._loop.time() + self.flush_interval
+            while not stopping and len(batch) < self.batch_size:
+                remaining = deadline - self._loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+                if item is _STOP:
+                    stopping = True
+                else:
+                    batch.append(item)
+
+            if stopping:
+                while not self._queue.empty():
+                    item = self._queue.get_nowait()
+                    if item is not _STOP:
+                        batch.append(item)
+
+            for start in range(0, len(batch), self.batch_size):
+                await self._write(self._loop, batch[start:start + self.batch_size])
+
+    async def _write(self, loop: asyncio.AbstractEventLoop, batch: List[Dict[str, Any]]):
+        if not batch:
+            return
+        try:
+            results, dead = await write_with_fallback(loop, write_response_batch, batch, "survey_responses")
+        finally:
+            for row in batch:
+                self._in_flight.discard((row["survey_id"], row["employee_id"]))
+        inserted = [row for rows in results for row in rows]
+
+        self.stats["batches"] += 1
+        self.stats["failed"] += len(dead)
+        self.stats["inserted"] += len(inserted)
+        self.stats["duplicates"] += len(batch) - len(inserted) - len(dead)
+        for listener in self._listeners:
+            try:
+                listener(inserted)
+            except Exception as e:
+                logger.error(f"Survey response ingest listener failed: {e}")
+
+
+response_ingestor = ResponseIngestor(
+    max_queue_size=settings.INGEST_QUEUE_MAX_SIZE,
+    batch_size=settings.INGEST_BATCH_SIZE,
+    flush_interval=settings.INGEST_FLUSH_INTERVAL_MS / 1000,
+)
+
+
+def _publish_live_counters(rows: List[Dict[str, Any]]):
+    for row in rows:
+        live_counters.record_response(
+            row["survey_id"], row["id"],
+            employee_id=row["employee_id"],
+            department_id=row.get("department_id"),
+            completion_time=row["completion_time_seconds"],
+            submitted_at=row["submitted_at"]
+        )
+
+
+response_ingestor.add_listener(_publish_live_counters)
+
+
+def add_ingest_listener(listener: Callable[[List[Dict[str, Any]]], None]):
+    response_ingestor.add_listener(listener)
+
+
+async def start_response_ingestor():
+    await response_ingestor.start()
+
+
+async def stop_response_ingestor():
+    await response_ingestor.stop()
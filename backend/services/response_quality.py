@@ -0,0 +1,413 @@
+"""
+Statistical response-quality engine behind ``GET /surveys/{id}/quality-check``.
+
+For each survey, responses are packed into NumPy arrays:
+* a float matrix of Likert (``scale``) answers, NaN where unanswered
+* a completion-time vector
+* a per-response bitmask of quality flags
+
+The engine detects:
+
+* **Straight-lining**: zero variance across at least ``MIN_STRAIGHT_LINE_ITEMS``
+  answered Likert items.
+* **Speeders and unusually slow responses**: modified z-score of
+  log(completion time), using the median and MAD (median absolute deviation).
+  Outliers therefore can't inflate the threshold the way they do with a
+  mean/stdev rule.
+* **Duplicate and near-duplicate text**:
+  - exact duplicates are matched on a hash of the normalized text;
+  - near-duplicates are found with MinHash signatures and LSH banding, then
+    confirmed by exact Jaccard similarity of character shingles.
+* **Reverse-coded inconsistency**: pairs listed in
+  ``platform_integrations["quality"]["reverse_coded_pairs"]`` whose answers
+  agree with each other once one side is reversed. Straight-liners and
+  careless respondents produce such pairs.
+
+The state for each survey is kept per worker. Each check fetches only
+responses newer than the last one seen (one query), and only those rows are
+scored. Speeder thresholds are recomputed over the full time vector, which is
+an O(n) NumPy pass. The state is rebuilt after ``QUALITY_REBUILD_SECONDS``, or
+when the questions or quality settings change, so deletions and retention
+anonymization are picked up.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import re
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from config import settings
+from database import SessionLocal
+from models import Survey, SurveyQuestion, SurveyResponse
+from services.live_counters import SurveyNotFound
+from services.survey_answers import scale_bounds
+
+logger = logging.getLogger(__name__)
+
+FLAG_STRAIGHT_LINING = 1
+FLAG_SPEEDER = 2
+FLAG_SLOW = 4
+FLAG_DUPLICATE_TEXT = 8
+FLAG_INCONSISTENT = 16
+QUALITY_FLAGS = {
+    "straight_lining": FLAG_STRAIGHT_LINING,
+    "suspiciously_fast": FLAG_SPEEDER,
+    "unusually_slow": FLAG_SLOW,
+    "duplicate_text": FLAG_DUPLICATE_TEXT,
+    "reverse_coded_inconsistency": FLAG_INCONSISTENT,
+}
+# Rate above which a survey-level validation flag is raised
+FLAG_RATE_WARNINGS = {
+    "straight_lining": ("high_straight_lining_rate", 0.10),
+    "suspiciously_fast": ("high_speeder_rate", 0.10),
+    "duplicate_text": ("high_duplicate_text_rate", 0.05),
+    "reverse_coded_inconsistency": ("high_inconsistency_rate", 0.10),
+}
+
+MIN_STRAIGHT_LINE_ITEMS = 3
+MIN_TIMED_RESPONSES = 10
+MAD_SCALE = 0.6745  # Makes the modified z-score comparable to a normal z-score
+SHINGLE_SIZE = 5
+MINHASH_PERMUTATIONS = 64
+LSH_BANDS = 8
+# Bound the work per response when many answers share phrasing
+LSH_BUCKET_CAPACITY = 200
+MAX_DUPLICATE_CANDIDATES = 20
+SIGNATURE_TOLERANCE = 0.1
+MINHASH_PRIME = (1 << 61) - 1
+# Responses submitted shortly before the watermark may still be committing on another worker
+WATERMARK_OVERLAP = timedelta(minutes=2)
+
+
+_rng = np.random.default_rng(20261019)
+_MINHASH_A = _rng.integers(1, 1 << 31, size=MINHASH_PERMUTATIONS, dtype=np.uint64)
+_MINHASH_B = _rng.integers(0, 1 << 31, size=MINHASH_PERMUTATIONS, dtype=np.uint64)
+
+
+def _as_float(value: Any) -> float:
+    if isinstance(value, bool) or value is None:
+        return np.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def normalize_text(value: str) -> str:
+    return " ".join(re.sub(r"[^\w\s]", " ", value.lower()).split())
+
+
+def _shingles(text: str) -> np.ndarray:
+    if len(text) <= SHINGLE_SIZE:
+        grams = {text}
+    else:
+        grams = {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+    # Built-in string hashing is salted per process, which is fine for per-worker state
+    return np.fromiter((hash(gram) & 0xFFFFFFFF for gram in grams), dtype=np.uint64, count=len(grams))
+
+
+def _minhash(shingles: np.ndarray) -> np.ndarray:
+    # (permutations x shingles) universal hashes, min over shingles
+    hashed = (_MINHASH_A[:, None] * shingles[None, :] + _MINHASH_B[:, None]) % MINHASH_PRIME
+    return hashed.min(axis=1)
+
+
+def _jaccard(a: frozenset, b: frozenset) -> float:
+    return len(a & b) / len(a | b)
+
+
+class QualitySettings:
+    """Question layout and thresholds that a survey's quality state depends on"""
+
+    def __init__(self, likert_ids: List[str], likert_bounds: List[Tuple[float, float]], text_ids: List[str],
+                 question_count: int, reverse_pairs: List[Tuple[int, int]], config: Dict[str, Any]):
+        self.likert_ids = likert_ids
+        self.likert_bounds = likert_bounds
+        self.text_ids = text_ids
+        self.question_count = question_count
+        self.reverse_pairs = reverse_pairs
+        self.speeder_z = float(config.get("speeder_z", settings.QUALITY_SPEEDER_Z))
+        self.near_duplicate_similarity = float(
+            config.get("near_duplicate_similarity", settings.QUALITY_NEAR_DUPLICATE_SIMILARITY)
+        )
+        self.min_text_length = int(config.get("min_text_length", settings.QUALITY_MIN_TEXT_LENGTH))
+        self.fingerprint = hashlib.sha1(json.dumps(
+            [likert_ids, likert_bounds, text_ids, question_count, reverse_pairs, config], sort_keys=True, default=str
+        ).encode()).hexdigest()
+
+
+def load_quality_settings(db, survey_id: str) -> Optional[QualitySettings]:
+    survey = db.query(Survey.platform_integrations).filter(Survey.id == survey_id).first()
+    if survey is None:
+        return None
+    questions = (
+        db.query(SurveyQuestion.id, SurveyQuestion.type, SurveyQuestion.options)
+        .filter(SurveyQuestion.survey_id == survey_id)
+        .order_by(SurveyQuestion.position, SurveyQuestion.id)
+        .all()
+    )
+    likert = [(str(q.id), scale_bounds(q.options)) for q in questions if q.type == "scale"]
+    likert_ids = [question_id for question_id, _ in likert]
+    column = {question_id: index for index, question_id in enumerate(likert_ids)}
+
+    config = dict((survey.platform_integrations or {}).get("quality") or {})
+    reverse_pairs = [
+        (column[str(a)], column[str(b)]) for a, b in config.get("reverse_coded_pairs", [])
+        if str(a) in column and str(b) in column
+    ]
+    return QualitySettings(
+        likert_ids=likert_ids,
+        likert_bounds=[bounds for _, bounds in likert],
+        text_ids=[str(q.id) for q in questions if q.type == "text"],
+        question_count=len(questions),
+        reverse_pairs=reverse_pairs,
+        config=config,
+    )
+
+
+class SurveyQualityState:
+    """Per-survey response arrays and incremental detector state"""
+
+    def __init__(self, survey_id: str, quality_settings: QualitySettings):
+        self.survey_id = survey_id
+        self.settings = quality_settings
+        self.built_at = datetime.now(timezone.utc)
+        self.watermark: Optional[datetime] = None
+        self.size = 0
+        capacity = 1024
+        self.response_ids: List[str] = []
+        self.index: Dict[str, int] = {}
+        self.likert = np.full((capacity, len(quality_settings.likert_ids)), np.nan)
+        self.times = np.full(capacity, np.nan)
+        self.answered = np.zeros(capacity, dtype=np.int32)
+        self.flags = np.zeros(capacity, dtype=np.uint8)
+        # Text duplicate detection
+        self._text_hashes: Dict[str, int] = {}
+        self._shingles: Dict[int, frozenset] = {}
+        self._signatures: Dict[int, np.ndarray] = {}
+        self._buckets: Dict[Tuple[int, bytes], List[int]] = {}
+
+    def _reserve(self, extra: int):
+        needed = self.size + extra
+        capacity = len(self.times)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        grow = capacity - len(self.times)
+        self.likert = np.vstack([self.likert, np.full((grow, self.likert.shape[1]), np.nan)])
+        self.times = np.concatenate([self.times, np.full(grow, np.nan)])
+        self.answered = np.concatenate([self.answered, np.zeros(grow, dtype=np.int32)])
+        self.flags = np.concatenate([self.flags, np.zeros(grow, dtype=np.uint8)])
+
+    def add_responses(self, rows: Sequence[Tuple[Any, Dict[str, Any], Optional[int], datetime]]):
+        """Append new responses and score them; rows already known are ignored"""
+        rows = [row for row in rows if str(row[0]) not in self.index]
+        if not rows:
+            return
+        self._reserve(len(rows))
+        start, end = self.size, self.size + len(rows)
+        likert_ids = self.settings.likert_ids
+
+        for offset, (response_id, answers, completion_time, submitted_at) in enumerate(rows):
+            response_id = str(response_id)
+            self.index[response_id] = start + offset
+            self.response_ids.append(response_id)
+            answers = answers or {}
+            self.answered[start + offset] = sum(1 for value in answers.values() if value not in (None, "", []))
+            if completion_time:
+                self.times[start + offset] = completion_time
+            if likert_ids:
+                self.likert[start + offset] = [_as_float(answers.get(question_id)) for question_id in likert_ids]
+            if submitted_at is not None and (self.watermark is None or submitted_at > self.watermark):
+                self.watermark = submitted_at
+        self.size = end
+
+        self._score_likert(start, end)
+        self._score_text(rows, start)
+
+    def _score_likert(self, start: int, end: int):
+        block = self.likert[start:end]
+        if block.shape[1] == 0:
+            return
+        answered = np.sum(~np.isnan(block), axis=1)
+        # fmax/fmin skip NaN without the all-NaN warnings of nanmax/nanmin
+        spread = np.fmax.reduce(block, axis=1) - np.fmin.reduce(block, axis=1)
+        straight = (answered >= MIN_STRAIGHT_LINE_ITEMS) & (spread == 0)
+        self.flags[start:end][straight] |= FLAG_STRAIGHT_LINING
+
+        if self.settings.reverse_pairs:
+            pairs = np.array(self.settings.reverse_pairs)
+            bounds = np.array(self.settings.likert_bounds)
+            low, high = bounds[pairs[:, 1], 0], bounds[pairs[:, 1], 1]
+            # Reverse the second item of each pair onto the first item's direction
+            reversed_b = low + high - block[:, pairs[:, 1]]
+            gap = np.abs(block[:, pairs[:, 0]] - reversed_b)
+            inconsistent = np.nan_to_num(gap, nan=0) > (high - low) / 2
+            self.flags[start:end][inconsistent.any(axis=1)] |= FLAG_INCONSISTENT
+
+    def _score_text(self, rows, start: int):
+        text_ids = self.settings.text_ids
+        if not text_ids:
+            return
+        rows_per_band = MINHASH_PERMUTATIONS // LSH_BANDS
+        for offset, (_, answers, _, _) in enumerate(rows):
+            answers = answers or {}
+            text = normalize_text(" ".join(
+                str(answers[question_id]) for question_id in text_ids if isinstance(answers.get(question_id), str)
+            ))
+            if len(text) < self.settings.min_text_length:
+                continue
+            position = start + offset
+
+            digest = hashlib.md5(text.encode()).hexdigest()
+            original = self._text_hashes.setdefault(digest, position)
+            if original != position:
+                self.flags[[original, position]] |= FLAG_DUPLICATE_TEXT
+                continue
+
+            shingles = _shingles(text)
+            signature = _minhash(shingles)
+            shingle_set = frozenset(shingles.tolist())
+            collisions = Counter()
+            for band in range(LSH_BANDS):
+                key = (band, signature[band * rows_per_band:(band + 1) * rows_per_band].tobytes())
+                bucket = self._buckets.setdefault(key, [])
+                collisions.update(bucket)
+                if len(bucket) < LSH_BUCKET_CAPACITY:
+                    bucket.append(position)
+
+            if collisions:
+                # Signature agreement estimates Jaccard similarity for every candidate in one pass;
+                # only plausible ones are confirmed against the exact shingle sets
+                candidates = [candidate for candidate, _ in collisions.most_common(MAX_DUPLICATE_CANDIDATES)]
+                estimates = np.mean(np.stack([self._signatures[c] for c in candidates]) == signature, axis=1)
+                for candidate, estimate in zip(candidates, estimates):
+                    if estimate < self.settings.near_duplicate_similarity - SIGNATURE_TOLERANCE:
+                        continue
+                    if _jaccard(shingle_set, self._shingles[candidate]) >= self.settings.near_duplicate_similarity:
+                        self.flags[[candidate, position]] |= FLAG_DUPLICATE_TEXT
+            self._shingles[position] = shingle_set
+            self._signatures[position] = signature
+
+    def _score_times(self) -> Tuple[Optional[float], Optional[float]]:
+        """Recompute speeder/slow flags over all responses; returns (median, MAD) in seconds"""
+        n = self.size
+        self.flags[:n] &= np.uint8(~(FLAG_SPEEDER | FLAG_SLOW) & 0xFF)
+        times = self.times[:n]
+        timed = ~np.isnan(times) & (times > 0)
+        if timed.sum() < MIN_TIMED_RESPONSES:
+            return None, None
+
+        log_times = np.log(times[timed])
+        median = np.median(log_times)
+        mad = np.median(np.abs(log_times - median))
+        if mad == 0:
+            return float(np.exp(median)), 0.0
+        z = MAD_SCALE * (np.log(np.where(timed, times, 1.0)) - median) / mad
+        self.flags[:n][timed & (z < -self.settings.speeder_z)] |= FLAG_SPEEDER
+        self.flags[:n][timed & (z > self.settings.speeder_z)] |= FLAG_SLOW
+        return float(np.exp(median)), float(mad)
+
+    def report(self, limit: int) -> Dict[str, Any]:
+        n = self.size
+        median_time, log_mad = self._score_times()
+        flags = self.flags[:n]
+        times = self.times[:n]
+        timed = times[~np.isnan(times)]
+
+        counts = {name: int(np.count_nonzero(flags & bit)) for name, bit in QUALITY_FLAGS.items()}
+        flagged = np.flatnonzero(flags)
+        validation_flags = [
+            warning for name, (warning, rate) in FLAG_RATE_WARNINGS.items() if n and counts[name] / n > rate
+        ]
+        if n and (counts["suspiciously_fast"] + counts["unusually_slow"]) / n > 0.10:
+            validation_flags.append("high_outlier_rate")
+
+        flagged_responses = [
+            {
+                "response_id": self.response_ids[i],
+                "issues": [name for name, bit in QUALITY_FLAGS.items() if flags[i] & bit],
+                "completion_time": None if np.isnan(times[i]) else int(times[i]),
+            }
+            for i in flagged[:limit]
+        ]
+        return {
+            "total_responses": n,
+            "completion_rate": round(float(np.mean(self.answered[:n]) / self.settings.question_count * 100), 2)
+            if n and self.settings.question_count else 0,
+            "average_completion_time": round(float(timed.mean()), 2) if timed.size else 0,
+            "median_completion_time": round(median_time, 2) if median_time is not None else None,
+            "response_quality_score": round(100 * (1 - flagged.size / n), 1) if n else 100,
+            "flag_counts": counts,
+            "flagged_response_count": int(flagged.size),
+            "flagged_responses": flagged_responses,
+            "outlier_responses": [
+                response for response in flagged_responses
+                if {"suspiciously_fast", "unusually_slow"} & set(response["issues"])
+            ],
+            "validation_flags": validation_flags,
+            "thresholds": {
+                "speeder_z": self.settings.speeder_z,
+                "completion_time_log_mad": round(log_mad, 4) if log_mad is not None else None,
+                "near_duplicate_similarity": self.settings.near_duplicate_similarity,
+                "reverse_coded_pairs": len(self.settings.reverse_pairs),
+            },
+            "as_of": datetime.now(timezone.utc).isoformat(),
+        }
+
+
+def refresh_quality_state(survey_id: str, state: Optional[SurveyQualityState]) -> SurveyQualityState:
+    """Bring a survey's state up to date with one delta query (runs in a worker thread)"""
+    db = SessionLocal()
+    try:
+        quality_settings = load_quality_settings(db, survey_id)
+        if quality_settings is None:
+            raise SurveyNotFound(survey_id)
+
+        max_age = timedelta(seconds=settings.QUALITY_REBUILD_SECONDS)
+        if (state is None or state.settings.fingerprint != quality_settings.fingerprint
+                or datetime.now(timezone.utc) - state.built_at > max_age):
+            state = SurveyQualityState(survey_id, quality_settings)
+
+        query = (
+            db.query(SurveyResponse.id, SurveyResponse.responses,
+                     SurveyResponse.completion_time_seconds, SurveyResponse.submitted_at)
+            .filter(SurveyResponse.survey_id == survey_id)
+        )
+        if state.watermark is not None:
+            query = query.filter(SurveyResponse.submitted_at >= state.watermark - WATERMARK_OVERLAP)
+        rows = query.order_by(SurveyResponse.submitted_at, SurveyResponse.id).all()
+        state.add_responses(rows)
+        return state
+    finally:
+        db.close()
+
+
+class ResponseQualityEngine:
+    """Per-worker cache of survey quality states; one refresh per survey at a time"""
+
+    def __init__(self):
+        self._states: Dict[str, SurveyQualityState] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    async def check(self, survey_id, limit: int = 100) -> Dict[str, Any]:
+        key = str(survey_id)
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            loop = asyncio.get_running_loop()
+            state = await loop.run_in_executor(None, refresh_quality_state, key, self._states.get(key))
+            self._states[key] = state
+            return await loop.run_in_executor(None, state.report, limit)
+
+    def invalidate(self, survey_id):
+        self._states.pop(str(survey_id), None)
+
+
+response_quality = ResponseQualityEngine()
@@ -0,0 +1,456 @@
+"""
+Data retention executor.
+
+Walks each active ``DataRetentionPolicy`` and deletes or anonymizes rows older
+than the policy's retention period. Work is done in bounded batches, each in
+its own short transaction with a lock timeout, and the executor sleeps between
+batches so it never holds more than ``RETENTION_MAX_DUTY_CYCLE`` of wall time.
+
+Progress is persisted on a ``RetentionRun`` row in the same transaction as
+each batch. The cutoff is fixed when the run is created and every batch
+predicate only matches rows that still need processing, so an interrupted run
+can simply be resumed.
+
+Several app workers can run the scheduler. A run is executed only after it has
+been claimed with a conditional ``UPDATE ... RETURNING``. The claim succeeds
+for a pending run, or for a running run whose heartbeat (refreshed with each
+batch) is older than ``RETENTION_STALE_AFTER_SECONDS``. If a batch finds that
+its worker no longer owns the run, it rolls back and stops. A partial unique
+index allows only one pending or running run per policy.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import and_, delete, func, or_, select, text, update
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from config import settings
+from database import SessionLocal, engine
+from models import AuditLog, ConsentRecord, DataRetentionPolicy, Feedback, RetentionRun, SurveyResponse
+from services.jobs import WORKER_ID
+
+logger = logging.getLogger(__name__)
+
+RETENTION_ACTIONS = ("delete", "anonymize")
+MAX_LOCK_RETRIES = 5
+
+# data_type -> table, age column and anonymization rules
+RETENTION_TARGETS: Dict[str, Dict[str, Any]] = {
+    "survey_responses": {
+        "model": SurveyResponse,
+        "age_column": SurveyResponse.submitted_at,
+        "anonymize": {"employee_id": None, "is_anonymous": True, "extra_metadata": {}},
+        "identifiable": lambda: SurveyResponse.employee_id.isnot(None),
+    },
+    "audit_logs": {
+        "model": AuditLog,
+        "age_column": AuditLog.timestamp,
+        "anonymize": {"user_id": None, "ip_address": None, "user_agent": None},
+        "identifiable": lambda: or_(
+            AuditLog.user_id.isnot(None), AuditLog.ip_address.isnot(None), AuditLog.user_agent.isnot(None)
+        ),
+    },
+    "consent_records": {
+        "model": ConsentRecord,
+        "age_column": ConsentRecord.created_at,
+        "anonymize": {"ip_address": None, "user_agent": None},
+        "identifiable": lambda: or_(ConsentRecord.ip_address.isnot(None), ConsentRecord.user_agent.isnot(None)),
+    },
+    "feedback": {
+        "model": Feedback,
+        "age_column": Feedback.created_at,
+        "anonymize": {"giver_id": None, "is_anonymous": True},
+        "identifiable": lambda: Feedback.giver_id.isnot(None),
+    },
+}
+
+
+class RetentionCancelled(Exception):
+    pass
+
+
+class RetentionClaimLost(Exception):
+    """Another worker took over the run after our heartbeat went stale"""
+
+
+def policy_action(policy: DataRetentionPolicy) -> str:
+    return policy.action if policy.action in RETENTION_ACTIONS else "delete"
+
+
+def policy_cutoff(policy: DataRetentionPolicy) -> datetime:
+    return datetime.utcnow() - timedelta(days=policy.retention_period_days)
+
+
+def _candidate_filter(data_type: str, action: str, cutoff: datetime):
+    target = RETENTION_TARGETS[data_type]
+    conditions = [target["age_column"] < cutoff]
+    if action == "anonymize":
+        # Already-anonymized rows are skipped, which is what makes re-runs idempotent
+        conditions.append(target["identifiable"]())
+    return conditions
+
+
+def count_candidates(db, data_type: str, action: str, cutoff: datetime) -> Dict[str, Any]:
+    """Aggregate candidate count and oldest timestamp without loading any rows"""
+    target = RETENTION_TARGETS[data_type]
+    count, oldest = db.execute(
+        select(func.count(), func.min(target["age_column"])).where(*_candidate_filter(data_type, action, cutoff))
+    ).one()
+    return {"count": count or 0, "oldest": oldest}
+
+
+# =====================================================
+# BATCH EXECUTION
+# =====================================================
+
+def _drop_expired_audit_partitions(cutoff: datetime) -> int:
+    """Drop whole monthly audit_logs partitions that end before the cutoff; returns rows removed"""
+    if engine.dialect.name != "postgresql":
+        return 0
+
+    removed = 0
+    with engine.begin() as conn:
+        partitions = conn.execute(text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass('audit_logs') AND c.relname ~ '^audit_logs_[0-9]{4}_[0-9]{2}$'"
+        )).scalars().all()
+
+    for name in partitions:
+        month_start = datetime.strptime(name[len("audit_logs_"):], "%Y_%m")
+        month_end = (month_start + timedelta(days=32)).replace(day=1)
+        if month_end > cutoff.replace(tzinfo=None):
+            continue
+        with engine.begin() as conn:
+            conn.execute(text(f"SET LOCAL lock_timeout = {int(settings.RETENTION_LOCK_TIMEOUT_MS)}"))
+            removed += conn.execute(text(f'SELECT COUNT(*) FROM "{name}"')).scalar() or 0
+            conn.execute(text(f'ALTER TABLE audit_logs DETACH PARTITION "{name}"'))
+            conn.execute(text(f'DROP TABLE "{name}"'))
+        logger.info(f"Dropped expired audit log partition {name}")
+    return removed
+
+
+def _process_batch(run_id: uuid.UUID, data_type: str, action: str, cutoff: datetime, batch_size: int) -> int:
+    """Delete or anonymize one batch and record progress atomically; returns rows affected"""
+    target = RETENTION_TARGETS[data_type]
+    model = target["model"]
+
+    batch_ids = (
+        select(model.id)
+        .where(*_candidate_filter(data_type, action, cutoff))
+        .order_by(target["age_column"])
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    if action == "delete":
+        statement = delete(model).where(model.id.in_(batch_ids))
+    else:
+        statement = update(model).where(model.id.in_(batch_ids)).values(**target["anonymize"])
+
+    with engine.begin() as conn:
+        if engine.dialect.name == "postgresql":
+            conn.execute(text(f"SET LOCAL lock_timeout = {int(settings.RETENTION_LOCK_TIMEOUT_MS)}"))
+        affected = conn.execute(statement.execution_options(synchronize_session=False)).rowcount or 0
+        owned = conn.execute(
+            update(RetentionRun)
+            .where(RetentionRun.id == run_id, RetentionRun.worker_id == WORKER_ID, RetentionRun.status == "running")
+            .values(
+                processed_count=RetentionRun.processed_count + affected,
+                batches_completed=RetentionRun.batches_completed + 1,
+                heartbeat_at=datetime.utcnow(),
+                updated_at=datetime.utcnow()
+            )
+        ).rowcount
+        if not owned:
+            # Raising rolls the batch back
+            raise RetentionClaimLost()
+    return affected
+
+
+def _set_run_status(run_id: uuid.UUID, **values):
+    """Update a run this worker owns"""
+    values["updated_at"] = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(
+            update(RetentionRun)
+            .where(RetentionRun.id == run_id, RetentionRun.worker_id == WORKER_ID)
+            .values(**values)
+        )
+
+
+def _stale_cutoff() -> datetime:
+    return datetime.utcnow() - timedelta(seconds=settings.RETENTION_STALE_AFTER_SECONDS)
+
+
+def _stale_running():
+    return and_(
+        RetentionRun.status == "running",
+        func.coalesce(RetentionRun.heartbeat_at, RetentionRun.updated_at) < _stale_cutoff()
+    )
+
+
+def claim_retention_run(run_id: uuid.UUID, statuses=("pending",)) -> bool:
+    """
+    Atomically take ownership of a run in one of ``statuses``, or of a running
+    run whose heartbeat is stale. Returns False if another worker owns it.
+    """
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        claimed = conn.execute(
+            update(RetentionRun)
+            .where(RetentionRun.id == run_id, or_(RetentionRun.status.in_(statuses), _stale_running()))
+            .values(status="running", worker_id=WORKER_ID, heartbeat_at=now,
+                    started_at=func.coalesce(RetentionRun.started_at, now),
+                    completed_at=None, last_error=None, updated_at=now)
+            .returning(RetentionRun.id)
+        ).first()
+    return claimed is not None
+
+
+def execute_retention_run(run_id: uuid.UUID, cancel_event: Optional[threading.Event] = None,
+                          statuses=("pending",)):
+    """
+    Claim and run (or resume) a retention run to completion. ``statuses`` are
+    the run states that may be claimed. Blocking; call from a worker thread.
+    """
+    if not claim_retention_run(run_id, statuses):
+        logger.info(f"Retention run {run_id} is owned by another worker or not claimable")
+        return
+
+    db = SessionLocal()
+    try:
+        run = db.query(RetentionRun).filter(RetentionRun.id == run_id).first()
+        if not run:
+            raise ValueError(f"Retention run {run_id} not found")
+        data_type, action, cutoff = run.data_type, run.action, run.cutoff_date
+    finally:
+        db.close()
+
+    if data_type not in RETENTION_TARGETS:
+        _set_run_status(run_id, status="failed", last_error=f"Unsupported data type: {data_type}",
+                        completed_at=datetime.utcnow())
+        return
+
+    batch_size = max(1, settings.RETENTION_BATCH_SIZE)
+    duty_cycle = min(max(settings.RETENTION_MAX_DUTY_CYCLE, 0.01), 1.0)
+    lock_retries = 0
+
+    try:
+        if data_type == "audit_logs" and action == "delete":
+            dropped = _drop_expired_audit_partitions(cutoff)
+            if dropped:
+                with engine.begin() as conn:
+                    conn.execute(
+                        update(RetentionRun).where(RetentionRun.id == run_id)
+                        .values(processed_count=RetentionRun.processed_count + dropped)
+                    )
+
+        while True:
+            if cancel_event is not None and cancel_event.is_set():
+                raise RetentionCancelled()
+
+            started = time.monotonic()
+            try:
+                affected = _process_batch(run_id, data_type, action, cutoff, batch_size)
+                lock_retries = 0
+            except OperationalError as e:
+                # Lock timeouts mean OLTP traffic holds the rows; back off and retry
+                lock_retries += 1
+                if lock_retries > MAX_LOCK_RETRIES:
+                    raise
+                logger.warning(f"Retention batch for run {run_id} hit a lock timeout, backing off: {e}")
+                _set_run_status(run_id, heartbeat_at=datetime.utcnow())
+                time.sleep(min(30, 2 ** lock_retries))
+                continue
+
+            if affected < batch_size:
+                break
+
+            # Throttle: keep time spent in transactions under the configured duty cycle
+            elapsed = time.monotonic() - started
+            time.sleep(elapsed * (1 - duty_cycle) / duty_cycle)
+
+        _set_run_status(run_id, status="completed", completed_at=datetime.utcnow())
+        logger.info(f"Retention run {run_id} ({action} {data_type}) completed")
+
+    except RetentionCancelled:
+        if _shutting_down.is_set():
+            # Leave the run resumable; the scheduler picks it up after restart
+            _set_run_status(run_id, status="pending", worker_id=None, heartbeat_at=None)
+            logger.info(f"Retention run {run_id} interrupted by shutdown")
+        else:
+            _set_run_status(run_id, status="cancelled", completed_at=datetime.utcnow())
+            logger.info(f"Retention run {run_id} cancelled")
+    except RetentionClaimLost:
+        logger.warning(f"Retention run {run_id} was taken over by another worker; stopping")
+    except Exception as e:
+        logger.error(f"Retention run {run_id} failed: {e}")
+        _set_run_status(run_id, status="failed", last_error=str(e), completed_at=datetime.utcnow())
+
+
+# =====================================================
+# BACKGROUND SCHEDULING
+# =====================================================
+
+_cancel_events: Dict[uuid.UUID, threading.Event] = {}
+_running_tasks = set()
+_shutting_down = threading.Event()
+
+
+def create_retention_run(db, policy: DataRetentionPolicy, started_by: Optional[uuid.UUID] = None) -> RetentionRun:
+    """Create a pending run with a fixed cutoff and an aggregate candidate count"""
+    action = policy_action(policy)
+    cutoff = policy_cutoff(policy)
+    total = count_candidates(db, policy.data_type, action, cutoff)["count"] if policy.data_type in RETENTION_TARGETS else 0
+
+    run = RetentionRun(
+        policy_id=policy.id,
+        data_type=policy.data_type,
+        action=action,
+        status="pending",
+        cutoff_date=cutoff,
+        total_candidates=total,
+        processed_count=0,
+        batches_completed=0,
+        started_by=started_by
+    )
+    db.add(run)
+    db.commit()
+    db.refresh(run)
+    return run
+
+
+def launch_retention_run(run_id: uuid.UUID, statuses=("pending",)):
+    """Claim and execute a run in a worker thread from the running event loop"""
+    if run_id in _cancel_events:
+        return
+    cancel_event = threading.Event()
+    _cancel_events[run_id] = cancel_event
+
+    async def _runner():
+        try:
+            await asyncio.get_running_loop().run_in_executor(
+                None, execute_retention_run, run_id, cancel_event, statuses
+            )
+        finally:
+            _cancel_events.pop(run_id, None)
+
+    task = asyncio.create_task(_runner())
+    _running_tasks.add(task)
+    task.add_done_callback(_running_tasks.discard)
+
+
+def cancel_retention_run(run_id: uuid.UUID) -> bool:
+    cancel_event = _cancel_events.get(run_id)
+    if not cancel_event:
+        return False
+    cancel_event.set()
+    return True
+
+
+def is_run_active(run_id: uuid.UUID) -> bool:
+    return run_id in _cancel_events
+
+
+def is_run_live(db, run_id: uuid.UUID) -> bool:
+    """True while this or another worker is executing the run with a fresh heartbeat"""
+    if is_run_active(run_id):
+        return True
+    return db.query(RetentionRun.id).filter(
+        RetentionRun.id == run_id,
+        RetentionRun.status == "running",
+        func.coalesce(RetentionRun.heartbeat_at, RetentionRun.updated_at) >= _stale_cutoff()
+    ).first() is not None
+
+
+def serialize_run(run: RetentionRun) -> Dict[str, Any]:
+    total = run.total_candidates or 0
+    processed = run.processed_count or 0
+    return {
+        "run_id": str(run.id),
+        "policy_id": str(run.policy_id) if run.policy_id else None,
+        "data_type": run.data_type,
+        "action": run.action,
+        "status": run.status,
+        "cutoff_date": run.cutoff_date.isoformat() if run.cutoff_date else None,
+        "total_candidates": total,
+        "processed_count": processed,
+        "batches_completed": run.batches_completed or 0,
+        "progress_percentage": round(min(processed / total, 1.0) * 100, 1) if total else 100.0,
+        "last_error": run.last_error,
+        "started_at": run.started_at.isoformat() if run.started_at else None,
+        "completed_at": run.completed_at.isoformat() if run.completed_at else None,
+    }
+
+
+def _schedule_due_runs() -> List[uuid.UUID]:
+    """
+    Find pending runs, running runs with a stale heartbeat and auto-delete
+    policies without a run; returns run IDs to launch. Ownership is decided by
+    ``claim_retention_run`` when a run starts, not here.
+    """
+    db = SessionLocal()
+    try:
+        interrupted = db.query(RetentionRun.id).filter(
+            or_(RetentionRun.status == "pending", _stale_running())
+        ).all()
+        run_ids = [row.id for row in interrupted if not is_run_active(row.id)]
+
+        busy_policies = {
+            row.policy_id for row in
+            db.query(RetentionRun.policy_id).filter(RetentionRun.status.in_(["pending", "running"])).all()
+        }
+        policies = db.query(DataRetentionPolicy).filter(
+            DataRetentionPolicy.is_active == True,
+            DataRetentionPolicy.auto_delete == True
+        ).all()
+        for policy in policies:
+            if policy.id in busy_policies or policy.data_type not in RETENTION_TARGETS:
+                continue
+            try:
+                run_ids.append(create_retention_run(db, policy).id)
+            except IntegrityError:
+                # Another worker created the policy's run first
+                db.rollback()
+        return run_ids
+    finally:
+        db.close()
+
+
+async def retention_scheduler_loop():
+    """Periodically execute auto-delete policies; also picks up runs interrupted by a restart"""
+    interval = settings.RETENTION_INTERVAL_HOURS * 3600
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            for run_id in await loop.run_in_executor(None, _schedule_due_runs):
+                launch_retention_run(run_id)
+        except Exception as e:
+            logger.error(f"Retention scheduler iteration failed: {e}")
+        await asyncio.sleep(interval)
+
+
+_scheduler_task: Optional[asyncio.Task] = None
+
+
+async def start_retention_scheduler():
+    global _scheduler_task
+    if settings.RETENTION_INTERVAL_HOURS <= 0 or _scheduler_task is not None:
+        return
+    _scheduler_task = asyncio.create_task(retention_scheduler_loop(), name="retention-scheduler")
+    logger.info("✅ Retention scheduler started")
+
+
+async def stop_retention_scheduler():
+    global _scheduler_task
+    _shutting_down.set()
+    for cancel_event in _cancel_events.values():
+        cancel_event.set()
+    if _scheduler_task is not None:
+        _scheduler_task.cancel()
+        _scheduler_task = None
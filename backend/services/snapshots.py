@@ -0,0 +1,376 @@
+"""
+Analytical snapshots: the main HR tables as partitioned Parquet.
+
+Analysts used to page through JSON endpoints to load data into notebooks.
+A snapshot instead writes each table in ``SNAPSHOT_TABLES`` as Arrow record
+batches to Parquet, laid out Hive-style so pandas/pyarrow/duckdb can read the
+whole directory as one dataset:
+
+    manifest.json
+    <table>/month=YYYY-MM/part-00000.parquet
+
+Partitions are keyed by the month of the table's watermark column
+(``updated_at`` for mutable tables, ``created_at``/``submitted_at``/
+``measurement_date`` for append-only ones). Rows are read in watermark order through a server-side
+cursor, so only one Parquet writer is open at a time and memory is bounded by
+``SNAPSHOT_BATCH_ROWS``.
+
+Incremental snapshots pass a watermark per table (normally the
+``high_watermark`` values from the previous snapshot's manifest). Only rows
+whose watermark column is at or after that value are exported. The bound is
+inclusive, so rows on the boundary appear twice; deduplicate on ``id``
+(keeping the latest) when merging. All tables are read in one REPEATABLE READ
+transaction, so a snapshot is consistent across tables.
+
+The output directory is zipped (stored, since Parquet is already compressed)
+into the job's download artifact.
+"""
+
+import json
+import logging
+import shutil
+import zipfile
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import select, text
+
+from database import engine
+from models import Employee, KPI, KPIMeasurement, KPIValue, PerformanceReview, Survey, SurveyResponse
+from services.exports import ExportError, artifact_path, cleanup_expired, export_filename
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_BATCH_ROWS = 50_000
+SNAPSHOT_FILE_ROWS = 1_000_000
+STREAM_YIELD_PER = 5000
+
+# Column types are names rather than pyarrow types so pyarrow stays optional
+Schema = List[Tuple[str, str]]
+
+
+class SnapshotTable:
+    def __init__(self, name: str, schema: Schema, watermark: str,
+                 rows: Callable[[Any, Optional[datetime]], Iterator[Sequence[Any]]]):
+        self.name = name
+        self.schema = schema
+        # Column (by name, present in ``schema``) used for incremental exports and partitioning
+        self.watermark = watermark
+        self.rows = rows
+
+
+SNAPSHOT_TABLES: Dict[str, SnapshotTable] = {}
+
+
+def snapshot_table(name: str, schema: Schema, watermark: str):
+    """Register ``func(conn, since) -> row iterator`` as a snapshot table"""
+    def decorator(func):
+        SNAPSHOT_TABLES[name] = SnapshotTable(name, schema, watermark, func)
+        return func
+    return decorator
+
+
+def _stream(conn, statement, params: Optional[Dict[str, Any]] = None):
+    return conn.execution_options(stream_results=True, yield_per=STREAM_YIELD_PER).execute(statement, params or {})
+
+
+def _json(value: Any) -> Optional[str]:
+    return None if value is None else json.dumps(value, default=str)
+
+
+# =====================================================
+# TABLES
+# =====================================================
+
+@snapshot_table("employees", [
+    ("id", "string"), ("first_name", "string"), ("last_name", "string"), ("name", "string"),
+    ("email", "string"), ("department_id", "string"), ("manager_id", "string"), ("position", "string"),
+    ("hire_date", "date"), ("status", "string"), ("is_active", "bool"), ("skills", "json"),
+    ("competencies", "json"), ("created_at", "timestamp"), ("updated_at", "timestamp"),
+], watermark="updated_at")
+def employees_rows(conn, since):
+    statement = select(
+        Employee.id, Employee.first_name, Employee.last_name, Employee.name, Employee.email,
+        Employee.department_id, Employee.manager_id, Employee.position, Employee.hire_date,
+        Employee.status, Employee.is_active, Employee.skills, Employee.competencies,
+        Employee.created_at, Employee.updated_at,
+    ).order_by(Employee.updated_at, Employee.id)
+    if since is not None:
+        statement = statement.where(Employee.updated_at >= since)
+    return _stream(conn, statement)
+
+
+@snapshot_table("kpi_values", [
+    ("id", "string"), ("kpi_id", "string"), ("kpi_name", "string"), ("value", "float64"),
+    ("period_start", "timestamp"), ("period_end", "timestamp"), ("department_id", "string"),
+    ("created_at", "timestamp"),
+], watermark="created_at")
+def kpi_values_rows(conn, since):
+    statement = (
+        select(KPIValue.id, KPIValue.kpi_id, KPI.name, KPIValue.value, KPIValue.period_start,
+               KPIValue.period_end, KPIValue.department_id, KPIValue.created_at)
+        .join(KPI, KPI.id == KPIValue.kpi_id)
+        .order_by(KPIValue.created_at, KPIValue.id)
+    )
+    if since is not None:
+        statement = statement.where(KPIValue.created_at >= since)
+    return _stream(conn, statement)
+
+
+@snapshot_table("kpi_measurements", [
+    ("id", "string"), ("kpi_id", "string"), ("kpi_name", "string"), ("value", "float64"),
+    ("measurement_date", "timestamp"), ("recorded_by", "string"), ("created_at", "timestamp"),
+], watermark="measurement_date")
+def kpi_measurements_rows(conn, since):
+    statement = (
+        select(KPIMeasurement.id, KPIMeasurement.kpi_id, KPI.name, KPIMeasurement.value,
+               KPIMeasurement.measurement_date, KPIMeasurement.recorded_by, KPIMeasurement.created_at)
+        .join(KPI, KPI.id == KPIMeasurement.kpi_id)
+        .order_by(KPIMeasurement.measurement_date, KPIMeasurement.id)
+    )
+    if since is not None:
+        statement = statement.where(KPIMeasurement.measurement_date >= since)
+    return _stream(conn, statement)
+
+
+@snapshot_table("survey_responses", [
+    ("response_id", "string"), ("survey_id", "string"), ("employee_id", "string"),
+    ("department_id", "string"), ("question_id", "string"), ("answer", "string"),
+    ("numeric_value", "float64"), ("completion_time_seconds", "int64"), ("submitted_at", "timestamp"),
+], watermark="submitted_at")
+def survey_responses_rows(conn, since):
+    """One row per answered question; employee_id is blank for anonymous responses"""
+    statement = (
+        select(SurveyResponse.id, SurveyResponse.survey_id, SurveyResponse.employee_id, Employee.department_id,
+               SurveyResponse.responses, SurveyResponse.completion_time_seconds, SurveyResponse.submitted_at,
+               SurveyResponse.is_anonymous, Survey.is_anonymous.label("survey_anonymous"))
+        .join(Survey, Survey.id == SurveyResponse.survey_id)
+        .outerjoin(Employee, Employee.id == SurveyResponse.employee_id)
+        .order_by(SurveyResponse.submitted_at, SurveyResponse.id)
+    )
+    if since is not None:
+        statement = statement.where(SurveyResponse.submitted_at >= since)
+
+    for row in _stream(conn, statement):
+        employee_id = None if (row.is_anonymous or row.survey_anonymous) else row.employee_id
+        for question_id, answer in (row.responses or {}).items():
+            numeric = answer if isinstance(answer, (int, float)) and not isinstance(answer, bool) else None
+            yield (
+                row.id, row.survey_id, employee_id, row.department_id, question_id,
+                answer if isinstance(answer, str) else _json(answer), numeric,
+                row.completion_time_seconds, row.submitted_at,
+            )
+
+
+@snapshot_table("employee_parameter_ratings", [
+    ("id", "string"), ("employee_id", "string"), ("parameter_id", "string"), ("rating_value", "float64"),
+    ("rater_id", "string"), ("rater_type", "string"), ("confidence_score", "float64"),
+    ("rating_period_start", "date"), ("rating_period_end", "date"), ("review_cycle_id", "string"),
+    ("evidence_text", "string"), ("created_at", "timestamp"), ("updated_at", "timestamp"),
+], watermark="updated_at")
+def parameter_ratings_rows(conn, since):
+    return _stream(conn, text(f"""
+        SELECT id, employee_id, parameter_id, rating_value, rater_id, rater_type, confidence_score,
+               rating_period_start, rating_period_end, review_cycle_id, evidence_text, created_at, updated_at
+        FROM employee_parameter_ratings
+        {"WHERE updated_at >= :since" if since is not None else ""}
+        ORDER BY updated_at, id
+    """), {"since": since})
+
+
+@snapshot_table("performance_reviews", [
+    ("id", "string"), ("employee_id", "string"), ("reviewer_id", "string"), ("cycle_id", "string"),
+    ("rating", "int64"), ("status", "string"), ("review_type", "string"), ("calibration_score", "float64"),
+    ("comments", "string"), ("created_at", "timestamp"), ("updated_at", "timestamp"),
+], watermark="updated_at")
+def performance_reviews_rows(conn, since):
+    statement = select(
+        PerformanceReview.id, PerformanceReview.employee_id, PerformanceReview.reviewer_id,
+        PerformanceReview.cycle_id, PerformanceReview.rating, PerformanceReview.status,
+        PerformanceReview.review_type, PerformanceReview.calibration_score, PerformanceReview.comments,
+        PerformanceReview.created_at, PerformanceReview.updated_at,
+    ).order_by(PerformanceReview.updated_at, PerformanceReview.id)
+    if since is not None:
+        statement = statement.where(PerformanceReview.updated_at >= since)
+    return _stream(conn, statement)
+
+
+# =====================================================
+# PARQUET WRITING
+# =====================================================
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ExportError("Parquet snapshots require the pyarrow package")
+    return pyarrow, pyarrow.parquet
+
+
+def _arrow_schema(pa, schema: Schema):
+    types = {
+        "string": pa.string(), "json": pa.string(), "int64": pa.int64(), "float64": pa.float64(),
+        "bool": pa.bool_(), "date": pa.date32(), "timestamp": pa.timestamp("us", tz="UTC"),
+    }
+    return pa.schema([(name, types[kind]) for name, kind in schema])
+
+
+def _converter(kind: str) -> Callable[[Any], Any]:
+    if kind == "json":
+        return _json
+    if kind == "string":
+        return lambda value: None if value is None else str(value)
+    if kind in ("float64", "int64"):
+        cast = float if kind == "float64" else int
+        return lambda value: None if value is None else cast(value)
+    if kind == "date":
+        return lambda value: value.date() if isinstance(value, datetime) else value
+    return lambda value: value
+
+
+def _partition_key(value: Any) -> str:
+    if isinstance(value, (datetime, date)):
+        return value.strftime("%Y-%m")
+    return "unknown"
+
+
+class _PartitionedWriter:
+    """Writes record batches into ``<root>/month=YYYY-MM/part-N.parquet``, one open file at a time"""
+
+    def __init__(self, pq, root: Path, schema):
+        self.pq, self.root, self.schema = pq, root, schema
+        self.files: List[str] = []
+        self._writer, self._partition, self._file_rows, self._part = None, None, 0, 0
+
+    def write(self, partition: str, batch):
+        if partition != self._partition or self._file_rows >= SNAPSHOT_FILE_ROWS:
+            self.close()
+            self._part = self._part + 1 if partition == self._partition else 0
+            self._partition = partition
+            path = self.root / f"month={partition}" / f"part-{self._part:05d}.parquet"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._writer = self.pq.ParquetWriter(str(path), self.schema, compression="zstd")
+            self.files.append(str(path.relative_to(self.root.parent)))
+        self._writer.write_batch(batch)
+        self._file_rows += batch.num_rows
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer, self._file_rows = None, 0
+
+
+def write_snapshot_table(table: SnapshotTable, conn, root: Path, since: Optional[datetime],
+                         check_cancelled: Optional[Callable[[], None]] = None) -> Dict[str, Any]:
+    """Stream one table into Parquet; returns its manifest entry"""
+    pa, pq = _import_pyarrow()
+    schema = _arrow_schema(pa, table.schema)
+    names = [name for name, _ in table.schema]
+    converters = [_converter(kind) for _, kind in table.schema]
+    watermark_index = names.index(table.watermark)
+
+    writer = _PartitionedWriter(pq, root / table.name, schema)
+    columns: List[List[Any]] = [[] for _ in names]
+    partition, rows, high_watermark = None, 0, None
+
+    def flush():
+        if columns[0]:
+            writer.write(partition, pa.RecordBatch.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema
+            ))
+            for values in columns:
+                values.clear()
+
+    try:
+        for row in table.rows(conn, since):
+            row_partition = _partition_key(row[watermark_index])
+            # A batch never spans partitions; rows arrive in watermark order
+            if row_partition != partition or len(columns[0]) >= SNAPSHOT_BATCH_ROWS:
+                flush()
+                partition = row_partition
+                if check_cancelled:
+                    check_cancelled()
+            for values, convert, value in zip(columns, converters, row):
+                values.append(convert(value))
+            rows += 1
+            if row[watermark_index] is not None:
+                high_watermark = row[watermark_index]
+        flush()
+    finally:
+        writer.close()
+
+    return {
+        "rows": rows,
+        "files": writer.files,
+        "watermark_column": table.watermark,
+        "since": since.isoformat() if since else None,
+        # Pass back as this table's watermark for the next incremental snapshot
+        "high_watermark": high_watermark.isoformat() if high_watermark else (since.isoformat() if since else None),
+        "schema": dict(table.schema),
+    }
+
+
+def _parse_watermark(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ExportError(f"Invalid watermark {value!r}, expected an ISO timestamp")
+
+
+def write_snapshot(job_id, tables: Optional[List[str]] = None, watermarks: Optional[Dict[str, str]] = None,
+                   progress: Optional[Callable[[int, str], None]] = None,
+                   check_cancelled: Optional[Callable[[], None]] = None) -> Dict[str, Any]:
+    """
+    Write a snapshot of ``tables`` (all by default) as the job's zip artifact.
+    ``watermarks`` maps table name to an ISO timestamp for incremental export.
+    """
+    tables = tables or list(SNAPSHOT_TABLES)
+    unknown = [name for name in tables if name not in SNAPSHOT_TABLES]
+    if unknown:
+        raise ExportError(f"Unknown snapshot tables: {unknown}")
+    watermarks = {name: _parse_watermark((watermarks or {}).get(name)) for name in tables}
+    _import_pyarrow()
+
+    cleanup_expired()
+    target = artifact_path(job_id, "snapshot")
+    root = target.with_suffix("")
+    shutil.rmtree(root, ignore_errors=True)
+    root.mkdir(parents=True)
+
+    manifest: Dict[str, Any] = {"snapshot_id": str(job_id), "generated_at": datetime.utcnow().isoformat(), "tables": {}}
+    try:
+        with engine.connect() as conn:
+            if conn.dialect.name == "postgresql":
+                conn = conn.execution_options(isolation_level="REPEATABLE READ")
+            with conn.begin():
+                for index, name in enumerate(tables):
+                    if progress:
+                        progress(int(index / len(tables) * 90), f"Exporting {name}")
+                    manifest["tables"][name] = write_snapshot_table(
+                        SNAPSHOT_TABLES[name], conn, root, watermarks[name], check_cancelled
+                    )
+                    logger.info(f"Snapshot {job_id}: {name} -> {manifest['tables'][name]['rows']} rows")
+
+        (root / "manifest.json").write_text(json.dumps(manifest, indent=2))
+        partial = target.with_name(target.name + ".part")
+        with zipfile.ZipFile(partial, "w", compression=zipfile.ZIP_STORED) as archive:
+            for path in sorted(root.rglob("*")):
+                if path.is_file():
+                    archive.write(path, path.relative_to(root))
+        partial.replace(target)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    return {
+        "format": "snapshot",
+        "filename": export_filename("hr_snapshot", "snapshot"),
+        "download_url": f"/api/v1/exports/jobs/{job_id}/download",
+        "bytes": target.stat().st_size,
+        "rows": sum(entry["rows"] for entry in manifest["tables"].values()),
+        "watermarks": {name: entry["high_watermark"] for name, entry in manifest["tables"].items()},
+        "tables": {name: {"rows": entry["rows"], "files": len(entry["files"])} for name, entry in manifest["tables"].items()},
+    }
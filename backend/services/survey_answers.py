@@ -0,0 +1,302 @@
+"""
+Columnar projection of survey answers.
+
+``survey_responses.responses`` stores each response as one JSON blob. This
+module projects every closed-ended answer into a row of ``survey_answers``:
+
+    (response_id, survey_id, question_id, department_id, numeric_value, choice_code)
+
+Encoding by question type:
+* ``scale``: numeric_value
+* ``boolean``: numeric_value and choice_code, both 1/0
+* ``single_choice``: choice_code is the option index; numeric_value is set when
+  the option is a number
+* ``multiple_choice``: one row per selected option
+
+Free text is not projected.
+
+The ingestor writes the projection in the same transaction as the response
+batch. Distribution and cross-tab queries can therefore run as grouped
+aggregates over ``idx_survey_answers_survey_question_dept`` (an index-only
+scan) instead of parsing JSON. ``rebuild_survey_answers`` re-projects a survey,
+for backfills and after its options are edited.
+"""
+
+import logging
+import uuid
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, select, tuple_
+
+from database import engine
+from models import Department, Employee, SurveyAnswer, SurveyQuestion, SurveyResponse
+
+logger = logging.getLogger(__name__)
+
+REBUILD_BATCH_SIZE = 2000
+SCALE_DEFAULT_BOUNDS = (1, 10)
+NPS_PROMOTER_MIN = 9
+NPS_DETRACTOR_MAX = 6
+
+_answer_table = SurveyAnswer.__table__
+
+QuestionLayout = Dict[str, Tuple[str, List[Any]]]
+
+
+def _as_number(value: Any) -> Optional[float]:
+    if isinstance(value, bool) or value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def scale_bounds(options) -> tuple:
+    if not options:
+        return SCALE_DEFAULT_BOUNDS
+    try:
+        values = [float(option) for option in options]
+        return min(values), max(values)
+    except (TypeError, ValueError):
+        # Option labels ("Strongly disagree" ... "Strongly agree") map to 1..n
+        return 1, len(options)
+
+
+def encode_answers(answers: Dict[str, Any], layout: QuestionLayout) -> Iterable[Tuple[str, Optional[float], Optional[int]]]:
+    """Yield (question_id, numeric_value, choice_code) for each closed-ended answer"""
+    for question_id, value in (answers or {}).items():
+        question = layout.get(question_id)
+        if question is None or value is None:
+            continue
+        question_type, options = question
+
+        if question_type == "scale":
+            number = _as_number(value)
+            if number is not None:
+                yield question_id, number, None
+        elif question_type == "boolean":
+            if isinstance(value, bool):
+                yield question_id, float(value), int(value)
+        elif question_type == "single_choice":
+            code = options.index(value) if value in options else None
+            if code is not None or _as_number(value) is not None:
+                yield question_id, _as_number(value), code
+        elif question_type == "multiple_choice":
+            for choice in (value if isinstance(value, list) else [value]):
+                if choice in options:
+                    yield question_id, _as_number(choice), options.index(choice)
+
+
+def load_question_layouts(conn, survey_ids: Iterable[Any]) -> Dict[str, QuestionLayout]:
+    layouts: Dict[str, QuestionLayout] = defaultdict(dict)
+    rows = conn.execute(
+        select(SurveyQuestion.survey_id, SurveyQuestion.id, SurveyQuestion.type, SurveyQuestion.options)
+        .where(SurveyQuestion.survey_id.in_(list(survey_ids)), SurveyQuestion.type != "text")
+    )
+    for survey_id, question_id, question_type, options in rows:
+        layouts[str(survey_id)][str(question_id)] = (question_type, list(options or []))
+    return layouts
+
+
+def project_answers(conn, responses: List[Dict[str, Any]]) -> int:
+    """
+    Insert answer rows for responses with keys id, survey_id, responses and
+    department_id, inside the caller's transaction
+    """
+    if not responses:
+        return 0
+    layouts = load_question_layouts(conn, {row["survey_id"] for row in responses})
+    values = [
+        {
+            "id": uuid.uuid4(),
+            "response_id": row["id"],
+            "survey_id": row["survey_id"],
+            "question_id": uuid.UUID(question_id),
+            "department_id": row.get("department_id"),
+            "numeric_value": numeric_value,
+            "choice_code": choice_code,
+        }
+        for row in responses
+        for question_id, numeric_value, choice_code in encode_answers(
+            row["responses"], layouts.get(str(row["survey_id"]), {})
+        )
+    ]
+    if values:
+        conn.execute(insert(_answer_table), values)
+    return len(values)
+
+
+def rebuild_survey_answers(survey_id) -> int:
+    """
+    Re-project every response of a survey. Each batch replaces its responses'
+    answer rows in one transaction, so responses ingested meanwhile are never
+    projected twice.
+    """
+    survey_id = uuid.UUID(str(survey_id))
+    projected, last_key = 0, None
+    while True:
+        with engine.begin() as conn:
+            query = (
+                select(SurveyResponse.id, SurveyResponse.survey_id, SurveyResponse.responses,
+                       SurveyResponse.submitted_at, Employee.department_id)
+                .outerjoin(Employee, Employee.id == SurveyResponse.employee_id)
+                .where(SurveyResponse.survey_id == survey_id)
+                .order_by(SurveyResponse.submitted_at, SurveyResponse.id)
+                .limit(REBUILD_BATCH_SIZE)
+            )
+            if last_key is not None:
+                query = query.where(tuple_(SurveyResponse.submitted_at, SurveyResponse.id) > last_key)
+            batch = [dict(row._mapping) for row in conn.execute(query)]
+            if not batch:
+                break
+            conn.execute(delete(_answer_table).where(
+                _answer_table.c.response_id.in_([row["id"] for row in batch])
+            ))
+            projected += project_answers(conn, batch)
+            last_key = (batch[-1]["submitted_at"], batch[-1]["id"])
+
+    logger.info(f"Rebuilt {projected} answer rows for survey {survey_id}")
+    return projected
+
+
+# =====================================================
+# DISTRIBUTIONS AND CROSS-TABS
+# =====================================================
+
+def summarize_question(question_type: str, options: List[Any], counts: Dict[Tuple[Optional[float], Optional[int]], int],
+                       respondents: int) -> Dict[str, Any]:
+    """Histogram, mean, top-box and NPS from grouped (numeric_value, choice_code) counts"""
+    summary: Dict[str, Any] = {"type": question_type, "respondents": respondents}
+
+    if question_type in ("single_choice", "multiple_choice", "boolean"):
+        labels = ["false", "true"] if question_type == "boolean" else options
+        by_code: Dict[int, int] = defaultdict(int)
+        for (_, code), count in counts.items():
+            if code is not None:
+                by_code[code] += count
+        summary["distribution"] = [
+            {
+                "choice": labels[code] if code < len(labels) else code,
+                "count": count,
+                "percentage": round(count / respondents * 100, 2) if respondents else 0,
+            }
+            for code, count in sorted(by_code.items())
+        ]
+        if question_type != "boolean":
+            return summary
+
+    values = {value: count for (value, _), count in counts.items() if value is not None}
+    total = sum(values.values())
+    if not total:
+        return summary
+    mean = sum(value * count for value, count in values.items()) / total
+    summary["mean"] = round(mean, 3)
+    if question_type == "boolean":
+        return summary
+
+    low, high = scale_bounds(options)
+    summary.update({
+        "histogram": [{"value": value, "count": count} for value, count in sorted(values.items())],
+        "scale": {"min": low, "max": high},
+        "top_box_pct": round(sum(c for v, c in values.items() if v >= high) / total * 100, 2),
+        "top2_box_pct": round(sum(c for v, c in values.items() if v >= high - 1) / total * 100, 2),
+        "bottom_box_pct": round(sum(c for v, c in values.items() if v <= low) / total * 100, 2),
+    })
+    if low == 0 and high == 10:
+        promoters = sum(c for v, c in values.items() if v >= NPS_PROMOTER_MIN)
+        detractors = sum(c for v, c in values.items() if v <= NPS_DETRACTOR_MAX)
+        summary["nps"] = round((promoters - detractors) / total * 100, 1)
+    return summary
+
+
+def _question_meta(db, survey_id, question_id=None) -> Dict[str, Dict[str, Any]]:
+    query = db.query(SurveyQuestion.id, SurveyQuestion.text, SurveyQuestion.type, SurveyQuestion.options).filter(
+        SurveyQuestion.survey_id == survey_id, SurveyQuestion.type != "text"
+    )
+    if question_id is not None:
+        query = query.filter(SurveyQuestion.id == question_id)
+    return {
+        str(q.id): {"text": q.text, "type": q.type, "options": list(q.options or [])}
+        for q in query.order_by(SurveyQuestion.position, SurveyQuestion.id)
+    }
+
+
+def answer_distribution(db, survey_id, question_id=None, department_id=None) -> List[Dict[str, Any]]:
+    """Per-question distribution summary from grouped aggregates"""
+    questions = _question_meta(db, survey_id, question_id)
+    filters = [SurveyAnswer.survey_id == survey_id]
+    if question_id is not None:
+        filters.append(SurveyAnswer.question_id == question_id)
+    if department_id is not None:
+        filters.append(SurveyAnswer.department_id == department_id)
+
+    counts: Dict[str, Dict[Tuple, int]] = defaultdict(dict)
+    for qid, value, code, count in db.query(
+        SurveyAnswer.question_id, SurveyAnswer.numeric_value, SurveyAnswer.choice_code, func.count()
+    ).filter(*filters).group_by(SurveyAnswer.question_id, SurveyAnswer.numeric_value, SurveyAnswer.choice_code):
+        counts[str(qid)][(value, code)] = count
+
+    respondents = dict(
+        (str(qid), count) for qid, count in db.query(
+            SurveyAnswer.question_id, func.count(func.distinct(SurveyAnswer.response_id))
+        ).filter(*filters).group_by(SurveyAnswer.question_id)
+    )
+
+    return [
+        {
+            "question_id": qid,
+            "question": meta["text"],
+            **summarize_question(meta["type"], meta["options"], counts.get(qid, {}), respondents.get(qid, 0)),
+        }
+        for qid, meta in questions.items()
+    ]
+
+
+def answer_crosstab(db, survey_id, question_id, min_group_size: int = 0) -> Optional[Dict[str, Any]]:
+    """One question broken down by department; groups below ``min_group_size`` are suppressed"""
+    meta = _question_meta(db, survey_id, question_id).get(str(question_id))
+    if meta is None:
+        return None
+    filters = [SurveyAnswer.survey_id == survey_id, SurveyAnswer.question_id == question_id]
+
+    counts: Dict[Any, Dict[Tuple, int]] = defaultdict(dict)
+    for department_id, value, code, count in db.query(
+        SurveyAnswer.department_id, SurveyAnswer.numeric_value, SurveyAnswer.choice_code, func.count()
+    ).filter(*filters).group_by(SurveyAnswer.department_id, SurveyAnswer.numeric_value, SurveyAnswer.choice_code):
+        counts[department_id][(value, code)] = count
+
+    respondents = dict(db.query(
+        SurveyAnswer.department_id, func.count(func.distinct(SurveyAnswer.response_id))
+    ).filter(*filters).group_by(SurveyAnswer.department_id).all())
+
+    names = dict(db.query(Department.id, Department.name).filter(
+        Department.id.in_([department_id for department_id in counts if department_id is not None])
+    ).all()) if counts else {}
+
+    departments = []
+    for department_id, department_counts in counts.items():
+        row = {
+            "department_id": str(department_id) if department_id else None,
+            "department": names.get(department_id, "Unassigned"),
+        }
+        if respondents.get(department_id, 0) < min_group_size:
+            row.update({"respondents": None, "suppressed": True})
+        else:
+            row.update(summarize_question(meta["type"], meta["options"], department_counts, respondents[department_id]))
+        departments.append(row)
+    departments.sort(key=lambda row: row["department"])
+
+    overall: Dict[Tuple, int] = defaultdict(int)
+    for department_counts in counts.values():
+        for key, count in department_counts.items():
+            overall[key] += count
+
+    return {
+        "question_id": str(question_id),
+        "question": meta["text"],
+        "overall": summarize_question(meta["type"], meta["options"], overall, sum(respondents.values())),
+        "by_department": departments,
+        "min_group_size": min_group_size,
+    }
@@ -0,0 +1,111 @@
+"""
+Survey audience.
+
+Targeting is stored in two indexed join tables, ``survey_target_departments``
+and ``survey_target_employees``. ``Survey.target_departments`` and
+``Survey.target_employees`` are read/write properties over them. When a
+survey is deployed (it becomes active, directly or through the scheduler),
+``resolve_audience`` expands the targets into ``survey_audience`` with one
+``INSERT ... SELECT``. It also stores ``Survey.audience_size``, so response
+rates are an indexed response count over a precomputed denominator.
+
+The audience is everyone targeted individually plus everyone in a targeted
+department. A survey with no targets goes to all active employees, matching
+how invitations have always been addressed.
+"""
+
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from sqlalchemy import and_, delete, func, insert, literal, or_, select
+
+from models import (
+    Employee, Survey, SurveyAudience, SurveyResponse, SurveyTargetDepartment, SurveyTargetEmployee,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def audience_query(survey_id):
+    """SELECT (employee_id, department_id) for the survey's current targets, resolved live"""
+    targeted_employees = select(SurveyTargetEmployee.employee_id).where(SurveyTargetEmployee.survey_id == survey_id)
+    targeted_departments = select(SurveyTargetDepartment.department_id).where(SurveyTargetDepartment.survey_id == survey_id)
+    has_targets = or_(targeted_employees.exists(), targeted_departments.exists())
+    return (
+        select(Employee.id, Employee.department_id)
+        .where(
+            Employee.is_active == True,
+            or_(
+                ~has_targets,
+                Employee.id.in_(targeted_employees),
+                Employee.department_id.in_(targeted_departments),
+            )
+        )
+    )
+
+
+def resolve_audience(db, survey: Survey) -> int:
+    """
+    Materialize the survey's audience and store its size. Runs in the
+    caller's transaction; call it whenever a survey is deployed.
+    """
+    db.flush()
+    db.execute(delete(SurveyAudience).where(SurveyAudience.survey_id == survey.id))
+    targets = audience_query(survey.id).subquery()
+    db.execute(
+        insert(SurveyAudience).from_select(
+            ["survey_id", "employee_id", "department_id"],
+            select(literal(survey.id, SurveyAudience.survey_id.type), targets.c.id, targets.c.department_id)
+        )
+    )
+    survey.audience_size = db.query(func.count(SurveyAudience.employee_id)).filter(
+        SurveyAudience.survey_id == survey.id
+    ).scalar()
+    survey.audience_resolved_at = datetime.now(timezone.utc)
+    logger.info(f"Resolved audience of survey {survey.id}: {survey.audience_size} employees")
+    return survey.audience_size
+
+
+def audience_size(db, survey: Survey) -> int:
+    """Precomputed size once deployed; a live indexed count for drafts"""
+    if survey.audience_size is not None:
+        return survey.audience_size
+    return db.query(func.count()).select_from(audience_query(survey.id).subquery()).scalar()
+
+
+def response_rate(db, survey: Survey) -> Dict[str, Any]:
+    """Responses against the survey's audience"""
+    total = db.query(func.count(SurveyResponse.id)).filter(SurveyResponse.survey_id == survey.id).scalar()
+    expected = audience_size(db, survey)
+    return {
+        "responses": total,
+        "audience": expected,
+        "response_rate": round(total / expected * 100, 2) if expected else 0,
+    }
+
+
+def surveys_targeting_department(department_id):
+    """SELECT survey_id for surveys that target a department, for ``Survey.id.in_(...)`` filters"""
+    return select(SurveyTargetDepartment.survey_id).where(SurveyTargetDepartment.department_id == department_id)
+
+
+def aggregate_response_rate(db, survey_ids, department_id: Optional[Any] = None) -> Dict[str, Any]:
+    """Responses and audience summed over many surveys (``survey_ids`` is a SELECT of survey IDs)"""
+    if department_id is None:
+        expected = db.query(func.coalesce(func.sum(Survey.audience_size), 0)).filter(Survey.id.in_(survey_ids)).scalar()
+        total = db.query(func.count(SurveyResponse.id)).filter(SurveyResponse.survey_id.in_(survey_ids)).scalar()
+    else:
+        expected = db.query(func.count(SurveyAudience.employee_id)).filter(
+            SurveyAudience.survey_id.in_(survey_ids), SurveyAudience.department_id == department_id
+        ).scalar()
+        total = db.query(func.count(SurveyResponse.id)).join(
+            SurveyAudience,
+            and_(SurveyAudience.survey_id == SurveyResponse.survey_id,
+                 SurveyAudience.employee_id == SurveyResponse.employee_id)
+        ).filter(SurveyResponse.survey_id.in_(survey_ids), SurveyAudience.department_id == department_id).scalar()
+    return {
+        "responses": total,
+        "audience": int(expected or 0),
+        "response_rate": round(total / expected * 100, 2) if expected else 0,
+    }
@@ -0,0 +1,273 @@
+"""
+Survey branching rule compiler and evaluator.
+
+``POST /surveys/{id}/branching`` stores raw rules like this one:
+
+    {"question_id", "condition", "value", "action", "target"}
+
+This module compiles those rules, together with the survey's question order,
+into a ``BranchingProgram``:
+
+* ``dispatch``: for each question, the precompiled ``skip_to``/``end_survey``
+  predicates to check once it is answered
+* ``reveals``: for each question that is hidden until a ``show_question`` rule
+  fires, the (source, predicate) pairs that can reveal it
+
+Working out the next question then costs one dict lookup and the few
+predicates attached to the current question. The rules are not rescanned for
+every answer. Compiled programs are cached by a fingerprint of the question
+order and rules, so each survey version is compiled once per worker.
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+Predicate = Callable[[Any], bool]
+
+BRANCH_ACTIONS = ("show_question", "skip_to", "end_survey")
+PROGRAM_CACHE_SIZE = 1024
+DEFAULT_PAGE_SIZE = 10
+
+
+class BranchingCompileError(ValueError):
+    pass
+
+
+class UnreachableAnswerError(ValueError):
+    pass
+
+
+# =====================================================
+# CONDITIONS
+# =====================================================
+
+def _as_number(value: Any) -> Optional[float]:
+    if isinstance(value, bool) or value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _equals(expected: Any) -> Predicate:
+    expected_number = _as_number(expected)
+    expected_text = str(expected)
+
+    def predicate(answer):
+        if answer is None:
+            return False
+        if expected_number is not None and _as_number(answer) is not None:
+            return _as_number(answer) == expected_number
+        return answer == expected or str(answer) == expected_text
+    return predicate
+
+
+def _not_equals(expected: Any) -> Predicate:
+    equals = _equals(expected)
+    return lambda answer: answer is not None and not equals(answer)
+
+
+def _compare(operator: Callable[[float, float], bool]) -> Callable[[Any], Predicate]:
+    def factory(expected: Any) -> Predicate:
+        threshold = _as_number(expected)
+        if threshold is None:
+            raise BranchingCompileError(f"Numeric condition needs a number, got {expected!r}")
+
+        def predicate(answer):
+            number = _as_number(answer)
+            return number is not None and operator(number, threshold)
+        return predicate
+    return factory
+
+
+def _contains(expected: Any) -> Predicate:
+    def predicate(answer):
+        if isinstance(answer, (list, tuple, set)):
+            return expected in answer
+        return isinstance(answer, str) and str(expected) in answer
+    return predicate
+
+
+def _in(expected: Any) -> Predicate:
+    if not isinstance(expected, (list, tuple)):
+        raise BranchingCompileError("'in' condition needs a list of values")
+    choices = {str(value) for value in expected}
+    return lambda answer: answer is not None and str(answer) in choices
+
+
+def _answered(expected: Any) -> Predicate:
+    return lambda answer: answer not in (None, "", [])
+
+
+BRANCH_CONDITIONS: Dict[str, Callable[[Any], Predicate]] = {
+    "equals": _equals,
+    "not_equals": _not_equals,
+    "greater_than": _compare(lambda a, b: a > b),
+    "greater_or_equal": _compare(lambda a, b: a >= b),
+    "less_than": _compare(lambda a, b: a < b),
+    "less_or_equal": _compare(lambda a, b: a <= b),
+    "contains": _contains,
+    "in": _in,
+    "answered": _answered,
+}
+
+
+# =====================================================
+# COMPILED PROGRAM
+# =====================================================
+
+class BranchingProgram:
+    """Indexed decision structure for one version of a survey"""
+
+    def __init__(self, question_order: Sequence[str], dispatch: Dict[str, List[Tuple[Predicate, str, Optional[int]]]],
+                 reveals: Dict[str, List[Tuple[str, Predicate]]]):
+        self.question_order = list(question_order)
+        self.position = {question_id: index for index, question_id in enumerate(self.question_order)}
+        self.dispatch = dispatch
+        self.reveals = reveals
+        # Questions whose answer can change what comes next
+        self.branch_points = set(dispatch) | {source for sources in reveals.values() for source, _ in sources}
+
+    def _is_visible(self, question_id: str, answers: Dict[str, Any]) -> bool:
+        sources = self.reveals.get(question_id)
+        return sources is None or any(predicate(answers.get(source)) for source, predicate in sources)
+
+    def _first_visible_from(self, index: int, answers: Dict[str, Any]) -> Optional[str]:
+        while index < len(self.question_order):
+            question_id = self.question_order[index]
+            if self._is_visible(question_id, answers):
+                return question_id
+            index += 1
+        return None
+
+    def first_question(self, answers: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        return self._first_visible_from(0, answers or {})
+
+    def next_question(self, current: str, answers: Dict[str, Any]) -> Optional[str]:
+        """Question that follows ``current`` given the answers so far; None ends the survey"""
+        index = self.position[current] + 1
+        answer = answers.get(current)
+        for predicate, action, target in self.dispatch.get(current, ()):
+            if predicate(answer):
+                if action == "end_survey":
+                    return None
+                index = target
+                break
+        return self._first_visible_from(index, answers)
+
+    def path(self, answers: Dict[str, Any]) -> List[str]:
+        """Every question shown for these answers, in order (unanswered questions count as skipped)"""
+        visited = []
+        question_id = self.first_question(answers)
+        while question_id is not None:
+            visited.append(question_id)
+            question_id = self.next_question(question_id, answers)
+        return visited
+
+    def next_questions(self, answers: Dict[str, Any], current: Optional[str] = None,
+                       limit: int = DEFAULT_PAGE_SIZE) -> List[str]:
+        """
+        Next unanswered questions, up to and including the next branch point.
+
+        With ``current``, the walk starts right after that question and costs one
+        dispatch lookup per step. Without it, the walk starts from the first
+        question and skips over questions that are already answered.
+        """
+        question_id = self.next_question(current, answers) if current else self.first_question(answers)
+        while question_id is not None and question_id in answers:
+            question_id = self.next_question(question_id, answers)
+
+        page = []
+        while question_id is not None and len(page) < limit:
+            page.append(question_id)
+            if question_id in self.branch_points:
+                break
+            question_id = self.next_question(question_id, answers)
+            if question_id is not None and any(
+                source not in answers for source, _ in self.reveals.get(question_id, ())
+            ):
+                # Visibility still depends on an unanswered question
+                break
+        return page
+
+    def validate(self, answers: Dict[str, Any]) -> List[str]:
+        """Reject answers to questions that are not on the path those answers take"""
+        path = self.path(answers)
+        on_path = set(path)
+        unreachable = [
+            question_id for question_id, value in answers.items()
+            if value is not None and question_id in self.position and question_id not in on_path
+        ]
+        if unreachable:
+            raise UnreachableAnswerError(f"Questions {unreachable} are not reachable with the given answers")
+        return path
+
+
+def _compile(question_order: Sequence[str], branching: Dict[str, Any]) -> BranchingProgram:
+    position = {question_id: index for index, question_id in enumerate(question_order)}
+    dispatch: Dict[str, List[Tuple[Predicate, str, Optional[int]]]] = {}
+    reveals: Dict[str, List[Tuple[str, Predicate]]] = {}
+
+    rules = branching.get("rules", []) if branching.get("enabled", True) else []
+    for number, rule in enumerate(rules, start=1):
+        source = str(rule.get("question_id"))
+        condition, action = rule.get("condition"), rule.get("action")
+        target = rule.get("target")
+        target = str(target) if target is not None else None
+
+        if source not in position:
+            raise BranchingCompileError(f"Rule {number}: unknown question {source}")
+        if condition not in BRANCH_CONDITIONS:
+            raise BranchingCompileError(f"Rule {number}: unsupported condition {condition!r}")
+        if action not in BRANCH_ACTIONS:
+            raise BranchingCompileError(f"Rule {number}: unsupported action {action!r}")
+        if action != "end_survey":
+            if target not in position:
+                raise BranchingCompileError(f"Rule {number}: unknown target question {target}")
+            # Forward-only jumps keep every path finite
+            if position[target] <= position[source]:
+                raise BranchingCompileError(f"Rule {number}: target must come after question {source}")
+
+        try:
+            predicate = BRANCH_CONDITIONS[condition](rule.get("value"))
+        except BranchingCompileError as e:
+            raise BranchingCompileError(f"Rule {number}: {e}")
+
+        if action == "show_question":
+            reveals.setdefault(target, []).append((source, predicate))
+        else:
+            dispatch.setdefault(source, []).append(
+                (predicate, action, position[target] if action == "skip_to" else None)
+            )
+
+    return BranchingProgram(question_order, dispatch, reveals)
+
+
+_programs: "OrderedDict[str, BranchingProgram]" = OrderedDict()
+_programs_lock = threading.Lock()
+
+
+def branching_fingerprint(question_order: Sequence[str], branching: Dict[str, Any]) -> str:
+    payload = json.dumps([list(question_order), branching or {}], sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def compile_branching(question_order: Sequence[str], branching: Optional[Dict[str, Any]]) -> BranchingProgram:
+    """Compiled program for this survey version, from the LRU cache when possible"""
+    key = branching_fingerprint(question_order, branching or {})
+    with _programs_lock:
+        program = _programs.get(key)
+        if program is not None:
+            _programs.move_to_end(key)
+            return program
+
+    program = _compile([str(question_id) for question_id in question_order], branching or {})
+    with _programs_lock:
+        _programs[key] = program
+        while len(_programs) > PROGRAM_CACHE_SIZE:
+            _programs.popitem(last=False)
+    return program
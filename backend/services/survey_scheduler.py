@@ -0,0 +1,344 @@
+"""
+Recurring survey scheduler.
+
+Surveys scheduled through ``POST /surveys/{id}/schedule`` get a
+``next_run_at``. Every app worker keeps those deployments in an in-memory
+min-heap. The heap is loaded at startup, updated whenever a schedule changes,
+and periodically resynced with the database to pick up changes made on other
+workers. The scheduler sleeps until the earliest deployment is due.
+
+When a deployment is due, one transaction does all of the following:
+* takes a transaction-scoped advisory lock for the survey, so only one
+  worker materializes it
+* re-checks ``next_run_at``
+* creates the survey instance and copies its questions under new IDs,
+  keeping their positions and rewriting the branching rules and
+  reverse-coded pairs that point at the parent's questions
+* resolves the target audience into ``survey_audience``
+* queues invitations and reminders for that audience
+* advances ``next_run_at``
+
+The unique ``(parent_survey_id, occurrence_at)`` index is a second guard
+against duplicate instances.
+
+One-time schedules activate the survey itself. Recurring schedules
+(daily/weekly/monthly/quarterly) create a new instance per occurrence until
+``recurring_until``. Occurrences missed while the service was down are
+collapsed into one catch-up deployment.
+"""
+
+import asyncio
+import heapq
+import logging
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from dateutil.relativedelta import relativedelta
+from sqlalchemy import insert, select, text
+
+from config import settings
+from database import SessionLocal
+from models import Survey, SurveyQuestion
+from services.notifications import queue_survey_notifications
+from services.survey_audience import resolve_audience
+
+logger = logging.getLogger(__name__)
+
+FREQUENCY_STEPS = {
+    "daily": relativedelta(days=1),
+    "weekly": relativedelta(weeks=1),
+    "monthly": relativedelta(months=1),
+    "quarterly": relativedelta(months=3),
+}
+SCHEDULE_FREQUENCIES = ("one-time",) + tuple(FREQUENCY_STEPS)
+DEFAULT_INSTANCE_DURATION = timedelta(days=7)
+LOCK_BUSY_RETRY_SECONDS = 30
+
+
+def _parse_datetime(value: Any) -> Optional[datetime]:
+    if value in (None, ""):
+        return None
+    parsed = value if isinstance(value, datetime) else datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def next_occurrence(previous: datetime, frequency: str, now: datetime) -> Optional[datetime]:
+    """First occurrence after ``now`` following ``previous``; None for one-time schedules"""
+    step = FREQUENCY_STEPS.get(frequency)
+    if step is None:
+        return None
+    candidate = previous + step
+    while candidate <= now:
+        candidate += step
+    return candidate
+
+
+def initial_run_at(schedule_config: Dict[str, Any]) -> Optional[datetime]:
+    """First deployment time for a schedule, or None if the scheduler has nothing to do"""
+    if schedule_config.get("frequency", "one-time") == "one-time" and not schedule_config.get("auto_deploy"):
+        return None
+    return _parse_datetime(schedule_config.get("start_date")) or datetime.now(timezone.utc)
+
+
+def _instance_duration(survey: Survey, schedule_config: Dict[str, Any]) -> timedelta:
+    start = _parse_datetime(schedule_config.get("start_date")) or _parse_datetime(survey.start_date)
+    end = _parse_datetime(schedule_config.get("end_date")) or _parse_datetime(survey.end_date)
+    if start and end and end > start:
+        # A recurring survey's window can't overlap its next occurrence
+        duration = end - start
+        step = FREQUENCY_STEPS.get(schedule_config.get("frequency"))
+        if step is not None:
+            duration = min(duration, (start + step) - start)
+        return duration
+    return DEFAULT_INSTANCE_DURATION
+
+
+def _remap_question_ids(integrations: Dict[str, Any], id_map: Dict[str, str]) -> Dict[str, Any]:
+    """Point branching rules and reverse-coded pairs at the cloned questions"""
+    def remap(question_id):
+        return id_map.get(str(question_id), question_id)
+
+    integrations = dict(integrations)
+    branching = integrations.get("branching")
+    if branching:
+        integrations["branching"] = {
+            **branching,
+            "rules": [
+                {**rule, "question_id": remap(rule.get("question_id")), "target": remap(rule.get("target"))}
+                for rule in branching.get("rules", [])
+            ],
+        }
+    quality = integrations.get("quality")
+    if quality and quality.get("reverse_coded_pairs"):
+        integrations["quality"] = {
+            **quality,
+            "reverse_coded_pairs": [[remap(question_id) for question_id in pair] for pair in quality["reverse_coded_pairs"]],
+        }
+    return integrations
+
+
+def _create_instance(db, parent: Survey, occurrence: datetime, schedule_config: Dict[str, Any]) -> Survey:
+    question_table = SurveyQuestion.__table__
+    parent_questions = db.execute(
+        select(question_table.c.id, question_table.c.text, question_table.c.type,
+               question_table.c.options, question_table.c.position)
+        .where(question_table.c.survey_id == parent.id)
+        .order_by(question_table.c.position, question_table.c.id)
+    ).all()
+    id_map = {str(question.id): str(uuid.uuid4()) for question in parent_questions}
+
+    integrations = {k: v for k, v in (parent.platform_integrations or {}).items() if k != "scheduling"}
+    instance = Survey(
+        id=uuid.uuid4(),
+        title=f"{parent.title} ({occurrence:%Y-%m-%d})",
+        description=parent.description,
+        type=parent.type,
+        status="active",
+        start_date=occurrence,
+        end_date=occurrence + _instance_duration(parent, schedule_config),
+        is_anonymous=parent.is_anonymous,
+        target_departments=parent.target_departments or [],
+        target_employees=parent.target_employees or [],
+        frequency="one-time",
+        platform_integrations=_remap_question_ids(integrations, id_map),
+        parent_survey_id=parent.id,
+        occurrence_at=occurrence,
+    )
+    db.add(instance)
+    db.flush()
+
+    if parent_questions:
+        db.execute(insert(question_table), [
+            {
+                "id": uuid.UUID(id_map[str(question.id)]),
+                "survey_id": instance.id,
+                "text": question.text,
+                "type": question.type,
+                "options": question.options,
+                "position": question.position,
+            }
+            for question in parent_questions
+        ])
+    return instance
+
+
+def materialize_due_survey(survey_id: uuid.UUID, expected_run_at: datetime) -> Tuple[Optional[datetime], Optional[uuid.UUID]]:
+    """
+    Deploy one due occurrence of a scheduled survey.
+
+    Returns ``(next_run_at, instance_id)``. ``instance_id`` is None when another
+    worker holds the lock or has already deployed this occurrence.
+    """
+    db = SessionLocal()
+    try:
+        locked = db.execute(
+            text("SELECT pg_try_advisory_xact_lock(hashtext(:key))"),
+            {"key": f"survey_schedule:{survey_id}"}
+        ).scalar()
+        if not locked:
+            db.rollback()
+            return datetime.now(timezone.utc) + timedelta(seconds=LOCK_BUSY_RETRY_SECONDS), None
+
+        survey = db.query(Survey).filter(Survey.id == survey_id).with_for_update().first()
+        now = datetime.now(timezone.utc)
+        if not survey or survey.next_run_at is None:
+            db.rollback()
+            return None, None
+        run_at = _parse_datetime(survey.next_run_at)
+        if run_at > now or run_at != _parse_datetime(expected_run_at):
+            # Rescheduled or already deployed by another worker
+            db.rollback()
+            return run_at, None
+
+        schedule_config = (survey.platform_integrations or {}).get("scheduling", {})
+        frequency = schedule_config.get("frequency", survey.frequency or "one-time")
+        auto_deploy = bool(schedule_config.get("auto_deploy"))
+
+        if frequency == "one-time":
+            target = survey
+            survey.status = "active"
+            survey.start_date = run_at
+        else:
+            target = _create_instance(db, survey, run_at, schedule_config)
+
+        resolve_audience(db, target)
+        if auto_deploy:
+            queue_survey_notifications(db, target, send_at=run_at, commit=False)
+
+        next_run = next_occurrence(run_at, frequency, now)
+        recurring_until = _parse_datetime(schedule_config.get("recurring_until"))
+        if next_run and recurring_until and next_run > recurring_until:
+            next_run = None
+        survey.next_run_at = next_run
+        if next_run is None and frequency != "one-time":
+            survey.status = "completed"
+
+        db.commit()
+        logger.info(f"Deployed scheduled survey {survey_id} occurrence {run_at.isoformat()} as {target.id}")
+        return next_run, target.id
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def load_scheduled_surveys() -> List[Tuple[datetime, uuid.UUID]]:
+    db = SessionLocal()
+    try:
+        rows = db.query(Survey.next_run_at, Survey.id).filter(Survey.next_run_at.isnot(None)).all()
+        return [(_parse_datetime(run_at), survey_id) for run_at, survey_id in rows]
+    finally:
+        db.close()
+
+
+class SurveyScheduler:
+    """Min-heap of upcoming deployments with a single timer task"""
+
+    def __init__(self, resync_seconds: float):
+        self.resync_seconds = resync_seconds
+        self._heap: List[Tuple[datetime, str]] = []
+        self._entries: Dict[str, datetime] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"deployed": 0, "failed": 0}
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def _push(self, survey_id: str, run_at: Optional[datetime]):
+        # Superseded heap entries are skipped lazily when popped
+        if run_at is None:
+            self._entries.pop(survey_id, None)
+            return
+        self._entries[survey_id] = run_at
+        heapq.heappush(self._heap, (run_at, survey_id))
+
+    def _replace_all(self, entries: List[Tuple[datetime, uuid.UUID]]):
+        self._entries = {str(survey_id): run_at for run_at, survey_id in entries}
+        self._heap = [(run_at, survey_id) for survey_id, run_at in self._entries.items()]
+        heapq.heapify(self._heap)
+
+    def schedule(self, survey_id: uuid.UUID, run_at: Optional[datetime]):
+        """Add, move or (with ``run_at=None``) remove a survey's next deployment"""
+        if not self.is_running:
+            return
+        run_at = _parse_datetime(run_at)
+
+        def _apply():
+            self._push(str(survey_id), run_at)
+            self._wakeup.set()
+
+        self._loop.call_soon_threadsafe(_apply)
+
+    async def start(self):
+        if self.is_running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._replace_all(await self._loop.run_in_executor(None, load_scheduled_surveys))
+        self._task = asyncio.create_task(self._run(), name="survey-scheduler")
+        logger.info(f"✅ Survey scheduler started with {len(self._entries)} scheduled surveys")
+
+    async def stop(self):
+        if not self.is_running:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        logger.info("✅ Survey scheduler stopped")
+
+    async def _run(self):
+        last_resync = self._loop.time()
+        while True:
+            if self._loop.time() - last_resync >= self.resync_seconds:
+                try:
+                    self._replace_all(await self._loop.run_in_executor(None, load_scheduled_surveys))
+                except Exception as e:
+                    logger.error(f"Survey scheduler resync failed: {e}")
+                last_resync = self._loop.time()
+
+            # Drop superseded entries from the top of the heap
+            while self._heap and self._entries.get(self._heap[0][1]) != self._heap[0][0]:
+                heapq.heappop(self._heap)
+
+            now = datetime.now(timezone.utc)
+            if not self._heap or self._heap[0][0] > now:
+                delay = self.resync_seconds - (self._loop.time() - last_resync)
+                if self._heap:
+                    delay = min(delay, (self._heap[0][0] - now).total_seconds())
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=max(0.0, delay))
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            run_at, survey_id = heapq.heappop(self._heap)
+            self._entries.pop(survey_id, None)
+            try:
+                next_run, instance_id = await self._loop.run_in_executor(
+                    None, materialize_due_survey, uuid.UUID(survey_id), run_at
+                )
+                if instance_id:
+                    self.stats["deployed"] += 1
+            except Exception as e:
+                logger.error(f"Failed to deploy scheduled survey {survey_id}: {e}")
+                self.stats["failed"] += 1
+                next_run = datetime.now(timezone.utc) + timedelta(seconds=self.resync_seconds)
+            if survey_id not in self._entries:
+                self._push(survey_id, next_run)
+
+
+survey_scheduler = SurveyScheduler(resync_seconds=settings.SURVEY_SCHEDULER_RESYNC_SECONDS)
+
+
+async def start_survey_scheduler():
+    await survey_scheduler.start()
+
+
+async def stop_survey_scheduler():
+    await survey_scheduler.stop()
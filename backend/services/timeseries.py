@@ -0,0 +1,302 @@
+"""
+Vectorized time-series analytics for KPI measurements and other short series.
+
+Every function takes a batch of series as one 2-D array with one row per
+series. Rows are right-aligned: the latest observation sits in the last
+column, and shorter series are padded with NaN on the left (see ``pad``).
+Statistics are computed with array operations across the whole batch, so
+hundreds of KPIs are analyzed in one call. The only Python loops run over
+time steps (EWMA) or candidate lags (seasonality), never over series.
+
+Observations are treated as equally spaced, since measurements are
+recorded at the KPI's measurement frequency.
+
+``analyze`` returns the usual summary for each series:
+
+* least-squares slope, R² and a confidence that the slope is not zero
+  (a two-sided t-test, using a normal approximation to the t distribution);
+* ``trend_percentage``, the fitted change across the series relative to
+  its first value, and the resulting direction;
+* the latest rolling mean and EWMA;
+* the dominant seasonal period, from the autocorrelation of the detrended
+  series;
+* a short-horizon forecast (linear trend plus the seasonal profile) with a
+  95% prediction interval.
+"""
+
+import logging
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import desc, func, select
+
+from models import KPIMeasurement
+
+logger = logging.getLogger(__name__)
+
+TREND_THRESHOLD = 0.05  # |trend_percentage| beyond which a series is improving/declining
+SEASONALITY_THRESHOLD = 0.3  # Minimum autocorrelation for a seasonal period
+MAX_SEASONAL_PERIOD = 12
+Z_95 = 1.959964
+
+
+def pad(series: Sequence[Sequence[Optional[float]]], length: Optional[int] = None) -> np.ndarray:
+    """
+    Right-align series into an (n, length) float array, NaN-padded on the
+    left. Series longer than ``length`` keep their latest points.
+    """
+    length = length if length is not None else max((len(values) for values in series), default=0)
+    padded = np.full((len(series), length), np.nan)
+    for row, values in enumerate(series):
+        tail = list(values)[-length:] if length else []
+        if tail:
+            padded[row, length - len(tail):] = np.array(tail, dtype=float)
+    return padded
+
+
+def _masked(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    mask = ~np.isnan(values)
+    return np.where(mask, values, 0.0), mask
+
+
+def _divide(numerator, denominator, fill=np.nan):
+    numerator, denominator = np.broadcast_arrays(np.asarray(numerator, dtype=float), np.asarray(denominator, dtype=float))
+    out = np.full(numerator.shape, fill, dtype=float)
+    np.divide(numerator, denominator, out=out, where=denominator != 0)
+    return out
+
+
+def _erf(x: np.ndarray) -> np.ndarray:
+    """erf for x >= 0 (Abramowitz & Stegun 7.1.26, |error| < 1.5e-7)"""
+    t = 1.0 / (1.0 + 0.3275911 * x)
+    poly = t * (0.254829592 + t * (-0.284496736 + t * (1.421413741 + t * (-1.453152027 + t * 1.061405429))))
+    return 1.0 - poly * np.exp(-x * x)
+
+
+def _t_confidence(t: np.ndarray, dof: np.ndarray) -> np.ndarray:
+    """1 - two-sided p-value of a t statistic, via a normal approximation of the t distribution"""
+    dof = np.maximum(dof, 1)
+    z = np.abs(t) * (1 - 1 / (4 * dof)) / np.sqrt(1 + t * t / (2 * dof))
+    return _erf(z / np.sqrt(2))
+
+
+def linear_trend(values: np.ndarray) -> Dict[str, np.ndarray]:
+    """Per-row least-squares fit of value against column position"""
+    y, mask = _masked(values)
+    x = np.broadcast_to(np.arange(values.shape[1], dtype=float), values.shape)
+    n = mask.sum(axis=1)
+    x_mean = _divide((x * mask).sum(axis=1), n)
+    y_mean = _divide(y.sum(axis=1), n)
+    dx = np.where(mask, x - np.nan_to_num(x_mean)[:, None], 0.0)
+    dy = np.where(mask, y - np.nan_to_num(y_mean)[:, None], 0.0)
+    sxx = (dx * dx).sum(axis=1)
+    sxy = (dx * dy).sum(axis=1)
+    syy = (dy * dy).sum(axis=1)
+
+    slope = _divide(sxy, sxx, fill=0.0)
+    intercept = y_mean - slope * x_mean
+    sse = np.clip(syy - slope * sxy, 0.0, None)
+    dof = n - 2
+    residual_std = np.sqrt(_divide(sse, np.where(dof > 0, dof, 0)))
+    t = _divide(slope, residual_std / np.sqrt(np.where(sxx > 0, sxx, np.nan)))
+    confidence = np.where(dof > 0, np.nan_to_num(_t_confidence(np.nan_to_num(t), dof)), 0.0)
+    # A perfect fit with a non-zero slope is certain
+    confidence = np.where((dof > 0) & (sse <= 1e-12 * np.maximum(syy, 1.0)) & (slope != 0), 1.0, confidence)
+    return {
+        "n": n,
+        "slope": slope,
+        "intercept": intercept,
+        "r_squared": np.where(syy > 0, 1 - _divide(sse, syy, fill=0.0), 0.0),
+        "confidence": confidence,
+        "residual_std": residual_std,
+        "x_mean": x_mean,
+        "sxx": sxx,
+    }
+
+
+def _first_valid(values: np.ndarray, mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    first = mask.argmax(axis=1)
+    return first, values[np.arange(values.shape[0]), first]
+
+
+def trend_percentage(values: np.ndarray, trend: Optional[Dict[str, np.ndarray]] = None) -> np.ndarray:
+    """Fitted change from the first to the last observation, as a fraction of the first value"""
+    trend = trend or linear_trend(values)
+    if values.shape[1] == 0:
+        return np.zeros(values.shape[0])
+    mask = ~np.isnan(values)
+    first, first_value = _first_valid(values, mask)
+    last = values.shape[1] - 1 - mask[:, ::-1].argmax(axis=1)
+    change = trend["slope"] * (last - first)
+    return np.where(trend["n"] >= 2, _divide(change, np.abs(np.nan_to_num(first_value)), fill=0.0), 0.0)
+
+
+def direction(percentage: np.ndarray, n: np.ndarray, threshold: float = TREND_THRESHOLD) -> np.ndarray:
+    labels = np.where(percentage > threshold, "improving", np.where(percentage < -threshold, "declining", "stable"))
+    return np.where(n >= 2, labels, "insufficient_data")
+
+
+def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """Trailing mean over the last ``window`` positions, ignoring missing values"""
+    y, mask = _masked(values)
+    sums = np.cumsum(y, axis=1)
+    counts = np.cumsum(mask, axis=1)
+    if window < values.shape[1]:
+        sums[:, window:] = sums[:, window:] - np.cumsum(y, axis=1)[:, :-window]
+        counts[:, window:] = counts[:, window:] - np.cumsum(mask, axis=1)[:, :-window]
+    return _divide(sums, counts)
+
+
+def ewma(values: np.ndarray, span: float = 3) -> np.ndarray:
+    """Exponentially weighted moving average (alpha = 2 / (span + 1)); missing values carry the last state"""
+    alpha = 2.0 / (span + 1.0)
+    smoothed = np.full(values.shape, np.nan)
+    state = np.full(values.shape[0], np.nan)
+    for column in range(values.shape[1]):
+        current = values[:, column]
+        state = np.where(
+            np.isnan(current), state,
+            np.where(np.isnan(state), current, alpha * current + (1 - alpha) * state)
+        )
+        smoothed[:, column] = state
+    return smoothed
+
+
+def _residuals(values: np.ndarray, trend: Dict[str, np.ndarray]) -> np.ndarray:
+    x = np.arange(values.shape[1], dtype=float)
+    return values - (trend["intercept"][:, None] + trend["slope"][:, None] * x)
+
+
+def seasonality(values: np.ndarray, trend: Optional[Dict[str, np.ndarray]] = None,
+                max_period: int = MAX_SEASONAL_PERIOD,
+                threshold: float = SEASONALITY_THRESHOLD) -> Dict[str, np.ndarray]:
+    """
+    Dominant period (0 when none) and its autocorrelation, from the detrended
+    series. A period needs two full cycles of data.
+    """
+    trend = trend or linear_trend(values)
+    residuals, mask = _masked(_residuals(values, trend))
+    variance = (residuals * residuals).sum(axis=1)
+    rows = values.shape[0]
+    best_period = np.zeros(rows, dtype=int)
+    best_strength = np.zeros(rows)
+    for lag in range(2, min(max_period, values.shape[1] // 2) + 1):
+        both = mask[:, lag:] & mask[:, :-lag]
+        strength = _divide((residuals[:, lag:] * residuals[:, :-lag] * both).sum(axis=1), variance, fill=0.0)
+        better = (trend["n"] >= 2 * lag) & (strength > best_strength)
+        best_period = np.where(better, lag, best_period)
+        best_strength = np.where(better, strength, best_strength)
+    seasonal = best_strength >= threshold
+    return {"period": np.where(seasonal, best_period, 0), "strength": best_strength}
+
+
+def forecast(values: np.ndarray, horizon: int, trend: Optional[Dict[str, np.ndarray]] = None,
+             seasons: Optional[Dict[str, np.ndarray]] = None) -> Dict[str, np.ndarray]:
+    """Linear trend plus seasonal profile for the next ``horizon`` steps, with a 95% prediction interval"""
+    trend = trend or linear_trend(values)
+    seasons = seasons or seasonality(values, trend)
+    length = values.shape[1]
+    future = np.arange(length, length + horizon, dtype=float)
+    predicted = trend["intercept"][:, None] + trend["slope"][:, None] * future
+
+    residuals, mask = _masked(_residuals(values, trend))
+    positions = np.arange(length)
+    for period in np.unique(seasons["period"]):
+        if period == 0:
+            continue
+        rows = seasons["period"] == period
+        phases = positions % period
+        profile = np.stack([
+            _divide((residuals[rows][:, phases == phase]).sum(axis=1), mask[rows][:, phases == phase].sum(axis=1), fill=0.0)
+            for phase in range(period)
+        ], axis=1)
+        predicted[rows] += profile[:, future.astype(int) % period]
+
+    n = np.where(trend["n"] > 0, trend["n"], np.nan)
+    spread = trend["residual_std"][:, None] * np.sqrt(
+        1 + 1 / n[:, None] + _divide((future[None, :] - trend["x_mean"][:, None]) ** 2, trend["sxx"][:, None])
+    )
+    return {"value": predicted, "lower": predicted - Z_95 * spread, "upper": predicted + Z_95 * spread}
+
+
+def _number(value, digits: int = 4) -> Optional[float]:
+    return None if value is None or np.isnan(value) else round(float(value), digits)
+
+
+def analyze(series: Sequence[Sequence[Optional[float]]], horizon: int = 3, window: int = 3,
+            span: float = 3, max_period: int = MAX_SEASONAL_PERIOD,
+            threshold: float = TREND_THRESHOLD) -> List[Dict[str, Any]]:
+    """Trend, smoothing, seasonality and forecast summaries for many series in one vectorized pass"""
+    if not series:
+        return []
+    values = pad(series)
+    trend = linear_trend(values)
+    percentage = trend_percentage(values, trend)
+    labels = direction(percentage, trend["n"], threshold)
+    rolling = rolling_mean(values, window)[:, -1] if values.shape[1] else np.full(len(series), np.nan)
+    smoothed = ewma(values, span)[:, -1] if values.shape[1] else np.full(len(series), np.nan)
+    seasons = seasonality(values, trend, max_period)
+    predicted = forecast(values, horizon, trend, seasons) if horizon else None
+
+    results = []
+    for row in range(len(series)):
+        enough = trend["n"][row] >= 2
+        results.append({
+            "points": int(trend["n"][row]),
+            "direction": str(labels[row]),
+            "slope": _number(trend["slope"][row]) if enough else None,
+            "r_squared": _number(trend["r_squared"][row]) if enough else None,
+            "confidence": _number(trend["confidence"][row]) if enough else None,
+            "trend_percentage": _number(percentage[row]),
+            "rolling_mean": _number(rolling[row]),
+            "ewma": _number(smoothed[row]),
+            "seasonality": {
+                "period": int(seasons["period"][row]) or None,
+                "strength": _number(seasons["strength"][row]),
+            },
+            "forecast": [
+                {
+                    "step": step + 1,
+                    "value": _number(predicted["value"][row, step]),
+                    "lower": _number(predicted["lower"][row, step]),
+                    "upper": _number(predicted["upper"][row, step]),
+                }
+                for step in range(horizon)
+            ] if predicted is not None and enough else [],
+        })
+    return results
+
+
+# =====================================================
+# KPI MEASUREMENT SERIES
+# =====================================================
+
+def load_kpi_series(db, kpi_ids: Iterable[Any], since=None, latest: Optional[int] = None) -> Dict[Any, List[float]]:
+    """
+    Measurement values per KPI in date order, from one query. ``latest``
+    keeps each KPI's most recent N measurements (a window function, so it
+    stays one query however many KPIs are asked for).
+    """
+    kpi_ids = list(kpi_ids)
+    if not kpi_ids:
+        return {}
+    ranked = select(
+        KPIMeasurement.kpi_id,
+        KPIMeasurement.value,
+        KPIMeasurement.measurement_date,
+        func.row_number().over(
+            partition_by=KPIMeasurement.kpi_id, order_by=desc(KPIMeasurement.measurement_date)
+        ).label("recency"),
+    ).where(KPIMeasurement.kpi_id.in_(kpi_ids))
+    if since is not None:
+        ranked = ranked.where(KPIMeasurement.measurement_date >= since)
+    ranked = ranked.subquery()
+    query = select(ranked.c.kpi_id, ranked.c.value).order_by(ranked.c.kpi_id, ranked.c.recency.desc())
+    if latest is not None:
+        query = query.where(ranked.c.recency <= latest)
+
+    series: Dict[Any, List[float]] = defaultdict(list)
+    for kpi_id, value in db.execute(query):
+        series[kpi_id].append(float(value))
+    return dict(series)
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+NOTIFICATION ROUTING TEST
+Checks that survey notifications carry the routing their senders need
+"""
+
+import uuid
+from datetime import timedelta
+
+from services.notifications import notification_routes, reminder_offsets
+
+RECIPIENTS = [
+    (uuid.uuid4(), "dm@example.com", uuid.uuid4(), {"slack_user_id": "U123"}),
+    (uuid.uuid4(), "nodm@example.com", uuid.uuid4(), {}),
+]
+
+
+def test_slack_rows_have_a_channel():
+    config = {"channel_ids": ["C42"], "user_groups": ["S7"], "notification_type": "message"}
+    routes = notification_routes("slack", config, RECIPIENTS)
+    assert all(route["metadata"].get("slack_user_id") or route["metadata"].get("slack_channel") for route in routes)
+    assert [route["metadata"]["slack_user_id"] for route in routes if route["recipient_id"]] == ["U123"]
+    channel_routes = [route for route in routes if route["recipient_id"] is None]
+    assert channel_routes == [{"recipient_id": None, "metadata": {"slack_channel": "C42", "slack_user_groups": ["S7"]}}]
+
+
+def test_teams_posts_once_per_channel():
+    routes = notification_routes("teams", {"team_ids": ["T1"], "channel_ids": ["A", "B"]}, RECIPIENTS)
+    assert [route["metadata"]["teams_channel_id"] for route in routes] == ["A", "B"]
+    assert all(route["recipient_id"] is None for route in routes)
+    assert len(notification_routes("teams", {}, RECIPIENTS)) == 1
+
+
+def test_email_and_in_app_rows_are_per_recipient():
+    for platform in ("email", "in_app"):
+        routes = notification_routes(platform, {}, RECIPIENTS)
+        assert [route["metadata"]["email"] for route in routes] == ["dm@example.com", "nodm@example.com"]
+
+
+def test_reminder_settings_from_schedule():
+    schedule = {"enabled": True, "schedule": ["2_days"]}
+    assert reminder_offsets("slack", {"reminder_enabled": None}, schedule) == [timedelta(days=2)]
+    assert reminder_offsets("in_app", {}, schedule) == [timedelta(days=2)]
+    assert reminder_offsets("email", {"reminder_schedule": ["6_hours"]}, schedule) == [timedelta(hours=6)]
+    assert reminder_offsets("slack", {}, {"enabled": False}) == []
+    assert reminder_offsets("slack", {"reminder_enabled": True}, {"enabled": False}) == [timedelta(days=1)]
+    assert reminder_offsets("in_app", {}, None) == []
+
+
+if __name__ == "__main__":
+    for test in (test_slack_rows_have_a_channel, test_teams_posts_once_per_channel,
+                 test_email_and_in_app_rows_are_per_recipient, test_reminder_settings_from_schedule):
+        test()
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+TIME-SERIES ANALYTICS TEST
+Checks services.timeseries against known fits, including empty input
+"""
+
+import numpy as np
+
+from services import timeseries
+
+
+def test_linear_series():
+    rising, falling = timeseries.analyze([[1, 2, 3, 4, 5], [5, 4, 3, 2, 1]])
+    assert rising["direction"] == "improving"
+    assert rising["slope"] == 1.0 and rising["confidence"] == 1.0
+    assert rising["trend_percentage"] == 4.0  # Fitted change of 4 over a first value of 1
+    assert [point["value"] for point in rising["forecast"]] == [6.0, 7.0, 8.0]
+    assert falling["direction"] == "declining"
+
+
+def test_matches_numpy_fit():
+    values = np.random.default_rng(1).normal(0, 1, 20) + 0.1 * np.arange(20)
+    trend = timeseries.linear_trend(timeseries.pad([values.tolist()]))
+    slope, intercept = np.polyfit(np.arange(20), values, 1)
+    assert np.isclose(trend["slope"][0], slope) and np.isclose(trend["intercept"][0], intercept)
+
+
+def test_empty_series():
+    # KPIs without measurements in the period pad to a zero-width array
+    for series in ([[]], [[], []], [[None, None]]):
+        results = timeseries.analyze(series)
+        assert len(results) == len(series)
+        for result in results:
+            assert result["direction"] == "insufficient_data"
+            assert result["points"] == 0
+            assert result["trend_percentage"] == 0.0
+            assert result["forecast"] == []
+    assert timeseries.analyze([]) == []
+    assert timeseries.trend_percentage(timeseries.pad([[]])).tolist() == [0.0]
+
+
+def test_mixed_lengths():
+    empty, short, full = timeseries.analyze([[], [3], [2, 4, 6, 8]])
+    assert empty["direction"] == short["direction"] == "insufficient_data"
+    assert short["ewma"] == 3.0
+    assert full["direction"] == "improving" and full["points"] == 4
+
+
+if __name__ == "__main__":
+    for test in (test_linear_series, test_matches_numpy_fit, test_empty_series, test_mixed_lengths):
+        test()
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,74 @@
+-- =====================================================
+-- AUDIT LOG PARTITIONING
+-- Converts audit_logs into a table range-partitioned by month
+-- so time-bounded queries prune partitions and old months can
+-- be detached/dropped instead of deleted row by row.
+-- =====================================================
+
+-- Creates the partition covering the month that contains target_month
+CREATE OR REPLACE FUNCTION create_audit_log_partition(target_month DATE)
+RETURNS TEXT AS $$
+DECLARE
+    month_start DATE := date_trunc('month', target_month)::date;
+    month_end DATE := (date_trunc('month', target_month) + INTERVAL '1 month')::date;
+    partition_name TEXT := 'audit_logs_' || to_char(month_start, 'YYYY_MM');
+BEGIN
+    IF to_regclass(partition_name) IS NULL THEN
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF audit_logs FOR VALUES FROM (%L) TO (%L)',
+            partition_name, month_start, month_end
+        );
+    END IF;
+    RETURN partition_name;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+    oldest DATE;
+    m DATE;
+BEGIN
+    -- Skip if already partitioned
+    IF EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('audit_logs')) THEN
+        RETURN;
+    END IF;
+
+    ALTER TABLE audit_logs RENAME TO audit_logs_legacy;
+    ALTER TABLE audit_logs_legacy RENAME CONSTRAINT audit_logs_pkey TO audit_logs_legacy_pkey;
+
+    CREATE TABLE audit_logs (
+        id UUID DEFAULT gen_random_uuid() NOT NULL,
+        user_id UUID REFERENCES users(id),
+        action TEXT NOT NULL,
+        details JSONB DEFAULT '{}',
+        ip_address TEXT,
+        user_agent TEXT,
+        timestamp TIMESTAMP WITH TIME ZONE DEFAULT NOW() NOT NULL,
+        PRIMARY KEY (id, timestamp)
+    ) PARTITION BY RANGE (timestamp);
+
+    -- Catch-all so a missing monthly partition never rejects an insert
+    CREATE TABLE audit_logs_default PARTITION OF audit_logs DEFAULT;
+
+    SELECT COALESCE(date_trunc('month', MIN(timestamp))::date, date_trunc('month', NOW())::date)
+    INTO oldest FROM audit_logs_legacy;
+
+    m := oldest;
+    WHILE m <= (date_trunc('month', NOW()) + INTERVAL '2 months')::date LOOP
+        PERFORM create_audit_log_partition(m);
+        m := (m + INTERVAL '1 month')::date;
+    END LOOP;
+
+    INSERT INTO audit_logs (id, user_id, action, details, ip_address, user_agent, timestamp)
+    SELECT id, user_id, action, details, ip_address, user_agent, COALESCE(timestamp, NOW())
+    FROM audit_logs_legacy;
+
+    DROP TABLE audit_logs_legacy;
+END $$;
+
+-- Indexes are defined on the parent and cascade to every partition
+CREATE INDEX IF NOT EXISTS idx_audit_logs_timestamp_id ON audit_logs(timestamp, id);
+CREATE INDEX IF NOT EXISTS idx_audit_logs_user_timestamp_id ON audit_logs(user_id, timestamp, id);
+CREATE INDEX IF NOT EXISTS idx_audit_logs_action_timestamp_id ON audit_logs(action, timestamp, id);
+
+ANALYZE audit_logs;
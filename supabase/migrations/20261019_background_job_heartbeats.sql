@@ -0,0 +1,13 @@
+-- =====================================================
+-- BACKGROUND JOB HEARTBEATS
+-- Running jobs record the worker executing them and a heartbeat it refreshes,
+-- so startup recovery only re-queues jobs whose worker has died instead of
+-- every running job in the cluster. Cancel requests are stored on the row so
+-- any worker can accept them
+-- =====================================================
+
+ALTER TABLE background_jobs ADD COLUMN IF NOT EXISTS worker_id TEXT;
+ALTER TABLE background_jobs ADD COLUMN IF NOT EXISTS heartbeat_at TIMESTAMP WITH TIME ZONE;
+
+-- Cancel requests for running jobs; the owning worker's heartbeat acts on them
+ALTER TABLE background_jobs ADD COLUMN IF NOT EXISTS cancel_requested BOOLEAN NOT NULL DEFAULT FALSE;
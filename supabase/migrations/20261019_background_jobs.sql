@@ -0,0 +1,29 @@
+-- =====================================================
+-- BACKGROUND JOBS
+-- Persisted job queue for long-running endpoints (?async=true)
+-- =====================================================
+
+CREATE TABLE IF NOT EXISTS background_jobs (
+    id UUID DEFAULT gen_random_uuid() PRIMARY KEY,
+    job_type TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued', -- queued, running, succeeded, failed, cancelled
+    params JSONB DEFAULT '{}',
+    idempotency_key TEXT,
+    progress INTEGER DEFAULT 0,
+    progress_message TEXT,
+    result JSONB,
+    error TEXT,
+    created_by UUID REFERENCES users(id),
+    started_at TIMESTAMP WITH TIME ZONE,
+    completed_at TIMESTAMP WITH TIME ZONE,
+    expires_at TIMESTAMP WITH TIME ZONE,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT TIMEZONE('utc'::text, NOW()) NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT TIMEZONE('utc'::text, NOW()) NOT NULL
+);
+
+-- Resubmitting with the same Idempotency-Key returns the existing job
+CREATE UNIQUE INDEX IF NOT EXISTS idx_background_jobs_idempotency
+ON background_jobs(created_by, job_type, idempotency_key);
+
+CREATE INDEX IF NOT EXISTS idx_background_jobs_status_created ON background_jobs(status, created_at);
+CREATE INDEX IF NOT EXISTS idx_background_jobs_expires_at ON background_jobs(expires_at);
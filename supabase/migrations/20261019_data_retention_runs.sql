@@ -0,0 +1,33 @@
+-- =====================================================
+-- DATA RETENTION EXECUTOR
+-- Policy action column and resumable run tracking
+-- =====================================================
+
+ALTER TABLE data_retention_policies
+ADD COLUMN IF NOT EXISTS action TEXT DEFAULT 'delete'; -- delete, anonymize
+
+CREATE TABLE IF NOT EXISTS retention_runs (
+    id UUID DEFAULT gen_random_uuid() PRIMARY KEY,
+    policy_id UUID REFERENCES data_retention_policies(id) ON DELETE CASCADE,
+    data_type TEXT NOT NULL,
+    action TEXT NOT NULL, -- delete, anonymize
+    status TEXT NOT NULL DEFAULT 'pending', -- pending, running, completed, failed, cancelled
+    cutoff_date TIMESTAMP WITH TIME ZONE NOT NULL,
+    total_candidates INTEGER DEFAULT 0,
+    processed_count INTEGER DEFAULT 0,
+    batches_completed INTEGER DEFAULT 0,
+    last_error TEXT,
+    started_by UUID REFERENCES users(id),
+    started_at TIMESTAMP WITH TIME ZONE,
+    completed_at TIMESTAMP WITH TIME ZONE,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT TIMEZONE('utc'::text, NOW()) NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT TIMEZONE('utc'::text, NOW()) NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_retention_runs_policy_id ON retention_runs(policy_id);
+CREATE INDEX IF NOT EXISTS idx_retention_runs_status ON retention_runs(status);
+
+-- Age columns walked by the executor
+CREATE INDEX IF NOT EXISTS idx_survey_responses_submitted_at ON survey_responses(submitted_at);
+CREATE INDEX IF NOT EXISTS idx_consent_records_created_at ON consent_records(created_at);
+CREATE INDEX IF NOT EXISTS idx_feedback_created_at ON feedback(created_at);
@@ -0,0 +1,62 @@
+-- =====================================================
+-- 360 FEEDBACK CAMPAIGNS
+-- A campaign requests feedback on many subjects at once. feedback_requests
+-- becomes one row per (subject, rater), inserted in bulk per campaign, with
+-- completion counters on the campaign and a (campaign_id, status) index for
+-- progress breakdowns
+-- =====================================================
+
+-- Same definition as SUPABASE_MANUAL_EXECUTION.sql, for databases that never ran it
+CREATE TABLE IF NOT EXISTS feedback_requests (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    employee_id UUID NOT NULL REFERENCES employees(id),
+    requested_by UUID NOT NULL REFERENCES users(id),
+    request_type TEXT NOT NULL CHECK (request_type IN ('360', 'peer', 'upward', 'self')),
+    parameters_to_rate TEXT[] NOT NULL,
+    target_raters UUID[] NOT NULL,
+    due_date DATE NOT NULL,
+    status TEXT DEFAULT 'pending' CHECK (status IN ('pending', 'in_progress', 'completed', 'expired')),
+    instructions TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT TIMEZONE('utc'::text, NOW()),
+    completed_at TIMESTAMP WITH TIME ZONE
+);
+
+CREATE TABLE IF NOT EXISTS feedback_campaigns (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    name TEXT NOT NULL,
+    description TEXT,
+    cycle_id UUID REFERENCES performance_review_cycles(id) ON DELETE SET NULL,
+    due_date DATE NOT NULL,
+    status TEXT NOT NULL DEFAULT 'active' CHECK (status IN ('active', 'closed')),
+    settings JSONB DEFAULT '{}'::jsonb,
+    subject_count INTEGER NOT NULL DEFAULT 0,
+    total_requests INTEGER NOT NULL DEFAULT 0,
+    completed_requests INTEGER NOT NULL DEFAULT 0,
+    created_by UUID REFERENCES users(id),
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT TIMEZONE('utc'::text, NOW()),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT TIMEZONE('utc'::text, NOW()),
+    closed_at TIMESTAMP WITH TIME ZONE
+);
+CREATE INDEX IF NOT EXISTS idx_feedback_campaigns_status ON feedback_campaigns(status, created_at DESC);
+
+-- Per-rater requests; the legacy arrays default to empty for campaign rows
+ALTER TABLE feedback_requests ADD COLUMN IF NOT EXISTS campaign_id UUID REFERENCES feedback_campaigns(id) ON DELETE CASCADE;
+ALTER TABLE feedback_requests ADD COLUMN IF NOT EXISTS rater_id UUID REFERENCES employees(id) ON DELETE CASCADE;
+ALTER TABLE feedback_requests ADD COLUMN IF NOT EXISTS feedback_id UUID REFERENCES feedback(id) ON DELETE SET NULL;
+ALTER TABLE feedback_requests ALTER COLUMN parameters_to_rate SET DEFAULT '{}';
+ALTER TABLE feedback_requests ALTER COLUMN target_raters SET DEFAULT '{}';
+
+-- Manager feedback on a report is a 'downward' request
+ALTER TABLE feedback_requests DROP CONSTRAINT IF EXISTS feedback_requests_request_type_check;
+ALTER TABLE feedback_requests ADD CONSTRAINT feedback_requests_request_type_check
+    CHECK (request_type IN ('360', 'peer', 'upward', 'downward', 'self'));
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_feedback_requests_campaign_subject_rater
+    ON feedback_requests(campaign_id, employee_id, rater_id);
+CREATE INDEX IF NOT EXISTS idx_feedback_requests_campaign_status
+    ON feedback_requests(campaign_id, status, request_type);
+CREATE INDEX IF NOT EXISTS idx_feedback_requests_rater_status
+    ON feedback_requests(rater_id, status);
+
+ALTER TABLE feedback_campaigns ENABLE ROW LEVEL SECURITY;
+ALTER TABLE feedback_requests ENABLE ROW LEVEL SECURITY;
@@ -0,0 +1,40 @@
+-- =====================================================
+-- FOCUS GROUP MEMBERSHIP
+-- Moves membership out of the focus_groups.members JSONB array into a join
+-- table, indexed both ways: (group, employee) for member lists and the
+-- uniqueness guarantee, (employee, group) for "which groups am I in"
+-- =====================================================
+
+CREATE TABLE IF NOT EXISTS focus_group_members (
+    id UUID DEFAULT gen_random_uuid() PRIMARY KEY,
+    focus_group_id UUID NOT NULL REFERENCES focus_groups(id) ON DELETE CASCADE,
+    employee_id UUID NOT NULL REFERENCES employees(id) ON DELETE CASCADE,
+    role TEXT NOT NULL DEFAULT 'member', -- member, coordinator, leader
+    notes TEXT,
+    added_by UUID REFERENCES users(id),
+    joined_at TIMESTAMP WITH TIME ZONE DEFAULT TIMEZONE('utc'::text, NOW()) NOT NULL
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_focus_group_members_group_employee
+    ON focus_group_members(focus_group_id, employee_id);
+CREATE INDEX IF NOT EXISTS idx_focus_group_members_employee
+    ON focus_group_members(employee_id, focus_group_id);
+
+ALTER TABLE focus_group_members ENABLE ROW LEVEL SECURITY;
+
+-- Backfill from the JSONB arrays; malformed and dangling IDs are dropped
+INSERT INTO focus_group_members (focus_group_id, employee_id, added_by, joined_at)
+SELECT fg.id, e.id, fg.created_by, fg.created_at
+FROM focus_groups fg
+CROSS JOIN LATERAL jsonb_array_elements_text(
+    CASE WHEN jsonb_typeof(fg.members) = 'array' THEN fg.members ELSE '[]'::jsonb END
+) AS member(employee_id)
+JOIN employees e
+  ON member.employee_id ~* '^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$'
+ AND e.id = member.employee_id::uuid
+ON CONFLICT (focus_group_id, employee_id) DO NOTHING;
+
+-- The array is no longer read or written; kept for rollback only
+ALTER TABLE focus_groups ALTER COLUMN members DROP NOT NULL;
+ALTER TABLE focus_groups ALTER COLUMN members SET DEFAULT '[]'::jsonb;
+COMMENT ON COLUMN focus_groups.members IS 'Deprecated: membership lives in focus_group_members';
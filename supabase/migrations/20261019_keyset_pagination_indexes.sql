@@ -0,0 +1,19 @@
+-- =====================================================
+-- KEYSET PAGINATION INDEXES
+-- Composite (sort_key, id) indexes backing cursor pagination
+-- =====================================================
+
+CREATE INDEX IF NOT EXISTS idx_users_created_at_id ON users(created_at, id);
+CREATE INDEX IF NOT EXISTS idx_employees_created_at_id ON employees(created_at, id);
+CREATE INDEX IF NOT EXISTS idx_surveys_created_at_id ON surveys(created_at, id);
+CREATE INDEX IF NOT EXISTS idx_survey_responses_survey_submitted_id ON survey_responses(survey_id, submitted_at, id);
+CREATE INDEX IF NOT EXISTS idx_action_plans_created_at_id ON action_plans(created_at, id);
+CREATE INDEX IF NOT EXISTS idx_audit_logs_timestamp_id ON audit_logs(timestamp, id);
+
+-- Keep planner estimates fresh enough for count=approximate
+ANALYZE users;
+ANALYZE employees;
+ANALYZE surveys;
+ANALYZE survey_responses;
+ANALYZE action_plans;
+ANALYZE audit_logs;
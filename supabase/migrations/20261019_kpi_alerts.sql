@@ -0,0 +1,30 @@
+-- =====================================================
+-- KPI ALERTS
+-- Alert rules (deviation, threshold, trend, rate of change) are evaluated
+-- when a measurement is recorded, and their state is kept here, so
+-- dashboards read alerts instead of recomputing them. The partial unique
+-- index keeps one active alert per KPI and rule
+-- =====================================================
+
+CREATE TABLE IF NOT EXISTS kpi_alerts (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    kpi_id UUID NOT NULL REFERENCES kpis(id) ON DELETE CASCADE,
+    rule TEXT NOT NULL CHECK (rule IN ('deviation', 'threshold', 'trend', 'rate_of_change')),
+    severity TEXT NOT NULL CHECK (severity IN ('warning', 'critical')),
+    status TEXT NOT NULL DEFAULT 'active' CHECK (status IN ('active', 'resolved')),
+    value NUMERIC,
+    metric DOUBLE PRECISION,
+    message TEXT,
+    details JSONB DEFAULT '{}'::jsonb,
+    occurrences INTEGER NOT NULL DEFAULT 1,
+    measured_at TIMESTAMP WITH TIME ZONE,
+    triggered_at TIMESTAMP WITH TIME ZONE DEFAULT TIMEZONE('utc'::text, NOW()),
+    last_evaluated_at TIMESTAMP WITH TIME ZONE DEFAULT TIMEZONE('utc'::text, NOW()),
+    notified_at TIMESTAMP WITH TIME ZONE,
+    resolved_at TIMESTAMP WITH TIME ZONE
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_kpi_alerts_active_rule ON kpi_alerts(kpi_id, rule) WHERE status = 'active';
+CREATE INDEX IF NOT EXISTS idx_kpi_alerts_status_severity ON kpi_alerts(status, severity, triggered_at);
+
+ALTER TABLE kpi_alerts ENABLE ROW LEVEL SECURITY;
@@ -0,0 +1,23 @@
+-- =====================================================
+-- KPI MEASUREMENTS
+-- The KPI endpoints record and chart measurements, but the table was never
+-- created. Series are read per KPI in date order, hence the
+-- (kpi_id, measurement_date) index
+-- =====================================================
+
+CREATE TABLE IF NOT EXISTS kpi_measurements (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    kpi_id UUID NOT NULL REFERENCES kpis(id) ON DELETE CASCADE,
+    value NUMERIC NOT NULL,
+    measurement_date TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT TIMEZONE('utc'::text, NOW()),
+    notes TEXT,
+    recorded_by UUID REFERENCES users(id),
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT TIMEZONE('utc'::text, NOW()),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT TIMEZONE('utc'::text, NOW())
+);
+
+CREATE INDEX IF NOT EXISTS idx_kpi_measurements_kpi_date ON kpi_measurements(kpi_id, measurement_date);
+-- Incremental Parquet snapshots range-scan from their measurement_date watermark
+CREATE INDEX IF NOT EXISTS idx_kpi_measurements_date_id ON kpi_measurements(measurement_date, id);
+
+ALTER TABLE kpi_measurements ENABLE ROW LEVEL SECURITY;
@@ -0,0 +1,14 @@
+-- =====================================================
+-- KPI PRIORITY
+-- The KPI endpoints filter, sort and bulk-update by priority, but the
+-- column was never created
+-- =====================================================
+
+ALTER TABLE kpis ADD COLUMN IF NOT EXISTS priority TEXT DEFAULT 'medium'; -- high, medium, low
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'kpis_priority_check') THEN
+        ALTER TABLE kpis ADD CONSTRAINT kpis_priority_check CHECK (priority IN ('high', 'medium', 'low'));
+    END IF;
+END $$;
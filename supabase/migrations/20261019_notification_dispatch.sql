@@ -0,0 +1,21 @@
+-- =====================================================
+-- NOTIFICATION DISPATCH
+-- Retry/claim tracking for the notification queue dispatcher
+-- =====================================================
+
+ALTER TABLE notification_queue
+ADD COLUMN IF NOT EXISTS attempts INTEGER DEFAULT 0,
+ADD COLUMN IF NOT EXISTS last_error TEXT,
+ADD COLUMN IF NOT EXISTS claimed_at TIMESTAMP WITH TIME ZONE;
+
+-- status now also includes 'sending' (claimed by a dispatcher)
+
+-- Due-row claims: WHERE status = 'pending' AND scheduled_for <= NOW() ORDER BY scheduled_for
+CREATE INDEX IF NOT EXISTS idx_notification_queue_status_scheduled
+ON notification_queue(status, scheduled_for);
+
+-- Per-survey cancellation and delivery status lookups. The expression must
+-- match the queries exactly (metadata ->> 'survey_id', no cast) to be used
+DROP INDEX IF EXISTS idx_notification_queue_survey_id;
+CREATE INDEX idx_notification_queue_survey_id
+ON notification_queue((metadata ->> 'survey_id'));
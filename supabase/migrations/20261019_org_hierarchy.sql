@@ -0,0 +1,82 @@
+-- =====================================================
+-- ORG HIERARCHY CLOSURE TABLE
+-- One row per (ancestor, descendant) pair in the reporting lines, so "all
+-- reports under X at any depth" and "is X above Y" are single index lookups
+-- =====================================================
+
+CREATE TABLE IF NOT EXISTS employee_hierarchy (
+    ancestor_id UUID NOT NULL REFERENCES employees(id) ON DELETE CASCADE,
+    descendant_id UUID NOT NULL REFERENCES employees(id) ON DELETE CASCADE,
+    depth INTEGER NOT NULL,
+    PRIMARY KEY (ancestor_id, descendant_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_employee_hierarchy_descendant ON employee_hierarchy(descendant_id, depth);
+
+-- Keep the closure in sync with employees.manager_id. A manager change moves
+-- the employee's whole subtree: links to the old ancestors are removed and
+-- links to every ancestor of the new manager are added.
+CREATE OR REPLACE FUNCTION maintain_employee_hierarchy()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO employee_hierarchy (ancestor_id, descendant_id, depth)
+        SELECT NEW.id, NEW.id, 0
+        UNION ALL
+        SELECT ancestor_id, NEW.id, depth + 1
+        FROM employee_hierarchy
+        WHERE descendant_id = NEW.manager_id
+        ON CONFLICT DO NOTHING;
+        RETURN NEW;
+    END IF;
+
+    IF NEW.manager_id IS NOT DISTINCT FROM OLD.manager_id THEN
+        RETURN NEW;
+    END IF;
+
+    IF NEW.manager_id IS NOT NULL AND EXISTS (
+        SELECT 1 FROM employee_hierarchy WHERE ancestor_id = NEW.id AND descendant_id = NEW.manager_id
+    ) THEN
+        RAISE EXCEPTION 'Employee % cannot report to % (would create a reporting cycle)', NEW.id, NEW.manager_id;
+    END IF;
+
+    DELETE FROM employee_hierarchy h
+    USING employee_hierarchy sub, employee_hierarchy sup
+    WHERE sub.ancestor_id = NEW.id
+      AND sup.descendant_id = NEW.id
+      AND sup.ancestor_id <> NEW.id
+      AND h.ancestor_id = sup.ancestor_id
+      AND h.descendant_id = sub.descendant_id;
+
+    INSERT INTO employee_hierarchy (ancestor_id, descendant_id, depth)
+    SELECT sup.ancestor_id, sub.descendant_id, sup.depth + sub.depth + 1
+    FROM employee_hierarchy sup
+    CROSS JOIN employee_hierarchy sub
+    WHERE sup.descendant_id = NEW.manager_id
+      AND sub.ancestor_id = NEW.id
+    ON CONFLICT DO NOTHING;
+
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS maintain_employee_hierarchy ON employees;
+CREATE TRIGGER maintain_employee_hierarchy
+    AFTER INSERT OR UPDATE OF manager_id ON employees
+    FOR EACH ROW
+    EXECUTE FUNCTION maintain_employee_hierarchy();
+
+-- Backfill from the existing adjacency list (depth cap guards against bad cycles)
+INSERT INTO employee_hierarchy (ancestor_id, descendant_id, depth)
+WITH RECURSIVE chain AS (
+    SELECT id AS ancestor_id, id AS descendant_id, 0 AS depth FROM employees
+    UNION ALL
+    SELECT e.manager_id, c.descendant_id, c.depth + 1
+    FROM chain c
+    JOIN employees e ON e.id = c.ancestor_id
+    WHERE e.manager_id IS NOT NULL AND c.depth < 64
+)
+SELECT ancestor_id, descendant_id, MIN(depth)
+FROM chain
+GROUP BY ancestor_id, descendant_id
+ON CONFLICT DO NOTHING;
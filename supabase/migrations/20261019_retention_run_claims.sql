@@ -0,0 +1,13 @@
+-- =====================================================
+-- RETENTION RUN CLAIMS
+-- Runs are claimed with a conditional UPDATE that records the worker and a
+-- heartbeat. Only pending runs, or running runs whose heartbeat is stale, can
+-- be claimed, so several app workers never execute the same run. The partial
+-- unique index allows one active run per policy
+-- =====================================================
+
+ALTER TABLE retention_runs ADD COLUMN IF NOT EXISTS worker_id TEXT;
+ALTER TABLE retention_runs ADD COLUMN IF NOT EXISTS heartbeat_at TIMESTAMP WITH TIME ZONE;
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_retention_runs_active_policy
+ON retention_runs(policy_id) WHERE status IN ('pending', 'running');
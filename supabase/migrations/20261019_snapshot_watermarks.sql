@@ -0,0 +1,19 @@
+-- =====================================================
+-- SNAPSHOT WATERMARK INDEXES
+-- Incremental Parquet snapshots read each table in (watermark, id) order from
+-- the previous snapshot's high watermark; these make that a range scan
+-- (survey_responses is covered by idx_survey_responses_submitted_at)
+-- =====================================================
+
+CREATE INDEX IF NOT EXISTS idx_employees_updated_at_id ON employees(updated_at, id);
+CREATE INDEX IF NOT EXISTS idx_kpi_values_created_at_id ON kpi_values(created_at, id);
+CREATE INDEX IF NOT EXISTS idx_employee_parameter_ratings_updated_at_id ON employee_parameter_ratings(updated_at, id);
+CREATE INDEX IF NOT EXISTS idx_performance_reviews_updated_at_id ON performance_reviews(updated_at, id);
+
+-- Ratings are upserted in place; without this trigger updated_at never moves
+-- and changed ratings would be missed by incremental snapshots
+DROP TRIGGER IF EXISTS update_employee_parameter_ratings_updated_at ON employee_parameter_ratings;
+CREATE TRIGGER update_employee_parameter_ratings_updated_at
+    BEFORE UPDATE ON employee_parameter_ratings
+    FOR EACH ROW
+    EXECUTE FUNCTION update_updated_at_column();
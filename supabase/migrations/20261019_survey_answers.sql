@@ -0,0 +1,24 @@
+-- =====================================================
+-- COLUMNAR SURVEY ANSWERS
+-- One row per closed-ended answer, written with each response batch, so
+-- distributions and cross-tabs are grouped index scans instead of JSON parsing
+-- =====================================================
+
+CREATE TABLE IF NOT EXISTS survey_answers (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    response_id UUID NOT NULL REFERENCES survey_responses(id) ON DELETE CASCADE,
+    survey_id UUID NOT NULL REFERENCES surveys(id) ON DELETE CASCADE,
+    question_id UUID NOT NULL REFERENCES survey_questions(id) ON DELETE CASCADE,
+    department_id UUID REFERENCES departments(id) ON DELETE SET NULL,
+    numeric_value DOUBLE PRECISION,
+    choice_code INTEGER
+);
+
+-- Covering index: per-question and per-department aggregates are index-only scans
+CREATE INDEX IF NOT EXISTS idx_survey_answers_survey_question_dept
+ON survey_answers(survey_id, question_id, department_id)
+INCLUDE (numeric_value, choice_code, response_id);
+
+CREATE INDEX IF NOT EXISTS idx_survey_answers_response ON survey_answers(response_id);
+
+-- Existing responses are projected per survey with POST /surveys/{id}/analytics/rebuild
@@ -0,0 +1,92 @@
+-- =====================================================
+-- SURVEY AUDIENCE
+-- Survey targeting moves from the target_departments/target_employees JSONB
+-- arrays into indexed join tables. survey_audience holds the targets
+-- expanded into employees at deployment, with surveys.audience_size as the
+-- precomputed response-rate denominator
+-- =====================================================
+
+CREATE TABLE IF NOT EXISTS survey_target_departments (
+    survey_id UUID NOT NULL REFERENCES surveys(id) ON DELETE CASCADE,
+    department_id UUID NOT NULL REFERENCES departments(id) ON DELETE CASCADE,
+    PRIMARY KEY (survey_id, department_id)
+);
+CREATE INDEX IF NOT EXISTS idx_survey_target_departments_department
+    ON survey_target_departments(department_id, survey_id);
+
+CREATE TABLE IF NOT EXISTS survey_target_employees (
+    survey_id UUID NOT NULL REFERENCES surveys(id) ON DELETE CASCADE,
+    employee_id UUID NOT NULL REFERENCES employees(id) ON DELETE CASCADE,
+    PRIMARY KEY (survey_id, employee_id)
+);
+CREATE INDEX IF NOT EXISTS idx_survey_target_employees_employee
+    ON survey_target_employees(employee_id, survey_id);
+
+CREATE TABLE IF NOT EXISTS survey_audience (
+    survey_id UUID NOT NULL REFERENCES surveys(id) ON DELETE CASCADE,
+    employee_id UUID NOT NULL REFERENCES employees(id) ON DELETE CASCADE,
+    department_id UUID REFERENCES departments(id) ON DELETE SET NULL, -- at resolution time
+    PRIMARY KEY (survey_id, employee_id)
+);
+CREATE INDEX IF NOT EXISTS idx_survey_audience_employee ON survey_audience(employee_id, survey_id);
+CREATE INDEX IF NOT EXISTS idx_survey_audience_department ON survey_audience(survey_id, department_id);
+
+ALTER TABLE survey_target_departments ENABLE ROW LEVEL SECURITY;
+ALTER TABLE survey_target_employees ENABLE ROW LEVEL SECURITY;
+ALTER TABLE survey_audience ENABLE ROW LEVEL SECURITY;
+
+ALTER TABLE surveys ADD COLUMN IF NOT EXISTS audience_size INTEGER;
+ALTER TABLE surveys ADD COLUMN IF NOT EXISTS audience_resolved_at TIMESTAMP WITH TIME ZONE;
+
+-- Backfill targets from the JSONB arrays; malformed and dangling IDs are dropped
+INSERT INTO survey_target_departments (survey_id, department_id)
+SELECT s.id, d.id
+FROM surveys s
+CROSS JOIN LATERAL jsonb_array_elements_text(
+    CASE WHEN jsonb_typeof(s.target_departments) = 'array' THEN s.target_departments ELSE '[]'::jsonb END
+) AS target(department_id)
+JOIN departments d
+  ON target.department_id ~* '^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$'
+ AND d.id = target.department_id::uuid
+ON CONFLICT DO NOTHING;
+
+INSERT INTO survey_target_employees (survey_id, employee_id)
+SELECT s.id, e.id
+FROM surveys s
+CROSS JOIN LATERAL jsonb_array_elements_text(
+    CASE WHEN jsonb_typeof(s.target_employees) = 'array' THEN s.target_employees ELSE '[]'::jsonb END
+) AS target(employee_id)
+JOIN employees e
+  ON target.employee_id ~* '^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$'
+ AND e.id = target.employee_id::uuid
+ON CONFLICT DO NOTHING;
+
+-- Resolve the audience of surveys that are already deployed
+INSERT INTO survey_audience (survey_id, employee_id, department_id)
+SELECT s.id, e.id, e.department_id
+FROM surveys s
+JOIN employees e ON e.is_active
+WHERE s.status IN ('active', 'completed', 'closed')
+  AND (
+        (NOT EXISTS (SELECT 1 FROM survey_target_departments t WHERE t.survey_id = s.id)
+         AND NOT EXISTS (SELECT 1 FROM survey_target_employees t WHERE t.survey_id = s.id))
+        OR EXISTS (SELECT 1 FROM survey_target_employees t WHERE t.survey_id = s.id AND t.employee_id = e.id)
+        OR EXISTS (SELECT 1 FROM survey_target_departments t WHERE t.survey_id = s.id AND t.department_id = e.department_id)
+      )
+ON CONFLICT DO NOTHING;
+
+UPDATE surveys s
+SET audience_size = counts.audience_size,
+    audience_resolved_at = TIMEZONE('utc'::text, NOW())
+FROM (
+    SELECT s2.id, COUNT(a.employee_id) AS audience_size
+    FROM surveys s2
+    LEFT JOIN survey_audience a ON a.survey_id = s2.id
+    WHERE s2.status IN ('active', 'completed', 'closed')
+    GROUP BY s2.id
+) counts
+WHERE s.id = counts.id;
+
+-- The arrays are no longer read or written; kept for rollback only
+COMMENT ON COLUMN surveys.target_departments IS 'Deprecated: targeting lives in survey_target_departments';
+COMMENT ON COLUMN surveys.target_employees IS 'Deprecated: targeting lives in survey_target_employees';
@@ -0,0 +1,22 @@
+-- =====================================================
+-- SURVEY QUESTION POSITION
+-- Questions created in one transaction share created_at, so ordering by it
+-- is arbitrary. An explicit position fixes the order that branching, quality
+-- checks, answer projections and exports rely on
+-- =====================================================
+
+ALTER TABLE survey_questions ADD COLUMN IF NOT EXISTS position INTEGER;
+
+-- Backfill with the previous ordering
+UPDATE survey_questions q
+SET position = ordered.position
+FROM (
+    SELECT id, ROW_NUMBER() OVER (PARTITION BY survey_id ORDER BY created_at, id) - 1 AS position
+    FROM survey_questions
+) ordered
+WHERE q.id = ordered.id AND q.position IS NULL;
+
+ALTER TABLE survey_questions ALTER COLUMN position SET DEFAULT 0;
+ALTER TABLE survey_questions ALTER COLUMN position SET NOT NULL;
+
+CREATE INDEX IF NOT EXISTS idx_survey_questions_survey_position ON survey_questions(survey_id, position, id);
@@ -0,0 +1,15 @@
+-- =====================================================
+-- SURVEY RESPONSE INGESTION
+-- One response per employee per survey, enforced by the database so the
+-- ingestor can use INSERT ... ON CONFLICT DO NOTHING instead of a pre-check
+-- =====================================================
+
+-- Keep the earliest response where duplicates slipped past the old pre-check
+DELETE FROM survey_responses r
+USING survey_responses earlier
+WHERE r.survey_id = earlier.survey_id
+  AND r.employee_id = earlier.employee_id
+  AND (r.submitted_at, r.id) > (earlier.submitted_at, earlier.id);
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_survey_responses_survey_employee
+ON survey_responses(survey_id, employee_id);
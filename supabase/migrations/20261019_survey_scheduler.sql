@@ -0,0 +1,15 @@
+-- =====================================================
+-- RECURRING SURVEY SCHEDULER
+-- Next deployment time and instance lineage for scheduled surveys
+-- =====================================================
+
+ALTER TABLE surveys
+ADD COLUMN IF NOT EXISTS parent_survey_id UUID REFERENCES surveys(id),
+ADD COLUMN IF NOT EXISTS occurrence_at TIMESTAMP WITH TIME ZONE,
+ADD COLUMN IF NOT EXISTS next_run_at TIMESTAMP WITH TIME ZONE;
+
+-- Loaded by every worker at startup and on resync
+CREATE INDEX IF NOT EXISTS idx_surveys_next_run_at ON surveys(next_run_at);
+
+-- One instance per occurrence, even if two workers race past the advisory lock
+CREATE UNIQUE INDEX IF NOT EXISTS idx_surveys_parent_occurrence ON surveys(parent_survey_id, occurrence_at);